@@ -1,7 +1,7 @@
 import json
 import os
 
-json_path = r'e:\Quant\PineScript_study\web\data\lessons.json'
+json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web", "data", "lessons.json")
 
 new_lessons = [
     {
@@ -368,52 +368,53 @@ print(res)""",
     }
 ]
 
-# 读取现有文件
-with open(json_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# 检查是否已经存在这些 ID，避免重复添加
-existing_ids = [l['id'] for l in data['lessons']]
-for new_lesson in new_lessons:
-    if new_lesson['id'] not in existing_ids:
-        # 插入到 ref_ta_all 之前，或者直接追加
-        # 找到 ref_ta_all 的索引
-        ref_index = -1
-        for i, l in enumerate(data['lessons']):
-            if l['id'] == 'ref_ta_all':
-                ref_index = i
-                break
-        
-        if ref_index != -1:
-            data['lessons'].insert(ref_index, new_lesson)
-            # 插入后 ref_index 需要后移，但我们是一次性插入逻辑，或者每次都找
-            # 这里简单起见，每次插入都会改变索引，所以上面的逻辑其实只对单个有效
-            # 更好的方法是先收集所有要插入的，然后一次性插入到 ref_ta_all 之前
-        else:
-            data['lessons'].append(new_lesson)
-
-# 重新排序逻辑：为了保证顺序 l11, l12, l13, l14 在 ref_ta_all 之前
-# 我们先把 ref_ta_all 拿出来，追加新课程，再放回去
-# 或者更简单：完全重建列表
-final_lessons = []
-ref_lesson = None
-for l in data['lessons']:
-    if l['id'] == 'ref_ta_all':
-        ref_lesson = l
-    elif l['id'] not in [nl['id'] for nl in new_lessons]: # 排除掉可能已存在的旧版
-        final_lessons.append(l)
-
-# 追加新的
-final_lessons.extend(new_lessons)
-
-# 最后放回 ref
-if ref_lesson:
-    final_lessons.append(ref_lesson)
-
-data['lessons'] = final_lessons
-
-# 写入文件
-with open(json_path, 'w', encoding='utf-8') as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
-
-print("Added lessons 11-14 successfully.")
+
+def merge(data, replace=True):
+    """把 new_lessons 合并进课程列表（放在 ref_ta_all 之前）。
+
+    replace=True 时用脚本中的版本覆盖同 id 的课程（原脚本行为）；
+    replace=False 时只补充缺失的课程，保留 lessons.json 中后续手工修改的内容。
+    """
+    existing = {l['id'] for l in data['lessons']}
+    new_ids = {nl['id'] for nl in new_lessons}
+    if not replace and new_ids <= existing:
+        return data
+    to_add = [nl for nl in new_lessons if replace or nl['id'] not in existing]
+    add_ids = {nl['id'] for nl in to_add}
+
+    # 完全重建列表：为了保证顺序 l11, l12, l13, l14 在 ref_ta_all 之前
+    final_lessons = []
+    ref_lesson = None
+    for l in data['lessons']:
+        if l['id'] == 'ref_ta_all':
+            ref_lesson = l
+        elif l['id'] not in add_ids: # 排除掉可能已存在的旧版
+            final_lessons.append(l)
+
+    # 追加新的
+    final_lessons.extend(to_add)
+
+    # 最后放回 ref
+    if ref_lesson:
+        final_lessons.append(ref_lesson)
+
+    data['lessons'] = final_lessons
+    return data
+
+
+def main():
+    # 读取现有文件
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    merge(data)
+
+    # 写入文件
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    print("Added lessons 11-14 successfully.")
+
+
+if __name__ == "__main__":
+    main()
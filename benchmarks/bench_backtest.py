@@ -0,0 +1,111 @@
+# 中文说明：策略回测与参数扫描基准
+"""
+功能概述：
+- 单次回测：课程策略示例在 N 根合成 K 线上的耗时（脚本执行 + 回测），区分向量化快速路径与事件推进路径
+- 参数扫描：10 组参数 × 100 万根 K 线，按不同进程数运行，输出总耗时、加速比与内存峰值
+
+输入/输出：
+- python benchmarks/bench_backtest.py [--bars 1000000] [--combos 10] [--workers 1,2,4]
+- 输出每项耗时（s）、相对单进程的加速比、父进程与单个子进程的 RSS 峰值（MB）
+
+边界与安全：
+- K 线数据只在共享内存中保存一份（6 列 float64，100 万根约 48 MB），子进程映射后只读访问
+- 加速比受机器核数限制；进程数超过核数时不会更快
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+from server.backtest import _vector_eligible, DEFAULT_CONFIG, sweep  # noqa: E402
+from server.pine_parser import parse  # noqa: E402
+from server.pine_runtime import Interpreter, PineRuntimeError, synthetic_ohlcv  # noqa: E402
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+SWEEP_CODE = """strategy("EMA Cross", overlay=true, commission_value=0.05)
+fast = input.int(10, "Fast")
+slow = input.int(50, "Slow")
+f = ta.ema(close, fast)
+s = ta.ema(close, slow)
+if ta.crossover(f, s)
+    strategy.entry("Long", strategy.long)
+if ta.crossunder(f, s)
+    strategy.entry("Short", strategy.short)
+"""
+
+
+def rss_mb(who) -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def bench_lessons(bars: int) -> None:
+    data = json.loads(LESSONS_FILE.read_text(encoding="utf-8"))
+    build_lessons.restore_bundles(data, LESSONS_FILE)
+    ohlcv = synthetic_ohlcv(bars)
+    print(f"课程策略单次回测（{bars} 根 K 线）")
+    for lesson in data["lessons"]:
+        code = lesson.get("pine_code", "")
+        if "strategy(" not in code:
+            continue
+        try:
+            started = time.perf_counter()
+            rt = Interpreter(parse(code), ohlcv)
+            rt.run()
+            mid = time.perf_counter()
+            result = rt.backtest(ohlcv)
+            done = time.perf_counter()
+        except (PineRuntimeError, ValueError) as e:
+            print(f"  {lesson['id']:22s} 跳过：{e}")
+            continue
+        path = "向量化" if _vector_eligible(rt.orders, {**DEFAULT_CONFIG, **rt.strategy}) else "事件推进"
+        print(f"  {lesson['id']:22s} 脚本 {(mid - started) * 1000:8.1f} ms  回测 {(done - mid) * 1000:8.1f} ms  "
+              f"{path:4s}  交易 {result.stats()['total_trades']}")
+
+
+def bench_sweep(bars: int, combos: int, workers_list) -> None:
+    grid = {"Fast": [5 + 5 * i for i in range(combos)]}
+    print(f"\n参数扫描：{combos} 组参数 × {bars} 根 K 线（本机 {os.cpu_count()} 核）")
+    baseline = None
+    for workers in workers_list:
+        started = time.perf_counter()
+        results = sweep(SWEEP_CODE, grid, {"bars": bars}, workers=workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        best = max(results, key=lambda r: r["stats"]["net_profit"])
+        print(f"  workers={workers:<3d} {elapsed:7.2f} s  加速比 {baseline / elapsed:5.2f}x  "
+              f"每组 {elapsed / combos * 1000:7.1f} ms  最优 Fast={best['params']['Fast']}")
+    print(f"  RSS 峰值：父进程 {rss_mb(resource.RUSAGE_SELF):.0f} MB，单个子进程 {rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="策略回测与参数扫描基准")
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    parser.add_argument("--combos", type=int, default=10)
+    parser.add_argument("--workers", default=None, help="逗号分隔的进程数列表（默认 1 到本机核数，按 2 倍递增）")
+    parser.add_argument("--lesson-bars", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.workers:
+        workers_list = [int(w) for w in args.workers.split(",")]
+    else:
+        workers_list, w = [], 1
+        while w < (os.cpu_count() or 1):
+            workers_list.append(w)
+            w *= 2
+        workers_list.append(os.cpu_count() or 1)
+    bench_lessons(args.lesson_bars)
+    bench_sweep(args.bars, args.combos, workers_list)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# 中文说明：接口处理微基准（改造前 vs 改造后）
+"""
+功能概述：
+- 序列化：标准库 json.dumps vs orjson.dumps（以真实 lessons.json 为输入）
+- 接口吞吐：在进程内通过 ASGI 传输层并发请求，对比
+  legacy（同步 def + 每次 json.load + 通用 JSON 编码器，即改造前的实现）与当前 server.main.app
+
+输入/输出：
+- python benchmarks/bench_handlers.py [--requests 2000] [--concurrency 32]
+- 输出每种实现的 requests/sec
+
+边界与安全：
+- 进度数据与课程修订日志写入临时目录，不会修改 server/data 与 web/data
+- 结果受机器负载影响，仅用于同一台机器上的前后对比
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+
+def build_legacy_app(progress_file: Path):
+    """中文说明：复刻改造前的实现（同步处理、每次读文件、通用 JSON 编码）"""
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    app = FastAPI()
+    # 原实现并发读写会读到写了一半的文件；这里加锁仅为让基准能跑完
+    file_lock = threading.Lock()
+
+    class ProgressPayload(BaseModel):
+        user: str
+        progress: dict
+
+    @app.get("/lessons")
+    def get_lessons():
+        with LESSONS_FILE.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @app.get("/progress")
+    def get_progress(user: str = "default"):
+        with file_lock:
+            if not progress_file.exists():
+                return {"user": user, "progress": {}}
+            with progress_file.open("r", encoding="utf-8") as f:
+                return {"user": user, "progress": json.load(f).get(user, {})}
+
+    @app.post("/progress")
+    def save_progress(payload: ProgressPayload):
+        with file_lock:
+            all_data = {}
+            if progress_file.exists():
+                with progress_file.open("r", encoding="utf-8") as f:
+                    all_data = json.load(f)
+            all_data[payload.user] = payload.progress
+            with progress_file.open("w", encoding="utf-8") as f:
+                json.dump(all_data, f, ensure_ascii=False, indent=2)
+        return {"ok": True}
+
+    return app
+
+
+async def measure(app, method: str, path: str, total: int, concurrency: int, body=None) -> float:
+    """中文说明：并发发送 total 个请求，返回 requests/sec"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        counter = iter(range(total))
+
+        async def worker():
+            for i in counter:
+                kwargs = {}
+                if body is not None:
+                    kwargs["json"] = body(i)
+                r = await client.request(method, path, **kwargs)
+                r.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+
+def bench_serializers(data: dict, number: int = 50) -> None:
+    import orjson
+
+    t_json = timeit.timeit(lambda: json.dumps(data, ensure_ascii=False), number=number) / number
+    t_orjson = timeit.timeit(lambda: orjson.dumps(data), number=number) / number
+    t_load = timeit.timeit(lambda: json.loads(LESSONS_FILE.read_bytes()), number=number) / number
+    t_oload = timeit.timeit(lambda: orjson.loads(LESSONS_FILE.read_bytes()), number=number) / number
+    print("序列化（lessons.json，单次耗时）")
+    print(f"  json.dumps   {t_json * 1000:8.3f} ms    orjson.dumps {t_orjson * 1000:8.3f} ms    x{t_json / t_orjson:.1f}")
+    print(f"  json.loads   {t_load * 1000:8.3f} ms    orjson.loads {t_oload * 1000:8.3f} ms    x{t_load / t_oload:.1f}")
+
+
+async def bench_apps(total: int, concurrency: int) -> None:
+    tmp = Path(tempfile.mkdtemp(prefix="ps-bench-"))
+    os.environ.setdefault("PS_WRITE_BEHIND_WINDOW", "0.2")
+    from server import main
+    from server.lessons_store import LessonsStore
+    from server.progress_store import SqliteProgressStore
+    from server.write_behind import WriteBehindQueue
+
+    main.lessons_store = LessonsStore(LESSONS_FILE, revisions_path=tmp / "lessons.revisions.json")
+    main.progress_store = SqliteProgressStore(tmp / "progress.db")
+    main.write_queue = WriteBehindQueue(main.progress_store, window=0.2, gate=main.admission.gate)
+    legacy = build_legacy_app(tmp / "progress.json")
+
+    progress = {"lessons": {f"l{i}": {"readDone": True, "codeDone": True, "quizDone": i % 2 == 0} for i in range(30)}}
+
+    def body(i):
+        return {"user": f"user{i % 200}", "progress": progress}
+
+    cases = [
+        ("GET /lessons", "GET", "/lessons", None),
+        ("GET /progress", "GET", "/progress?user=user1", None),
+        ("POST /progress", "POST", "/progress", body),
+    ]
+    await main.write_queue.start()
+    try:
+        print(f"\n接口吞吐（{total} 请求，并发 {concurrency}，requests/sec）")
+        for name, method, path, make_body in cases:
+            before = await measure(legacy, method, path, total, concurrency, make_body)
+            after = await measure(main.app, method, path, total, concurrency, make_body)
+            print(f"  {name:16s} legacy {before:9.1f}    current {after:9.1f}    x{after / before:.1f}")
+    finally:
+        await main.write_queue.stop()
+        main.progress_store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口处理微基准")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    bench_serializers(json.loads(LESSONS_FILE.read_bytes()))
+    asyncio.run(bench_apps(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# 中文说明：课程数据格式基准（JSON vs 紧凑二进制）
+"""
+功能概述：
+- 体积：缩进 JSON（当前 lessons.json）、紧凑 JSON、二进制 lessons.bin，各自原始与 gzip 后的字节数
+- 整体解码：json.loads / orjson.loads / lessons_pack.unpack（安装 msgpack 时另测其 C 实现）
+- 单课读取：JSON 必须解析整个文件再查找；二进制 mmap 后只解码偏移表指向的那一节课
+
+输入/输出：
+- python benchmarks/bench_lessons_format.py [--number 200] [--lesson ID]
+- 输出每项的单次耗时（ms）与字节数
+
+边界与安全：
+- 只读 web/data 下的文件；lessons.bin 不存在或与 lessons.json 不一致时在临时目录重新生成
+- 纯 Python 解码器受解释器开销限制，整体解码可能慢于 C 实现的 JSON 解析；二进制格式的收益在体积与单课读取
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server import lessons_pack  # noqa: E402
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+PACKED_FILE = ROOT / "web" / "data" / "lessons.bin"
+
+
+def per_call_ms(fn, number: int) -> float:
+    return timeit.timeit(fn, number=number) / number * 1000
+
+
+def bench_sizes(pretty: bytes, compact: bytes, packed: bytes) -> None:
+    print("体积（字节）              原始        gzip -9")
+    for name, raw in (("lessons.json（缩进）", pretty), ("紧凑 JSON", compact), ("lessons.bin", packed)):
+        print(f"  {name:20s} {len(raw):10d} {len(gzip.compress(raw, 9)):12d}    {len(raw) / len(pretty):6.1%}")
+
+
+def bench_decode(pretty: bytes, packed: bytes, number: int) -> None:
+    cases = [("json.loads", lambda: json.loads(pretty))]
+    try:
+        import orjson
+        cases.append(("orjson.loads", lambda: orjson.loads(pretty)))
+    except ImportError:
+        pass
+    accelerated = lessons_pack.msgpack
+    lessons_pack.msgpack = None
+    cases.append(("unpack（纯 Python）", lambda: lessons_pack.unpack(packed)))
+    print(f"\n整体解码（单次耗时，{number} 次平均）")
+    for name, fn in cases:
+        print(f"  {name:20s} {per_call_ms(fn, number):8.3f} ms")
+    lessons_pack.msgpack = accelerated
+    if accelerated is not None:
+        print(f"  {'unpack（msgpack）':20s} {per_call_ms(lambda: lessons_pack.unpack(packed), number):8.3f} ms")
+
+
+def bench_single(pretty: bytes, path: Path, lesson_id: str, number: int) -> None:
+    def from_json():
+        return next(l for l in json.loads(pretty)["lessons"] if l.get("id") == lesson_id)
+
+    packed = lessons_pack.PackedLessons(path)
+    try:
+        assert packed.lesson(lesson_id) == from_json()
+        print(f"\n单课读取（{lesson_id}，单次耗时）")
+        print(f"  {'JSON 全量解析后查找':20s} {per_call_ms(from_json, number):8.3f} ms")
+        print(f"  {'mmap 打开（文件头+id 表）':20s} {per_call_ms(lambda: lessons_pack.PackedLessons(path).close(), number):8.3f} ms")
+        print(f"  {'mmap 按 id 解码':20s} {per_call_ms(lambda: packed.lesson(lesson_id), number):8.3f} ms")
+    finally:
+        packed.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程数据格式基准")
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--lesson", default=None, help="单课读取使用的课程 id（默认取正文最长的一节）")
+    args = parser.parse_args()
+
+    pretty = LESSONS_FILE.read_bytes()
+    data = json.loads(pretty)
+    compact = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    packed = lessons_pack.pack(data)
+    path = PACKED_FILE
+    if not path.exists() or path.read_bytes() != packed:
+        path = Path(tempfile.mkdtemp(prefix="ps-bench-")) / "lessons.bin"
+        path.write_bytes(packed)
+    lesson_id = args.lesson or max(data["lessons"], key=lambda l: len(json.dumps(l, ensure_ascii=False)))["id"]
+
+    bench_sizes(pretty, compact, packed)
+    bench_decode(pretty, packed, args.number)
+    bench_single(pretty, path, lesson_id, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# 中文说明：Pine 向量化运行时基准
+"""
+功能概述：
+- ta.* 内核：向量化实现与逐根 K 线的 Python 循环（与 Pine 的执行模型相同）对比
+- 整段脚本：课程中的指标示例在 N 根合成 K 线上的运行耗时（解析 + 执行，不含缓存）
+
+输入/输出：
+- python benchmarks/bench_pine_runtime.py [--bars 100000] [--number 5]
+- 输出每项的单次耗时（ms）
+
+边界与安全：
+- 只读 web/data/lessons.json；策略、数组与 map 示例运行时不支持，跳过
+- 逐根循环只测 ema/rma 等递推指标，窗口类指标的朴素实现为 O(N·length)，对比意义不大
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+from server import pine_ta as ta  # noqa: E402
+from server.pine_runtime import PineRuntimeError, run, synthetic_ohlcv  # noqa: E402
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+
+def per_call_ms(fn, number: int) -> float:
+    return timeit.timeit(fn, number=number) / number * 1000
+
+
+def loop_ema(x, length: int):
+    alpha = 2 / (length + 1)
+    out = [float("nan")] * len(x)
+    prev = sum(x[:length]) / length
+    out[length - 1] = prev
+    for i in range(length, len(x)):
+        prev = alpha * x[i] + (1 - alpha) * prev
+        out[i] = prev
+    return out
+
+
+def bench_kernels(data, number: int) -> None:
+    close, high, low = data["close"], data["high"], data["low"]
+    values = close.tolist()
+    cases = [
+        ("ta.ema(20)（逐根循环）", lambda: loop_ema(values, 20), 1),
+        ("ta.ema(20)", lambda: ta.ema(close, 20), number),
+        ("ta.sma(20)", lambda: ta.sma(close, 20), number),
+        ("ta.rsi(14)", lambda: ta.rsi(close, 14), number),
+        ("ta.atr(14)", lambda: ta.atr(high, low, close, 14), number),
+        ("ta.macd(12,26,9)", lambda: ta.macd(close, 12, 26, 9), number),
+        ("ta.bb(20,2)", lambda: ta.bb(close, 20, 2.0), number),
+        ("ta.highest(50)", lambda: ta.highest(high, 50), number),
+        ("ta.crossover", lambda: ta.crossover(close, ta.sma(close, 20)), number),
+    ]
+    print(f"ta.* 内核（{len(close)} 根 K 线，单次耗时）")
+    for name, fn, n in cases:
+        print(f"  {name:24s} {per_call_ms(fn, n):9.3f} ms")
+
+
+def bench_lessons(bars: int, number: int) -> None:
+    data = json.loads(LESSONS_FILE.read_text(encoding="utf-8"))
+    build_lessons.restore_bundles(data, LESSONS_FILE)
+    print(f"\n课程示例整段运行（{bars} 根 K 线，单次耗时）")
+    for lesson in data["lessons"]:
+        code = lesson.get("pine_code", "")
+        if code.startswith("ENC:"):
+            continue
+        try:
+            run(code, {"bars": bars})
+        except (PineRuntimeError, ValueError) as e:
+            print(f"  {lesson['id']:24s}   跳过：{e}")
+            continue
+        print(f"  {lesson['id']:24s} {per_call_ms(lambda: run(code, {'bars': bars}), number):9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pine 向量化运行时基准")
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_ohlcv(args.bars)
+    np.seterr(all="ignore")
+    bench_kernels(data, args.number)
+    bench_lessons(args.bars, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# 中文说明：课程内容校验基准
+"""
+功能概述：
+- 把真实课程（还原锁定课程包后）复制扩展为 N 节课的合成目录（每节课的代码追加唯一注释行，内容哈希各不相同）
+- 分别测量：无缓存串行、无缓存多进程、缓存全部命中、只改动 1% 课程后的增量校验
+
+输入/输出：
+- python benchmarks/bench_validate_lessons.py [--lessons 3000] [--workers 4]
+- 输出每项耗时（ms）与重新校验的课程数
+
+边界与安全：
+- 缓存写在临时目录，不影响仓库根目录的 .validate_cache.json
+- 多进程加速比受机器核数限制
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+import validate_lessons  # noqa: E402
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+
+def synthetic_catalogue(size: int) -> dict:
+    data = json.loads(LESSONS_FILE.read_text(encoding="utf-8"))
+    build_lessons.restore_bundles(data, LESSONS_FILE)
+    base = data["lessons"]
+    lessons = []
+    for i in range(size):
+        lesson = copy.deepcopy(base[i % len(base)])
+        lesson["id"] = f"{lesson['id']}_{i}"
+        lesson["pine_code"] = lesson.get("pine_code", "") + f"\n// copy {i}\n"
+        lessons.append(lesson)
+    return {"lessons": lessons}
+
+
+def run(label: str, catalogue: dict, cache_path: str, workers: int, force: bool = False) -> None:
+    cache = validate_lessons.load_cache(cache_path)
+    report = validate_lessons.validate(catalogue, cache, workers=workers, force=force)
+    validate_lessons.save_cache(cache_path, cache)
+    print(f"  {label:24s} {report.elapsed_ms:10.2f} ms  重新校验 {report.checked:5d}  有问题 {len(report.errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程内容校验基准")
+    parser.add_argument("--lessons", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    catalogue = synthetic_catalogue(args.lessons)
+    print(f"课程内容校验（{args.lessons} 节课，本机 {os.cpu_count()} 核）")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.json")
+        run("无缓存，串行", catalogue, cache_path, 1, force=True)
+        run(f"无缓存，{args.workers} 进程", catalogue, cache_path, args.workers, force=True)
+        run("缓存全部命中", catalogue, cache_path, args.workers)
+        for lesson in catalogue["lessons"][::100]:
+            lesson["pine_code"] += "// edited\n"
+        run("改动 1% 的课程", catalogue, cache_path, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+# 中文说明：本地压测与延迟基准
+"""
+功能概述：
+- 完全在本机运行：asgi 模式走进程内 ASGI 传输层；uvicorn 模式在后台线程启动真实 HTTP 服务
+- 按场景回放真实流量：冷启动拉取课程、条件请求、单课加载、进度读取、多用户并发保存、混合流量
+- 开环场景按固定速率发送请求（不等上一个请求返回），延迟从计划发送时刻算起，不会因服务变慢而少发请求：
+  paced_writes 只有普通用户的增量保存（--rate）；hot_user_burst 在此之上叠加一个以 --hot-rate 整体保存进度的热点用户，
+  分别统计普通用户与热点用户的延迟和 429 次数，两者的普通用户 p99 应基本一致
+- 输出每个场景的 p50/p95/p99 延迟、RPS 与进程 RSS；可保存为基线 JSON，并与基线对比发现回归
+
+输入/输出：
+- python benchmarks/load_test.py [--mode asgi|uvicorn] [--requests 2000] [--concurrency 32] [--users 200]
+  [--rate 200] [--hot-rate 400]
+- --save-baseline：把结果写入 benchmarks/baseline.json
+- --compare：与基线对比，p95 变慢或 RPS 下降超过 --threshold（默认 25%）时退出码为 1
+
+边界与安全：
+- 进度数据与课程修订日志写入临时目录，不会修改 server/data 与 web/data
+- 基线与机器相关；对比前请在同一台机器上重新生成基线
+- 基线记录开环场景的 --rate/--hot-rate，对比时请使用相同速率；速率超过服务能力时排队延迟会持续增长
+- 所有请求来自本机同一 IP，压测时关闭按 IP 限流；按用户限流与存储写入名额（WriteGate）保持服务默认配置
+- 压测客户端与服务共用进程：CPU 核不足时热点用户的请求（即使被 429 拒绝）也占用 CPU，普通用户 p99 会随总请求量上升
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+
+def rss_mb() -> float:
+    """中文说明：当前进程常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        # 非 Linux：退回到峰值 RSS（macOS 单位为字节，Linux 为 KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def setup_app(tmp: Path):
+    """中文说明：把服务的数据存储指向临时目录，返回 ASGI app"""
+    from server import main
+    from server.admission import RateLimiter
+    from server.lessons_store import LessonsStore
+    from server.progress_store import SqliteProgressStore
+    from server.write_behind import WriteBehindQueue
+
+    main.lessons_store = LessonsStore(LESSONS_FILE, revisions_path=tmp / "lessons.revisions.json")
+    main.progress_store = SqliteProgressStore(tmp / "progress.db")
+    main.write_queue = WriteBehindQueue(
+        main.progress_store, window=float(os.environ.get("PS_WRITE_BEHIND_WINDOW", "0.5")), gate=main.admission.gate
+    )
+    main.admission.ip = RateLimiter(rate=0, burst=0)
+    return main
+
+
+def lesson_ids():
+    return [l["id"] for l in json.loads(LESSONS_FILE.read_bytes())["lessons"]]
+
+
+def build_scenarios(users: int):
+    """中文说明：场景 = 名称 -> 生成单个请求 (method, path, headers, json) 的函数"""
+    ids = lesson_ids()
+    state = {"etag": None}
+
+    def lessons_cold(rng):
+        return "GET", "/lessons", {"Accept-Encoding": "gzip"}, None
+
+    def lessons_revalidate(rng):
+        return "GET", "/lessons", {"Accept-Encoding": "gzip", "If-None-Match": state["etag"] or ""}, None
+
+    def lesson_single(rng):
+        return "GET", f"/lessons/{rng.choice(ids)}", {"Accept-Encoding": "gzip"}, None
+
+    def progress_read(rng):
+        return "GET", f"/progress?user=user{rng.randrange(users)}", {}, None
+
+    def save_burst(rng):
+        change = {"lessonId": rng.choice(ids), "field": rng.choice(["readDone", "codeDone", "quizDone"]), "val": True}
+        return "PATCH", "/progress", {}, {"user": f"user{rng.randrange(users)}", "changes": [change]}
+
+    def save_full(rng):
+        progress = {"lessons": {i: {"readDone": True, "codeDone": rng.random() < 0.5, "quizDone": False} for i in ids[: rng.randrange(1, len(ids))]}}
+        return "POST", "/progress", {}, {"user": f"user{rng.randrange(users)}", "progress": progress}
+
+    # 混合流量：按课堂场景估计的比例（大多数请求是读）
+    weighted = [
+        (lessons_revalidate, 20),
+        (lesson_single, 35),
+        (progress_read, 20),
+        (save_burst, 20),
+        (lessons_cold, 5),
+    ]
+    population = [fn for fn, _ in weighted]
+    weights = [w for _, w in weighted]
+
+    def mixed(rng):
+        return rng.choices(population, weights)[0](rng)
+
+    def hot_save(rng):
+        # 刷写脚本：同一个用户反复整体保存全部课程的进度
+        progress = {"lessons": {i: {"readDone": True, "codeDone": rng.random() < 0.5, "quizDone": False} for i in ids}}
+        return "POST", "/progress", {}, {"user": "hot", "progress": progress}
+
+    return state, {
+        "lessons_cold": lessons_cold,
+        "lessons_revalidate": lessons_revalidate,
+        "lesson_single": lesson_single,
+        "progress_read": progress_read,
+        "save_burst": save_burst,
+        "save_full": save_full,
+        "mixed": mixed,
+        "hot_save": hot_save,
+    }
+
+
+# 开环场景：名称 -> [(统计分组, 请求生成函数, 速率参数)]；第一个流为主指标（普通用户）
+PACED_SCENARIOS = {
+    "paced_writes": [("normal", "save_burst", "rate")],
+    "hot_user_burst": [("normal", "save_burst", "rate"), ("hot", "hot_save", "hot_rate")],
+}
+
+
+def latency_summary(latencies) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+async def run_scenario(client, make_request, total: int, concurrency: int, seed: int) -> dict:
+    latencies = []
+    errors = 0
+    limited = 0
+    counter = iter(range(total))
+    rng = random.Random(seed)
+
+    async def worker():
+        nonlocal errors, limited
+        for _ in counter:
+            method, path, headers, body = make_request(rng)
+            started = time.perf_counter()
+            r = await client.request(method, path, headers=headers, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 429 是准入控制的预期结果，单独计数，不算错误
+            if r.status_code == 429:
+                limited += 1
+            elif r.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "limited": limited,
+        "rps": round(total / elapsed, 1),
+        **latency_summary(latencies),
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+async def run_paced(client, streams, seed: int) -> dict:
+    """中文说明：开环压测；streams 为 [(分组, 请求生成函数, 每秒请求数, 请求数)]，各流同时开始、按固定间隔发送"""
+    import httpx
+
+    groups = {}
+    tasks = []
+
+    async def send(group, request, scheduled):
+        method, path, headers, body = request
+        g = groups[group]
+        try:
+            r = await client.request(method, path, headers=headers, json=body)
+        except httpx.TransportError:
+            # 开环压力超过服务能力时连接可能被重置：计为错误，不中断整轮压测
+            g["errors"] += 1
+            return
+        # 从计划发送时刻计时：服务变慢导致的发送延后也计入延迟（避免协同遗漏）
+        g["latencies"].append((time.perf_counter() - scheduled) * 1000)
+        if r.status_code == 429:
+            g["limited"] += 1
+        elif r.status_code >= 400:
+            g["errors"] += 1
+
+    async def pace(group, make_request, rate, count, rng):
+        groups[group] = {"latencies": [], "limited": 0, "errors": 0}
+        for i in range(count):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(group, make_request(rng), scheduled)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        pace(group, make_request, rate, count, random.Random(seed * 100 + i))
+        for i, (group, make_request, rate, count) in enumerate(streams)
+    ))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    summary = {
+        name: {"requests": len(g["latencies"]), "limited": g["limited"], **latency_summary(g["latencies"])}
+        for name, g in groups.items()
+    }
+    main_group = groups[streams[0][0]]
+    return {
+        "requests": len(main_group["latencies"]),
+        "errors": sum(g["errors"] for g in groups.values()),
+        "limited": sum(g["limited"] for g in groups.values()),
+        "rps": round(sum(len(g["latencies"]) for g in groups.values()) / elapsed, 1),
+        # 主指标只统计普通用户，热点用户的延迟见 groups
+        **latency_summary(main_group["latencies"]),
+        "rss_mb": round(rss_mb(), 1),
+        "groups": summary,
+    }
+
+
+class UvicornThread:
+    """中文说明：在后台线程运行 uvicorn，用于测量包含 HTTP 协议栈的真实延迟"""
+
+    def __init__(self, app):
+        import uvicorn
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def run_all(args) -> dict:
+    import httpx
+
+    tmp = Path(tempfile.mkdtemp(prefix="ps-load-"))
+    main = setup_app(tmp)
+    state, scenarios = build_scenarios(args.users)
+    selected = args.scenarios or [name for name in scenarios if name != "hot_save"] + list(PACED_SCENARIOS)
+    results = {}
+
+    async def drive(client):
+        r = await client.get("/lessons")
+        state["etag"] = r.headers.get("etag")
+        for i, name in enumerate(selected):
+            if name in PACED_SCENARIOS:
+                # 各流持续时间相同：请求数按速率比例分配
+                streams = [
+                    (group, scenarios[fn], getattr(args, rate), max(1, round(args.requests * getattr(args, rate) / args.rate)))
+                    for group, fn, rate in PACED_SCENARIOS[name]
+                ]
+                results[name] = await run_paced(client, streams, seed=i)
+            else:
+                results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency, seed=i)
+            print(format_row(name, results[name]))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    print(f"模式 {args.mode}，每场景 {args.requests} 请求，并发 {args.concurrency}，用户数 {args.users}")
+    print(f"{'场景':20s}{'RPS':>10s}{'p50':>10s}{'p95':>10s}{'p99':>10s}{'RSS MB':>10s}{'错误':>8s}")
+    if args.mode == "asgi":
+        await main.write_queue.start()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as client:
+                await drive(client)
+        finally:
+            await main.write_queue.stop()
+    else:
+        with UvicornThread(main.app) as base_url:
+            async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+                await drive(client)
+    main.progress_store.close()
+    return results
+
+
+def format_row(name: str, r: dict) -> str:
+    row = (
+        f"{name:20s}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+        f"{r['p99_ms']:>10.2f}{r['rss_mb']:>10.1f}{r['errors']:>8d}"
+    )
+    for group, g in r.get("groups", {}).items():
+        row += (
+            f"\n  {group:18s}{g['requests']:>10d}{g['p50_ms']:>10.2f}{g['p95_ms']:>10.2f}"
+            f"{g['p99_ms']:>10.2f}{'429: ' + str(g['limited']):>18s}"
+        )
+    return row
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """中文说明：返回回归列表（p95 变慢或 RPS 下降超过阈值）"""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] > 0 and cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {cur['p95_ms']} ms")
+        if cur["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name}: RPS {base['rps']} -> {cur['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地压测与延迟基准")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--requests", type=int, default=2000, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--scenarios", nargs="*", help="只运行指定场景")
+    parser.add_argument("--rate", type=float, default=200, help="开环场景中普通用户每秒的保存请求数")
+    parser.add_argument("--hot-rate", type=float, default=400, help="hot_user_burst 中热点用户每秒的保存请求数")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args))
+
+    key = f"{args.mode}-c{args.concurrency}"
+    stored = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    if args.compare:
+        baseline = stored.get(key, {}).get("results", {})
+        if not baseline:
+            print(f"基线中没有 {key} 的结果，请先运行 --save-baseline")
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("回归:", line)
+        if regressions:
+            sys.exit(1)
+        print("未发现回归")
+    if args.save_baseline:
+        stored[key] = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "requests": args.requests,
+            "users": args.users,
+            "rate": args.rate,
+            "hot_rate": args.hot_rate,
+            "results": results,
+        }
+        args.baseline.write_text(json.dumps(stored, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"基线已写入 {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
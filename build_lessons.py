@@ -0,0 +1,366 @@
+# 中文说明：课程内容统一构建入口
+"""
+功能概述：
+- 把 add_advanced_lessons / reorganize_lessons / renumber_titles / encrypt_lessons 串成有序的构建阶段，
+  在同一份内存中的课程目录上依次执行：merge -> reorder -> renumber -> highlight -> encrypt -> bundle -> emit
+- highlight 阶段用 Pygments（含 Pine Script 语法，见 highlight_lessons.py）预先生成 pine_html / python_html，
+  前端直接插入标记，不再在切换课程时运行 highlight.js；未安装 Pygments 时跳过该阶段，并删除上次构建留下的
+  pine_html / python_html（可能与代码不一致），构建依赖见 requirements-build.txt
+- bundle 阶段把每节锁定课程的正文单独写成按内容哈希命名的 locked/<hash>.bin（原始字节，不再 base64），
+  lessons.json 中只保留 "bundle" 引用，免费用户不再下载加密正文；VIP 打开课程时前端才拉取并解密
+- 整个构建只解析一次源文件、只写一次输出文件；输出内容未变化时不写盘
+- 逐课阶段（如 encrypt）按“阶段版本 + 课程内容哈希”缓存结果，未改动的课程直接复用上次输出
+- 同时写出紧凑二进制版本 lessons.bin（server/lessons_pack.py：分类名去重、带长度前缀的课程记录与偏移表），
+  服务端可直接提供下载，或 mmap 后按 id 只解码单节课
+- 写出后生成离线缓存清单 web/precache-manifest.js（前端静态文件的内容哈希），供 web/sw.js 预缓存与增量更新；
+  清单同时列出当前的课程包及其哈希，sw.js 激活时据此删除运行时缓存中的旧课程包
+- 同时记录课程修订日志（server/lesson_revisions.py，lessons.json 旁的 lessons.revisions.json）：
+  有课程新增、修改、删除或调整顺序时修订号加 1，服务端据此只向客户端下发改动的课程
+
+输入/输出：
+- python build_lessons.py [--source PATH] [--out PATH] [--stages merge,reorder,renumber,highlight,encrypt,bundle] [--force]
+- 锁定课程包写在输出文件同目录的 locked/ 下；不再被引用的旧包会被删除
+- 二进制版本默认写在输出文件旁（lessons.json -> lessons.bin），--packed "" 不生成
+- python build_lessons.py --manifest-only：只重新生成离线缓存清单（修改 app.js / styles.css 后执行）
+- 默认源文件为 web/data/lessons_source.json（明文，本地保留）；不存在时使用 web/data/lessons.json
+- 缓存写在仓库根目录 .build_cache.json（已加入 .gitignore）
+
+边界与安全：
+- merge 阶段只补充缺失的课程，不覆盖 lessons.json 中已手工修改的同 id 课程
+- encrypt 阶段跳过已带 ENC: 前缀的字段，因此对已加密的文件重复构建结果不变
+- 源文件中已打包的锁定课程会先从 locked/ 中的课程包还原明文，再重新经过各阶段，结果与从明文源构建一致
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import time
+
+import add_advanced_lessons
+import encrypt_lessons
+import highlight_lessons
+import renumber_titles
+import reorganize_lessons
+from server import lessons_pack
+from server.lesson_revisions import RevisionLog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "web", "data")
+CACHE_FILE = os.path.join(HERE, ".build_cache.json")
+# 锁定课程包目录（相对于输出文件所在目录）
+BUNDLE_DIR = "locked"
+
+WEB_DIR = os.path.join(HERE, "web")
+MANIFEST_FILE = os.path.join(WEB_DIR, "precache-manifest.js")
+# 预缓存的静态文件（相对 web/）；lib/ 与 assets/ 下的非空文件全部加入；锁定课程包由 sw.js 按需缓存
+PRECACHE_FILES = ["index.html", "app.js", "styles.css", "data/lessons.json"]
+PRECACHE_DIRS = ["lib", "assets"]
+# index.html 引用的固定版本外部资源（URL 含版本号，内容不变，以 URL 作为版本）
+PRECACHE_EXTERNAL = [
+    "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css",
+]
+
+# 逐课阶段的实现版本：修改阶段逻辑时递增，使旧缓存失效
+STAGE_VERSIONS = {
+    "highlight": 1,
+    "encrypt": 1,
+}
+
+
+def lesson_hash(lesson):
+    """中文说明：课程内容哈希（键排序后的紧凑 JSON）"""
+    raw = json.dumps(lesson, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class BuildContext:
+    """中文说明：一次构建的共享状态（缓存、计数、选项）"""
+
+    def __init__(self, cache, force=False, out_path=None):
+        self.cache = cache
+        self.force = force
+        self.out_path = out_path
+        self.used = {}
+        self.counters = {}
+
+    def per_lesson(self, stage, catalogue, fn):
+        """中文说明：对每节课执行 fn(lesson)->lesson；输入哈希未变时复用缓存输出"""
+        version = STAGE_VERSIONS[stage]
+        old = self.cache.get(stage, {})
+        new = self.used.setdefault(stage, {})
+        hits = runs = 0
+        lessons = []
+        for lesson in catalogue["lessons"]:
+            key = f"{version}:{lesson_hash(lesson)}"
+            entry = old.get(lesson.get("id"))
+            if not self.force and entry and entry["key"] == key:
+                out = entry["out"]
+                hits += 1
+            else:
+                out = fn(copy.deepcopy(lesson))
+                runs += 1
+            new[lesson.get("id")] = {"key": key, "out": out}
+            lessons.append(copy.deepcopy(out))
+        catalogue["lessons"] = lessons
+        self.counters[stage] = {"cached": hits, "built": runs}
+
+
+def stage_merge(catalogue, ctx):
+    add_advanced_lessons.merge(catalogue, replace=False)
+
+
+def stage_reorder(catalogue, ctx):
+    reorganize_lessons.reorganize(catalogue)
+
+
+def stage_renumber(catalogue, ctx):
+    renumber_titles.renumber(catalogue)
+
+
+def stage_highlight(catalogue, ctx):
+    if highlight_lessons.lex is None:
+        # 之前构建生成的标记可能与已修改的代码不一致，一并删除，前端回退到运行时高亮
+        print("  未安装 pygments，跳过 highlight 阶段并删除旧的高亮标记（前端将在运行时高亮）")
+        for lesson in catalogue.get("lessons", []):
+            highlight_lessons.strip_highlight(lesson)
+        return
+    ctx.per_lesson("highlight", catalogue, highlight_lessons.highlight_lesson)
+
+
+def stage_encrypt(catalogue, ctx):
+    def encrypt(lesson):
+        encrypt_lessons.encrypt_lesson(lesson)
+        return lesson
+
+    ctx.per_lesson("encrypt", catalogue, encrypt)
+
+
+def stage_bundle(catalogue, ctx):
+    """中文说明：锁定课程正文移到独立的内容寻址文件；文件名即内容哈希，已存在时不重复写"""
+    bundle_dir = os.path.join(os.path.dirname(os.path.abspath(ctx.out_path)), BUNDLE_DIR)
+    referenced = set()
+    written = reused = 0
+    for lesson in catalogue["lessons"]:
+        if not lesson.get("isLocked"):
+            continue
+        if not any(lesson.get(f) for f in encrypt_lessons.FIELDS):
+            # 已经打包过：正文字段为空，只保留引用
+            if lesson.get("bundle"):
+                referenced.add(os.path.basename(lesson["bundle"]))
+            continue
+        name, data = encrypt_lessons.make_bundle(lesson)
+        path = os.path.join(bundle_dir, name)
+        if os.path.exists(path):
+            reused += 1
+        else:
+            os.makedirs(bundle_dir, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            written += 1
+        referenced.add(name)
+        for field in encrypt_lessons.FIELDS:
+            if field in lesson:
+                lesson[field] = ""
+        lesson["bundle"] = f"{BUNDLE_DIR}/{name}"
+        lesson["isEncrypted"] = True
+    if os.path.isdir(bundle_dir):
+        for name in os.listdir(bundle_dir):
+            if name.endswith(".bin") and name not in referenced:
+                os.remove(os.path.join(bundle_dir, name))
+    ctx.counters["bundle"] = {"cached": reused, "built": written}
+
+
+# 有序的构建阶段；emit 总是最后执行
+STAGES = [
+    ("merge", stage_merge),
+    ("reorder", stage_reorder),
+    ("renumber", stage_renumber),
+    ("highlight", stage_highlight),
+    ("encrypt", stage_encrypt),
+    ("bundle", stage_bundle),
+]
+
+
+def emit(catalogue, out_path):
+    """中文说明：序列化并写出；内容未变化时不写盘，返回是否写入"""
+    text = json.dumps(catalogue, ensure_ascii=False, indent=2)
+    if os.path.exists(out_path):
+        with open(out_path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, out_path)
+    return True
+
+
+def emit_packed(catalogue, out_path):
+    """中文说明：写出紧凑二进制版本；内容未变化时不写盘，返回是否写入"""
+    data = lessons_pack.pack(catalogue)
+    if os.path.exists(out_path):
+        with open(out_path, "rb") as f:
+            if f.read() == data:
+                return False
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)
+    return True
+
+
+def revisions_path(out_path):
+    """中文说明：修订日志路径（lessons.json -> lessons.revisions.json）"""
+    return os.path.splitext(out_path)[0] + ".revisions.json"
+
+
+def record_revision(catalogue, path):
+    """中文说明：把输出的课程记入修订日志；有改动时写盘，返回 (修订号, 是否新增修订)"""
+    log = RevisionLog.load(path)
+    changed = log.record(catalogue.get("lessons", []))
+    if changed:
+        log.save(path)
+    return log.revision, changed
+
+
+def precache_manifest(web_dir=WEB_DIR):
+    """中文说明：{"version", "files": {相对路径: 内容哈希}, "external": [...], "bundles": {课程包路径: 内容哈希}}；
+    version 由以上全部内容决定。课程包不预缓存，sw.js 据 bundles 清理运行时缓存中已不再引用的旧包"""
+    names = list(PRECACHE_FILES)
+    for sub in PRECACHE_DIRS:
+        folder = os.path.join(web_dir, sub)
+        if os.path.isdir(folder):
+            names.extend(
+                f"{sub}/{n}" for n in sorted(os.listdir(folder))
+                if not n.startswith(".") and os.path.getsize(os.path.join(folder, n)) > 0
+            )
+    files = {}
+    for name in names:
+        with open(os.path.join(web_dir, name), "rb") as f:
+            files[name] = hashlib.sha256(f.read()).hexdigest()[:16]
+    external = list(PRECACHE_EXTERNAL)
+    bundles = {}
+    folder = os.path.join(web_dir, "data", BUNDLE_DIR)
+    if os.path.isdir(folder):
+        for n in sorted(os.listdir(folder)):
+            if n.endswith(".bin"):
+                with open(os.path.join(folder, n), "rb") as f:
+                    bundles[f"data/{BUNDLE_DIR}/{n}"] = hashlib.sha256(f.read()).hexdigest()[:16]
+    raw = json.dumps({"files": files, "external": external, "bundles": bundles}, sort_keys=True).encode()
+    return {"version": hashlib.sha256(raw).hexdigest()[:16], "files": files, "external": external, "bundles": bundles}
+
+
+def write_manifest(path=MANIFEST_FILE, web_dir=WEB_DIR):
+    """中文说明：写出 precache-manifest.js（sw.js 通过 importScripts 加载），内容未变化时不写盘"""
+    manifest = precache_manifest(web_dir)
+    text = (
+        "// 中文说明：离线缓存清单，由 build_lessons.py 生成，请勿手工修改\n"
+        "self.PRECACHE_MANIFEST = " + json.dumps(manifest, indent=2) + ";\n"
+    )
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def restore_bundles(catalogue, source):
+    """中文说明：把已打包课程的明文从课程包还原回课程 dict（保留 bundle 键的位置）"""
+    base = os.path.dirname(os.path.abspath(source))
+    for lesson in catalogue.get("lessons", []):
+        name = lesson.get("bundle")
+        if not name or any(lesson.get(f) for f in encrypt_lessons.FIELDS):
+            continue
+        path = os.path.join(base, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            lesson.update(encrypt_lessons.open_bundle(f.read()))
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def build(source, out, stages=None, force=False, cache_path=CACHE_FILE, packed_out=None):
+    """中文说明：执行构建，返回 (是否写入, 各阶段统计)；packed_out 为二进制版本路径（None 不生成）"""
+    selected = [name for name, _ in STAGES] if stages is None else list(stages)
+    unknown = set(selected) - {name for name, _ in STAGES}
+    if unknown:
+        raise ValueError(f"未知的构建阶段: {', '.join(sorted(unknown))}")
+
+    with open(source, "r", encoding="utf-8") as f:
+        catalogue = json.load(f)
+    restore_bundles(catalogue, source)
+
+    ctx = BuildContext(load_cache(cache_path), force=force, out_path=out)
+    timings = {}
+    for name, fn in STAGES:
+        if name not in selected:
+            continue
+        started = time.perf_counter()
+        fn(catalogue, ctx)
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    written = emit(catalogue, out)
+    packed = emit_packed(catalogue, packed_out) if packed_out else None
+    revision = record_revision(catalogue, revisions_path(out))
+    # 本次执行过的阶段只保留用到的条目，已删除的课程不会一直留在缓存里
+    merged = dict(ctx.cache)
+    merged.update(ctx.used)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False)
+    return written, {"timings_ms": timings, "lessons": ctx.counters, "packed": packed, "revision": revision}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程内容构建")
+    default_source = os.path.join(DATA_DIR, "lessons_source.json")
+    if not os.path.exists(default_source):
+        default_source = os.path.join(DATA_DIR, "lessons.json")
+    parser.add_argument("--source", default=default_source)
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "lessons.json"))
+    parser.add_argument("--stages", default=",".join(name for name, _ in STAGES),
+                        help="逗号分隔的阶段列表（按固定顺序执行）")
+    parser.add_argument("--packed", default=None, help="二进制版本输出路径（默认与 --out 同名的 .bin，设为空串则不生成）")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，重新处理所有课程")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="离线缓存清单路径（设为空串则不生成）")
+    parser.add_argument("--manifest-only", action="store_true", help="只重新生成离线缓存清单")
+    args = parser.parse_args()
+
+    if args.manifest_only:
+        changed = write_manifest(args.manifest)
+        print(f"已更新 {args.manifest}" if changed else f"{args.manifest} 内容未变化")
+        return
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    packed_out = os.path.splitext(args.out)[0] + ".bin" if args.packed is None else args.packed
+    written, report = build(args.source, args.out, stages, args.force, args.cache, packed_out)
+    for name, ms in report["timings_ms"].items():
+        extra = report["lessons"].get(name)
+        detail = f"（复用 {extra['cached']}，重新处理 {extra['built']}）" if extra else ""
+        print(f"  {name:10s} {ms:8.2f} ms {detail}")
+    print(f"已写入 {args.out}" if written else f"{args.out} 内容未变化，跳过写入")
+    if packed_out:
+        print(f"已写入 {packed_out}" if report["packed"] else f"{packed_out} 内容未变化，跳过写入")
+    revision, changed = report["revision"]
+    print(f"课程修订号 {revision}" + ("（新修订）" if changed else "（无改动）"))
+    if args.manifest:
+        changed = write_manifest(args.manifest)
+        print(f"已更新 {args.manifest}" if changed else f"{args.manifest} 内容未变化")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,176 @@
-import json
+import argparse
 import base64
+import hashlib
+import json
+import os
+import shutil
 
 # Simple XOR encryption to obfuscate content
 # Key matching the frontend 'pinegood888'
 KEY = "pinegood888"
 
+# Fields of a locked lesson that are encrypted
+FIELDS = ["concept", "concept_extra", "pine_code", "python_code", "pine_html", "python_html"]
+PREFIX = "ENC:"
+
+# XOR works on this many bytes at a time (rounded down to a multiple of the key
+# length so every chunk starts at key offset 0 and can reuse one keystream)
+CHUNK_SIZE = 1 << 20
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "web", "data")
+
+
+def xor_bytes(data, key):
+    """XOR a whole buffer with a repeating key.
+
+    Instead of a per-byte Python loop, each chunk is turned into one big
+    integer and XORed against the repeated key in a single operation.
+    """
+    if not data:
+        return b""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    step = max(len(key), CHUNK_SIZE - CHUNK_SIZE % len(key))
+    stream = (key * (step // len(key) + 1))[:step]
+    stream_int = int.from_bytes(stream, "little")
+    out = bytearray()
+    for start in range(0, len(data), step):
+        chunk = data[start:start + step]
+        n = len(chunk)
+        ks = stream_int if n == step else int.from_bytes(stream[:n], "little")
+        out += (int.from_bytes(chunk, "little") ^ ks).to_bytes(n, "little")
+    return bytes(out)
+
+
 def xor_encrypt(text, key):
     if not text:
         return ""
-    # Convert to bytes
-    text_bytes = text.encode('utf-8')
-    key_bytes = key.encode('utf-8')
-    encrypted = bytearray()
-    
-    for i in range(len(text_bytes)):
-        encrypted.append(text_bytes[i] ^ key_bytes[i % len(key_bytes)])
-        
     # Return as base64 string
-    return base64.b64encode(encrypted).decode('utf-8')
+    return base64.b64encode(xor_bytes(text.encode("utf-8"), key)).decode("utf-8")
 
-def main():
-    source_path = r"e:\Quant\PineScript_study\web\data\lessons.json"
-    dest_path = r"e:\Quant\PineScript_study\web\data\lessons_encrypted.json"
-    
-    print(f"Reading from {source_path}...")
-    with open(source_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        
-    print("Encrypting sensitive fields for locked lessons...")
+
+def xor_decrypt(encrypted_base64, key):
+    """Python twin of xorDecrypt in web/app.js (used by tests and build tools)."""
+    if not encrypted_base64:
+        return ""
+    return xor_bytes(base64.b64decode(encrypted_base64), key).decode("utf-8")
+
+
+def encrypt_lesson(lesson, key=KEY):
+    """Encrypt the sensitive fields of a locked lesson in place.
+
+    Fields that already carry the ENC: prefix are left alone, so running the
+    script on an already encrypted file does not encrypt twice.
+    """
+    if not lesson.get("isLocked", False):
+        return False
+    for field in FIELDS:
+        value = lesson.get(field)
+        if value and not value.startswith(PREFIX):
+            lesson[field] = PREFIX + xor_encrypt(value, key)
+    # Mark as encrypted content
+    lesson["isEncrypted"] = True
+    return True
+
+
+def make_bundle(lesson, key=KEY):
+    """Build the content-addressed bundle for a locked lesson.
+
+    The bundle is the XORed UTF-8 JSON of the plain-text FIELDS (raw bytes,
+    no base64). Fields that still carry the ENC: prefix are decrypted first,
+    so both lessons_source.json and an already encrypted lessons.json work.
+    Returns (name, data) where name is "<sha256 prefix>.bin".
+    """
+    payload = {}
+    for field in FIELDS:
+        value = lesson.get(field)
+        if not value:
+            continue
+        payload[field] = xor_decrypt(value[len(PREFIX):], key) if value.startswith(PREFIX) else value
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    data = xor_bytes(raw, key)
+    return hashlib.sha256(data).hexdigest()[:16] + ".bin", data
+
+
+def open_bundle(data, key=KEY):
+    """Python twin of the bundle decryption in web/app.js."""
+    return json.loads(xor_bytes(data, key).decode("utf-8"))
+
+
+def _indent(text, spaces):
+    pad = " " * spaces
+    return text.replace("\n", "\n" + pad)
+
+
+def write_streaming(data, f, key=KEY):
+    """Encrypt and write lessons one at a time, returns the encrypted count.
+
+    Produces exactly the same bytes as encrypt_catalogue(data) followed by
+    json.dump(data, f, ensure_ascii=False, indent=2). Each lesson is encrypted
+    on a shallow copy that is dropped once written, so data is left untouched
+    and at most one encrypted lesson is alive on top of the parsed source.
+    """
     count = 0
-    
-    for lesson in data.get("lessons", []):
-        # Only encrypt if it is a locked lesson
-        if lesson.get("isLocked", False):
-            print(f"  Encrypting: {lesson.get('title', 'Unknown')}")
-            
-            # Fields to encrypt
-            fields = ["concept", "concept_extra", "pine_code", "python_code"]
-            
-            for field in fields:
-                if field in lesson and lesson[field]:
-                    lesson[field] = "ENC:" + xor_encrypt(lesson[field], KEY)
-            
-            # Mark as encrypted content
-            lesson["isEncrypted"] = True
-            count += 1
-            
-    print(f"Encrypted {count} lessons.")
-    
-    # Save to a NEW file or overwrite (user choice, but let's overwrite for deployment simplicity usually)
-    # Here we save to lessons.json directly to make deployment easy? 
-    # WAIT: If we overwrite, the user loses source. 
-    # Better approach: 
-    # 1. We keep lessons.json as SOURCE (Source of Truth).
-    # 2. We generate lessons.json for deployment.
-    # But since the user wants to "upload to git", they might upload the source.
-    # 
-    # STRATEGY:
-    # We will modify lessons.json in place BUT keep a backup? 
-    # No, that's dangerous.
-    # 
+    f.write("{")
+    for i, (name, value) in enumerate(data.items()):
+        f.write("," if i else "")
+        f.write("\n  " + json.dumps(name, ensure_ascii=False) + ": ")
+        if name != "lessons" or not isinstance(value, list) or not value:
+            f.write(_indent(json.dumps(value, ensure_ascii=False, indent=2), 2))
+            continue
+        f.write("[")
+        for j, lesson in enumerate(value):
+            lesson = dict(lesson)
+            count += encrypt_lesson(lesson, key)
+            f.write("," if j else "")
+            f.write("\n    " + _indent(json.dumps(lesson, ensure_ascii=False, indent=2), 4))
+        f.write("\n  ]")
+    f.write("\n}" if data else "}")
+    return count
+
+
+def encrypt_catalogue(data, key=KEY):
+    """Encrypt every locked lesson in a single pass, returns the count."""
+    return sum(encrypt_lesson(lesson, key) for lesson in data.get("lessons", []))
+
+
+def main():
     # Correct Flow for User:
     # 1. lessons_source.json (Editable, Clear Text) -> KEEP THIS LOCAL
     # 2. lessons.json (Encrypted) -> PUBLIC WEB
-    #
-    # Action: Rename current lessons.json to lessons_source.json, then generate encrypted lessons.json
-    
-    import os
-    import shutil
-    
-    source_file = r"e:\Quant\PineScript_study\web\data\lessons_source.json"
-    target_file = r"e:\Quant\PineScript_study\web\data\lessons.json"
-    
+    parser = argparse.ArgumentParser(description="Encrypt locked lessons for deployment")
+    parser.add_argument("--source", default=os.path.join(DATA_DIR, "lessons_source.json"))
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "lessons.json"))
+    parser.add_argument("--stream", action="store_true", help="encrypt and write lessons one at a time")
+    args = parser.parse_args()
+
     # Check if we already have a source file
-    if not os.path.exists(source_file):
+    if not os.path.exists(args.source):
         print("Creating source backup: lessons_source.json")
-        shutil.copy(r"e:\Quant\PineScript_study\web\data\lessons.json", source_file)
+        shutil.copy(args.out, args.source)
     else:
         print("Using existing lessons_source.json as source.")
-        
-    # Read from SOURCE
-    with open(source_file, "r", encoding="utf-8") as f:
+
+    # Read from SOURCE (single pass)
+    print(f"Reading from {args.source}...")
+    with open(args.source, "r", encoding="utf-8") as f:
         data = json.load(f)
-        
-    # Encrypt
-    for lesson in data.get("lessons", []):
-        if lesson.get("isLocked", False):
-            fields = ["concept", "concept_extra", "pine_code", "python_code"]
-            for field in fields:
-                if field in lesson and lesson[field]:
-                    lesson[field] = "ENC:" + xor_encrypt(lesson[field], KEY)
-            lesson["isEncrypted"] = True
 
     # Write to TARGET (lessons.json) which is used by the app
-    with open(target_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-        
-    print(f"Success! Encrypted data written to {target_file}")
-    print(f"Original data preserved in {source_file}")
+    tmp = args.out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        if args.stream:
+            count = write_streaming(data, f)
+        else:
+            count = encrypt_catalogue(data)
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, args.out)
+
+    print(f"Encrypted {count} lessons.")
+    print(f"Success! Encrypted data written to {args.out}")
+    print(f"Original data preserved in {args.source}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,177 @@
+import html
+import re
+
+# Build-time syntax highlighting for lesson code.
+#
+# Pygments is optional: without it the build skips the highlight stage and the
+# front end falls back to highlight.js at runtime.
+try:
+    from pygments import lex
+    from pygments.lexer import RegexLexer, bygroups, words
+    from pygments.lexers import PythonLexer
+    from pygments.token import (Comment, Keyword, Name, Number, Operator,
+                                Punctuation, String, Text, Whitespace)
+except ImportError:  # pragma: no cover - exercised only without pygments
+    lex = None
+
+# Lesson fields that get a pre-rendered "<field minus _code>_html" sibling
+CODE_FIELDS = {"pine_code": "pine", "python_code": "python"}
+
+# Pine Script v5 vocabulary
+PINE_KEYWORDS = (
+    "if", "else", "for", "to", "by", "while", "switch", "var", "varip", "import",
+    "export", "method", "type", "and", "or", "not", "in", "break", "continue",
+)
+PINE_TYPES = (
+    "int", "float", "bool", "color", "string", "label", "line", "box", "table",
+    "array", "matrix", "map", "series", "simple", "const", "linefill", "polyline",
+)
+PINE_CONSTANTS = ("true", "false", "na")
+PINE_NAMESPACES = (
+    "ta", "math", "strategy", "input", "request", "str", "array", "matrix", "map",
+    "color", "syminfo", "timeframe", "barstate", "chart", "runtime", "log",
+    "label", "line", "box", "table", "plot", "hline", "shape", "location",
+    "size", "position", "display", "format", "currency", "session", "barmerge",
+    "order", "alert", "extend", "xloc", "yloc", "text", "font", "dayofweek",
+    "scale", "adjustment", "splits", "dividends", "earnings", "polyline",
+)
+PINE_BUILTIN_VARS = (
+    "open", "high", "low", "close", "volume", "time", "time_close", "bar_index",
+    "last_bar_index", "hl2", "hlc3", "ohlc4", "hlcc4", "year", "month",
+    "weekofyear", "dayofmonth", "hour", "minute", "second", "timenow",
+)
+PINE_BUILTIN_FUNCS = (
+    "indicator", "strategy", "library", "plot", "plotshape", "plotchar",
+    "plotarrow", "plotbar", "plotcandle", "hline", "fill", "bgcolor", "barcolor",
+    "alert", "alertcondition", "nz", "fixnan", "max_bars_back", "timestamp",
+)
+
+if lex is not None:
+
+    class PineScriptLexer(RegexLexer):
+        """Pygments lexer for TradingView Pine Script (v4/v5)."""
+
+        name = "Pine Script"
+        aliases = ["pine", "pinescript"]
+        filenames = ["*.pine"]
+
+        tokens = {
+            "root": [
+                (r"//@\w+.*?$", Comment.Preproc),
+                (r"//.*?$", Comment.Single),
+                (r"/\*", Comment.Multiline, "comment"),
+                (r"\s+", Whitespace),
+                (r'"(\\\\|\\"|[^"\n])*"', String.Double),
+                (r"'(\\\\|\\'|[^'\n])*'", String.Single),
+                (r"#[0-9a-fA-F]{6}([0-9a-fA-F]{2})?\b", Number.Hex),
+                (r"(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?", Number),
+                (words(PINE_CONSTANTS, suffix=r"\b"), Keyword.Constant),
+                (words(PINE_KEYWORDS, suffix=r"\b"), Keyword),
+                (words(PINE_TYPES, suffix=r"\b(?!\s*\.)"), Keyword.Type),
+                # namespace.member(...) / namespace.member
+                (r"\b(" + "|".join(PINE_NAMESPACES) + r")(\.)([A-Za-z_]\w*)(?=\s*\()",
+                 bygroups(Name.Builtin, Punctuation, Name.Builtin)),
+                (r"\b(" + "|".join(PINE_NAMESPACES) + r")(\.)([A-Za-z_]\w*)",
+                 bygroups(Name.Builtin, Punctuation, Name.Variable.Magic)),
+                (words(PINE_BUILTIN_FUNCS, suffix=r"\b(?=\s*\()"), Name.Builtin),
+                (words(PINE_BUILTIN_VARS, suffix=r"\b"), Name.Variable.Magic),
+                # user function definition: name(args) =>
+                (r"[A-Za-z_]\w*(?=\s*\([^()\n]*\)\s*=>)", Name.Function),
+                (r"[A-Za-z_]\w*(?=\s*\()", Name.Function),
+                (r"[A-Za-z_]\w*", Name),
+                (r":=|=>|==|!=|<=|>=|[-+*/%<>=?:]", Operator),
+                (r"[()\[\],.]", Punctuation),
+                (r".", Text),
+            ],
+            "comment": [
+                (r"[^*]+", Comment.Multiline),
+                (r"\*/", Comment.Multiline, "#pop"),
+                (r"\*", Comment.Multiline),
+            ],
+        }
+
+    # Pygments token -> highlight.js class, so the existing hljs theme CSS applies.
+    # Checked in order; the first ancestor match wins.
+    HLJS_CLASSES = [
+        (Comment.Preproc, "hljs-meta"),
+        (Comment, "hljs-comment"),
+        (Keyword.Constant, "hljs-literal"),
+        (Keyword.Type, "hljs-type"),
+        (Keyword, "hljs-keyword"),
+        (String.Doc, "hljs-comment"),
+        (String, "hljs-string"),
+        (Number, "hljs-number"),
+        (Name.Builtin.Pseudo, "hljs-variable language_"),
+        (Name.Builtin, "hljs-built_in"),
+        (Name.Variable.Magic, "hljs-variable"),
+        (Name.Function, "hljs-title function_"),
+        (Name.Class, "hljs-title class_"),
+        (Name.Decorator, "hljs-meta"),
+        (Operator.Word, "hljs-keyword"),
+    ]
+
+    LEXERS = {"pine": PineScriptLexer, "python": PythonLexer}
+
+
+def _css_class(token):
+    for parent, css in HLJS_CLASSES:
+        if token in parent:
+            return css
+    return None
+
+
+def highlight(code, language):
+    """Return highlight.js-compatible HTML for code (inner HTML of <code>)."""
+    if lex is None:
+        raise RuntimeError("pygments is not installed")
+    out = []
+    current, buf = None, []
+
+    def flush():
+        if not buf:
+            return
+        text = html.escape("".join(buf), quote=False)
+        out.append(f'<span class="{current}">{text}</span>' if current else text)
+        buf.clear()
+
+    for token, value in lex(code, LEXERS[language](stripnl=False, ensurenl=False)):
+        css = _css_class(token)
+        if css != current:
+            flush()
+            current = css
+        buf.append(value)
+    flush()
+    return "".join(out)
+
+
+def highlight_lesson(lesson):
+    """Add pine_html / python_html next to the raw code, in place.
+
+    Fields that are still encrypted (ENC: prefix) cannot be highlighted and
+    are left alone.
+    """
+    for field, language in CODE_FIELDS.items():
+        code = lesson.get(field)
+        target = f"{language}_html"
+        if not code or code.startswith("ENC:"):
+            lesson.pop(target, None)
+            continue
+        lesson[target] = highlight(code, language)
+    return lesson
+
+
+def strip_highlight(lesson):
+    """Remove pre-rendered markup, in place.
+
+    Used when the build runs without Pygments: markup left over from an
+    earlier build may no longer match the code, so the front end should
+    fall back to highlighting the raw code at runtime.
+    """
+    for language in CODE_FIELDS.values():
+        lesson.pop(f"{language}_html", None)
+    return lesson
+
+
+def strip_tags(markup):
+    """Plain text of highlighted HTML (used by tests to check round-trips)."""
+    return html.unescape(re.sub(r"<[^>]+>", "", markup))
@@ -0,0 +1,222 @@
+# 中文说明：进度写入的准入控制与背压
+"""
+功能概述：
+- RateLimiter：按键（用户名 / 客户端 IP）的令牌桶限流；桶存于内存，按最近使用顺序（LRU）淘汰空闲的桶，
+  键的数量有上限，伪造大量用户名也不会让内存无限增长
+- WriteGate：存储写入（进度落库、读改写事务）的全局在途上限；由写后队列（server/write_behind.py）在调用存储时占用，
+  超出上限的写入在有界队列中等待，队列已满或等待超时则直接拒绝（削峰），单个热点用户或脚本无法占满存储的写入能力
+- AdmissionControl：请求入口只做“用户限流 + IP 限流”（check 不占用名额、不限制并发）；同时持有写后队列共用的
+  WriteGate，stats() 汇总放行、限流、排队与丢弃次数
+
+输入/输出：
+- limiter.acquire(key) -> 0.0（放行，消耗一个令牌）或需要等待的秒数（拒绝，不消耗令牌）
+- await gate.acquire() / gate.release()（或 async with gate.slot()）-> 在途数超限时排队；
+  无法排队或超时抛出 Overloaded(retry_after)；shed=False（后台批量落库）时不受队列长度与超时限制，一直等到名额
+- admission.check(user, ip) -> 被限流时抛出 RateLimited(retry_after, scope)
+- stats() -> 当前桶数、放行/限流/淘汰计数、在途与排队数、丢弃次数
+
+边界与安全：
+- 状态只在本进程内存中；多进程部署时每个进程各自限流（有效速率约为 单进程速率 × 进程数）
+- 被淘汰的桶下次出现时按满桶重建，LRU 只淘汰最久未使用的键，活跃客户端的桶不会被淘汰
+- 令牌桶按单调时钟补充，不受系统时间调整影响
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class RateLimited(Exception):
+    """中文说明：超出限流速率；retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, retry_after: float, scope: str):
+        super().__init__(f"{scope} 请求过于频繁")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class Overloaded(Exception):
+    """中文说明：在途写入已满且无法排队（或排队超时）"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("服务繁忙")
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> str:
+    """中文说明：Retry-After 只接受整数秒，向上取整且至少为 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """中文说明：按键的令牌桶；rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """中文说明：取一个令牌；成功返回 0，否则返回距下一个令牌可用的秒数"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return (1.0 - bucket.tokens) / self.rate
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evictions": self.evictions,
+        }
+
+
+class WriteGate:
+    """中文说明：全局在途写入上限 + 有界等待队列（先到先得）"""
+
+    def __init__(self, max_inflight: int = 64, max_queue: int = 256, queue_timeout: float = 2.0):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+        self.admitted = 0
+        self.queued_total = 0
+        self.max_queued = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, shed: bool = True):
+        await self.acquire(shed)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, shed: bool = True) -> None:
+        """中文说明：占用一个在途名额；已满时排队，队列已满或等待超时抛出 Overloaded（shed=False 时一直等待）"""
+        if self.max_inflight <= 0:
+            return
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return
+        if shed and len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise Overloaded(self.queue_timeout)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[fut] = None
+        self.queued_total += 1
+        self.max_queued = max(self.max_queued, len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.queue_timeout if shed else None)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # 超时的同时被唤醒：名额已转交给本请求，直接使用
+                self.admitted += 1
+                return
+            self._waiters.pop(fut, None)
+            fut.cancel()
+            self.timeouts += 1
+            raise Overloaded(self.queue_timeout)
+        except BaseException:
+            # 客户端断开等取消：名额已转交时归还，否则移出队列
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                self._waiters.pop(fut, None)
+                fut.cancel()
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        if self.max_inflight <= 0:
+            return
+        # 名额直接转交给队首的等待者，在途数不变
+        while self._waiters:
+            fut, _ = self._waiters.popitem(last=False)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+        }
+
+
+class AdmissionControl:
+    """中文说明：进度写入的准入控制：先按用户、再按 IP 限流；并发上限由写后队列在存储写入时占用 gate 实现"""
+
+    def __init__(self, user: RateLimiter, ip: RateLimiter, gate: WriteGate):
+        self.user = user
+        self.ip = ip
+        self.gate = gate
+
+    def check(self, user: str, ip: Optional[str], now: Optional[float] = None) -> None:
+        """中文说明：被限流时抛出 RateLimited；用户桶被拒绝时不消耗 IP 桶的令牌"""
+        wait = self.user.acquire(user, now)
+        if wait:
+            raise RateLimited(wait, "user")
+        if ip:
+            wait = self.ip.acquire(ip, now)
+            if wait:
+                raise RateLimited(wait, "ip")
+
+    def stats(self) -> dict:
+        return {"user": self.user.stats(), "ip": self.ip.stats(), "writes": self.gate.stats()}
@@ -0,0 +1,59 @@
+# 中文说明：阻塞 I/O 的有界线程池
+"""
+功能概述：
+- 所有文件/SQLite 访问统一通过 run_io 放到独立的有界线程池执行，事件循环只做调度
+- 与 Starlette 默认线程池隔离，避免慢磁盘拖住同步依赖与其他任务
+- 每次调用的执行耗时按函数名记入 ps_io_seconds（/metrics）
+- run_cpu：计算密集任务（如 Pine 脚本运行）使用另一个线程池，不占用 I/O 线程；NumPy 运算期间释放 GIL；
+  耗时单独记入 ps_cpu_seconds，不混入 I/O 延迟
+
+输入/输出：
+- await run_io(fn, *args) -> fn(*args) 的返回值
+- await run_cpu(fn, *args) -> 同上，在计算线程池中执行
+
+边界与安全：
+- 线程数由 PS_IO_WORKERS 控制（默认 4）；SQLite 连接按线程复用，线程数即连接数上限
+- 计算线程数由 PS_CPU_WORKERS 控制（默认 2），同时运行的脚本数不超过该值，其余排队
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .metrics import CPU_SECONDS, IO_SECONDS
+
+IO_WORKERS = int(os.environ.get("PS_IO_WORKERS", "4"))
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="ps-io")
+CPU_WORKERS = int(os.environ.get("PS_CPU_WORKERS", "2"))
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="ps-cpu")
+
+
+async def run_io(fn, *args, **kwargs):
+    """中文说明：在 I/O 线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    op = getattr(fn, "__qualname__", None) or type(fn).__name__
+    if kwargs:
+        fn = functools.partial(fn, **kwargs)
+    return await loop.run_in_executor(IO_EXECUTOR, _timed_call, IO_SECONDS, op, fn, args)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """中文说明：在计算线程池中执行计算密集函数（耗时按函数名记入 ps_cpu_seconds）"""
+    loop = asyncio.get_running_loop()
+    op = getattr(fn, "__qualname__", None) or type(fn).__name__
+    if kwargs:
+        fn = functools.partial(fn, **kwargs)
+    return await loop.run_in_executor(CPU_EXECUTOR, _timed_call, CPU_SECONDS, op, fn, args)
+
+
+def _timed_call(histogram, op, fn, args):
+    # 在工作线程内计时，只统计执行时间，不含排队等待
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        histogram.observe(time.perf_counter() - started, op=op)
@@ -0,0 +1,763 @@
+# 中文说明：策略回测引擎（课程中 strategy.* 示例的成交、持仓与绩效统计）
+"""
+功能概述：
+- 把 Pine 运行时记录的 strategy.entry / close / close_all / exit 订单（每个订单是一组按 K 线的布尔/价格数组）
+  转换为成交、持仓与资金曲线
+- 快速路径：只有市价进出场、无 strategy.exit、pyramiding=1 时，持仓由信号数组的向前填充直接得出，
+  成交、交易与资金曲线全部是数组运算
+- 通用路径：按事件推进（只在有订单可能成交的 K 线停下），止盈/止损/移动止损在两次事件之间按块向量化扫描，
+  支持限价/止损进场、反手、加仓（pyramiding）与手续费、滑点
+- 绩效：净利润、胜率、盈亏比、最大回撤、CAGR、Sharpe（按 K 线间隔年化）
+- sweep：用进程池并行扫描参数网格；K 线数据放在共享内存中，各进程只映射同一份数据
+
+输入/输出：
+- backtest(orders, data, config) -> Backtest（fills / trades / 每根 K 线的持仓、均价与权益）
+- Backtest.stats() -> 绩效统计 dict；Backtest.to_public(start) -> 可序列化的 dict
+- sweep(code, grid, dataset, workers) -> [{"params": ..., "stats": ...}, ...]
+
+边界与安全：
+- 订单在信号 K 线收盘时下达，下一根开盘成交（等同 process_orders_on_close=false）；限价/止损单持续有效直到成交
+- 同一根 K 线内先处理市价平仓，再处理市价进场，再检查止盈止损与挂单；止损与止盈同时触及时按止损成交（保守）
+- strategy.exit 作用于整个持仓（按持仓均价计算止盈止损），不区分加仓的每一笔
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Pine 的 strategy() 默认值
+DEFAULT_CONFIG = {
+    "initial_capital": 1_000_000.0,
+    "default_qty_type": "fixed",
+    "default_qty_value": 1.0,
+    "pyramiding": 1,
+    "commission_type": "percent",
+    "commission_value": 0.0,
+    "slippage": 0,
+}
+YEAR_MS = 365.25 * 86_400_000
+SCAN_CHUNK = 256  # 止盈止损扫描的初始块大小，之后每块翻倍
+
+
+@dataclass
+class EntryOrder:
+    """中文说明：strategy.entry；issued 为下单的 K 线，limit/stop/qty 为每根 K 线的值（NaN 表示未设置）"""
+
+    id: str
+    direction: int
+    issued: np.ndarray
+    qty: Optional[np.ndarray] = None
+    limit: Optional[np.ndarray] = None
+    stop: Optional[np.ndarray] = None
+
+    @property
+    def market(self) -> bool:
+        return self.limit is None and self.stop is None
+
+
+@dataclass
+class CloseOrder:
+    """中文说明：strategy.close(id) 或 strategy.close_all()（id 为 None）"""
+
+    id: Optional[str]
+    issued: np.ndarray
+
+
+@dataclass
+class ExitOrder:
+    """中文说明：strategy.exit；profit/loss/trail_* 单位为最小价格变动（tick），limit/stop 为价格"""
+
+    id: str
+    from_entry: Optional[str]
+    issued: np.ndarray
+    profit: Optional[float] = None
+    loss: Optional[float] = None
+    limit: Optional[np.ndarray] = None
+    stop: Optional[np.ndarray] = None
+    trail_points: Optional[float] = None
+    trail_offset: Optional[float] = None
+
+
+@dataclass
+class Orders:
+    entries: List[EntryOrder] = field(default_factory=list)
+    closes: List[CloseOrder] = field(default_factory=list)
+    exits: List[ExitOrder] = field(default_factory=list)
+
+
+# -------------------------------
+# 数组辅助
+# -------------------------------
+def next_true(mask: np.ndarray) -> np.ndarray:
+    """中文说明：out[t] = t 及之后第一个为真的下标（没有则为 n）"""
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    out = np.minimum.accumulate(idx[::-1])[::-1]
+    return np.append(out, n)
+
+
+def last_true(mask: np.ndarray) -> np.ndarray:
+    """中文说明：out[t] = t 及之前最后一个为真的下标（没有则为 -1）"""
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    return np.maximum.accumulate(idx)
+
+
+def held(values: np.ndarray, issued: np.ndarray) -> np.ndarray:
+    """中文说明：下单时的值保持到下一次下单（挂单价格）"""
+    last = last_true(issued)
+    return np.where(last >= 0, values[np.maximum(last, 0)], np.nan)
+
+
+# -------------------------------
+# 回测结果
+# -------------------------------
+@dataclass
+class Backtest:
+    """中文说明：回测结果；fills/trades 为按列存放的数组"""
+
+    config: dict
+    time: np.ndarray
+    close: np.ndarray
+    fill_bar: np.ndarray
+    fill_qty: np.ndarray      # 带方向的成交数量（买为正）
+    fill_price: np.ndarray
+    fill_commission: np.ndarray
+    trades: Dict[str, np.ndarray]  # 已平仓交易
+    open_trades: Dict[str, np.ndarray]
+    position: np.ndarray = field(init=False)
+    avg_price: np.ndarray = field(init=False)
+    equity: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        n = len(self.close)
+        qty = np.zeros(n)
+        np.add.at(qty, self.fill_bar, self.fill_qty)
+        cash = np.zeros(n)
+        np.add.at(cash, self.fill_bar, -self.fill_qty * self.fill_price - self.fill_commission)
+        self.position = np.cumsum(qty)
+        # 浮点累加误差：平仓后持仓归零
+        self.position[np.abs(self.position) < 1e-9] = 0.0
+        self.equity = self.config["initial_capital"] + np.cumsum(cash) + self.position * self.close
+        self.avg_price = np.full(n, np.nan)
+
+    def stats(self) -> dict:
+        """中文说明：绩效统计（百分比为小数）"""
+        cfg = self.config
+        initial = cfg["initial_capital"]
+        equity = self.equity
+        pnl = self.trades["pnl"]
+        wins, losses = pnl[pnl > 0], pnl[pnl < 0]
+        peak = np.maximum.accumulate(np.maximum(equity, initial))
+        drawdown = peak - equity
+        dd_pct = drawdown / peak
+        span = float(self.time[-1] - self.time[0]) if len(self.time) > 1 else 0.0
+        final = float(equity[-1]) if len(equity) else initial
+        years = span / YEAR_MS
+        cagr = (final / initial) ** (1 / years) - 1 if years > 0 and final > 0 else None
+        sharpe = None
+        if len(equity) > 2:
+            returns = np.diff(equity) / equity[:-1]
+            sd = returns.std()
+            if sd > 0:
+                bars_per_year = YEAR_MS / float(np.median(np.diff(self.time)))
+                sharpe = float(returns.mean() / sd * math.sqrt(bars_per_year))
+        return {
+            "initial_capital": initial,
+            "final_equity": final,
+            "net_profit": final - initial,
+            "net_profit_pct": final / initial - 1,
+            "gross_profit": float(wins.sum()),
+            "gross_loss": float(-losses.sum()),
+            "profit_factor": float(wins.sum() / -losses.sum()) if len(losses) else None,
+            "total_trades": int(len(pnl)),
+            "win_rate": float(len(wins) / len(pnl)) if len(pnl) else None,
+            "avg_trade": float(pnl.mean()) if len(pnl) else None,
+            "open_trades": int(len(self.open_trades["qty"])),
+            "open_pnl": float(self.open_trades["pnl"].sum()),
+            "commission_paid": float(self.fill_commission.sum()),
+            "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+            "max_drawdown_pct": float(dd_pct.max()) if len(dd_pct) else 0.0,
+            "cagr": cagr,
+            "sharpe": sharpe,
+        }
+
+    def to_public(self, start: int = 0, max_trades: int = 500) -> dict:
+        """中文说明：返回统计、资金曲线（从 start 开始）与最近 max_trades 笔交易"""
+        # 只保留在窗口内平仓的最近 max_trades 笔；K 线下标相对窗口起点（进场早于窗口时为负数）
+        keep = np.flatnonzero(self.trades["exit_bar"] >= start)[-max_trades:]
+        trades = {k: [v[i] for i in keep] if isinstance(v, list) else v[keep] for k, v in self.trades.items()}
+        trades["entry_bar"] = trades["entry_bar"] - start
+        trades["exit_bar"] = trades["exit_bar"] - start
+        open_trades = {**self.open_trades, "entry_bar": self.open_trades["entry_bar"] - start}
+        return {
+            "stats": self.stats(),
+            "equity": self.equity[start:],
+            "position": self.position[start:],
+            "trades": trades,
+            "open_trades": open_trades,
+        }
+
+
+TRADE_FIELDS = ("entry_id", "direction", "qty", "entry_bar", "entry_price", "exit_bar", "exit_price", "pnl", "commission")
+
+
+def _trade_columns(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    cols = list(zip(*rows)) if rows else [()] * len(TRADE_FIELDS)
+    out = {}
+    for name, col in zip(TRADE_FIELDS, cols):
+        if name == "entry_id":
+            out[name] = list(col)
+        elif name in ("direction", "entry_bar", "exit_bar"):
+            out[name] = np.asarray(col, dtype=np.int64)
+        else:
+            out[name] = np.asarray(col, dtype=np.float64)
+    return out
+
+
+# -------------------------------
+# 成交辅助
+# -------------------------------
+class _Costs:
+    def __init__(self, config: dict, mintick: float):
+        self.slip = config["slippage"] * mintick
+        self.kind = config["commission_type"]
+        self.value = config["commission_value"]
+
+    def price(self, price, side):
+        """中文说明：滑点对成交不利：买入加价，卖出减价"""
+        return price + side * self.slip
+
+    def commission(self, qty, price):
+        if self.kind == "cash_per_contract":
+            return abs(qty) * self.value
+        if self.kind == "cash_per_order":
+            return np.where(qty != 0, self.value, 0.0) if isinstance(qty, np.ndarray) else self.value
+        return abs(qty) * price * self.value / 100
+
+
+def _default_qty(config: dict, price, equity):
+    kind, value = config["default_qty_type"], config["default_qty_value"]
+    if kind == "cash":
+        return value / price
+    if kind == "percent_of_equity":
+        return max(equity, 0.0) * value / 100 / price
+    return value
+
+
+# -------------------------------
+# 快速路径：纯信号
+# -------------------------------
+def _vector_eligible(orders: Orders, config: dict) -> bool:
+    if orders.exits or config["pyramiding"] != 1 or config["default_qty_type"] == "percent_of_equity":
+        return False
+    if not orders.entries or any(not e.market or e.qty is not None for e in orders.entries):
+        return False
+    ids = {}
+    for e in orders.entries:
+        if ids.setdefault(e.id, e.direction) != e.direction:
+            return False
+    long_ = np.zeros_like(orders.entries[0].issued)
+    short = np.zeros_like(long_)
+    for e in orders.entries:
+        (long_ if e.direction > 0 else short)[:] |= e.issued
+    close_long, close_short = _close_masks(orders, ids, len(long_))
+    # 同一根 K 线同时出现多空进场、或进场与同向平仓时，处理顺序会影响结果，交给通用路径
+    return not ((long_ & short) | (long_ & close_long) | (short & close_short)).any()
+
+
+def _close_masks(orders: Orders, directions: Dict[str, int], n: int):
+    close_long = np.zeros(n, dtype=bool)
+    close_short = np.zeros(n, dtype=bool)
+    for c in orders.closes:
+        d = directions.get(c.id) if c.id is not None else 0
+        if d is None:
+            continue
+        if d >= 0:
+            close_long |= c.issued
+        if d <= 0:
+            close_short |= c.issued
+    return close_long, close_short
+
+
+def vector_backtest(orders: Orders, data: Dict[str, np.ndarray], config: dict, mintick: float) -> Backtest:
+    """中文说明：市价进出场的向量化回测：目标持仓 = 最近一次进场方向（之后出现同向平仓则为 0）"""
+    n = len(data["close"])
+    open_ = data["open"]
+    directions = {e.id: e.direction for e in orders.entries}
+    long_ = np.zeros(n, dtype=bool)
+    short = np.zeros(n, dtype=bool)
+    for e in orders.entries:
+        (long_ if e.direction > 0 else short)[:] |= e.issued
+    close_long, close_short = _close_masks(orders, directions, n)
+
+    entry_at = last_true(long_ | short)
+    side = np.where(entry_at >= 0, np.where(long_[np.maximum(entry_at, 0)], 1, -1), 0)
+    closed = np.where(side > 0, last_true(close_long) > entry_at, last_true(close_short) > entry_at)
+    state = np.where(closed, 0, side)
+    # 第 s 根收盘时的目标持仓在第 s+1 根开盘成交
+    held_side = np.concatenate(([0], state[:-1]))
+    change = np.flatnonzero(np.diff(held_side, prepend=0))
+
+    costs = _Costs(config, mintick)
+    # 每次方向变化：先平旧仓（如有），再开新仓（如有）
+    prev = np.concatenate(([0], held_side[change[:-1]])) if len(change) else np.zeros(0, dtype=np.int64)
+    new = held_side[change]
+    opens = change[new != 0]
+    open_side = new[new != 0]
+    open_price = costs.price(open_[opens], open_side)
+    if config["default_qty_type"] == "cash":
+        open_qty = config["default_qty_value"] / open_price
+    else:
+        open_qty = np.full(len(opens), float(config["default_qty_value"]))
+    open_comm = costs.commission(open_qty, open_price)
+
+    exits = change[prev != 0]
+    exit_side = prev[prev != 0]
+    exit_price = costs.price(open_[exits], -exit_side)
+    k = len(exits)  # 已平仓交易数：第 i 笔平仓对应第 i 笔开仓
+    exit_qty = open_qty[:k]
+    exit_comm = costs.commission(exit_qty, exit_price)
+
+    fill_bar = np.concatenate((exits, opens))
+    order = np.argsort(fill_bar, kind="stable")
+    fill_bar = fill_bar[order]
+    fill_qty = np.concatenate((-exit_side * exit_qty, open_side * open_qty))[order]
+    fill_price = np.concatenate((exit_price, open_price))[order]
+    fill_comm = np.concatenate((exit_comm, open_comm))[order]
+
+    entry_ids = {1: next((e.id for e in orders.entries if e.direction > 0), ""),
+                 -1: next((e.id for e in orders.entries if e.direction < 0), "")}
+    pnl = exit_side * exit_qty * (exit_price - open_price[:k]) - open_comm[:k] - exit_comm
+    trades = {
+        "entry_id": [entry_ids[int(d)] for d in open_side[:k]],
+        "direction": open_side[:k].astype(np.int64),
+        "qty": exit_qty,
+        "entry_bar": opens[:k],
+        "entry_price": open_price[:k],
+        "exit_bar": exits,
+        "exit_price": exit_price,
+        "pnl": pnl,
+        "commission": open_comm[:k] + exit_comm,
+    }
+    last_close = data["close"][-1]
+    rest = slice(k, None)
+    open_trades = {
+        "entry_id": [entry_ids[int(d)] for d in open_side[rest]],
+        "direction": open_side[rest].astype(np.int64),
+        "qty": open_qty[rest],
+        "entry_bar": opens[rest],
+        "entry_price": open_price[rest],
+        "pnl": open_side[rest] * open_qty[rest] * (last_close - open_price[rest]) - open_comm[rest],
+    }
+    result = Backtest(config, data["time"], data["close"], fill_bar, fill_qty, fill_price, fill_comm, trades, open_trades)
+    # 均价：每笔开仓价保持到平仓
+    avg = np.full(n, np.nan)
+    avg[opens] = open_price
+    result.avg_price = np.where(result.position != 0, held(avg, ~np.isnan(avg)), np.nan)
+    return result
+
+
+# -------------------------------
+# 通用路径：事件推进
+# -------------------------------
+class _EntryState:
+    """中文说明：进场订单的预计算数组与搜索位置"""
+
+    def __init__(self, order: EntryOrder, data, n: int):
+        # 事件循环中逐个取值：Python 列表的下标访问比 NumPy 标量快一个数量级
+        self.order = order
+        self.market = order.market
+        self.direction = order.direction
+        self.issued = order.issued.tolist()
+        self.next_issue = next_true(order.issued).tolist()
+        self.last_issue = last_true(order.issued)
+        self.anchor = 0  # 只有在 anchor 及之后下达的订单有效（成交后订单被消耗）
+        self.search = 1
+        if order.market:
+            return
+        d = order.direction
+        high, low, open_ = data["high"], data["low"], data["open"]
+        touch = np.zeros(n, dtype=bool)
+        price = np.full(n, np.nan)
+        for level, is_limit in ((order.limit, True), (order.stop, False)):
+            if level is None:
+                continue
+            p = np.concatenate(([np.nan], held(level, order.issued)[:-1]))  # 第 t 根使用上一根收盘时的挂单价
+            # 多头限价：最低价触及；多头止损（突破买入）：最高价触及；空头相反
+            below = is_limit == (d > 0)
+            hit = (low <= p) if below else (high >= p)
+            fill = np.minimum(open_, p) if below else np.maximum(open_, p)
+            new = hit & ~touch
+            price = np.where(new, fill, price)
+            touch |= hit
+        self.touch_next = next_true(touch).tolist()
+        self.fill_price = price.tolist()
+
+    def candidate(self, cur: int) -> int:
+        """中文说明：cur 及之后最早可能成交的 K 线"""
+        start = max(cur, self.search)
+        if self.market:
+            s = self.next_issue[max(start - 1, self.anchor)]
+            return s + 1
+        first = self.next_issue[self.anchor] + 1
+        return self.touch_next[min(max(start, first), len(self.touch_next) - 1)]
+
+
+class _Position:
+    def __init__(self):
+        self.entries: List[list] = []  # [id, direction, qty, price, bar, commission]
+        self.opened = -1
+        self.peak = None  # 移动止损：激活后的最高（多）/最低（空）价
+        self.scanned = 0
+
+    @property
+    def direction(self) -> int:
+        return self.entries[0][1] if self.entries else 0
+
+    @property
+    def qty(self) -> float:
+        return sum(e[2] for e in self.entries)
+
+    @property
+    def avg(self) -> float:
+        q = self.qty
+        return sum(e[2] * e[3] for e in self.entries) / q if q else math.nan
+
+
+class _EventEngine:
+    def __init__(self, orders: Orders, data, config: dict, mintick: float):
+        self.orders = orders
+        self.data = data
+        self.config = config
+        self.tick = mintick
+        self.costs = _Costs(config, mintick)
+        self.n = n = len(data["close"])
+        self.entries = [_EntryState(e, data, n) for e in orders.entries]
+        self.close_next = [next_true(c.issued).tolist() for c in orders.closes]
+        self.exit_next = [next_true(x.issued).tolist() for x in orders.exits]
+        self.exit_limit = [None if x.limit is None else held(x.limit, x.issued) for x in orders.exits]
+        self.exit_stop = [None if x.stop is None else held(x.stop, x.issued) for x in orders.exits]
+        self.pos = _Position()
+        self.realized = 0.0
+        self.fills: List[tuple] = []
+        self.trades: List[tuple] = []
+
+    # ---- 成交 ----
+    def fill(self, bar: int, qty: float, price: float) -> float:
+        commission = self.costs.commission(qty, price)
+        self.fills.append((bar, qty, price, commission))
+        self.realized -= commission
+        return commission
+
+    def open(self, bar: int, s: _EntryState, raw_price: float) -> None:
+        order = s.order
+        d = order.direction
+        price = self.costs.price(raw_price, d)
+        qty = None
+        if order.qty is not None:
+            qty = float(order.qty[max(s.last_issue[bar - 1], 0)])
+        if qty is None or not math.isfinite(qty) or qty <= 0:
+            equity = 0.0
+            if self.config["default_qty_type"] == "percent_of_equity":
+                equity = self.config["initial_capital"] + self.realized + self.unrealized(price)
+            qty = _default_qty(self.config, price, equity)
+        if qty <= 0:
+            return
+        commission = self.fill(bar, d * qty, price)
+        if not self.pos.entries:
+            self.pos.opened = bar
+            self.pos.peak = None
+            self.pos.scanned = bar
+        self.pos.entries.append([order.id, d, qty, price, bar, commission])
+
+    def close(self, bar: int, raw_price: float, entry_id: Optional[str] = None) -> None:
+        keep = []
+        for e in self.pos.entries:
+            if entry_id is not None and e[0] != entry_id:
+                keep.append(e)
+                continue
+            eid, d, qty, entry_price, entry_bar, entry_comm = e
+            price = self.costs.price(raw_price, -d)
+            commission = self.fill(bar, -d * qty, price)
+            pnl = d * qty * (price - entry_price)
+            self.realized += pnl
+            self.trades.append((eid, d, qty, entry_bar, entry_price, bar, price, pnl - entry_comm - commission,
+                                entry_comm + commission))
+        self.pos.entries = keep
+
+    def unrealized(self, price: float) -> float:
+        return sum(d * q * (price - p) for _id, d, q, p, _b, _c in self.pos.entries)
+
+    # ---- 止盈止损 ----
+    def _exit_levels(self, k: int, a: int, b: int):
+        """中文说明：第 k 个 exit 在 [a, b) 内每根 K 线的止损与止盈价（多头为正向）"""
+        x = self.orders.exits[k]
+        pos = self.pos
+        d, avg = pos.direction, pos.avg
+        size = b - a
+        stop = np.full(size, -np.inf if d > 0 else np.inf)
+        limit = np.full(size, np.inf if d > 0 else -np.inf)
+        if x.loss is not None:
+            stop[:] = avg - d * x.loss * self.tick
+        if self.exit_stop[k] is not None:
+            s = self.exit_stop[k][a - 1:b - 1]
+            stop = np.where(np.isnan(s), stop, s)
+        if x.profit is not None:
+            limit[:] = avg + d * x.profit * self.tick
+        if self.exit_limit[k] is not None:
+            s = self.exit_limit[k][a - 1:b - 1]
+            limit = np.where(np.isnan(s), limit, s)
+        return stop, limit
+
+    def _trail(self, k: int, a: int, b: int):
+        """中文说明：移动止损价；价格先到达 avg ± trail_points 后激活，止损 = 激活后极值 ∓ trail_offset"""
+        x = self.orders.exits[k]
+        pos = self.pos
+        d = pos.direction
+        extreme = (self.data["high"] if d > 0 else self.data["low"])[a:b] * d
+        activation = (pos.avg + d * x.trail_points * self.tick) * d
+        peak = -np.inf if pos.peak is None else pos.peak * d
+        if pos.peak is None:
+            hit = np.flatnonzero(extreme >= activation)
+            if not len(hit):
+                return np.full(b - a, -np.inf * d), None
+            extreme = np.where(np.arange(b - a) >= hit[0], extreme, -np.inf)
+        running = np.maximum.accumulate(np.concatenate(([peak], extreme)))
+        stop = (running[:-1] - (x.trail_offset or 0) * self.tick) * d
+        stop[np.isinf(running[:-1])] = -np.inf * d
+        return stop, running[-1] * d
+
+    def scan_exits(self, start: int, end: int):
+        """中文说明：在 [start, end] 内找最早触发的 strategy.exit；返回 (bar, 价格, 平仓的 entry id)"""
+        pos = self.pos
+        d = pos.direction
+        active = []
+        ids = {e[0] for e in pos.entries}
+        for k, x in enumerate(self.orders.exits):
+            if x.from_entry is not None and x.from_entry not in ids:
+                continue
+            first = self.exit_next[k][max(pos.opened - 1, 0)] + 1
+            if first <= end:
+                active.append((k, max(first, start)))
+        if not active:
+            return None
+        high, low, open_ = self.data["high"], self.data["low"], self.data["open"]
+        a = min(s for _k, s in active)
+        size = SCAN_CHUNK
+        while a <= end:
+            b = min(a + size, end + 1)
+            best = None
+            new_peak = pos.peak
+            for k, s in active:
+                x = self.orders.exits[k]
+                if s >= b:
+                    continue
+                lo = max(a, s)
+                stop, limit = self._exit_levels(k, lo, b)
+                if x.trail_points is not None:
+                    trail, peak = self._trail(k, lo, b)
+                    stop = np.maximum(stop * d, trail * d) * d
+                    if peak is not None:
+                        new_peak = peak
+                adverse = (low[lo:b] <= stop) if d > 0 else (high[lo:b] >= stop)
+                favour = (high[lo:b] >= limit) if d > 0 else (low[lo:b] <= limit)
+                hits = np.flatnonzero(adverse | favour)
+                if not len(hits):
+                    continue
+                j = hits[0]
+                bar = lo + j
+                o = open_[bar]
+                if adverse[j]:
+                    price = min(o, stop[j]) if d > 0 else max(o, stop[j])
+                else:
+                    price = max(o, limit[j]) if d > 0 else min(o, limit[j])
+                if best is None or bar < best[0]:
+                    best = (bar, price, x.from_entry)
+            if best is not None:
+                return best
+            pos.peak = new_peak
+            a = b
+            size *= 2
+        return None
+
+    # ---- 主循环 ----
+    def next_event(self, cur: int) -> int:
+        t = self.n
+        pos = self.pos
+        # 加仓已满时同向进场单不会成交，持仓变化前不必停下（限价网格单每根 K 线都会触及）
+        full = pos.direction if len(pos.entries) >= self.config["pyramiding"] else 0
+        for s in self.entries:
+            if s.direction != full:
+                t = min(t, s.candidate(cur))
+        if self.pos.entries:
+            for nxt in self.close_next:
+                t = min(t, nxt[max(cur - 1, self.pos.opened)] + 1)
+        return t
+
+    def run(self) -> Backtest:
+        n = self.n
+        open_ = self.data["open"].tolist()
+        cur = 1
+        while cur < n:
+            t = self.next_event(cur)
+            if self.pos.entries and self.orders.exits:
+                # 只扫描到事件 K 线之前；事件 K 线本身在 step 中按顺序处理
+                end = min(t, n) - 1
+                hit = self.scan_exits(max(cur, self.pos.scanned), end)
+                if hit is not None:
+                    bar, price, entry_id = hit
+                    self.close(bar, price, entry_id)
+                    self.pending(bar)
+                    cur = bar + 1
+                    continue
+                self.pos.scanned = end + 1
+            if t >= n:
+                break
+            self.step(t, open_[t])
+            cur = t + 1
+        return self.result()
+
+    def step(self, t: int, o: float) -> None:
+        """中文说明：处理第 t 根 K 线：市价平仓 -> 市价进场 -> 止盈止损 -> 限价/止损进场"""
+        if self.pos.entries:
+            for c, nxt in zip(self.orders.closes, self.close_next):
+                if nxt[max(t - 1, self.pos.opened)] == t - 1:
+                    self.close(t, o, c.id)
+        for s in self.entries:
+            if s.market and s.issued[t - 1] and t - 1 >= s.anchor:
+                self.try_enter(s, t, o)
+        if self.pos.entries and self.orders.exits:
+            self.pos.scanned = max(self.pos.scanned, t)
+            hit = self.scan_exits(t, t)
+            if hit is not None:
+                self.close(hit[0], hit[1], hit[2])
+            self.pos.scanned = t + 1
+        self.pending(t)
+
+    def pending(self, t: int) -> None:
+        """中文说明：第 t 根 K 线内触及价格的限价/止损进场单"""
+        for s in self.entries:
+            if not s.market and s.candidate(t) == t:
+                self.try_enter(s, t, s.fill_price[t])
+
+    def try_enter(self, s: _EntryState, t: int, price: float) -> None:
+        pos = self.pos
+        s.search = t + 1
+        if pos.entries and pos.direction != s.direction:
+            self.close(t, price)
+        elif pos.entries and len(pos.entries) >= self.config["pyramiding"]:
+            if s.market:
+                s.anchor = t
+            return
+        self.open(t, s, price)
+        s.anchor = t
+
+    def result(self) -> Backtest:
+        data = self.data
+        fills = np.array(self.fills, dtype=np.float64).reshape(-1, 4)
+        last = data["close"][-1]
+        open_rows = [(e[0], e[1], e[2], e[4], e[3], e[1] * e[2] * (last - e[3]) - e[5]) for e in self.pos.entries]
+        cols = list(zip(*open_rows)) if open_rows else [()] * 6
+        open_trades = {
+            "entry_id": list(cols[0]),
+            "direction": np.asarray(cols[1], dtype=np.int64),
+            "qty": np.asarray(cols[2], dtype=np.float64),
+            "entry_bar": np.asarray(cols[3], dtype=np.int64),
+            "entry_price": np.asarray(cols[4], dtype=np.float64),
+            "pnl": np.asarray(cols[5], dtype=np.float64),
+        }
+        result = Backtest(self.config, data["time"], data["close"], fills[:, 0].astype(np.int64), fills[:, 1],
+                          fills[:, 2], fills[:, 3], _trade_columns(self.trades), open_trades)
+        # 均价：逐笔成交更新（加仓按成交额加权，减仓不变），同一根 K 线取最后一笔后的值并保持到下一次成交
+        avg = np.full(self.n, np.nan)
+        issued = np.zeros(self.n, dtype=bool)
+        cur_avg, cur_pos = math.nan, 0.0
+        for bar, q, p, _c in self.fills:
+            if cur_pos == 0 or (q > 0) == (cur_pos > 0):
+                cur_avg = p if cur_pos == 0 else (cur_avg * cur_pos + p * q) / (cur_pos + q)
+            cur_pos += q
+            if abs(cur_pos) < 1e-9:
+                cur_pos, cur_avg = 0.0, math.nan
+            avg[bar] = cur_avg
+            issued[bar] = True
+        result.avg_price = np.where(result.position != 0, held(avg, issued), np.nan)
+        return result
+
+
+def backtest(orders: Orders, data: Dict[str, np.ndarray], config: Optional[dict] = None, mintick: float = 0.01,
+             vectorized: Optional[bool] = None) -> Backtest:
+    """中文说明：执行回测；vectorized=None 时能用快速路径就用快速路径"""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    if vectorized is None:
+        vectorized = _vector_eligible(orders, config)
+    if vectorized:
+        return vector_backtest(orders, data, config, mintick)
+    return _EventEngine(orders, data, config, mintick).run()
+
+
+# -------------------------------
+# 参数扫描（进程池 + 共享内存）
+# -------------------------------
+_FIELDS = ("open", "high", "low", "close", "volume", "time")
+_worker: dict = {}
+
+
+def _attach(name: str, n: int):
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((len(_FIELDS), n), dtype=np.float64, buffer=shm.buf)
+    block.setflags(write=False)
+    data = {f: block[i] for i, f in enumerate(_FIELDS)}
+    data["time"] = data["time"].astype(np.int64)
+    return shm, data
+
+
+def _init_worker(name: str, n: int, code: str) -> None:
+    from .pine_parser import parse
+
+    shm, data = _attach(name, n)
+    _worker.update(shm=shm, data=data, script=parse(code))
+
+
+def _sweep_one(params: dict) -> dict:
+    from .pine_runtime import execute
+
+    result = execute(_worker["script"], _worker["data"], params)
+    return {"params": params, "stats": result.backtest.stats() if result.backtest else None}
+
+
+def sweep(code: str, grid: Dict[str, list], dataset: Optional[dict] = None, workers: Optional[int] = None) -> List[dict]:
+    """中文说明：对参数网格的每个组合运行脚本并回测；workers=1 时在当前进程内执行"""
+    from .pine_parser import parse
+    from .pine_runtime import synthetic_ohlcv
+
+    parse(code)  # 语法错误在分发前抛出
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[k] for k in names))]
+    data = synthetic_ohlcv(**(dataset or {"bars": 100_000}))
+    n = len(data["close"])
+    shm = shared_memory.SharedMemory(create=True, size=len(_FIELDS) * n * 8)
+    try:
+        block = np.ndarray((len(_FIELDS), n), dtype=np.float64, buffer=shm.buf)
+        for i, f in enumerate(_FIELDS):
+            block[i] = data[f]
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1:
+            _init_worker(shm.name, n, code)
+            try:
+                return [_sweep_one(p) for p in combos]
+            finally:
+                _worker.pop("shm").close()
+                _worker.clear()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shm.name, n, code)) as pool:
+            return list(pool.map(_sweep_one, combos))
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,21 @@
+# 中文说明：gunicorn 多进程部署配置
+"""
+用法：gunicorn -c server/gunicorn_conf.py server.main:app（需额外安装 gunicorn）
+
+- 工作进程类型为 uvicorn.workers.UvicornWorker，数量取 PS_WORKERS（默认 CPU 核数）
+- 不使用 preload_app：SQLite 连接与 I/O 线程池不能跨 fork 共享，每个进程启动后各自打开并各自加载课程数据
+"""
+
+import multiprocessing
+import os
+
+workers = int(os.environ.get("PS_WORKERS") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{os.environ.get('PS_HOST', '0.0.0.0')}:{os.environ.get('PS_PORT', '8001')}"
+preload_app = False
+# 关闭时留给写后队列与 SQLite 检查点的时间
+graceful_timeout = 30
+keepalive = 5
+
+# 在 master 中设置，fork 出的工作进程导入 server.main 时即可读到
+os.environ["PS_WORKERS"] = str(workers)
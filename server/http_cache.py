@@ -0,0 +1,111 @@
+# 中文说明：HTTP 缓存与预压缩响应
+"""
+功能概述：
+- EncodedBody：一次性计算内容哈希（ETag）以及 gzip/brotli 预压缩版本
+- encoded_response：按 If-None-Match 返回 304，按 Accept-Encoding 选择预压缩正文
+
+输入/输出：
+- encode_body(raw: bytes) -> EncodedBody
+- encoded_response(request, body, media_type) -> Response
+
+边界与安全：
+- brotli 已列入 server/requirements.txt；未安装时（如只装了构建脚本依赖的环境）仅提供 gzip 与原始正文
+- 不同编码使用不同的强 ETag（追加 -gzip/-br 后缀），比较时忽略后缀与 W/ 前缀
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request, Response
+
+try:  # server/requirements.txt 中已包含；缺失时退化为只提供 gzip
+    import brotli
+except ImportError:  # pragma: no cover - 取决于运行环境
+    brotli = None
+
+# 小于该字节数的正文不压缩（压缩收益不足以抵消头部开销）
+MIN_COMPRESS_SIZE = 512
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """中文说明：同一份内容的原始/压缩版本与内容哈希"""
+
+    raw: bytes
+    digest: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def encode_body(raw: bytes) -> EncodedBody:
+    """中文说明：计算内容哈希并生成预压缩版本（仅在数据加载时调用一次）"""
+    digest = hashlib.sha256(raw).hexdigest()[:32]
+    if len(raw) < MIN_COMPRESS_SIZE:
+        return EncodedBody(raw=raw, digest=digest)
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    br = brotli.compress(raw, quality=11) if brotli is not None else None
+    return EncodedBody(raw=raw, digest=digest, gzip=gz, br=br)
+
+
+def _accepted_encodings(header: str) -> set:
+    """中文说明：解析 Accept-Encoding，忽略 q=0 的编码"""
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(token)
+    return accepted
+
+
+def _etag_matches(if_none_match: str, digest: str) -> bool:
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def encoded_response(request: Request, body: EncodedBody, media_type: str = "application/json") -> Response:
+    """中文说明：条件请求返回 304，否则按客户端能力返回预压缩正文"""
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match", ""), body.digest):
+        headers["ETag"] = body.etag
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    if body.br is not None and "br" in accepted:
+        content, encoding = body.br, "br"
+    elif body.gzip is not None and ("gzip" in accepted or "*" in accepted):
+        content, encoding = body.gzip, "gzip"
+    else:
+        content, encoding = body.raw, None
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = f'"{body.digest}-{encoding}"'
+    else:
+        headers["ETag"] = body.etag
+    return Response(content=content, media_type=media_type, headers=headers)
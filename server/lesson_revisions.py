@@ -0,0 +1,169 @@
+# 中文说明：课程内容修订日志（增量同步）
+"""
+功能概述：
+- 为课程目录维护单调递增的修订号：每次记录时按课程内容哈希比较，只有课程被新增、修改、删除或调整顺序时
+  才生成新修订，并记下本次改动的课程 id
+- changes_since(since)：汇总 since 之后所有修订改动过的课程 id，得到客户端需要更新（upsert）与删除（removed）的课程，
+  以及顺序是否变化；客户端只下载改动的课程，而不是整份 lessons.json
+- 构建脚本（build_lessons.py 写出 lessons.json 时）与服务端（加载 / 热加载课程时）都会记录，
+  因此直接运行 renumber_titles.py 等脚本修改课程后，服务端热加载时同样会生成新修订
+
+输入/输出：
+- RevisionLog.load(path) / log.save(path)：日志文件为 JSON（默认在 lessons.json 旁的 lessons.revisions.json）
+- log.record(lessons) -> bool：记录当前课程列表，产生新修订时返回 True
+- log.changes_since(since) -> Changes 或 None（since 不在保留范围内，客户端应全量重新加载）
+
+边界与安全：
+- 日志只保存 id 与内容哈希，不保存课程正文；只保留最近 MAX_REVISIONS 次修订，更早的修订号需要全量重新加载
+- 内容哈希按完整课程 dict（含测验答案）计算，构建脚本与服务端使用同一函数，结果一致
+- 日志文件损坏或格式版本不同时从空日志开始（等价于所有客户端全量重新加载一次）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+FORMAT = 1
+# 保留的修订数；客户端的修订号早于保留范围时需要全量重新加载
+MAX_REVISIONS = 200
+
+
+def lesson_digest(lesson: dict) -> str:
+    """中文说明：课程内容哈希（键排序后的紧凑 JSON，取前 16 字节十六进制）"""
+    raw = json.dumps(lesson, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _order_digest(ids: List[str]) -> str:
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass(frozen=True)
+class Changes:
+    """中文说明：since 之后的改动；upsert/removed 为课程 id，reordered 表示课程顺序有变化（含新增与删除）"""
+
+    revision: int
+    since: int
+    upsert: List[str]
+    removed: List[str]
+    reordered: bool
+
+
+class RevisionLog:
+    """中文说明：课程修订日志；revision 为当前修订号，lessons 为当前 {id: 内容哈希}"""
+
+    def __init__(self):
+        self.revision = 0
+        # 可作为 since 的最早修订号；更早的修订已被裁剪
+        self.base = 0
+        self.lessons: Dict[str, str] = {}
+        self.order = ""
+        self.revisions: List[dict] = []
+
+    @classmethod
+    def load(cls, path) -> "RevisionLog":
+        log = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return log
+        if not isinstance(data, dict) or data.get("format") != FORMAT:
+            return log
+        log.revision = int(data.get("revision", 0))
+        log.base = int(data.get("base", 0))
+        log.lessons = dict(data.get("lessons", {}))
+        log.order = data.get("order", "")
+        log.revisions = list(data.get("revisions", []))
+        return log
+
+    def to_dict(self) -> dict:
+        return {
+            "format": FORMAT,
+            "revision": self.revision,
+            "base": self.base,
+            "order": self.order,
+            "lessons": self.lessons,
+            "revisions": self.revisions,
+        }
+
+    def save(self, path) -> None:
+        """中文说明：写临时文件后替换，读取方不会看到写到一半的文件；临时文件名唯一，多个进程同时保存互不覆盖"""
+        path = Path(path)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False
+        ) as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        try:
+            os.replace(f.name, path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+    def copy(self) -> "RevisionLog":
+        """中文说明：独立副本（课程快照持有，之后的 record 不影响已发布的快照）"""
+        log = RevisionLog()
+        log.revision, log.base, log.order = self.revision, self.base, self.order
+        log.lessons = dict(self.lessons)
+        log.revisions = list(self.revisions)
+        return log
+
+    def record(self, lessons: List[dict]) -> bool:
+        """中文说明：与上一次记录比较，有改动时追加一次修订并返回 True"""
+        current: Dict[str, str] = {}
+        ids: List[str] = []
+        for lesson in lessons:
+            lesson_id = lesson.get("id")
+            if not lesson_id or lesson_id in current:
+                continue
+            current[lesson_id] = lesson_digest(lesson)
+            ids.append(lesson_id)
+        order = _order_digest(ids)
+        changed = [i for i in ids if self.lessons.get(i) != current[i]]
+        removed = [i for i in self.lessons if i not in current]
+        if not changed and not removed and order == self.order:
+            return False
+        self.revision += 1
+        self.revisions.append({
+            "rev": self.revision,
+            "changed": changed,
+            "removed": removed,
+            "reordered": order != self.order,
+            "at": int(time.time()),
+        })
+        if len(self.revisions) > MAX_REVISIONS:
+            del self.revisions[: len(self.revisions) - MAX_REVISIONS]
+        # 最早可比较的修订号：第一条保留修订之前的那个修订（修订号从 1 开始）
+        self.base = max(1, self.revisions[0]["rev"] - 1)
+        self.lessons = current
+        self.order = order
+        return True
+
+    def covers(self, since: int) -> bool:
+        """中文说明：since 是否在日志保留范围内（0 与未来的修订号不在范围内）"""
+        return since > 0 and self.base <= since <= self.revision
+
+    def changes_since(self, since: int) -> Optional[Changes]:
+        """中文说明：since 之后的改动；since 超出保留范围（含 0 与未来的修订号）时返回 None"""
+        if not self.covers(since):
+            return None
+        touched: Dict[str, None] = {}
+        reordered = False
+        for entry in self.revisions:
+            if entry["rev"] <= since:
+                continue
+            for lesson_id in entry["changed"]:
+                touched[lesson_id] = None
+            for lesson_id in entry["removed"]:
+                touched[lesson_id] = None
+            reordered = reordered or entry["reordered"]
+        upsert = [i for i in touched if i in self.lessons]
+        removed = [i for i in touched if i not in self.lessons]
+        return Changes(revision=self.revision, since=since, upsert=upsert, removed=removed, reordered=reordered)
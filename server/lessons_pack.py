@@ -0,0 +1,312 @@
+# 中文说明：课程数据紧凑二进制格式（MessagePack 编码 + 偏移表，无外部依赖）
+"""
+功能概述：
+- pack(catalogue) -> bytes：把课程目录编码为紧凑二进制；分类名去重后存入字符串表，
+  课程记录中的 category 只存字符串表下标
+- unpack(data) -> catalogue：整体解码，结果与原 JSON 解析结果一致
+- PackedLessons(path)：mmap 打开文件，只解析文件头、字符串表与 id 表，
+  按 id 切出单节课的记录并解码，不解析其余课程
+- iter_lessons(stream)：流式解码，按记录长度前缀逐节读取，不把整个文件读入内存
+
+文件布局（小端序）：
+- 文件头 20 字节：magic "PSLB" | u8 版本 | 3 字节保留 | u32 课程数 | u32 偏移表位置 | u32 记录区位置
+- 字符串表（MessagePack 数组）、目录元数据（MessagePack map，不含 lessons）、id 表（MessagePack 数组）
+- 偏移表：每节课 (u32 记录位置, u32 记录长度)
+- 记录区：每节课 u32 长度前缀 + MessagePack map
+
+边界与安全：
+- 值编码为标准 MessagePack（nil/bool/int/float64/str/array/map），单条记录可用任意 MessagePack 库解码；
+  安装了 msgpack 时解码使用其 C 实现，否则使用本模块的纯 Python 实现
+- 格式版本或 magic 不符时抛出 ValueError
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:  # 可选依赖：pip install msgpack
+    import msgpack
+except ImportError:  # pragma: no cover - 取决于运行环境
+    msgpack = None
+
+MAGIC = b"PSLB"
+VERSION = 1
+_HEADER = struct.Struct("<4sB3xIII")
+_ENTRY = struct.Struct("<II")
+_LEN = struct.Struct("<I")
+
+
+# -------------------------------
+# MessagePack 编码
+# -------------------------------
+def _pack(obj, out: List[bytes]) -> None:
+    if obj is None:
+        out.append(b"\xc0")
+    elif obj is True:
+        out.append(b"\xc3")
+    elif obj is False:
+        out.append(b"\xc2")
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(bytes((obj,)))
+        elif -32 <= obj < 0:
+            out.append(struct.pack("b", obj))
+        elif 0 <= obj <= 0xFF:
+            out.append(struct.pack(">BB", 0xCC, obj))
+        elif 0 <= obj <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xCD, obj))
+        elif 0 <= obj <= 0xFFFFFFFF:
+            out.append(struct.pack(">BI", 0xCE, obj))
+        elif 0 <= obj <= 0xFFFFFFFFFFFFFFFF:
+            out.append(struct.pack(">BQ", 0xCF, obj))
+        elif -0x80 <= obj:
+            out.append(struct.pack(">Bb", 0xD0, obj))
+        elif -0x8000 <= obj:
+            out.append(struct.pack(">Bh", 0xD1, obj))
+        elif -0x80000000 <= obj:
+            out.append(struct.pack(">Bi", 0xD2, obj))
+        else:
+            out.append(struct.pack(">Bq", 0xD3, obj))
+    elif isinstance(obj, float):
+        out.append(struct.pack(">Bd", 0xCB, obj))
+    elif isinstance(obj, str):
+        raw = obj.encode("utf-8")
+        n = len(raw)
+        if n < 32:
+            out.append(bytes((0xA0 | n,)))
+        elif n <= 0xFF:
+            out.append(struct.pack(">BB", 0xD9, n))
+        elif n <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDA, n))
+        else:
+            out.append(struct.pack(">BI", 0xDB, n))
+        out.append(raw)
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x90 | n,)))
+        elif n <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDC, n))
+        else:
+            out.append(struct.pack(">BI", 0xDD, n))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x80 | n,)))
+        elif n <= 0xFFFF:
+            out.append(struct.pack(">BH", 0xDE, n))
+        else:
+            out.append(struct.pack(">BI", 0xDF, n))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"无法编码的类型: {type(obj).__name__}")
+
+
+def packb(obj) -> bytes:
+    """中文说明：MessagePack 编码单个值"""
+    out: List[bytes] = []
+    _pack(obj, out)
+    return b"".join(out)
+
+
+# -------------------------------
+# MessagePack 解码（纯 Python）
+# -------------------------------
+_FIXED = {
+    0xCC: (">B", 1), 0xCD: (">H", 2), 0xCE: (">I", 4), 0xCF: (">Q", 8),
+    0xD0: (">b", 1), 0xD1: (">h", 2), 0xD2: (">i", 4), 0xD3: (">q", 8),
+    0xCA: (">f", 4), 0xCB: (">d", 8),
+}
+_STR_LEN = {0xD9: (">B", 1), 0xDA: (">H", 2), 0xDB: (">I", 4)}
+_ARRAY_LEN = {0xDC: (">H", 2), 0xDD: (">I", 4)}
+_MAP_LEN = {0xDE: (">H", 2), 0xDF: (">I", 4)}
+
+
+def _unpack(data: bytes, pos: int) -> Tuple[object, int]:
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0xA0 <= b <= 0xBF:
+        end = pos + (b & 0x1F)
+        return data[pos:end].decode("utf-8"), end
+    if 0x90 <= b <= 0x9F:
+        return _unpack_array(data, pos, b & 0x0F)
+    if 0x80 <= b <= 0x8F:
+        return _unpack_map(data, pos, b & 0x0F)
+    if b == 0xC0:
+        return None, pos
+    if b == 0xC2:
+        return False, pos
+    if b == 0xC3:
+        return True, pos
+    if b in _STR_LEN:
+        fmt, size = _STR_LEN[b]
+        end = pos + size + struct.unpack_from(fmt, data, pos)[0]
+        return data[pos + size:end].decode("utf-8"), end
+    if b in _FIXED:
+        fmt, size = _FIXED[b]
+        return struct.unpack_from(fmt, data, pos)[0], pos + size
+    if b in _ARRAY_LEN:
+        fmt, size = _ARRAY_LEN[b]
+        return _unpack_array(data, pos + size, struct.unpack_from(fmt, data, pos)[0])
+    if b in _MAP_LEN:
+        fmt, size = _MAP_LEN[b]
+        return _unpack_map(data, pos + size, struct.unpack_from(fmt, data, pos)[0])
+    raise ValueError(f"不支持的 MessagePack 类型字节 0x{b:02x}（位置 {pos - 1}）")
+
+
+def _unpack_array(data: bytes, pos: int, n: int) -> Tuple[list, int]:
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data: bytes, pos: int, n: int) -> Tuple[dict, int]:
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        value, pos = _unpack(data, pos)
+        result[key] = value
+    return result, pos
+
+
+def unpackb(data: bytes):
+    """中文说明：MessagePack 解码单个值（安装了 msgpack 时使用其 C 实现）"""
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    value, _pos = _unpack(bytes(data), 0)
+    return value
+
+
+# -------------------------------
+# 课程文件
+# -------------------------------
+def pack(catalogue: dict) -> bytes:
+    """中文说明：把课程目录编码为紧凑二进制（见模块说明中的文件布局）"""
+    strings: List[str] = []
+    string_idx: Dict[str, int] = {}
+    ids = []
+    records = []
+    for lesson in catalogue.get("lessons", []):
+        category = lesson.get("category")
+        if isinstance(category, str):
+            if category not in string_idx:
+                string_idx[category] = len(strings)
+                strings.append(category)
+            lesson = {**lesson, "category": string_idx[category]}
+        ids.append(lesson.get("id") or "")
+        records.append(packb(lesson))
+    meta = {k: v for k, v in catalogue.items() if k != "lessons"}
+    prefix = packb(strings) + packb(meta) + packb(ids)
+
+    table_off = _HEADER.size + len(prefix)
+    records_off = table_off + _ENTRY.size * len(records)
+    table = []
+    pos = records_off
+    for raw in records:
+        table.append(_ENTRY.pack(pos + _LEN.size, len(raw)))
+        pos += _LEN.size + len(raw)
+    header = _HEADER.pack(MAGIC, VERSION, len(records), table_off, records_off)
+    body = b"".join(_LEN.pack(len(raw)) + raw for raw in records)
+    return header + prefix + b"".join(table) + body
+
+
+def _read_header(data: bytes) -> Tuple[int, int, int]:
+    if len(data) < _HEADER.size:
+        raise ValueError("课程二进制文件过短")
+    magic, version, count, table_off, records_off = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("不是课程二进制文件（magic 不符）")
+    if version != VERSION:
+        raise ValueError(f"不支持的课程二进制格式版本: {version}")
+    return count, table_off, records_off
+
+
+def _read_prefix(data: bytes) -> Tuple[List[str], dict, List[str]]:
+    """中文说明：解码文件头之后的字符串表、元数据与 id 表（data 从文件头之后开始）"""
+    strings, pos = _unpack(data, 0)
+    meta, pos = _unpack(data, pos)
+    ids, _pos = _unpack(data, pos)
+    return strings, meta, ids
+
+
+def _restore(lesson: dict, strings: List[str]) -> dict:
+    category = lesson.get("category")
+    if isinstance(category, int) and not isinstance(category, bool):
+        lesson["category"] = strings[category]
+    return lesson
+
+
+def unpack(data: bytes) -> dict:
+    """中文说明：整体解码为与原 JSON 相同结构的 dict"""
+    data = bytes(data)
+    count, table_off, _records_off = _read_header(data)
+    strings, meta, _ids = _read_prefix(data[_HEADER.size:table_off])
+    lessons = []
+    for i in range(count):
+        off, length = _ENTRY.unpack_from(data, table_off + i * _ENTRY.size)
+        lessons.append(_restore(unpackb(data[off:off + length]), strings))
+    return {**meta, "lessons": lessons}
+
+
+def iter_lessons(stream: BinaryIO) -> Iterator[dict]:
+    """中文说明：流式解码：依次读取长度前缀与记录，每次只在内存中保留一节课"""
+    header = stream.read(_HEADER.size)
+    count, table_off, records_off = _read_header(header)
+    strings, _meta, _ids = _read_prefix(stream.read(table_off - _HEADER.size))
+    stream.read(records_off - table_off)  # 跳过偏移表
+    for _ in range(count):
+        (length,) = _LEN.unpack(stream.read(_LEN.size))
+        yield _restore(unpackb(stream.read(length)), strings)
+
+
+class PackedLessons:
+    """中文说明：mmap 打开的课程二进制文件；按 id 只解码所需的单节课"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        count, self._table_off, _records_off = _read_header(self._mm[:_HEADER.size])
+        self.strings, self.meta, ids = _read_prefix(self._mm[_HEADER.size:self._table_off])
+        self.count = count
+        self._index = {lesson_id: i for i, lesson_id in enumerate(ids) if lesson_id}
+
+    def __enter__(self) -> "PackedLessons":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def ids(self) -> List[str]:
+        return list(self._index)
+
+    def raw(self, lesson_id: str) -> Optional[bytes]:
+        """中文说明：单节课的 MessagePack 记录（category 为字符串表下标）"""
+        i = self._index.get(lesson_id)
+        if i is None:
+            return None
+        off, length = _ENTRY.unpack_from(self._mm, self._table_off + i * _ENTRY.size)
+        return self._mm[off:off + length]
+
+    def lesson(self, lesson_id: str) -> Optional[dict]:
+        """中文说明：按 id 解码单节课；不存在返回 None"""
+        raw = self.raw(lesson_id)
+        if raw is None:
+            return None
+        return _restore(unpackb(raw), self.strings)
@@ -0,0 +1,327 @@
+# 中文说明：课程数据内存缓存
+"""
+功能概述：
+- 启动后只解析一次 lessons.json，并预先编码为 UTF-8 字节，请求直接返回内存中的字节
+- 加载时同时计算内容哈希（ETag）与 gzip/brotli 预压缩版本
+- 同时构建轻量目录（仅元数据与字节数）与按 id 索引的单课正文，供侧边栏首屏与按需加载使用
+- 构建测验答案索引 (lessonId, 题号) -> 正确选项位掩码；对外返回的课程数据去掉 isCorrect，由服务端判分
+- 同时预编码紧凑二进制版本（server/lessons_pack.py，同样不含 isCorrect），供 GET /lessons/packed 返回
+- 构建全文检索索引（server/search.py）；热加载时复用上一版快照中未变化课程的分词结果
+- 加载时按课程内容哈希记录修订日志（server/lesson_revisions.py），snapshot.changes(since) 只返回 since 修订之后
+  新增/修改的课程正文与删除的课程 id，供前端增量同步；服务端的日志写在 revisions_path（服务端数据目录），
+  首次启动时以构建脚本发布的 lessons.json 旁的 lessons.revisions.json 为起点，之后不再修改静态目录中的文件
+- 每次访问时比较文件 mtime/size，变化时自动热加载（无需重启服务）
+- 异步接口 aget：check_interval 秒内直接返回内存快照，不触发任何文件 I/O；
+  需要检查文件时放到 I/O 线程池执行，不阻塞事件循环
+- 使用 orjson 解析与编码（未安装时回退到标准库 json）
+- 统计缓存命中、未命中与重载次数，供监控接口查看
+
+输入/输出：
+- LessonsStore(path).get() -> LessonsSnapshot（data 为解析后的 dict，body 为预编码正文 EncodedBody）
+- LessonsStore.stats() -> {"hits", "misses", "reloads", "revision", ...}
+- snapshot.changes(since) -> EncodedBody：{"revision", "since", "full", "upsert", "removed", "order"}；
+  since 不在日志保留范围内时只返回 {"revision", "full": true}，客户端应重新加载目录
+- snapshot.cached_changes(since) -> 已编码的增量响应或 None（命中时无需进入线程池）
+
+边界与安全：
+- 文件不存在时抛出 FileNotFoundError，由调用方转换为 404
+- 文件解析失败时保留上一次成功加载的快照，避免热加载期间服务中断
+- 修订日志写入失败（如只读部署目录）时只保留在内存中，不影响课程加载
+- 多个工作进程共享同一个日志文件：读取-记录-保存在文件锁（fcntl）内完成，不会交错或生成重复的修订号
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 下只支持单进程
+    fcntl = None
+
+from .aio import run_io
+from .http_cache import EncodedBody, encode_body
+from .lesson_revisions import RevisionLog
+from .lessons_pack import pack
+from .metrics import JSON_SECONDS, timed
+from .search import SearchIndex
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 构建脚本等无服务端依赖的环境
+    orjson = None
+
+
+@dataclass(frozen=True)
+class LessonsSnapshot:
+    """中文说明：某一时刻的课程数据快照（只读）"""
+
+    data: dict
+    body: EncodedBody
+    mtime_ns: int
+    size: int
+    index: EncodedBody
+    by_id: Dict[str, EncodedBody]
+    lessons: Dict[str, dict]
+    answers: Dict[Tuple[str, int], int]
+    search: SearchIndex
+    packed: EncodedBody
+    revisions: RevisionLog = field(default_factory=RevisionLog)
+    order: Tuple[str, ...] = ()
+    # since -> 预编码的增量响应；键的取值范围受日志保留的修订数限制
+    _changes: Dict[Optional[int], EncodedBody] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def revision(self) -> int:
+        return self.revisions.revision
+
+    def lesson(self, lesson_id: str) -> Optional[EncodedBody]:
+        """中文说明：O(1) 按 id 取单课正文"""
+        return self.by_id.get(lesson_id)
+
+    def find(self, lesson_id: str) -> Optional[dict]:
+        """中文说明：O(1) 按 id 取解析后的课程 dict（只读）"""
+        return self.lessons.get(lesson_id)
+
+    def answer_mask(self, lesson_id: str, question_idx: int) -> Optional[int]:
+        """中文说明：正确选项位掩码（第 i 个选项正确则第 i 位为 1）；题目不存在返回 None"""
+        return self.answers.get((lesson_id, question_idx))
+
+    def cached_changes(self, since: int) -> Optional[EncodedBody]:
+        """中文说明：已编码的增量响应；未命中返回 None，由调用方在计算线程池中调用 changes 生成"""
+        return self._changes.get(since if self.revisions.covers(since) else None)
+
+    def changes(self, since: int) -> EncodedBody:
+        """中文说明：since 修订之后的增量（新增/修改课程的公开正文、删除的 id、顺序变化时的完整顺序）；
+        未命中时要压缩正文，异步调用方应放到 run_cpu 执行"""
+        body = self.cached_changes(since)
+        if body is not None:
+            return body
+        delta = self.revisions.changes_since(since)
+        key = since if delta is not None else None
+        if delta is None:
+            # 所有超出范围的 since 共用同一份响应，正文中不能带请求方的 since
+            raw = encode_json({"revision": self.revision, "full": True})
+        else:
+            head = encode_json({
+                "revision": self.revision,
+                "since": since,
+                "full": False,
+                "removed": delta.removed,
+                "order": list(self.order) if delta.reordered else None,
+            })
+            # 单课正文已预编码，直接拼接字节，不再重新序列化
+            lessons = b",".join(self.by_id[i].raw for i in delta.upsert if i in self.by_id)
+            raw = head[:-1] + b',"upsert":[' + lessons + b"]}"
+        body = self._changes[key] = encode_body(raw)
+        return body
+
+
+# 目录中保留的元数据字段（侧边栏与标题渲染所需）
+INDEX_FIELDS = ("id", "title", "subtitle", "category", "isLocked", "isEncrypted", "bundle")
+
+
+def encode_json(obj) -> bytes:
+    """中文说明：紧凑 JSON 编码（不转义中文，去掉多余空白）"""
+    with timed(JSON_SECONDS, op="dump"):
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_json(raw: bytes):
+    """中文说明：JSON 解码"""
+    with timed(JSON_SECONDS, op="parse"):
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+
+
+def strip_answers(lesson: dict, answers: Dict[Tuple[str, int], int]) -> dict:
+    """中文说明：把测验答案写入索引，返回不含 isCorrect 的公开版本（不修改原 dict）"""
+    quiz = lesson.get("quiz")
+    if not isinstance(quiz, list):
+        return lesson
+    public_quiz = []
+    for idx, q in enumerate(quiz):
+        mask = 0
+        choices = []
+        for i, choice in enumerate(q.get("choices") or []):
+            if choice.get("isCorrect"):
+                mask |= 1 << i
+            choices.append({k: v for k, v in choice.items() if k != "isCorrect"})
+        answers[(lesson["id"], idx)] = mask
+        public_quiz.append({**q, "choices": choices})
+    return {**lesson, "quiz": public_quiz}
+
+
+def build_snapshot(
+    data: dict,
+    mtime_ns: int = 0,
+    size: int = 0,
+    previous: Optional[LessonsSnapshot] = None,
+    revisions: Optional[RevisionLog] = None,
+) -> LessonsSnapshot:
+    """中文说明：由解析后的课程数据构建快照（全量正文、目录、单课索引、答案索引、检索索引）"""
+    by_id: Dict[str, EncodedBody] = {}
+    lessons: Dict[str, dict] = {}
+    answers: Dict[Tuple[str, int], int] = {}
+    public_lessons = []
+    entries = []
+    for lesson in data.get("lessons", []):
+        lesson_id = lesson.get("id")
+        if not lesson_id:
+            public_lessons.append(lesson)
+            continue
+        public = strip_answers(lesson, answers)
+        public_lessons.append(public)
+        body = encode_body(encode_json(public))
+        by_id[lesson_id] = body
+        lessons[lesson_id] = lesson
+        entry = {k: lesson[k] for k in INDEX_FIELDS if k in lesson}
+        entry["bytes"] = len(body.raw)
+        entries.append(entry)
+    revisions = revisions if revisions is not None else RevisionLog()
+    index = {"version": data.get("version"), "revision": revisions.revision, "lessons": entries}
+    public = {**data, "lessons": public_lessons}
+    return LessonsSnapshot(
+        data=data,
+        body=encode_body(encode_json(public)),
+        mtime_ns=mtime_ns,
+        size=size,
+        index=encode_body(encode_json(index)),
+        by_id=by_id,
+        lessons=lessons,
+        answers=answers,
+        search=SearchIndex.build(data.get("lessons", []), previous.search if previous else None),
+        packed=encode_body(pack(public)),
+        revisions=revisions,
+        order=tuple(lessons),
+    )
+
+
+class LessonsStore:
+    """中文说明：按 mtime/size 失效的课程数据缓存，线程安全"""
+
+    def __init__(self, path: Path, check_interval: float = 1.0, revisions_path: Optional[Path] = None):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        # 构建脚本发布的日志（只读）；服务端自己的日志尚不存在时以它为起点，修订号与构建输出保持连续
+        self.published_revisions_path = self.path.with_name(self.path.stem + ".revisions.json")
+        self.revisions_path = Path(revisions_path) if revisions_path else self.published_revisions_path
+        self._revisions = RevisionLog()
+        self._lock = threading.Lock()
+        self._snapshot: Optional[LessonsSnapshot] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def _stat(self):
+        st = self.path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    async def aget(self) -> LessonsSnapshot:
+        """中文说明：异步获取快照；检查间隔内直接返回内存数据"""
+        snap = self._snapshot
+        if snap is not None and time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return snap
+        return await run_io(self.get)
+
+    def get(self) -> LessonsSnapshot:
+        """中文说明：返回最新快照；文件变化时重新加载"""
+        try:
+            self._checked_at = time.monotonic()
+            mtime_ns, size = self._stat()
+        except FileNotFoundError:
+            if self._snapshot is None:
+                raise
+            # 文件被临时移走（例如构建脚本替换中），继续使用旧快照
+            self.hits += 1
+            return self._snapshot
+
+        snap = self._snapshot
+        if snap is not None and snap.mtime_ns == mtime_ns and snap.size == size:
+            self.hits += 1
+            return snap
+
+        with self._lock:
+            # 双重检查：其他线程可能已完成加载
+            snap = self._snapshot
+            if snap is not None and snap.mtime_ns == mtime_ns and snap.size == size:
+                self.hits += 1
+                return snap
+            self.misses += 1
+            try:
+                snap = self._load(mtime_ns, size)
+            except (OSError, ValueError):
+                self.errors += 1
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            if self._snapshot is not None:
+                self.reloads += 1
+            self._snapshot = snap
+            return snap
+
+    def _load(self, mtime_ns: int, size: int) -> LessonsSnapshot:
+        raw = self.path.read_bytes()
+        data = decode_json(raw)
+        return build_snapshot(data, mtime_ns, size, self._snapshot, self._record(data))
+
+    def _record(self, data: dict) -> RevisionLog:
+        """中文说明：把当前课程记入修订日志，返回供快照持有的副本"""
+        with self._revisions_locked():
+            # 其他进程可能已经记录了更新的修订；文件比内存中的旧（或不可读）时沿用内存中的日志
+            stored = RevisionLog.load(self.revisions_path)
+            if not stored.revision and self.revisions_path != self.published_revisions_path:
+                stored = RevisionLog.load(self.published_revisions_path)
+            if stored.revision >= self._revisions.revision:
+                self._revisions = stored
+            if self._revisions.record(data.get("lessons", [])):
+                try:
+                    self._revisions.save(self.revisions_path)
+                except OSError:
+                    self.errors += 1
+        return self._revisions.copy()
+
+    @contextmanager
+    def _revisions_locked(self):
+        """中文说明：跨进程文件锁（锁文件与日志同目录）；目录不可写时不加锁"""
+        if fcntl is None:
+            yield
+            return
+        try:
+            lock_file = open(self.revisions_path.with_name(self.revisions_path.name + ".lock"), "a")
+        except OSError:
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        """中文说明：缓存计数器"""
+        snap = self._snapshot
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "loaded": snap is not None,
+            "bytes": len(snap.body.raw) if snap else 0,
+            "etag": snap.body.etag if snap else None,
+            "revision": snap.revision if snap else None,
+            "search": snap.search.stats() if snap else None,
+        }
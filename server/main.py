@@ -4,24 +4,101 @@
 - 提供课程数据 API（/lessons）
 - 提供用户进度读写 API（/progress）
 - 允许前端跨域访问（本地开发）
+- 所有接口均为异步处理；文件与数据库访问放到有界 I/O 线程池（server/aio.py），响应使用 orjson 序列化
 
 输入/输出：
-- GET /lessons -> 返回 lessons.json 中的课程数据
+- GET /lessons -> 返回 lessons.json 中的课程数据（内存缓存，文件变化时自动热加载；
+  支持 ETag/If-None-Match 304 与 gzip/brotli 预压缩）
+- GET /lessons/packed -> 同一份课程数据的紧凑二进制版本（server/lessons_pack.py 格式，比 JSON 小约 20%，
+  客户端可按偏移表只解码需要的课程）
+- GET /lessons/index -> 课程目录（id/title/category/isLocked 等元数据与正文字节数）
+- GET /lessons/{id} -> 单课完整内容（按需加载）
+- GET /lessons/changes?since=<revision> -> 增量同步：since 修订之后新增/修改的课程正文、删除的课程 id，
+  顺序变化时附带完整顺序；修订号来自 /lessons/index 或上一次增量响应，超出日志保留范围时返回 full=true
+- GET /stats/cache -> 课程缓存命中/未命中/重载计数
+- GET /metrics -> Prometheus 文本格式指标：按路由/状态码的延迟直方图、响应字节数、I/O、计算与 JSON 耗时、
+  课程缓存命中率、写后队列深度；开发时设置 PS_PROFILE=1，请求带 ?profile=1 会写出 folded 调用栈文件
+- GET /search?q=ta.crossover&limit=10 -> 全文检索（倒排索引 + BM25，锁定课程只按标题检索）
 - GET /progress?user=default -> 返回指定用户进度
-- POST /progress { user, progress } -> 保存指定用户进度
+- GET /progress 同时返回 version（每次保存递增，用于乐观并发）
+- POST /progress { user, progress } -> 保存指定用户进度（写后队列，按时间窗口合并批量落库）
+- PATCH /progress { user, changes: [{lessonId, field, val}], baseVersion? } -> 只提交变化的字段，
+  服务端合并后返回新版本号；baseVersion 与当前版本不一致时返回 409
+- POST/PATCH /progress 经过准入控制（server/admission.py）：按用户与客户端 IP 的令牌桶限流，超出时返回 429 与 Retry-After；
+  同时进行的存储写入（写后队列的读改写与批量落库）超过上限时在有界队列中等待，队列已满或等待超时返回 503 与 Retry-After
+- GET /stats/writes -> 写后队列深度、合并次数与刷盘耗时
+- GET /stats/admission -> 限流桶数、放行/限流/淘汰计数、在途与排队写入数、丢弃次数
+- GET /stats/lessons -> 每节课 started/readDone/codeDone/quizDone/completed 人数（增量计数器，O(课程数)）
+- GET /stats/funnel -> 全部课程与各分类的阶段漏斗与完成率
+- POST /review/answer { user, lessonId, questionIdx, correct, quality? } -> 按 SM-2 更新该题的复习计划
+- GET /review/due?user=default&limit=20 -> 已到期的复习题（最早到期的在前）
+- POST /quiz/grade { user?, answers: [{lessonId, questionIdx, choice}] } -> 批量判分；
+  对外的课程数据不含 isCorrect，答案索引在课程加载时构建；带 user 时同时记入复习计划
+- POST /run { code, dataset?: {bars, seed, drift, volatility}, params?, tail? } -> 在合成 K 线上运行 Pine 脚本
+  （server/pine_runtime.py，NumPy 向量化），返回 plot/plotshape/hline 序列与 input 参数；
+  strategy 脚本同时返回回测结果（server/backtest.py：绩效统计、资金曲线、持仓与最近的交易）；
+  结果按 (代码哈希, 数据集, 参数) 缓存；语法或运行错误返回 400 与行号
+- GET /stats/run -> 脚本运行缓存的命中/未命中计数
 
 边界与安全：
-- 简易文件存储，生产环境建议使用数据库与鉴权
+- 进度默认存入 SQLite（server/data/progress.db，可用 PS_DATA_DIR 指定目录），旧版 progress.json 首次启动时自动导入
+- 多进程部署（python -m server.serve 或 gunicorn -c server/gunicorn_conf.py）时设置 PS_WORKERS>1：
+  关闭进程内写后合并，进度读改写在存储事务（SQLite）或文件锁（JSON）内完成，多个进程不会丢失写入；
+  课程数据每个进程各自加载一次，按文件 mtime 独立热加载
+- 脚本在计算线程池（PS_CPU_WORKERS）中运行，K 线数与代码长度有上限；只能调用白名单内的内置函数
+- 尚未实现鉴权，生产环境请在网关层补充；用户名由客户端提供，因此同时按 IP 限流。
+  位于反向代理之后时设置 PS_TRUST_PROXY=1，按 X-Forwarded-For 的第一个地址识别客户端
 - 不保存敏感信息，不记录密钥
 """
 
-from fastapi import FastAPI, HTTPException
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
 from pathlib import Path
-import json
+from typing import Any, List, Optional
+
+from .admission import AdmissionControl, Overloaded, RateLimited, RateLimiter, WriteGate, retry_after_header
+from .aio import IO_WORKERS, run_cpu, run_io
+from .http_cache import encoded_response
+from .lessons_store import LessonsStore
+from .metrics import JSON_SECONDS, REGISTRY, MetricsMiddleware, timed
+from .pine_parser import PineSyntaxError
+from .pine_runtime import PineRuntimeError, RunCache
+from .progress_store import META_ROW, RESERVED_USERS, open_progress_store
+from .review import ReviewEngine, ReviewStore, quality_from_correct
+from .stats import funnel_report, lessons_report
+from .write_behind import VersionConflict, WriteBehindQueue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """中文说明：启动写后队列；关闭时写入剩余进度并刷盘"""
+    await write_queue.start()
+    try:
+        yield
+    finally:
+        await write_queue.stop()
+
 
-app = FastAPI(title="Pine Script 学习系统 API", version="0.1.0")
+class TimedJSONResponse(ORJSONResponse):
+    """中文说明：orjson 响应，序列化耗时记入 ps_json_seconds"""
+
+    def render(self, content: Any) -> bytes:
+        with timed(JSON_SECONDS, op="dump"):
+            return super().render(content)
+
+
+# 默认使用 orjson 序列化响应，比通用 JSON 编码器快数倍
+app = FastAPI(
+    title="Pine Script 学习系统 API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse,
+)
 
 # 允许本地与移动端访问（开发阶段）
 app.add_middleware(
@@ -30,55 +107,414 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 前端按 Retry-After 延后重试被限流的进度同步，跨域时需要显式暴露该响应头
+    expose_headers=["Retry-After"],
 )
+# 最外层中间件：请求耗时包含 CORS 处理
+app.add_middleware(MetricsMiddleware)
 
 ROOT = Path(__file__).resolve().parent.parent
 LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
-DATA_DIR = ROOT / "server" / "data"
+DATA_DIR = Path(os.environ.get("PS_DATA_DIR") or ROOT / "server" / "data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-PROGRESS_FILE = DATA_DIR / "progress.json"
+
+# 工作进程数（由 server/serve.py 或 gunicorn 配置设置）；多进程时各进程的内存状态互不可见
+WORKERS = int(os.environ.get("PS_WORKERS", "1"))
+
+# 进度存储：默认 SQLite（WAL），开发时可设置 PS_PROGRESS_BACKEND=json 使用单文件
+progress_store = open_progress_store(DATA_DIR)
+# 复习引擎：SM-2 状态存于 review.db，内存保留最近活跃用户的卡组
+review_engine = ReviewEngine(
+    ReviewStore(DATA_DIR / "review.db"),
+    # 多进程时不缓存卡组，每次从 review.db 读取，避免使用其他进程已更新过的旧状态
+    max_users=int(os.environ.get("PS_REVIEW_CACHE_USERS", "20000")) if WORKERS <= 1 else 0,
+)
+# 进度写入的准入控制：速率为每秒令牌数（0 表示不限流），突发为桶容量；在途上限作用于实际的存储写入；
+# 同一 IP 后可能有整间教室的用户，IP 的额度比单个用户宽松得多
+admission = AdmissionControl(
+    user=RateLimiter(
+        rate=float(os.environ.get("PS_RATE_USER", "5")),
+        burst=float(os.environ.get("PS_RATE_USER_BURST", "20")),
+        max_keys=int(os.environ.get("PS_RATE_MAX_KEYS", "100000")),
+    ),
+    ip=RateLimiter(
+        rate=float(os.environ.get("PS_RATE_IP", "50")),
+        burst=float(os.environ.get("PS_RATE_IP_BURST", "200")),
+        max_keys=int(os.environ.get("PS_RATE_MAX_KEYS", "100000")),
+    ),
+    gate=WriteGate(
+        # 默认与 I/O 线程数相同：超出的写入在门前排队（可超时、可丢弃），而不是堆积在线程池里
+        max_inflight=int(os.environ.get("PS_WRITE_INFLIGHT", str(IO_WORKERS))),
+        max_queue=int(os.environ.get("PS_WRITE_QUEUE", "256")),
+        queue_timeout=float(os.environ.get("PS_WRITE_QUEUE_TIMEOUT", "2.0")),
+    ),
+)
+TRUST_PROXY = os.environ.get("PS_TRUST_PROXY", "0") == "1"
+# 写后队列：PS_WRITE_BEHIND_WINDOW 秒内同一用户的多次保存合并为一次写入（0 表示同步写入）；
+# 多进程时强制同步写入，由存储层保证跨进程的读改写原子性
+write_queue = WriteBehindQueue(
+    progress_store,
+    window=float(os.environ.get("PS_WRITE_BEHIND_WINDOW", "0.5")) if WORKERS <= 1 else 0.0,
+    max_batch=int(os.environ.get("PS_WRITE_BEHIND_BATCH", "500")),
+    gate=admission.gate,
+)
+
+# 课程数据只解析一次，之后直接返回预编码的字节
+# 修订日志写在服务端数据目录，不修改静态目录中由构建脚本发布的 lessons.revisions.json
+lessons_store = LessonsStore(LESSONS_FILE, revisions_path=DATA_DIR / "lessons.revisions.json")
+# 脚本运行结果缓存：同一段代码在同一数据集与参数下只计算一次
+run_cache = RunCache(max_entries=int(os.environ.get("PS_RUN_CACHE", "64")))
+
+
+def _check_user(user: str) -> str:
+    """中文说明：保留的用户名（存储内部使用）不能用于保存进度"""
+    if user in RESERVED_USERS:
+        raise ValueError(f"保留的用户名: {user}")
+    return user
 
 
 class ProgressPayload(BaseModel):
     user: str
     progress: dict
 
+    _user = field_validator("user")(_check_user)
 
-@app.get("/lessons")
-def get_lessons():
-    """中文说明：返回课程数据 JSON"""
-    if not LESSONS_FILE.exists():
+    @field_validator("progress")
+    @classmethod
+    def _lesson_ids(cls, progress: dict) -> dict:
+        # 空串是 SQLite 后端存放顶层字段的行，课程 id 不能与之冲突
+        lessons = progress.get("lessons")
+        if isinstance(lessons, dict) and META_ROW in lessons:
+            raise ValueError("课程 id 不能为空")
+        return progress
+
+
+class ProgressChange(BaseModel):
+    """中文说明：单个课程字段的变化，与前端 markLessonProgress(lessonId, field, val) 对应"""
+
+    lessonId: str = Field(..., min_length=1)
+    field: str
+    val: Any = None
+
+
+class ProgressPatch(BaseModel):
+    user: str
+    changes: List[ProgressChange] = Field(..., min_length=1, max_length=100)
+    baseVersion: Optional[int] = None
+
+    _user = field_validator("user")(_check_user)
+
+
+class ReviewAnswer(BaseModel):
+    user: str
+    lessonId: str
+    questionIdx: int = Field(..., ge=0)
+    correct: bool
+    # 可选的 SM-2 评分（0..5）；未提供时按对错换算
+    quality: Optional[int] = Field(None, ge=0, le=5)
+
+
+class QuizAnswer(BaseModel):
+    lessonId: str
+    questionIdx: int = Field(..., ge=0)
+    # 单选题用 choice；多选题用 choices
+    choice: Optional[int] = Field(None, ge=0, le=62)
+    choices: Optional[List[int]] = None
+
+
+class QuizGradeRequest(BaseModel):
+    user: Optional[str] = None
+    answers: List[QuizAnswer] = Field(..., min_length=1, max_length=500)
+
+
+class RunDataset(BaseModel):
+    """中文说明：合成 K 线参数（相同参数生成相同数据）"""
+
+    bars: int = Field(5000, ge=1, le=200_000)
+    seed: int = Field(0, ge=0, le=2**32 - 1)
+    drift: float = Field(0.0, ge=-0.01, le=0.01)
+    volatility: float = Field(0.01, gt=0, le=0.1)
+
+
+class RunRequest(BaseModel):
+    code: str = Field(..., min_length=1, max_length=20_000)
+    dataset: RunDataset = Field(default_factory=RunDataset)
+    # input.* 覆盖值，键为 input 标题或变量名
+    params: dict = Field(default_factory=dict)
+    # 只返回最后 tail 根 K 线（缓存仍保存完整结果）
+    tail: Optional[int] = Field(None, ge=1)
+
+
+def _mask_bits(mask: int) -> List[int]:
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+def apply_changes(progress: dict, changes: List[ProgressChange]) -> dict:
+    """中文说明：把字段变化合并进用户进度（新课程按前端默认结构初始化）"""
+    lessons = progress.get("lessons")
+    if not isinstance(lessons, dict):
+        lessons = progress["lessons"] = {}
+    for ch in changes:
+        entry = lessons.get(ch.lessonId)
+        if not isinstance(entry, dict):
+            entry = lessons[ch.lessonId] = {"readDone": False, "codeDone": False, "quizDone": False}
+        entry[ch.field] = ch.val
+    return progress
+
+
+def _client_ip(request: Request) -> Optional[str]:
+    if TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def _admit_write(request: Request, user: str) -> None:
+    """中文说明：进度写入的限流检查：按用户、再按 IP，超出时返回 429（带 Retry-After）"""
+    try:
+        admission.check(user, _client_ip(request))
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "请求过于频繁", "scope": e.scope, "retryAfter": round(e.retry_after, 3)},
+            headers={"Retry-After": retry_after_header(e.retry_after)},
+        )
+
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    """中文说明：存储写入名额已满且无法排队（或排队超时）时返回 503（带 Retry-After）"""
+    return HTTPException(
+        status_code=503,
+        detail={"message": "服务繁忙，请稍后重试", "retryAfter": e.retry_after},
+        headers={"Retry-After": retry_after_header(e.retry_after)},
+    )
+
+
+async def _lessons_snapshot():
+    """中文说明：取当前课程快照，文件缺失时返回 404"""
+    try:
+        return await lessons_store.aget()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="课程数据不存在")
-    with LESSONS_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+
+
+@app.get("/lessons")
+async def get_lessons(request: Request):
+    """中文说明：返回课程数据 JSON（条件请求返回 304）"""
+    return encoded_response(request, (await _lessons_snapshot()).body)
+
+
+@app.get("/lessons/packed")
+async def get_lessons_packed(request: Request):
+    """中文说明：返回课程数据的紧凑二进制版本（条件请求返回 304）"""
+    return encoded_response(request, (await _lessons_snapshot()).packed, media_type="application/octet-stream")
+
+
+@app.get("/lessons/index")
+async def get_lessons_index(request: Request):
+    """中文说明：返回轻量课程目录，供侧边栏首屏渲染"""
+    return encoded_response(request, (await _lessons_snapshot()).index)
+
+
+@app.get("/lessons/changes")
+async def get_lessons_changes(request: Request, since: int = 0):
+    """中文说明：返回 since 修订之后的课程增量（条件请求返回 304）"""
+    snapshot = await _lessons_snapshot()
+    # 未命中缓存时要压缩增量正文，放到计算线程池，不阻塞事件循环
+    body = snapshot.cached_changes(since) or await run_cpu(snapshot.changes, since)
+    return encoded_response(request, body)
+
+
+@app.get("/lessons/{lesson_id}")
+async def get_lesson(lesson_id: str, request: Request):
+    """中文说明：按 id 返回单课完整内容"""
+    body = (await _lessons_snapshot()).lesson(lesson_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="课程不存在")
+    return encoded_response(request, body)
+
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    """中文说明：课程缓存计数器"""
+    return lessons_store.stats()
+
+
+@REGISTRY.collector
+def _component_metrics():
+    """中文说明：导出时读取各组件的内部计数器"""
+    cache = lessons_store.stats()
+    lookups = cache["hits"] + cache["misses"]
+    writes = write_queue.stats()
+    review = review_engine.stats()
+    adm = admission.stats()
+    return [
+        ("ps_lessons_cache_lookups_total", "counter", "课程缓存查询次数",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        ("ps_lessons_cache_hit_ratio", "gauge", "课程缓存命中率",
+         [({}, round(cache["hits"] / lookups, 6) if lookups else None)]),
+        ("ps_lessons_reloads_total", "counter", "课程文件热加载次数", [({}, cache["reloads"])]),
+        ("ps_lessons_body_bytes", "gauge", "全量课程正文字节数", [({}, cache["bytes"])]),
+        ("ps_write_queue_depth", "gauge", "写后队列中等待落库的用户数", [({}, writes["depth"])]),
+        ("ps_write_queue_coalesced_total", "counter", "被合并的进度写入次数", [({}, writes["coalesced"])]),
+        ("ps_write_queue_errors_total", "counter", "批量落库失败次数", [({}, writes["errors"])]),
+        ("ps_review_users_cached", "gauge", "内存中的复习卡组数", [({}, review["users_cached"])]),
+        ("ps_admission_limited_total", "counter", "被限流（429）的进度写入次数",
+         [({"scope": "user"}, adm["user"]["limited"]), ({"scope": "ip"}, adm["ip"]["limited"])]),
+        ("ps_admission_buckets", "gauge", "内存中的限流桶数",
+         [({"scope": "user"}, adm["user"]["keys"]), ({"scope": "ip"}, adm["ip"]["keys"])]),
+        ("ps_write_inflight", "gauge", "在途进度写入数", [({}, adm["writes"]["inflight"])]),
+        ("ps_write_queued", "gauge", "等待在途名额的进度写入数", [({}, adm["writes"]["queued"])]),
+        ("ps_write_shed_total", "counter", "因在途写入已满被拒绝（503）的次数",
+         [({"reason": "queue_full"}, adm["writes"]["shed"]), ({"reason": "timeout"}, adm["writes"]["timeouts"])]),
+    ]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """中文说明：Prometheus 文本格式指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/search")
+async def search_lessons(q: str = "", limit: int = 10):
+    """中文说明：按标题、讲解与代码检索课程"""
+    limit = max(1, min(limit, 50))
+    snap = await _lessons_snapshot()
+    return {"q": q, "results": snap.search.search(q[:200], limit)}
 
 
 @app.get("/progress")
-def get_progress(user: str = "default"):
+async def get_progress(user: str = "default"):
     """中文说明：读取指定用户的学习进度"""
-    if not PROGRESS_FILE.exists():
-        return {"user": user, "progress": {}}
     try:
-        with PROGRESS_FILE.open("r", encoding="utf-8") as f:
-            all_data = json.load(f)
-        return {"user": user, "progress": all_data.get(user, {})}
+        progress, version = await write_queue.read(user)
+        return {"user": user, "progress": progress, "version": version}
     except Exception:
-        return {"user": user, "progress": {}}
+        return {"user": user, "progress": {}, "version": 0}
 
 
 @app.post("/progress")
-def save_progress(payload: ProgressPayload):
-    """中文说明：保存指定用户的学习进度"""
+async def save_progress(payload: ProgressPayload, request: Request):
+    """中文说明：保存指定用户的学习进度（进入写后队列）"""
+    _admit_write(request, payload.user)
     try:
-        if PROGRESS_FILE.exists():
-            with PROGRESS_FILE.open("r", encoding="utf-8") as f:
-                all_data = json.load(f)
-        else:
-            all_data = {}
-        all_data[payload.user] = payload.progress
-        with PROGRESS_FILE.open("w", encoding="utf-8") as f:
-            json.dump(all_data, f, ensure_ascii=False, indent=2)
-        return {"ok": True}
+        version = await write_queue.submit(payload.user, payload.progress)
+        return {"ok": True, "version": version}
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存失败: {e}")
 
+
+@app.patch("/progress")
+async def patch_progress(payload: ProgressPatch, request: Request):
+    """中文说明：按字段增量更新进度，请求体大小与已完成课程数无关"""
+    _admit_write(request, payload.user)
+    try:
+        version = await write_queue.update(
+            payload.user,
+            lambda current: apply_changes(current, payload.changes),
+            base_version=payload.baseVersion,
+        )
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": "版本冲突", "version": e.current})
+    except Overloaded as e:
+        raise _overloaded(e)
+    return {"ok": True, "version": version}
+
+
+@app.get("/stats/writes")
+async def get_write_stats():
+    """中文说明：写后队列指标"""
+    return write_queue.stats()
+
+
+@app.get("/stats/admission")
+async def get_admission_stats():
+    """中文说明：进度写入准入控制的状态（限流桶、在途与排队写入、丢弃计数）"""
+    return admission.stats()
+
+
+@app.get("/stats/lessons")
+async def get_lesson_stats():
+    """中文说明：每节课各阶段的学习人数（读取计数器，不扫描用户进度）"""
+    snap = await _lessons_snapshot()
+    return lessons_report(snap.data.get("lessons", []), await run_io(progress_store.counts))
+
+
+@app.get("/stats/funnel")
+async def get_funnel_stats():
+    """中文说明：按分类汇总的学习漏斗"""
+    snap = await _lessons_snapshot()
+    return funnel_report(snap.data.get("lessons", []), await run_io(progress_store.counts))
+
+
+@app.post("/review/answer")
+async def review_answer(payload: ReviewAnswer):
+    """中文说明：记录一次答题并按 SM-2 重新安排该题的复习时间"""
+    lesson = (await _lessons_snapshot()).find(payload.lessonId)
+    if lesson is None:
+        raise HTTPException(status_code=404, detail="课程不存在")
+    if payload.questionIdx >= len(lesson.get("quiz") or []):
+        raise HTTPException(status_code=404, detail="题目不存在")
+    quality = payload.quality if payload.quality is not None else quality_from_correct(payload.correct)
+    card = await review_engine.answer(payload.user, payload.lessonId, payload.questionIdx, quality)
+    return {"ok": True, "card": card.to_public()}
+
+
+@app.get("/review/due")
+async def review_due(user: str = "default", limit: int = 20):
+    """中文说明：返回已到期的复习题"""
+    limit = max(1, min(limit, 200))
+    cards, total = await review_engine.due(user, limit)
+    return {"user": user, "total": total, "cards": [c.to_public() for c in cards]}
+
+
+@app.post("/quiz/grade")
+async def quiz_grade(payload: QuizGradeRequest):
+    """中文说明：批量判分（一次请求判完整套题），按位掩码比较选择与正确答案"""
+    snap = await _lessons_snapshot()
+    results = []
+    grades = []
+    score = 0
+    for ans in payload.answers:
+        expected = snap.answer_mask(ans.lessonId, ans.questionIdx)
+        if expected is None:
+            results.append({"lessonId": ans.lessonId, "questionIdx": ans.questionIdx, "correct": False, "error": "题目不存在"})
+            continue
+        selected = 0
+        for i in ([ans.choice] if ans.choice is not None else []) + (ans.choices or []):
+            if 0 <= i < 63:
+                selected |= 1 << i
+        correct = selected == expected
+        score += correct
+        results.append({
+            "lessonId": ans.lessonId,
+            "questionIdx": ans.questionIdx,
+            "correct": correct,
+            "correctChoices": _mask_bits(expected),
+        })
+        grades.append((ans.lessonId, ans.questionIdx, quality_from_correct(correct)))
+    if payload.user and grades:
+        # 整套题的复习计划一次写入（一次 I/O 调用、一个事务），而不是每题一次
+        await review_engine.answer_many(payload.user, grades)
+    return {"score": score, "total": len(payload.answers), "results": results}
+
+
+@app.post("/run")
+async def run_script(payload: RunRequest):
+    """中文说明：在合成 K 线上运行 Pine 脚本，返回绘图序列（NaN 序列化为 null）"""
+    try:
+        result, hit = await run_cpu(run_cache.run, payload.code, payload.dataset.model_dump(), payload.params)
+    except (PineSyntaxError, PineRuntimeError) as e:
+        raise HTTPException(status_code=400, detail={"error": e.message, "line": e.line})
+    # 直接返回 orjson 响应：跳过 jsonable_encoder，NumPy 数组原样序列化
+    return TimedJSONResponse({**result.to_public(payload.tail), "cached": hit})
+
+
+@app.get("/stats/run")
+async def run_stats():
+    """中文说明：返回脚本运行缓存统计"""
+    return run_cache.stats()
@@ -0,0 +1,272 @@
+# 中文说明：请求级指标与采样分析（无外部依赖）
+"""
+功能概述：
+- MetricsMiddleware：纯 ASGI 中间件，按路由模板与状态码记录延迟直方图、请求数与响应字节数
+- 进程内指标注册表：Counter / Histogram，以及在导出时读取的回调（缓存命中率、写后队列深度等）
+- GET /metrics 以 Prometheus 文本格式导出，可直接被 Prometheus 抓取，无需额外服务
+- 开发模式（PS_PROFILE=1）下请求带 ?profile=1 时启动采样分析器，按固定间隔采集调用栈，
+  请求结束后写出 folded 格式文件（flamegraph.pl / speedscope 可直接读取），文件名见响应头 X-Profile-File
+
+输入/输出：
+- REGISTRY.counter(name, help, labels) / REGISTRY.histogram(name, help, labels, buckets)
+- with timed(histogram, **labels): ... -> 记录代码块耗时（秒）
+- REGISTRY.render() -> Prometheus 文本
+
+边界与安全：
+- 路由标签使用模板（/lessons/{lesson_id}），不会因 id 不同产生无限多的时间序列；未匹配路由记为 <unmatched>
+- 采样分析器默认关闭；只在设置 PS_PROFILE=1 时生效，避免线上被外部请求触发
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 默认延迟桶（秒），覆盖 0.1ms .. 5s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """中文说明：单调递增计数器（按标签值分组）"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_fmt(v)}" for key, v in items]
+
+
+class Histogram:
+    """中文说明：累积直方图（_bucket / _sum / _count）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., 超出最大桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[n]) for n in self.labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            total = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                total += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_fmt(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {total}")
+        return lines
+
+
+class Registry:
+    """中文说明：指标注册表；collectors 在导出时调用，返回 [(名称, 类型, 说明, [(标签 dict, 值)])]"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], list]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Callable[[], list]) -> Callable[[], list]:
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception:  # 导出不能因为某个组件未就绪而失败
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "ps_http_request_duration_seconds", "HTTP 请求处理耗时", ("method", "route", "status"))
+RESPONSE_BYTES = REGISTRY.counter(
+    "ps_http_response_bytes_total", "响应正文字节数（压缩后）", ("route",))
+IO_SECONDS = REGISTRY.histogram(
+    "ps_io_seconds", "I/O 线程池中阻塞调用（文件、SQLite）的执行耗时", ("op",))
+CPU_SECONDS = REGISTRY.histogram(
+    "ps_cpu_seconds", "计算线程池中计算密集调用（脚本运行、压缩等）的执行耗时", ("op",))
+JSON_SECONDS = REGISTRY.histogram(
+    "ps_json_seconds", "JSON 解析与序列化耗时", ("op",))
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+class StackSampler:
+    """中文说明：按间隔采集目标线程调用栈的采样分析器，输出 folded 格式"""
+
+    def __init__(self, thread_ids: Optional[Sequence[int]] = None, interval: float = 0.001):
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.interval = interval
+        self.samples: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ps-profiler", daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.samples.items()))
+
+
+def profile_dir() -> Path:
+    return Path(os.environ.get("PS_PROFILE_DIR") or Path(__file__).resolve().parent / "data" / "profiles")
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """中文说明：记录每个请求的耗时、状态码与响应字节数；开发模式下支持 ?profile=1"""
+
+    def __init__(self, app, profile: Optional[bool] = None):
+        self.app = app
+        self.profile = os.environ.get("PS_PROFILE") == "1" if profile is None else profile
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+        sent = {"bytes": 0}
+        sampler = None
+        profile_path = None
+        if self.profile and b"profile=1" in scope.get("query_string", b""):
+            # 事件循环线程 + I/O 线程池的调用栈都采集
+            sampler = StackSampler()
+            profile_path = profile_dir() / f"{int(time.time() * 1000)}-{scope['path'].strip('/').replace('/', '_') or 'root'}.folded"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if profile_path is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-file", str(profile_path).encode()))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                sent["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            if sampler is not None:
+                with sampler:
+                    await self.app(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_label(scope)
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=status["code"])
+            RESPONSE_BYTES.inc(sent["bytes"], route=route)
+            if sampler is not None:
+                profile_path.parent.mkdir(parents=True, exist_ok=True)
+                profile_path.write_text(sampler.folded(), encoding="utf-8")
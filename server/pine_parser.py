@@ -0,0 +1,858 @@
+# 中文说明：Pine Script v5 词法与语法分析
+"""
+功能概述：
+- tokenize(code) -> [Token]：按行切分，去掉 // 注释；行首缩进产生 INDENT/DEDENT（4 个空格或 1 个 Tab 为一级），
+  括号内换行与缩进不是 4 的倍数的续行会并入上一行
+- parse(code) -> Script：递归下降解析为 AST（dataclass 节点），供 server/pine_runtime.py 执行
+- 支持：声明（var/varip、类型前缀、逗号分隔的多个声明、元组解构 [a, b] = ...）、:= 与复合赋值、
+  if / else if / else（语句与表达式）、for ... to ... by、for ... in、while、switch（带或不带判断对象）、
+  单行与多行函数定义（=>）、method、type 自定义类型、import ... as、三元运算、
+  and/or/not、历史引用 x[n]、命名空间调用（ta.sma）、泛型调用（array.new<float>()）、命名参数、数组字面量
+
+输入/输出：
+- parse(code) -> Script(body, version)
+- 语法错误抛出 PineSyntaxError（ValueError 子类，带 line/col，消息为中文）
+
+边界与安全：
+- 只做语法分析，不执行任何代码
+- 解析器覆盖 v5 的语句语法，供内容校验（validate_lessons.py）使用；运行时只执行其中的子集，
+  其余节点（while/switch/type/method/import 等）由 pine_runtime 给出带行号的运行时错误
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+KEYWORDS = {
+    "if", "else", "for", "to", "by", "while", "switch", "var", "varip",
+    "and", "or", "not", "true", "false", "na", "break", "continue",
+}
+# 只在语句开头且后接名称时才是关键字（type = input.string(...) 中的 type 是普通变量名）
+SOFT_KEYWORDS = {"import", "export", "method", "type"}
+# 声明中可出现在变量名前的类型关键字
+TYPE_NAMES = {"int", "float", "bool", "color", "string", "label", "line", "box", "table", "linefill", "polyline"}
+TYPE_QUALIFIERS = {"series", "simple", "const"}
+GENERIC_TYPES = {"array", "matrix", "map"}
+ASSIGN_OPS = {":=", "+=", "-=", "*=", "/=", "%="}
+
+# 一级缩进的空格数
+INDENT_WIDTH = 4
+
+
+class PineSyntaxError(ValueError):
+    """中文说明：Pine 语法错误（带行列号）"""
+
+    def __init__(self, message: str, line: int = 0, col: int = 0):
+        super().__init__(f"第 {line} 行: {message}" if line else message)
+        self.message = message
+        self.line = line
+        self.col = col
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str  # NUMBER / STRING / COLOR / NAME / OP / NEWLINE / INDENT / DEDENT / EOF
+    value: str
+    line: int
+    col: int
+
+
+# -------------------------------
+# 词法分析
+# -------------------------------
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>[ \t]+)
+  | (?P<comment>//.*)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<color>\#[0-9a-fA-F]{6}(?:[0-9a-fA-F]{2})?\b)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>:=|\+=|-=|\*=|/=|%=|=>|==|!=|<=|>=|[-+*/%<>=?:()\[\],.])
+    """,
+    re.VERBOSE,
+)
+_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", "'": "'", '"': '"'}
+
+
+def _unquote(raw: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), raw[1:-1])
+
+
+def _indent_width(prefix: str) -> int:
+    return sum(INDENT_WIDTH if ch == "\t" else 1 for ch in prefix)
+
+
+def tokenize(code: str) -> List[Token]:
+    """中文说明：把源码切成 Token 序列（含 NEWLINE/INDENT/DEDENT）"""
+    tokens: List[Token] = []
+    levels = [0]
+    depth = 0  # 括号嵌套深度；括号内换行不结束语句
+    for lineno, text in enumerate(code.splitlines(), start=1):
+        stripped = text.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        width = _indent_width(text[: len(text) - len(text.lstrip(" \t"))])
+        continuation = depth > 0 or (tokens and width % INDENT_WIDTH != 0 and width > levels[-1])
+        if not continuation:
+            if tokens and tokens[-1].kind != "NEWLINE":
+                tokens.append(Token("NEWLINE", "", lineno - 1, 0))
+            if width % INDENT_WIDTH:
+                raise PineSyntaxError("缩进必须是 4 个空格的整数倍", lineno, 1)
+            if width > levels[-1]:
+                if width - levels[-1] != INDENT_WIDTH:
+                    raise PineSyntaxError("缩进层级一次只能增加一级", lineno, 1)
+                levels.append(width)
+                tokens.append(Token("INDENT", "", lineno, 1))
+            while width < levels[-1]:
+                levels.pop()
+                tokens.append(Token("DEDENT", "", lineno, 1))
+            if width != levels[-1]:
+                raise PineSyntaxError("缩进与外层代码块不一致", lineno, 1)
+        pos = 0
+        while pos < len(text):
+            m = _TOKEN_RE.match(text, pos)
+            if m is None:
+                raise PineSyntaxError(f"无法识别的字符 {text[pos]!r}", lineno, pos + 1)
+            kind = m.lastgroup
+            value = m.group(kind)
+            col = pos + 1
+            pos = m.end()
+            if kind in ("ws", "comment"):
+                continue
+            if kind == "string":
+                tokens.append(Token("STRING", _unquote(value), lineno, col))
+            elif kind == "op":
+                if value in "([":
+                    depth += 1
+                elif value in ")]":
+                    depth = max(0, depth - 1)
+                tokens.append(Token("OP", value, lineno, col))
+            else:
+                tokens.append(Token(kind.upper(), value, lineno, col))
+    last = tokens[-1].line if tokens else 1
+    if tokens and tokens[-1].kind != "NEWLINE":
+        tokens.append(Token("NEWLINE", "", last, 0))
+    for _ in levels[1:]:
+        tokens.append(Token("DEDENT", "", last, 0))
+    tokens.append(Token("EOF", "", last, 0))
+    return tokens
+
+
+# -------------------------------
+# AST 节点
+# -------------------------------
+@dataclass
+class Node:
+    line: int = field(default=0, kw_only=True)
+
+
+@dataclass
+class Num(Node):
+    value: float
+
+
+@dataclass
+class Str(Node):
+    value: str
+
+
+@dataclass
+class Bool(Node):
+    value: bool
+
+
+@dataclass
+class Na(Node):
+    pass
+
+
+@dataclass
+class Color(Node):
+    value: str
+
+
+@dataclass
+class Name(Node):
+    id: str  # 命名空间成员使用点号连接，如 "ta.tr"、"color.red"
+
+
+@dataclass
+class ArrayLit(Node):
+    items: List[Node]
+
+
+@dataclass
+class Unary(Node):
+    op: str
+    operand: Node
+
+
+@dataclass
+class Binary(Node):
+    op: str
+    left: Node
+    right: Node
+
+
+@dataclass
+class Ternary(Node):
+    cond: Node
+    then: Node
+    orelse: Node
+
+
+@dataclass
+class Call(Node):
+    func: str
+    args: List[Node]
+    kwargs: List[Tuple[str, Node]]
+    generic: Tuple[str, ...] = ()
+
+
+@dataclass
+class Index(Node):
+    """中文说明：历史引用 target[offset]"""
+
+    target: Node
+    offset: Node
+
+
+@dataclass
+class If(Node):
+    """中文说明：if / else if / else；既可作为语句，也可作为表达式（值为所执行分支最后一个表达式）"""
+
+    branches: List[Tuple[Node, List[Node]]]
+    orelse: Optional[List[Node]] = None
+
+
+@dataclass
+class For(Node):
+    var: str
+    start: Node
+    end: Node
+    step: Optional[Node]
+    body: List[Node]
+
+
+@dataclass
+class ForIn(Node):
+    """中文说明：for x in arr / for [i, x] in arr"""
+
+    targets: List[str]
+    iterable: Node
+    body: List[Node]
+
+
+@dataclass
+class While(Node):
+    cond: Node
+    body: List[Node]
+
+
+@dataclass
+class Switch(Node):
+    """中文说明：subject 为 None 时每个分支的条件是布尔表达式；default 为 => 之后的默认分支"""
+
+    subject: Optional[Node]
+    cases: List[Tuple[Node, List[Node]]]
+    default: Optional[List[Node]] = None
+
+
+@dataclass
+class FuncDef(Node):
+    name: str
+    params: List[Tuple[str, Optional[Node]]]
+    body: List[Node]
+    export: bool = False
+    method: bool = False
+
+
+@dataclass
+class TypeDef(Node):
+    """中文说明：type 自定义类型；fields 为 (类型, 字段名, 默认值)"""
+
+    name: str
+    fields: List[Tuple[str, str, Optional[Node]]]
+    export: bool = False
+
+
+@dataclass
+class Import(Node):
+    """中文说明：import 作者/库名/版本 [as 别名]"""
+
+    path: str
+    alias: Optional[str] = None
+
+
+@dataclass
+class Assign(Node):
+    """中文说明：declare=True 为声明（=），否则为重新赋值（:= 或复合赋值）；多个 targets 表示元组解构"""
+
+    targets: List[str]
+    value: Node
+    declare: bool = True
+    op: str = "="
+    mode: Optional[str] = None  # "var" / "varip"
+    type: Optional[str] = None
+
+
+@dataclass
+class ExprStmt(Node):
+    expr: Node
+
+
+@dataclass
+class Break(Node):
+    pass
+
+
+@dataclass
+class Continue(Node):
+    pass
+
+
+@dataclass
+class Script(Node):
+    body: List[Node]
+    version: Optional[int] = None
+
+
+# -------------------------------
+# 语法分析
+# -------------------------------
+_BINARY_LEVELS = [
+    ("or",),
+    ("and",),
+    ("==", "!="),
+    ("<", ">", "<=", ">="),
+    ("+", "-"),
+    ("*", "/", "%"),
+]
+
+
+class Parser:
+    """中文说明：递归下降语法分析器"""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    # ---- 工具方法 ----
+    @property
+    def tok(self) -> Token:
+        return self.tokens[self.pos]
+
+    def peek(self, offset: int = 1) -> Token:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def at(self, value: str, kind: Optional[str] = None) -> bool:
+        tok = self.tok
+        if kind is not None and tok.kind != kind:
+            return False
+        return tok.value == value and tok.kind in ("OP", "NAME")
+
+    def advance(self) -> Token:
+        tok = self.tok
+        self.pos += 1
+        return tok
+
+    def expect(self, value: str) -> Token:
+        if not self.at(value):
+            self.error(f"缺少 {value!r}")
+        return self.advance()
+
+    def expect_kind(self, kind: str, what: str) -> Token:
+        if self.tok.kind != kind:
+            self.error(f"缺少{what}")
+        return self.advance()
+
+    def error(self, message: str):
+        tok = self.tok
+        found = {"NEWLINE": "行尾", "EOF": "文件末尾", "INDENT": "缩进", "DEDENT": "代码块结束"}.get(tok.kind, repr(tok.value))
+        raise PineSyntaxError(f"{message}（遇到 {found}）", tok.line, tok.col)
+
+    def name(self) -> str:
+        tok = self.tok
+        if tok.kind != "NAME" or tok.value in KEYWORDS:
+            self.error("缺少名称")
+        self.pos += 1
+        return tok.value
+
+    # ---- 语句 ----
+    def parse_script(self) -> Script:
+        body = self.statements(until="EOF")
+        return Script(body=body, line=1)
+
+    def statements(self, until: str) -> List[Node]:
+        body: List[Node] = []
+        while self.tok.kind != until:
+            if self.tok.kind == "NEWLINE":
+                self.advance()
+                continue
+            body.extend(self.statement())
+        return body
+
+    def block(self) -> List[Node]:
+        """中文说明：NEWLINE INDENT 语句... DEDENT"""
+        self.expect_kind("NEWLINE", "换行")
+        self.expect_kind("INDENT", "缩进的代码块")
+        body = self.statements(until="DEDENT")
+        self.advance()
+        if not body:
+            self.error("代码块不能为空")
+        return body
+
+    def end_statement(self) -> None:
+        if self.tokens[self.pos - 1].kind == "DEDENT":
+            return  # 以代码块结尾的语句（如 x = if ... else ...）
+        if self.tok.kind == "NEWLINE":
+            self.advance()
+        elif self.tok.kind not in ("DEDENT", "EOF"):
+            self.error("语句后应换行")
+
+    def statement(self) -> List[Node]:
+        tok = self.tok
+        line = tok.line
+        if tok.kind == "NAME":
+            if tok.value == "if":
+                return [self.if_(line)]
+            if tok.value == "for":
+                return [self.for_(line)]
+            if tok.value == "break":
+                self.advance()
+                self.end_statement()
+                return [Break(line=line)]
+            if tok.value == "continue":
+                self.advance()
+                self.end_statement()
+                return [Continue(line=line)]
+            if tok.value == "while":
+                return [self.while_(line)]
+            if tok.value == "switch":
+                node = self.switch(line)
+                self.end_statement()
+                return [node]
+            if tok.value == "import" and self.peek().kind == "NAME":
+                return [self.import_(line)]
+            export = tok.value == "export" and self.peek().kind == "NAME"
+            if export:
+                self.advance()
+            if self.at("type", "NAME") and self.peek().kind == "NAME":
+                return [self.type_def(line, export)]
+            if self.at("method", "NAME") and self.peek().kind == "NAME":
+                self.advance()
+                if not self.is_func_def():
+                    self.error("method 之后应为函数定义")
+                return [self.func_def(line, export, method=True)]
+            if self.is_func_def():
+                return [self.func_def(line, export)]
+            if export:
+                self.error("export 之后应为函数、method 或 type 定义")
+        if tok.kind == "OP" and tok.value == "[" and self.is_tuple_decl():
+            return [self.tuple_decl(line)]
+        decls = self.declarations(line)
+        if decls is not None:
+            return decls
+        expr = self.expression()
+        if self.tok.kind == "OP" and self.tok.value in ASSIGN_OPS:
+            if not isinstance(expr, Name) or "." in expr.id:
+                self.error("只能对变量重新赋值")
+            op = self.advance().value
+            value = self.rhs()
+            self.end_statement()
+            return [Assign(targets=[expr.id], value=value, declare=False, op=op, line=line)]
+        self.end_statement()
+        return [ExprStmt(expr=expr, line=line)]
+
+    def is_func_def(self) -> bool:
+        """中文说明：NAME ( ... ) => 视为函数定义"""
+        if self.tok.kind != "NAME" or self.tok.value in KEYWORDS or not self.peek().value == "(":
+            return False
+        depth = 0
+        i = self.pos + 1
+        while i < len(self.tokens):
+            tok = self.tokens[i]
+            if tok.kind == "OP" and tok.value == "(":
+                depth += 1
+            elif tok.kind == "OP" and tok.value == ")":
+                depth -= 1
+                if depth == 0:
+                    nxt = self.tokens[i + 1]
+                    return nxt.kind == "OP" and nxt.value == "=>"
+            elif tok.kind in ("NEWLINE", "EOF"):
+                return False
+            i += 1
+        return False
+
+    def func_def(self, line: int, export: bool, method: bool = False) -> FuncDef:
+        name = self.name()
+        self.expect("(")
+        params: List[Tuple[str, Optional[Node]]] = []
+        while not self.at(")"):
+            # 参数可带类型前缀：float principal / series float src / array<float> a
+            names = [self.name()]
+            while self.tok.kind == "NAME" and self.tok.value not in KEYWORDS:
+                names.append(self.name())
+            if self.at("<"):
+                self.generic_args()
+                names.append(self.name())
+            default = None
+            if self.at("="):
+                self.advance()
+                default = self.expression()
+            params.append((names[-1], default))
+            if not self.at(")"):
+                self.expect(",")
+        self.expect(")")
+        self.expect("=>")
+        if self.tok.kind == "NEWLINE":
+            body = self.block()
+        else:
+            body = [ExprStmt(expr=self.expression(), line=self.tok.line)]
+            self.end_statement()
+        return FuncDef(name=name, params=params, body=body, export=export, method=method, line=line)
+
+    def type_def(self, line: int, export: bool) -> TypeDef:
+        """中文说明：type 名称 + 缩进的字段列表（类型 字段名 [= 默认值]）"""
+        self.expect("type")
+        name = self.name()
+        self.expect_kind("NEWLINE", "换行")
+        self.expect_kind("INDENT", "缩进的字段列表")
+        fields: List[Tuple[str, str, Optional[Node]]] = []
+        while self.tok.kind != "DEDENT":
+            if self.tok.kind == "NEWLINE":
+                self.advance()
+                continue
+            type_name = self.name()
+            if self.at("<"):
+                type_name = f"{type_name}<{','.join(self.generic_args())}>"
+            field_name = self.name()
+            default = None
+            if self.at("="):
+                self.advance()
+                default = self.expression()
+            fields.append((type_name, field_name, default))
+            self.end_statement()
+        self.advance()
+        if not fields:
+            self.error("type 至少需要一个字段")
+        return TypeDef(name=name, fields=fields, export=export, line=line)
+
+    def import_(self, line: int) -> Import:
+        """中文说明：import 作者/库名/版本 [as 别名]"""
+        self.expect("import")
+        parts = [self.name()]
+        while self.at("/"):
+            self.advance()
+            if self.tok.kind not in ("NAME", "NUMBER"):
+                self.error("import 路径格式应为 作者/库名/版本")
+            parts.append(self.advance().value)
+        if len(parts) != 3 or self.tokens[self.pos - 1].kind != "NUMBER":
+            self.error("import 路径格式应为 作者/库名/版本")
+        alias = None
+        if self.at("as", "NAME"):
+            self.advance()
+            alias = self.name()
+        self.end_statement()
+        return Import(path="/".join(parts), alias=alias, line=line)
+
+    def is_tuple_decl(self) -> bool:
+        """中文说明：[a, b] = ... 视为元组解构；否则为数组字面量表达式"""
+        i = self.pos + 1
+        while i < len(self.tokens):
+            tok = self.tokens[i]
+            if tok.kind == "OP" and tok.value == "]":
+                nxt = self.tokens[i + 1]
+                return nxt.kind == "OP" and nxt.value in ("=", ":=")
+            if not (tok.kind == "NAME" or (tok.kind == "OP" and tok.value == ",")):
+                return False
+            i += 1
+        return False
+
+    def tuple_decl(self, line: int) -> Assign:
+        self.expect("[")
+        targets = [self.name()]
+        while self.at(","):
+            self.advance()
+            targets.append(self.name())
+        self.expect("]")
+        op = self.advance().value
+        value = self.rhs()
+        self.end_statement()
+        return Assign(targets=targets, value=value, declare=op == "=", op=op, line=line)
+
+    def declarations(self, line: int) -> Optional[List[Node]]:
+        """中文说明：[var|varip] [类型] 名称 = 值 (, 名称 = 值)*；不是声明时返回 None 并回退"""
+        start = self.pos
+        mode = None
+        if self.tok.kind == "NAME" and self.tok.value in ("var", "varip"):
+            mode = self.advance().value
+        type_name = self.type_prefix()
+        if self.tok.kind != "NAME" or self.tok.value in KEYWORDS or not (self.peek().kind == "OP" and self.peek().value == "="):
+            if mode is not None or type_name is not None:
+                self.error("声明缺少变量名或 =")
+            self.pos = start
+            return None
+        decls: List[Node] = []
+        while True:
+            name = self.name()
+            self.expect("=")
+            value = self.rhs()
+            decls.append(Assign(targets=[name], value=value, mode=mode, type=type_name, line=line))
+            if not self.at(","):
+                break
+            self.advance()
+            if self.tok.kind != "NAME" or not (self.peek().kind == "OP" and self.peek().value == "="):
+                self.error("逗号后应为新的声明")
+        self.end_statement()
+        return decls
+
+    def type_prefix(self) -> Optional[str]:
+        """中文说明：解析可选的类型前缀（series float / array<float> / map<string, int>）"""
+        parts = []
+        while self.tok.kind == "NAME" and self.tok.value in TYPE_QUALIFIERS:
+            parts.append(self.advance().value)
+        tok = self.tok
+        nxt = self.peek()
+        if tok.kind == "NAME" and tok.value in TYPE_NAMES and nxt.kind == "NAME":
+            parts.append(self.advance().value)
+        elif tok.kind == "NAME" and tok.value in GENERIC_TYPES and nxt.kind == "OP" and nxt.value == "<":
+            self.advance()
+            parts.append(f"{tok.value}<{','.join(self.generic_args())}>")
+        elif parts:
+            self.error("类型限定词后应为类型")
+        return " ".join(parts) or None
+
+    def generic_args(self) -> Tuple[str, ...]:
+        self.expect("<")
+        args = [self.name()]
+        while self.at(","):
+            self.advance()
+            args.append(self.name())
+        self.expect(">")
+        return tuple(args)
+
+    def rhs(self) -> Node:
+        """中文说明：赋值右侧：表达式，或 if / for / while / switch 表达式（值为代码块最后一个表达式）"""
+        if self.at("if", "NAME"):
+            return self.if_(self.tok.line, expression=True)
+        if self.at("for", "NAME"):
+            return self.for_(self.tok.line)
+        if self.at("while", "NAME"):
+            return self.while_(self.tok.line)
+        if self.at("switch", "NAME"):
+            return self.switch(self.tok.line)
+        return self.expression()
+
+    def if_(self, line: int, expression: bool = False) -> If:
+        self.expect("if")
+        branches = [(self.expression(), self.block())]
+        orelse = None
+        while self.at("else", "NAME"):
+            self.advance()
+            if self.at("if", "NAME"):
+                self.advance()
+                branches.append((self.expression(), self.block()))
+                continue
+            orelse = self.block()
+            break
+        if not expression and self.tok.kind == "NEWLINE":
+            self.advance()
+        return If(branches=branches, orelse=orelse, line=line)
+
+    def for_(self, line: int) -> Node:
+        self.expect("for")
+        if self.at("["):
+            self.advance()
+            targets = [self.name()]
+            self.expect(",")
+            targets.append(self.name())
+            self.expect("]")
+            self.expect("in")
+            return ForIn(targets=targets, iterable=self.expression(), body=self.block(), line=line)
+        var = self.name()
+        if self.at("in", "NAME"):
+            self.advance()
+            return ForIn(targets=[var], iterable=self.expression(), body=self.block(), line=line)
+        self.expect("=")
+        start = self.expression()
+        self.expect("to")
+        end = self.expression()
+        step = None
+        if self.at("by", "NAME"):
+            self.advance()
+            step = self.expression()
+        return For(var=var, start=start, end=end, step=step, body=self.block(), line=line)
+
+    def while_(self, line: int) -> While:
+        self.expect("while")
+        return While(cond=self.expression(), body=self.block(), line=line)
+
+    def switch(self, line: int) -> Switch:
+        """中文说明：switch [表达式] + 缩进的分支（条件 => 语句或代码块；单独的 => 为默认分支）"""
+        self.expect("switch")
+        subject = None if self.tok.kind == "NEWLINE" else self.expression()
+        self.expect_kind("NEWLINE", "换行")
+        self.expect_kind("INDENT", "缩进的分支列表")
+        cases: List[Tuple[Node, List[Node]]] = []
+        default = None
+        while self.tok.kind != "DEDENT":
+            if self.tok.kind == "NEWLINE":
+                self.advance()
+                continue
+            if default is not None:
+                self.error("默认分支 => 必须是最后一个分支")
+            cond = None if self.at("=>") else self.expression()
+            self.expect("=>")
+            body = self.block() if self.tok.kind == "NEWLINE" else self.statement()
+            if cond is None:
+                default = body
+            else:
+                cases.append((cond, body))
+        self.advance()
+        if not cases and default is None:
+            self.error("switch 至少需要一个分支")
+        return Switch(subject=subject, cases=cases, default=default, line=line)
+
+    # ---- 表达式 ----
+    def expression(self) -> Node:
+        cond = self.binary(0)
+        if self.at("?"):
+            line = self.advance().line
+            then = self.expression()
+            self.expect(":")
+            orelse = self.expression()
+            return Ternary(cond=cond, then=then, orelse=orelse, line=line)
+        return cond
+
+    def binary(self, level: int) -> Node:
+        if level == len(_BINARY_LEVELS):
+            return self.unary()
+        left = self.binary(level + 1)
+        ops = _BINARY_LEVELS[level]
+        while self.tok.value in ops and self.tok.kind in ("OP", "NAME"):
+            tok = self.advance()
+            right = self.binary(level + 1)
+            left = Binary(op=tok.value, left=left, right=right, line=tok.line)
+        return left
+
+    def unary(self) -> Node:
+        tok = self.tok
+        if (tok.kind == "OP" and tok.value in ("-", "+")) or (tok.kind == "NAME" and tok.value == "not"):
+            self.advance()
+            return Unary(op=tok.value, operand=self.unary(), line=tok.line)
+        return self.postfix()
+
+    def postfix(self) -> Node:
+        node = self.primary()
+        while True:
+            if self.at("("):
+                if not isinstance(node, Name):
+                    self.error("只能调用函数名")
+                node = self.call(node.id, (), node.line)
+            elif self.at("<") and isinstance(node, Name) and self.is_generic_call():
+                generic = self.generic_args()
+                node = self.call(node.id, generic, node.line)
+            elif self.at("["):
+                line = self.advance().line
+                offset = self.expression()
+                self.expect("]")
+                node = Index(target=node, offset=offset, line=line)
+            elif self.at(".") and isinstance(node, Name):
+                self.advance()
+                node = Name(id=f"{node.id}.{self.name()}", line=node.line)
+            else:
+                return node
+
+    def is_generic_call(self) -> bool:
+        """中文说明：name<type, ...>( 视为泛型调用，否则 < 为比较运算"""
+        i = self.pos + 1
+        expect_name = True
+        while i < len(self.tokens):
+            tok = self.tokens[i]
+            if expect_name:
+                if tok.kind != "NAME":
+                    return False
+            elif tok.kind == "OP" and tok.value == ">":
+                nxt = self.tokens[i + 1]
+                return nxt.kind == "OP" and nxt.value == "("
+            elif not (tok.kind == "OP" and tok.value == ","):
+                return False
+            expect_name = not expect_name
+            i += 1
+        return False
+
+    def call(self, func: str, generic: Tuple[str, ...], line: int) -> Call:
+        self.expect("(")
+        args: List[Node] = []
+        kwargs: List[Tuple[str, Node]] = []
+        while not self.at(")"):
+            if self.tok.kind == "NAME" and self.peek().kind == "OP" and self.peek().value == "=":
+                key = self.name()
+                self.advance()
+                kwargs.append((key, self.expression()))
+            else:
+                if kwargs:
+                    self.error("位置参数不能出现在命名参数之后")
+                args.append(self.expression())
+            if not self.at(")"):
+                self.expect(",")
+        self.expect(")")
+        return Call(func=func, args=args, kwargs=kwargs, generic=generic, line=line)
+
+    def primary(self) -> Node:
+        tok = self.tok
+        line = tok.line
+        if tok.kind == "NUMBER":
+            self.advance()
+            text = tok.value
+            return Num(value=float(text) if any(c in text for c in ".eE") else int(text), line=line)
+        if tok.kind == "STRING":
+            self.advance()
+            return Str(value=tok.value, line=line)
+        if tok.kind == "COLOR":
+            self.advance()
+            return Color(value=tok.value.upper(), line=line)
+        if tok.kind == "NAME":
+            if tok.value in ("true", "false"):
+                self.advance()
+                return Bool(value=tok.value == "true", line=line)
+            if tok.value == "na":
+                self.advance()
+                # na 既是常量也是函数 na(x)
+                if self.at("("):
+                    return self.call("na", (), line)
+                return Na(line=line)
+            if tok.value in KEYWORDS:
+                self.error(f"此处不能使用关键字 {tok.value}")
+            self.advance()
+            return Name(id=tok.value, line=line)
+        if tok.kind == "OP" and tok.value == "(":
+            self.advance()
+            node = self.expression()
+            self.expect(")")
+            return node
+        if tok.kind == "OP" and tok.value == "[":
+            self.advance()
+            items = []
+            while not self.at("]"):
+                items.append(self.expression())
+                if not self.at("]"):
+                    self.expect(",")
+            self.expect("]")
+            return ArrayLit(items=items, line=line)
+        self.error("缺少表达式")
+
+
+_VERSION_RE = re.compile(r"^\s*//@version=(\d+)", re.MULTILINE)
+
+
+def parse(code: str) -> Script:
+    """中文说明：解析 Pine 源码；语法错误抛出 PineSyntaxError"""
+    script = Parser(tokenize(code)).parse_script()
+    m = _VERSION_RE.search(code)
+    script.version = int(m.group(1)) if m else None
+    return script
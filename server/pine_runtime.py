@@ -0,0 +1,1405 @@
+# 中文说明：Pine Script 向量化运行时（课程示例在合成 K 线上实时运行）
+"""
+功能概述：
+- 执行 server/pine_parser.py 解析出的脚本：每条语句只执行一次，变量是整条序列（NumPy 数组）或标量，
+  ta.* 等内置函数一次处理全部 K 线（server/pine_ta.py），不逐根循环
+- if / else 的条件是序列时，各分支在掩码下执行，分支内重新赋值的变量按掩码合并（np.where）；
+  var 变量在分支内赋值时保持上一次的值（向前填充），var 变量的累加自引用（x := x + 表达式）转为累积和
+- 支持 input.* 默认值与覆盖（按标题或变量名）、plot / plotshape / plotchar / hline 的结果采集、
+  用户函数（含多行函数）、for 循环（常量边界）、历史引用 x[n]
+- strategy 脚本：strategy.entry / close / close_all / exit 按掩码记录为订单数组，交给 server/backtest.py 回测；
+  脚本读取 strategy.position_size 等回测状态时，以上一次回测的状态重新运行，直到持仓不再变化
+- synthetic_ohlcv：按种子生成可复现的合成 K 线（几何随机游走）
+- RunCache：按 (代码哈希, 数据集, 参数) 缓存运行结果（LRU）
+
+输入/输出：
+- run(code, dataset, params) -> RunResult（plots/shapes/hlines/inputs、strategy 脚本的回测结果与耗时）
+- execute(script, data, params) -> 同上，使用已解析的脚本与给定的 K 线（参数扫描时复用）
+- RunResult.to_public(tail) -> 可直接用 orjson 序列化的 dict（NaN 序列化为 null）
+
+边界与安全：
+- 只能调用白名单内的内置函数；未知函数、未定义变量、不支持的自引用递推给出带行号的 PineRuntimeError
+- for 循环累计次数与函数调用深度有上限，避免恶意代码占满 CPU
+- 绘图对象（label/line/box/table）与日志（log.*）只用于显示，运行时忽略；字符串函数只处理标量
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import backtest as bt
+from . import pine_ta as ta
+from .pine_parser import (
+    ArrayLit, Assign, Binary, Bool, Break, Call, Color, Continue, ExprStmt, For, FuncDef, If, Index, Na,
+    Name, Node, Num, Script, Str, Ternary, Unary, parse,
+)
+
+MAX_LOOP_ITERATIONS = 10_000
+MAX_CALL_DEPTH = 32
+MAX_STRATEGY_PASSES = 8
+# 合成数据起始时间：2024-01-01 00:00 UTC（毫秒）
+START_MS = 1_704_067_200_000
+DAY_MS = 86_400_000
+
+
+class PineRuntimeError(ValueError):
+    """中文说明：脚本运行错误（带行号）"""
+
+    def __init__(self, message: str, line: int = 0):
+        super().__init__(f"第 {line} 行: {message}" if line else message)
+        self.message = message
+        self.line = line
+
+
+# -------------------------------
+# 合成 K 线
+# -------------------------------
+@lru_cache(maxsize=8)
+def synthetic_ohlcv(
+    bars: int, seed: int = 0, drift: float = 0.0, volatility: float = 0.01, interval_ms: int = 60_000
+) -> Dict[str, np.ndarray]:
+    """中文说明：几何随机游走生成的 OHLCV（只读数组；相同参数结果相同）"""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(drift, volatility, bars)))
+    open_ = np.concatenate(([100.0], close[:-1]))
+    wick = np.abs(rng.normal(0.0, volatility / 2, (2, bars)))
+    data = {
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + wick[0]),
+        "low": np.minimum(open_, close) * (1 - wick[1]),
+        "close": close,
+        "volume": np.round(rng.lognormal(10.0, 0.5, bars)),
+        "time": START_MS + np.arange(bars, dtype=np.int64) * interval_ms,
+    }
+    for arr in data.values():
+        arr.setflags(write=False)
+    return data
+
+
+# -------------------------------
+# 值的辅助函数
+# -------------------------------
+_MISSING = object()
+NA = math.nan
+
+# 常量命名空间：成员求值为字符串本身（如 plot.style_histogram），只用于显示参数
+ENUM_NAMESPACES = {
+    "plot", "shape", "location", "size", "display", "hline", "position", "text", "xloc", "yloc",
+    "extend", "format", "font", "order", "scale", "barmerge", "currency", "dayofweek", "alert",
+}
+# 只影响显示的函数与命名空间：不求值参数，返回 na
+DISPLAY_ONLY = {"fill", "bgcolor", "barcolor", "alertcondition", "alert", "plotcandle", "plotbar", "plotarrow"}
+DISPLAY_NAMESPACES = {"log", "label", "line", "box", "table", "linefill", "polyline"}
+
+COLORS = {
+    "aqua": "#00BCD4", "black": "#363A45", "blue": "#2962FF", "fuchsia": "#E040FB", "gray": "#787B86",
+    "green": "#4CAF50", "lime": "#00E676", "maroon": "#880E4F", "navy": "#311B92", "olive": "#808000",
+    "orange": "#FF9800", "purple": "#9C27B0", "red": "#F23645", "silver": "#B2B5BE", "teal": "#089981",
+    "white": "#FFFFFF", "yellow": "#FFEB3B",
+}
+CONSTANTS: Dict[str, Any] = {f"color.{k}": v for k, v in COLORS.items()}
+CONSTANTS.update({
+    "syminfo.tickerid": "SYNTH:DEMO",
+    "syminfo.ticker": "DEMO",
+    "syminfo.mintick": 0.01,
+    "timeframe.period": "1",
+    "strategy.long": "long",
+    "strategy.short": "short",
+    "strategy.fixed": "fixed",
+    "strategy.cash": "cash",
+    "strategy.percent_of_equity": "percent_of_equity",
+    "strategy.commission.percent": "percent",
+    "strategy.commission.cash_per_contract": "cash_per_contract",
+    "strategy.commission.cash_per_order": "cash_per_order",
+    "math.pi": math.pi,
+    "math.e": math.e,
+})
+
+
+def is_series(value) -> bool:
+    return isinstance(value, np.ndarray)
+
+
+def _scalar(value):
+    """中文说明：0 维 NumPy 结果转回 Python 标量"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _truth(value):
+    """中文说明：条件求值：na 视为 false"""
+    if is_series(value):
+        if value.dtype == bool:
+            return value
+        if value.dtype.kind == "f":
+            return (value != 0) & ~np.isnan(value)
+        return value.astype(bool)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return False
+    return bool(value)
+
+
+def _where(mask: np.ndarray, a, b):
+    if isinstance(a, tuple) or isinstance(b, tuple):
+        if not (isinstance(a, tuple) and isinstance(b, tuple) and len(a) == len(b)):
+            raise PineRuntimeError("条件分支返回的元组长度不一致")
+        return tuple(_where(mask, x, y) for x, y in zip(a, b))
+    if a is None:
+        a = NA
+    if b is None:
+        b = NA
+    if isinstance(a, str) or isinstance(b, str):
+        # 字符串序列（如 if 表达式选择文字）用 object 数组保存，只支持 == / != 比较
+        return np.where(mask, np.asarray(a, dtype=object), np.asarray(b, dtype=object))
+    return np.where(mask, a, b)
+
+
+def _hold(mask: np.ndarray, new, before):
+    """中文说明：var 变量：掩码为真时取新值，否则保持最近一次赋值（此前为原值）"""
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    new = np.broadcast_to(np.asarray(new, dtype=np.float64), mask.shape)
+    before = np.broadcast_to(np.asarray(before, dtype=np.float64), mask.shape)
+    return np.where(idx >= 0, new[np.maximum(idx, 0)], before)
+
+
+def _references(node, name: str, history_only: bool = False) -> bool:
+    """中文说明：表达式中是否引用了变量 name（history_only 时只看 name[n]）"""
+    if isinstance(node, Index) and isinstance(node.target, Name) and node.target.id == name:
+        return True
+    if isinstance(node, Name):
+        return node.id == name and not history_only
+    if isinstance(node, list):
+        return any(_references(item, name, history_only) for item in node)
+    if isinstance(node, tuple):
+        return any(_references(item, name, history_only) for item in node)
+    if isinstance(node, Node):
+        return any(_references(v, name, history_only) for v in vars(node).values() if isinstance(v, (Node, list, tuple)))
+    return False
+
+
+# -------------------------------
+# 内置函数注册表
+# -------------------------------
+BUILTINS: Dict[str, Tuple[Callable, Tuple[str, ...], Dict[str, Any]]] = {}
+INPUT_KINDS = {
+    "input": None, "input.int": "int", "input.float": "float", "input.bool": "bool", "input.string": "string",
+    "input.color": "color", "input.source": "source", "input.price": "float", "input.timeframe": "string",
+    "input.symbol": "string", "input.session": "string",
+}
+
+
+def builtin(name: str, params: str = "", **defaults):
+    """中文说明：注册内置函数；params 为 Pine 文档中的参数名（空格分隔），用于绑定命名参数"""
+
+    def deco(fn):
+        for alias in name.split():
+            BUILTINS[alias] = (fn, tuple(params.split()), defaults)
+        return fn
+
+    return deco
+
+
+@dataclass
+class Frame:
+    """中文说明：作用域；reassigned 记录在本作用域内被 := 改写的外层变量"""
+
+    vars: Dict[str, Any] = field(default_factory=dict)
+    reassigned: Set[str] = field(default_factory=set)
+
+
+class _LoopBreak(Exception):
+    pass
+
+
+class _LoopContinue(Exception):
+    pass
+
+
+@dataclass
+class RunResult:
+    """中文说明：一次运行的结果；序列为 NumPy 数组"""
+
+    title: Optional[str]
+    overlay: bool
+    bars: int
+    plots: List[dict]
+    shapes: List[dict]
+    hlines: List[dict]
+    inputs: List[dict]
+    elapsed_ms: float
+    backtest: Optional[bt.Backtest] = None
+
+    def to_public(self, tail: Optional[int] = None) -> dict:
+        """中文说明：返回可序列化的 dict；tail 只保留最后 tail 根 K 线的数据"""
+        start = max(0, self.bars - tail) if tail else 0
+
+        def cut(item: dict, key: str) -> dict:
+            values = item[key]
+            if key == "bars":
+                values = values[values >= start] - start
+            else:
+                values = values[start:]
+            return {**item, key: values}
+
+        return {
+            "title": self.title,
+            "overlay": self.overlay,
+            "bars": self.bars - start,
+            "plots": [cut(p, "values") for p in self.plots],
+            "shapes": [cut(s, "bars") for s in self.shapes],
+            "hlines": self.hlines,
+            "inputs": self.inputs,
+            "strategy": self.backtest.to_public(start) if self.backtest is not None else None,
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+
+def _new_day(series, n):
+    t = series["time"]
+    out = np.empty(n, dtype=bool)
+    out[:1] = True
+    out[1:] = t[1:] // DAY_MS != t[:-1] // DAY_MS
+    return out
+
+
+DERIVED_SERIES: Dict[str, Callable[[Dict[str, Any], int], np.ndarray]] = {
+    "hl2": lambda s, n: (s["high"] + s["low"]) / 2,
+    "hlc3": lambda s, n: (s["high"] + s["low"] + s["close"]) / 3,
+    "ohlc4": lambda s, n: (s["open"] + s["high"] + s["low"] + s["close"]) / 4,
+    "hlcc4": lambda s, n: (s["high"] + s["low"] + 2 * s["close"]) / 4,
+    "bar_index": lambda s, n: np.arange(n, dtype=np.float64),
+    "barstate.isfirst": lambda s, n: np.arange(n) == 0,
+    "barstate.islast": lambda s, n: np.arange(n) == n - 1,
+    "barstate.isnew": lambda s, n: np.ones(n, dtype=bool),
+    "barstate.isconfirmed": lambda s, n: np.ones(n, dtype=bool),
+    "barstate.ishistory": lambda s, n: np.ones(n, dtype=bool),
+    "barstate.isrealtime": lambda s, n: np.zeros(n, dtype=bool),
+    "timeframe.change": _new_day,
+}
+
+
+class Interpreter:
+    """中文说明：对整条序列执行脚本的解释器"""
+
+    def __init__(self, script: Script, data: Dict[str, np.ndarray], params: Optional[dict] = None,
+                 strategy_state: Optional[Dict[str, np.ndarray]] = None):
+        self.script = script
+        self.params = params or {}
+        self.n = n = len(data["close"])
+        self.series: Dict[str, Any] = {
+            "open": data["open"], "high": data["high"], "low": data["low"], "close": data["close"],
+            "volume": data["volume"], "time": data["time"], "last_bar_index": float(n - 1),
+        }
+        self.frames: List[Frame] = [Frame()]
+        self.funcs: Dict[str, FuncDef] = {}
+        self.var_names: Set[str] = set()
+        self.mask: Optional[np.ndarray] = None
+        self.depth = 0
+        self.iterations = 0  # 全部 for 循环累计次数（嵌套循环同样计入上限）
+        self.target: Optional[str] = None  # 当前赋值语句的变量名（input.* 按变量名覆盖参数时使用）
+        self.title: Optional[str] = None
+        self.overlay = False
+        self.plots: List[dict] = []
+        self.shapes: List[dict] = []
+        self.hlines: List[dict] = []
+        self.inputs: List[dict] = []
+        self.strategy: Optional[dict] = None  # strategy() 的参数；None 表示指标脚本
+        self.orders = bt.Orders()
+        self.strategy_state = strategy_state or {}
+        self.uses_state = False
+
+    # ---- 值转换 ----
+    def f(self, value, line: int = 0) -> np.ndarray:
+        """中文说明：转为 float64 序列（标量广播到全部 K 线）"""
+        if is_series(value):
+            if value.dtype == np.float64:
+                return value
+            if value.dtype.kind in "biuf":
+                return value.astype(np.float64)
+            raise PineRuntimeError("需要数值序列", line)
+        if value is None:
+            return np.full(self.n, NA)
+        if isinstance(value, (bool, int, float)):
+            return np.full(self.n, float(value))
+        raise PineRuntimeError(f"需要数值，得到 {type(value).__name__}", line)
+
+    def length(self, value, line: int = 0) -> int:
+        if is_series(value):
+            raise PineRuntimeError("长度参数必须是常量（不能是序列）", line)
+        if value is None or isinstance(value, str) or (isinstance(value, float) and (math.isnan(value) or value != int(value))):
+            raise PineRuntimeError(f"长度参数必须是正整数，得到 {value!r}", line)
+        if int(value) < 1:
+            raise PineRuntimeError(f"长度参数必须是正整数，得到 {value!r}", line)
+        return int(value)
+
+    def number(self, value, line: int = 0) -> float:
+        if is_series(value) or isinstance(value, str) or value is None:
+            raise PineRuntimeError("参数必须是数值常量", line)
+        return float(value)
+
+    def builtin_series(self, name: str):
+        """中文说明：内置序列；派生序列（hl2、barstate.* 等）首次使用时才计算"""
+        value = self.series.get(name)
+        if value is None and name in DERIVED_SERIES:
+            value = self.series[name] = DERIVED_SERIES[name](self.series, self.n)
+        return value
+
+    # ---- 作用域 ----
+    def lookup(self, name: str):
+        for frame in reversed(self.frames):
+            if name in frame.vars:
+                return frame.vars[name]
+        return _MISSING
+
+    def declare(self, name: str, value) -> None:
+        self.frames[-1].vars[name] = value
+
+    def reassign(self, name: str, value, line: int = 0) -> None:
+        if self.lookup(name) is _MISSING:
+            raise PineRuntimeError(f"变量 {name} 未声明，不能使用 :=", line)
+        top = self.frames[-1]
+        if name not in top.vars or name in top.reassigned:
+            top.reassigned.add(name)
+        top.vars[name] = value
+
+    def _write_through(self, name: str, value) -> None:
+        """中文说明：累加型 var 变量已按掩码计算，直接写入所有可见作用域，不参与分支合并"""
+        for frame in self.frames:
+            if name in frame.vars:
+                frame.vars[name] = value
+
+    # ---- 语句 ----
+    def run(self) -> None:
+        self.block(self.script.body)
+
+    def block(self, body: List[Node]):
+        value = NA
+        for stmt in body:
+            value = self.stmt(stmt)
+        return value
+
+    def child_block(self, body: List[Node]) -> Tuple[Frame, Any]:
+        """中文说明：在新作用域中执行代码块，返回 (作用域, 最后一个表达式的值)"""
+        frame = Frame()
+        self.frames.append(frame)
+        try:
+            value = self.block(body)
+        finally:
+            self.frames.pop()
+        return frame, value
+
+    def stmt(self, node: Node):
+        if isinstance(node, Assign):
+            return self.assign(node)
+        if isinstance(node, ExprStmt):
+            return self.eval(node.expr)
+        if isinstance(node, If):
+            return self.if_(node)
+        if isinstance(node, For):
+            return self.for_(node)
+        if isinstance(node, FuncDef):
+            if node.method:
+                raise PineRuntimeError("暂不支持 method 定义", node.line)
+            self.funcs[node.name] = node
+            return NA
+        if isinstance(node, Break):
+            if self.mask is not None:
+                raise PineRuntimeError("序列条件下的 break 无法向量化执行", node.line)
+            raise _LoopBreak()
+        if isinstance(node, Continue):
+            if self.mask is not None:
+                raise PineRuntimeError("序列条件下的 continue 无法向量化执行", node.line)
+            raise _LoopContinue()
+        raise PineRuntimeError(f"不支持的语句 {type(node).__name__}", node.line)
+
+    def assign(self, node: Assign):
+        if node.declare:
+            self.target = node.targets[0] if len(node.targets) == 1 else None
+            try:
+                value = self.eval(node.value)
+            finally:
+                self.target = None
+            if len(node.targets) > 1:
+                if not isinstance(value, tuple) or len(value) != len(node.targets):
+                    raise PineRuntimeError(f"右侧需要返回 {len(node.targets)} 个值的元组", node.line)
+                for name, item in zip(node.targets, value):
+                    self.declare(name, item)
+                return value
+            if isinstance(value, tuple):
+                raise PineRuntimeError("元组结果必须用 [a, b, ...] 解构", node.line)
+            name = node.targets[0]
+            if node.mode is not None:
+                self.var_names.add(name)
+            self.declare(name, value)
+            return value
+
+        if len(node.targets) > 1:
+            value = self.eval(node.value)
+            for name, item in zip(node.targets, value):
+                self.reassign(name, item, node.line)
+            return value
+        name = node.targets[0]
+        rhs = node.value
+        if node.op != ":=":
+            rhs = Binary(op=node.op[0], left=Name(id=name, line=node.line), right=rhs, line=node.line)
+        if _references(rhs, name, history_only=True):
+            raise PineRuntimeError(f"暂不支持引用自身历史值的递推定义（{name}[n]）", node.line)
+        if name in self.var_names and _references(rhs, name):
+            return self.accumulate(name, rhs, node.line)
+        value = self.eval(rhs)
+        self.reassign(name, value, node.line)
+        return value
+
+    def accumulate(self, name: str, rhs: Node, line: int):
+        """中文说明：var x := x + 表达式 -> x0 + cumsum(表达式)（序列条件下只累加条件为真的 K 线）"""
+        if not isinstance(rhs, Binary) or rhs.op not in ("+", "-"):
+            raise PineRuntimeError(f"var 变量 {name} 只支持累加形式的自引用（{name} := {name} + 表达式）", line)
+        left_self = isinstance(rhs.left, Name) and rhs.left.id == name
+        right_self = isinstance(rhs.right, Name) and rhs.right.id == name and rhs.op == "+"
+        other = rhs.right if left_self else rhs.left
+        if not (left_self or right_self) or _references(other, name):
+            raise PineRuntimeError(f"var 变量 {name} 只支持累加形式的自引用（{name} := {name} + 表达式）", line)
+        delta = self.f(self.eval(other), line)
+        if rhs.op == "-":
+            delta = -delta
+        if self.mask is not None:
+            delta = np.where(self.mask, delta, 0.0)
+        value = self.lookup(name) + np.cumsum(delta)
+        self._write_through(name, value)
+        return value
+
+    def if_(self, node: If):
+        for i, (cond_node, body) in enumerate(node.branches):
+            cond = self.eval(cond_node)
+            if is_series(cond):
+                rest = [(cond, body)] + node.branches[i + 1:]
+                return self.masked_if(rest, node.orelse)
+            if _truth(cond):
+                return self.scalar_block(body)
+        if node.orelse is not None:
+            return self.scalar_block(node.orelse)
+        return NA
+
+    def scalar_block(self, body: List[Node]):
+        frame, value = self.child_block(body)
+        for name in frame.reassigned:
+            self.reassign(name, frame.vars[name])
+        return value
+
+    def masked_if(self, branches, orelse):
+        """中文说明：序列条件：每个分支在各自掩码下执行，改写的变量按掩码合并"""
+        remaining = np.ones(self.n, dtype=bool)
+        outcomes = []
+        for cond, body in branches:
+            if isinstance(cond, Node):
+                cond = self.eval(cond)
+            hit = remaining & np.broadcast_to(_truth(cond), remaining.shape)
+            remaining &= ~hit
+            outcomes.append((hit, *self.masked_block(body, hit)))
+        if orelse is not None:
+            outcomes.append((remaining, *self.masked_block(orelse, remaining)))
+        names = set()
+        for _mask, frame, _value in outcomes:
+            if frame is not None:
+                names |= frame.reassigned
+        for name in sorted(names):
+            merged = self.lookup(name)
+            for mask, frame, _value in outcomes:
+                if frame is None or name not in frame.reassigned:
+                    continue
+                if name in self.var_names:
+                    merged = _hold(mask, frame.vars[name], merged)
+                else:
+                    merged = _where(mask, frame.vars[name], merged)
+            self.reassign(name, merged)
+        value = NA
+        for mask, frame, branch_value in reversed(outcomes):
+            if frame is not None:
+                value = _where(mask, branch_value, value)
+        return value
+
+    def masked_block(self, body: List[Node], mask: np.ndarray):
+        if not mask.any():
+            return None, NA
+        saved = self.mask
+        self.mask = mask if saved is None else saved & mask
+        try:
+            return self.child_block(body)
+        finally:
+            self.mask = saved
+
+    def for_(self, node: For):
+        start = self.eval(node.start)
+        end = self.eval(node.end)
+        step = self.eval(node.step) if node.step is not None else (1 if end >= start else -1)
+        for bound in (start, end, step):
+            if is_series(bound):
+                raise PineRuntimeError("for 循环的边界必须是常量（不能是序列）", node.line)
+        if step == 0:
+            raise PineRuntimeError("for 循环步长不能为 0", node.line)
+        count = int(math.floor((end - start) / step)) + 1 if (end - start) * step >= 0 else 0
+        self.iterations += count
+        if self.iterations > MAX_LOOP_ITERATIONS:
+            raise PineRuntimeError(f"for 循环总次数超过上限 {MAX_LOOP_ITERATIONS}", node.line)
+        value = NA
+        for k in range(count):
+            frame = Frame(vars={node.var: _scalar(start + k * step)})
+            self.frames.append(frame)
+            stop = False
+            try:
+                value = self.block(node.body)
+            except _LoopContinue:
+                pass
+            except _LoopBreak:
+                stop = True
+            finally:
+                self.frames.pop()
+            for name in frame.reassigned:
+                self.reassign(name, frame.vars[name], node.line)
+            if stop:
+                break
+        return value
+
+    # ---- 表达式 ----
+    def eval(self, node: Node):
+        method = getattr(self, f"eval_{type(node).__name__}", None)
+        if method is None:
+            raise PineRuntimeError(f"不支持的表达式 {type(node).__name__}", node.line)
+        return method(node)
+
+    def eval_Num(self, node: Num):
+        return node.value
+
+    def eval_Str(self, node: Str):
+        return node.value
+
+    def eval_Bool(self, node: Bool):
+        return node.value
+
+    def eval_Na(self, node: Na):
+        return NA
+
+    def eval_Color(self, node: Color):
+        return node.value
+
+    def eval_If(self, node: If):
+        return self.if_(node)
+
+    def eval_ArrayLit(self, node: ArrayLit):
+        return tuple(self.eval(item) for item in node.items)
+
+    def eval_Name(self, node: Name):
+        ident = node.id
+        if "." not in ident:
+            value = self.lookup(ident)
+            if value is not _MISSING:
+                return value
+        value = self.builtin_series(ident)
+        if value is not None:
+            return value
+        if ident == "ta.tr":
+            return ta.tr(self.series["high"], self.series["low"], self.series["close"], handle_na=False)
+        if ident in STRATEGY_STATE:
+            if self.strategy is None:
+                raise PineRuntimeError(f"{ident} 只能在 strategy 脚本中使用", node.line)
+            self.uses_state = True
+            value = self.strategy_state.get(ident)
+            return STRATEGY_STATE[ident](self) if value is None else value
+        if ident in CONSTANTS:
+            return CONSTANTS[ident]
+        if ident.split(".", 1)[0] in ENUM_NAMESPACES and "." in ident:
+            return ident
+        raise PineRuntimeError(f"未定义的变量: {ident}", node.line)
+
+    def eval_Index(self, node: Index):
+        value = self.eval(node.target)
+        offset = self.eval(node.offset)
+        if is_series(offset):
+            raise PineRuntimeError("历史引用的偏移必须是常量", node.line)
+        if offset is None or offset != int(offset) or offset < 0:
+            raise PineRuntimeError(f"历史引用的偏移必须是非负整数，得到 {offset!r}", node.line)
+        if isinstance(value, tuple):
+            raise PineRuntimeError("不能对元组使用历史引用", node.line)
+        if not is_series(value):
+            return value
+        return ta.shift(value, int(offset))
+
+    def eval_Unary(self, node: Unary):
+        value = self.eval(node.operand)
+        if node.op == "not":
+            result = np.logical_not(_truth(value))
+        elif node.op == "-":
+            result = np.negative(value) if is_series(value) else -value
+        else:
+            result = value
+        return _scalar(result)
+
+    def eval_Binary(self, node: Binary):
+        op = node.op
+        left = self.eval(node.left)
+        right = self.eval(node.right)
+        if op in ("and", "or"):
+            a, b = _truth(left), _truth(right)
+            if is_series(a) or is_series(b):
+                return np.logical_and(a, b) if op == "and" else np.logical_or(a, b)
+            return (a and b) if op == "and" else (a or b)
+        if isinstance(left, str) or isinstance(right, str):
+            return self.string_op(op, left, right, node.line)
+        if isinstance(left, tuple) or isinstance(right, tuple):
+            raise PineRuntimeError("元组不能参与运算", node.line)
+        if left is None or right is None:
+            return NA
+        fn = _BINARY_UFUNCS.get(op)
+        if fn is None:
+            raise PineRuntimeError(f"不支持的运算符 {op}", node.line)
+        with np.errstate(all="ignore"):
+            result = fn(left, right)
+            if op in ("/", "%"):
+                result = np.where(np.isfinite(result), result, NA) if is_series(result) else (
+                    result if math.isfinite(result) else NA)
+        return _scalar(result)
+
+    def string_op(self, op: str, left, right, line: int):
+        if is_series(left) or is_series(right):
+            if op in ("==", "!="):
+                result = np.asarray(left) == np.asarray(right)
+                return result if op == "==" else ~result
+            raise PineRuntimeError("字符串序列只支持 == 与 != 比较", line)
+        if op == "+":
+            if left is None or right is None or (isinstance(left, float) and math.isnan(left)):
+                return None
+            if not (isinstance(left, str) and isinstance(right, str)):
+                raise PineRuntimeError("字符串只能与字符串相加（数值请先用 str.tostring 转换）", line)
+            return left + right
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        raise PineRuntimeError(f"字符串不支持运算符 {op}", line)
+
+    def eval_Ternary(self, node: Ternary):
+        cond = self.eval(node.cond)
+        if not is_series(cond):
+            return self.eval(node.then) if _truth(cond) else self.eval(node.orelse)
+        return _where(_truth(cond), self.eval(node.then), self.eval(node.orelse))
+
+    def eval_Call(self, node: Call):
+        name = node.func
+        if name in self.funcs:
+            return self.call_user(self.funcs[name], node)
+        if name in DISPLAY_ONLY or name.split(".", 1)[0] in DISPLAY_NAMESPACES:
+            return NA
+        if name in INPUT_KINDS:
+            return self.call_input(node, INPUT_KINDS[name])
+        entry = BUILTINS.get(name)
+        if entry is None:
+            raise PineRuntimeError(f"不支持的函数: {name}", node.line)
+        fn, params, defaults = entry
+        bound = self.bind(node, params, defaults, [self.eval(a) for a in node.args],
+                          {k: self.eval(v) for k, v in node.kwargs})
+        try:
+            return fn(self, node, *bound)
+        except PineRuntimeError as e:
+            if not e.line:
+                raise PineRuntimeError(e.message, node.line) from None
+            raise
+
+    def bind(self, node: Call, params: Tuple[str, ...], defaults: Dict[str, Any], args: list, kwargs: dict) -> list:
+        """中文说明：按 Pine 参数名把位置参数与命名参数对齐；可变参数函数（params 以 * 开头）原样返回"""
+        if params and params[0].startswith("*"):
+            return [args]
+        if len(args) > len(params):
+            raise PineRuntimeError(f"{node.func} 参数过多（最多 {len(params)} 个）", node.line)
+        values = dict(zip(params, args))
+        for key, value in kwargs.items():
+            if key in values:
+                raise PineRuntimeError(f"{node.func} 的参数 {key} 重复", node.line)
+            values[key] = value
+        out = []
+        for p in params:
+            if p in values:
+                out.append(values[p])
+            elif p in defaults:
+                out.append(defaults[p])
+            else:
+                raise PineRuntimeError(f"{node.func} 缺少参数 {p}", node.line)
+        return out
+
+    def call_user(self, fn: FuncDef, node: Call):
+        if self.depth >= MAX_CALL_DEPTH:
+            raise PineRuntimeError("函数调用层数过多", node.line)
+        args = [self.eval(a) for a in node.args]
+        kwargs = {k: self.eval(v) for k, v in node.kwargs}
+        names = [p for p, _ in fn.params]
+        if len(args) > len(names):
+            raise PineRuntimeError(f"{fn.name} 参数过多", node.line)
+        frame = Frame(vars=dict(zip(names, args)))
+        for (pname, default) in fn.params:
+            if pname in kwargs:
+                frame.vars[pname] = kwargs[pname]
+            elif pname not in frame.vars:
+                if default is None:
+                    raise PineRuntimeError(f"{fn.name} 缺少参数 {pname}", node.line)
+                frame.vars[pname] = self.eval(default)
+        # 函数体只能看到全局变量与自己的参数
+        saved, saved_vars = self.frames, self.var_names
+        self.frames = [self.frames[0], frame]
+        self.var_names = set(saved_vars)
+        self.depth += 1
+        try:
+            return self.block(fn.body)
+        finally:
+            self.frames, self.var_names = saved, saved_vars
+            self.depth -= 1
+
+    def call_input(self, node: Call, kind: Optional[str]):
+        kwargs = dict(node.kwargs)
+        default_node = node.args[0] if node.args else kwargs.get("defval")
+        if default_node is None:
+            raise PineRuntimeError("input 缺少默认值", node.line)
+        title_node = node.args[1] if len(node.args) > 1 else kwargs.get("title")
+        title = self.eval(title_node) if title_node is not None else None
+        default = self.eval(default_node)
+        if kind is None:
+            kind = ("source" if is_series(default) else "bool" if isinstance(default, bool)
+                    else "int" if isinstance(default, int) else "float" if isinstance(default, float) else "string")
+        default_label = default_node.id if kind == "source" and isinstance(default_node, Name) else default
+        options = self.eval(kwargs["options"]) if "options" in kwargs else None
+        minval = self.eval(kwargs["minval"]) if "minval" in kwargs else None
+        maxval = self.eval(kwargs["maxval"]) if "maxval" in kwargs else None
+
+        override = _MISSING
+        for key in (title, self.target):
+            if key is not None and key in self.params:
+                override = self.params[key]
+                break
+        value, label = default, default_label
+        if override is not _MISSING:
+            value, label = self.coerce_input(override, kind, title or self.target, options, minval, maxval, node.line)
+        self.inputs.append({
+            "name": self.target, "title": title, "type": kind, "default": default_label, "value": label,
+            **({"options": list(options)} if options else {}),
+            **({"minval": minval} if minval is not None else {}),
+            **({"maxval": maxval} if maxval is not None else {}),
+        })
+        return value
+
+    def coerce_input(self, raw, kind, title, options, minval, maxval, line):
+        try:
+            if kind == "source":
+                if raw not in ("open", "high", "low", "close", "volume", "hl2", "hlc3", "ohlc4", "hlcc4"):
+                    raise ValueError
+                return self.builtin_series(raw), raw
+            if kind == "int":
+                if isinstance(raw, bool) or float(raw) != int(float(raw)):
+                    raise ValueError
+                value = int(float(raw))
+            elif kind == "float":
+                if isinstance(raw, bool):
+                    raise ValueError
+                value = float(raw)
+            elif kind == "bool":
+                if not isinstance(raw, bool):
+                    raise ValueError
+                value = raw
+            else:
+                if not isinstance(raw, str):
+                    raise ValueError
+                value = raw
+        except (TypeError, ValueError):
+            raise PineRuntimeError(f"参数 {title} 的值 {raw!r} 不是有效的 {kind}", line) from None
+        if options and value not in options:
+            raise PineRuntimeError(f"参数 {title} 只能取 {list(options)}", line)
+        if minval is not None and value < minval or maxval is not None and value > maxval:
+            raise PineRuntimeError(f"参数 {title} 超出范围 [{minval}, {maxval}]", line)
+        return value, value
+
+    def backtest(self, data: Dict[str, np.ndarray]) -> bt.Backtest:
+        """中文说明：对记录下的 strategy.* 订单回测"""
+        return bt.backtest(self.orders, data, self.strategy, mintick=CONSTANTS["syminfo.mintick"])
+
+
+_BINARY_UFUNCS = {
+    "+": np.add, "-": np.subtract, "*": np.multiply, "/": np.true_divide, "%": np.mod,
+    "==": np.equal, "!=": np.not_equal, "<": np.less, ">": np.greater, "<=": np.less_equal, ">=": np.greater_equal,
+}
+
+
+# -------------------------------
+# 内置函数
+# -------------------------------
+def _hlc(rt: Interpreter):
+    return rt.series["high"], rt.series["low"], rt.series["close"]
+
+
+@builtin("indicator library", "title shorttitle overlay", shorttitle=None, overlay=False)
+def _declare(rt, node, title, shorttitle, overlay):
+    rt.title, rt.overlay = title, bool(overlay)
+    return NA
+
+
+@builtin("plot", "series title color linewidth style", title=None, color=None, linewidth=1, style=None)
+def _plot(rt, node, series, title, color, linewidth, style):
+    if isinstance(series, (str, tuple)):
+        raise PineRuntimeError("plot 只能绘制数值序列", node.line)
+    rt.plots.append({
+        "title": title or f"Plot {len(rt.plots) + 1}",
+        "color": color if isinstance(color, str) else None,
+        "linewidth": linewidth,
+        "style": style,
+        "values": rt.f(series, node.line),
+    })
+    return NA
+
+
+def _capture_shape(rt, node, series, title, style, location, color, char=None):
+    hits = np.flatnonzero(np.broadcast_to(_truth(series), (rt.n,)))
+    rt.shapes.append({
+        "title": title or f"Shape {len(rt.shapes) + 1}",
+        "style": style,
+        "location": location,
+        "color": color if isinstance(color, str) else None,
+        **({"char": char} if char is not None else {}),
+        "bars": hits,
+    })
+    return NA
+
+
+@builtin("plotshape", "series title style location color", title=None, style="shape.xcross",
+         location="location.abovebar", color=None)
+def _plotshape(rt, node, series, title, style, location, color):
+    return _capture_shape(rt, node, series, title, style, location, color)
+
+
+@builtin("plotchar", "series title char location color", title=None, char="★",
+         location="location.abovebar", color=None)
+def _plotchar(rt, node, series, title, char, location, color):
+    return _capture_shape(rt, node, series, title, "char", location, color, char)
+
+
+@builtin("hline", "price title color", title=None, color=None)
+def _hline(rt, node, price, title, color):
+    rt.hlines.append({"price": rt.number(price, node.line), "title": title, "color": color})
+    return NA
+
+
+@builtin("na", "x")
+def _na(rt, node, x):
+    if is_series(x):
+        return np.isnan(x) if x.dtype.kind == "f" else np.zeros(rt.n, dtype=bool)
+    return x is None or (isinstance(x, float) and math.isnan(x))
+
+
+@builtin("nz", "source replacement", replacement=0.0)
+def _nz(rt, node, source, replacement):
+    if is_series(source):
+        return np.where(np.isnan(source), replacement, source) if source.dtype.kind == "f" else source
+    return replacement if _na(rt, node, source) else source
+
+
+@builtin("fixnan", "source")
+def _fixnan(rt, node, source):
+    return ta.fixnan(rt.f(source, node.line))
+
+
+@builtin("int", "x")
+def _int(rt, node, x):
+    if is_series(x):
+        return np.trunc(rt.f(x))
+    return NA if _na(rt, node, x) else int(x)
+
+
+@builtin("float", "x")
+def _float(rt, node, x):
+    return rt.f(x) if is_series(x) else (NA if x is None else float(x))
+
+
+# ---- ta.* ----
+@builtin("ta.sma", "source length")
+def _sma(rt, node, source, length):
+    return ta.sma(rt.f(source), rt.length(length))
+
+
+@builtin("ta.ema", "source length")
+def _ema(rt, node, source, length):
+    return ta.ema(rt.f(source), rt.length(length))
+
+
+@builtin("ta.rma", "source length")
+def _rma(rt, node, source, length):
+    return ta.rma(rt.f(source), rt.length(length))
+
+
+@builtin("ta.wma", "source length")
+def _wma(rt, node, source, length):
+    return ta.wma(rt.f(source), rt.length(length))
+
+
+@builtin("ta.rsi", "source length")
+def _rsi(rt, node, source, length):
+    return ta.rsi(rt.f(source), rt.length(length))
+
+
+@builtin("ta.tr", "handle_na", handle_na=False)
+def _tr(rt, node, handle_na):
+    return ta.tr(*_hlc(rt), handle_na=bool(handle_na))
+
+
+@builtin("ta.atr", "length")
+def _atr(rt, node, length):
+    return ta.atr(*_hlc(rt), rt.length(length))
+
+
+@builtin("ta.macd", "source fastlen slowlen siglen")
+def _macd(rt, node, source, fastlen, slowlen, siglen):
+    return ta.macd(rt.f(source), rt.length(fastlen), rt.length(slowlen), rt.length(siglen))
+
+
+@builtin("ta.bb", "series length mult")
+def _bb(rt, node, series, length, mult):
+    return ta.bb(rt.f(series), rt.length(length), rt.number(mult))
+
+
+@builtin("ta.kc", "series length mult")
+def _kc(rt, node, series, length, mult):
+    return ta.kc(rt.f(series), *_hlc(rt), rt.length(length), rt.number(mult))
+
+
+@builtin("ta.stdev", "source length biased", biased=True)
+def _stdev(rt, node, source, length, biased):
+    length = rt.length(length)
+    out = ta.stdev(rt.f(source), length)
+    return out if biased or length == 1 else out * math.sqrt(length / (length - 1))
+
+
+@builtin("ta.crossover", "source1 source2")
+def _crossover(rt, node, a, b):
+    return ta.crossover(rt.f(a), rt.f(b))
+
+
+@builtin("ta.crossunder", "source1 source2")
+def _crossunder(rt, node, a, b):
+    return ta.crossunder(rt.f(a), rt.f(b))
+
+
+@builtin("ta.cross", "source1 source2")
+def _cross(rt, node, a, b):
+    return ta.cross(rt.f(a), rt.f(b))
+
+
+@builtin("ta.highest", "source length", length=None)
+def _highest(rt, node, source, length):
+    if length is None:
+        source, length = rt.series["high"], source
+    return ta.highest(rt.f(source), rt.length(length))
+
+
+@builtin("ta.lowest", "source length", length=None)
+def _lowest(rt, node, source, length):
+    if length is None:
+        source, length = rt.series["low"], source
+    return ta.lowest(rt.f(source), rt.length(length))
+
+
+@builtin("ta.change", "source length", length=1)
+def _change(rt, node, source, length):
+    if is_series(source) and source.dtype == bool:
+        return source != ta.shift(source, rt.length(length))
+    return ta.change(rt.f(source), rt.length(length))
+
+
+@builtin("ta.barssince", "condition")
+def _barssince(rt, node, condition):
+    return ta.barssince(np.broadcast_to(_truth(condition), (rt.n,)))
+
+
+@builtin("ta.cum", "source")
+def _cum(rt, node, source):
+    return ta.cum(rt.f(source))
+
+
+@builtin("ta.stoch", "source high low length")
+def _stoch(rt, node, source, high, low, length):
+    return ta.stoch(rt.f(source), rt.f(high), rt.f(low), rt.length(length))
+
+
+@builtin("ta.willr", "length")
+def _willr(rt, node, length):
+    return ta.willr(*_hlc(rt), rt.length(length))
+
+
+@builtin("ta.cci", "source length")
+def _cci(rt, node, source, length):
+    return ta.cci(rt.f(source), rt.length(length))
+
+
+@builtin("ta.cmo", "series length")
+def _cmo(rt, node, series, length):
+    return ta.cmo(rt.f(series), rt.length(length))
+
+
+@builtin("ta.dmi", "diLength adxSmoothing")
+def _dmi(rt, node, di_length, adx_smoothing):
+    return ta.dmi(*_hlc(rt), rt.length(di_length), rt.length(adx_smoothing))
+
+
+@builtin("ta.vwap", "source")
+def _vwap(rt, node, source):
+    return ta.vwap(rt.f(source), rt.series["volume"], rt.builtin_series("timeframe.change"))
+
+
+@builtin("ta.supertrend", "factor atrPeriod")
+def _supertrend(rt, node, factor, atr_period):
+    return ta.supertrend(*_hlc(rt), rt.number(factor), rt.length(atr_period))
+
+
+@builtin("ta.pivothigh", "source leftbars rightbars", rightbars=None)
+def _pivothigh(rt, node, source, left, right):
+    if right is None:
+        source, left, right = rt.series["high"], source, left
+    return ta.pivothigh(rt.f(source), rt.length(left), rt.length(right))
+
+
+@builtin("ta.pivotlow", "source leftbars rightbars", rightbars=None)
+def _pivotlow(rt, node, source, left, right):
+    if right is None:
+        source, left, right = rt.series["low"], source, left
+    return ta.pivotlow(rt.f(source), rt.length(left), rt.length(right))
+
+
+# ---- math.* ----
+def _numeric(rt, values, node):
+    return [v if is_series(v) else (NA if v is None else v) for v in values]
+
+
+@builtin("math.avg", "*numbers")
+def _avg(rt, node, numbers):
+    values = _numeric(rt, numbers, node)
+    total = values[0]
+    for v in values[1:]:
+        total = total + v
+    return _scalar(total / len(values))
+
+
+@builtin("math.max", "*numbers")
+def _max(rt, node, numbers):
+    return _scalar(np.maximum.reduce(np.broadcast_arrays(*_numeric(rt, numbers, node))))
+
+
+@builtin("math.min", "*numbers")
+def _min(rt, node, numbers):
+    return _scalar(np.minimum.reduce(np.broadcast_arrays(*_numeric(rt, numbers, node))))
+
+
+def _unary_math(name, ufunc):
+    @builtin(name, "number")
+    def fn(rt, node, number):
+        with np.errstate(all="ignore"):
+            return _scalar(ufunc(NA if number is None else number))
+    return fn
+
+
+for _name, _ufunc in (("math.abs", np.abs), ("math.sqrt", np.sqrt), ("math.log", np.log), ("math.log10", np.log10),
+                      ("math.exp", np.exp), ("math.floor", np.floor), ("math.ceil", np.ceil), ("math.sign", np.sign)):
+    _unary_math(_name, _ufunc)
+
+
+@builtin("math.pow", "base exponent")
+def _pow(rt, node, base, exponent):
+    with np.errstate(all="ignore"):
+        return _scalar(np.power(base, exponent))
+
+
+@builtin("math.round", "number precision", precision=None)
+def _round(rt, node, number, precision):
+    digits = 0 if precision is None else int(rt.number(precision))
+    if is_series(number):
+        return np.round(number, digits)
+    if number is None or math.isnan(number):
+        return NA
+    return round(number, digits) if precision is not None else int(math.floor(number + 0.5))
+
+
+@builtin("math.sum", "source length")
+def _sum(rt, node, source, length):
+    return ta.rolling_sum(rt.f(source), rt.length(length))
+
+
+# ---- color.* ----
+@builtin("color.new", "color transp")
+def _color_new(rt, node, color, transp):
+    if is_series(color) or is_series(transp) or not isinstance(color, str):
+        return color
+    alpha = round(255 * (1 - rt.number(transp) / 100))
+    return f"{color[:7]}{alpha:02X}"
+
+
+@builtin("color.rgb", "red green blue transp", transp=0)
+def _color_rgb(rt, node, red, green, blue, transp):
+    if any(is_series(v) for v in (red, green, blue, transp)):
+        raise PineRuntimeError("color.rgb 只支持常量参数", node.line)
+    alpha = round(255 * (1 - transp / 100))
+    return "#%02X%02X%02X%02X" % (int(red), int(green), int(blue), alpha)
+
+
+# ---- str.*（只处理标量；字符串序列只用于显示，返回 na） ----
+@builtin("str.tostring", "value format", format=None)
+def _tostring(rt, node, value, format):
+    if is_series(value):
+        return None
+    return "NaN" if value is None or (isinstance(value, float) and math.isnan(value)) else str(value)
+
+
+@builtin("str.format", "*args")
+def _str_format(rt, node, args):
+    if not args or not isinstance(args[0], str) or any(is_series(a) for a in args[1:]):
+        return None
+    try:
+        return args[0].format(*args[1:])
+    except (IndexError, KeyError, ValueError):
+        raise PineRuntimeError("str.format 的占位符与参数不匹配", node.line) from None
+
+
+# ---- strategy.* ----
+# 脚本可读取的回测状态；首次运行时按空仓计算
+STRATEGY_STATE: Dict[str, Callable[[Interpreter], Any]] = {
+    "strategy.position_size": lambda rt: np.zeros(rt.n),
+    "strategy.position_avg_price": lambda rt: np.full(rt.n, NA),
+    "strategy.equity": lambda rt: np.full(rt.n, rt.strategy["initial_capital"]),
+    "strategy.netprofit": lambda rt: np.zeros(rt.n),
+    "strategy.openprofit": lambda rt: np.zeros(rt.n),
+}
+
+
+def strategy_state(result: bt.Backtest) -> Dict[str, np.ndarray]:
+    """中文说明：回测结果 -> 下一次运行时 strategy.* 变量的值（每根 K 线收盘时的状态）"""
+    net = np.zeros(len(result.close))
+    np.add.at(net, result.trades["exit_bar"], result.trades["pnl"])
+    net = np.cumsum(net)
+    return {
+        "strategy.position_size": result.position,
+        "strategy.position_avg_price": result.avg_price,
+        "strategy.equity": result.equity,
+        "strategy.netprofit": net,
+        "strategy.openprofit": result.equity - result.config["initial_capital"] - net,
+    }
+
+
+def _require_strategy(rt, node):
+    if rt.strategy is None:
+        raise PineRuntimeError(f"{node.func} 只能在 strategy 脚本中使用", node.line)
+
+
+def _issued(rt, when) -> np.ndarray:
+    """中文说明：订单在哪些 K 线下达：当前分支掩码与 when 参数同时为真"""
+    mask = np.ones(rt.n, dtype=bool) if rt.mask is None else rt.mask.copy()
+    if when is not None:
+        mask &= np.broadcast_to(_truth(when), (rt.n,))
+    return mask
+
+
+def _price(rt, value, node) -> Optional[np.ndarray]:
+    if value is None or (not is_series(value) and _na(rt, node, value)):
+        return None
+    return rt.f(value, node.line)
+
+
+def _ticks(rt, value, node, name) -> Optional[float]:
+    if value is None:
+        return None
+    if is_series(value):
+        raise PineRuntimeError(f"strategy.exit 的 {name} 需要常量（按价格设置请用 limit/stop）", node.line)
+    return None if _na(rt, node, value) else rt.number(value, node.line)
+
+
+@builtin("strategy", "title shorttitle overlay format precision scale pyramiding calc_on_order_fills "
+         "calc_on_every_tick max_bars_back backtest_fill_limits_assumption default_qty_type default_qty_value "
+         "initial_capital currency slippage commission_type commission_value",
+         shorttitle=None, overlay=False, format=None, precision=None, scale=None, pyramiding=1,
+         calc_on_order_fills=False, calc_on_every_tick=False, max_bars_back=None,
+         backtest_fill_limits_assumption=0, default_qty_type="fixed", default_qty_value=1.0,
+         initial_capital=1_000_000.0, currency=None, slippage=0, commission_type="percent", commission_value=0.0)
+def _strategy(rt, node, title, shorttitle, overlay, _format, _precision, _scale, pyramiding, _on_fills, _on_tick,
+              _max_bars_back, _fill_assumption, qty_type, qty_value, initial_capital, _currency, slippage,
+              commission_type, commission_value):
+    rt.title, rt.overlay = title, bool(overlay)
+    if qty_type not in ("fixed", "cash", "percent_of_equity"):
+        raise PineRuntimeError(f"不支持的 default_qty_type: {qty_type}", node.line)
+    if commission_type not in ("percent", "cash_per_contract", "cash_per_order"):
+        raise PineRuntimeError(f"不支持的 commission_type: {commission_type}", node.line)
+    rt.strategy = {
+        "initial_capital": rt.number(initial_capital, node.line),
+        "default_qty_type": qty_type,
+        "default_qty_value": rt.number(qty_value, node.line),
+        "pyramiding": max(1, int(rt.number(pyramiding, node.line))),
+        "commission_type": commission_type,
+        "commission_value": rt.number(commission_value, node.line),
+        "slippage": rt.number(slippage, node.line),
+    }
+    return NA
+
+
+@builtin("strategy.entry", "id direction qty limit stop oca_name oca_type comment alert_message disable_alert when",
+         qty=None, limit=None, stop=None, oca_name=None, oca_type=None, comment=None, alert_message=None,
+         disable_alert=False, when=None)
+def _entry(rt, node, id, direction, qty, limit, stop, *_rest):
+    _require_strategy(rt, node)
+    if direction not in ("long", "short"):
+        raise PineRuntimeError("strategy.entry 的方向必须是 strategy.long 或 strategy.short", node.line)
+    issued = _issued(rt, _rest[-1])
+    if not issued.any():
+        return NA
+    rt.orders.entries.append(bt.EntryOrder(
+        id=str(id), direction=1 if direction == "long" else -1, issued=issued,
+        qty=_price(rt, qty, node), limit=_price(rt, limit, node), stop=_price(rt, stop, node),
+    ))
+    return NA
+
+
+@builtin("strategy.close", "id comment qty qty_percent alert_message immediately disable_alert when",
+         comment=None, qty=None, qty_percent=None, alert_message=None, immediately=False, disable_alert=False, when=None)
+def _close(rt, node, id, *_rest):
+    _require_strategy(rt, node)
+    issued = _issued(rt, _rest[-1])
+    if issued.any():
+        rt.orders.closes.append(bt.CloseOrder(id=str(id), issued=issued))
+    return NA
+
+
+@builtin("strategy.close_all", "comment alert_message immediately disable_alert when",
+         comment=None, alert_message=None, immediately=False, disable_alert=False, when=None)
+def _close_all(rt, node, *_rest):
+    _require_strategy(rt, node)
+    issued = _issued(rt, _rest[-1])
+    if issued.any():
+        rt.orders.closes.append(bt.CloseOrder(id=None, issued=issued))
+    return NA
+
+
+@builtin("strategy.exit", "id from_entry qty qty_percent profit limit loss stop trail_price trail_points "
+         "trail_offset oca_name comment alert_message disable_alert when",
+         from_entry=None, qty=None, qty_percent=None, profit=None, limit=None, loss=None, stop=None,
+         trail_price=None, trail_points=None, trail_offset=None, oca_name=None, comment=None,
+         alert_message=None, disable_alert=False, when=None)
+def _exit(rt, node, id, from_entry, _qty, _qty_percent, profit, limit, loss, stop, trail_price, trail_points,
+          trail_offset, *_rest):
+    _require_strategy(rt, node)
+    if trail_price is not None:
+        raise PineRuntimeError("暂不支持 trail_price，请使用 trail_points", node.line)
+    trail_points = _ticks(rt, trail_points, node, "trail_points")
+    if trail_points is not None and trail_offset is None:
+        raise PineRuntimeError("使用 trail_points 时需要同时设置 trail_offset", node.line)
+    issued = _issued(rt, _rest[-1])
+    if not issued.any():
+        return NA
+    rt.orders.exits.append(bt.ExitOrder(
+        id=str(id), from_entry=None if from_entry is None else str(from_entry), issued=issued,
+        profit=_ticks(rt, profit, node, "profit"), loss=_ticks(rt, loss, node, "loss"),
+        limit=_price(rt, limit, node), stop=_price(rt, stop, node),
+        trail_points=trail_points, trail_offset=_ticks(rt, trail_offset, node, "trail_offset"),
+    ))
+    return NA
+
+
+# -------------------------------
+# 运行与缓存
+# -------------------------------
+def execute(script: Script, data: Dict[str, np.ndarray], params: Optional[dict] = None) -> RunResult:
+    """中文说明：在给定 K 线上执行已解析的脚本；strategy 脚本同时回测"""
+    started = time.perf_counter()
+    rt = Interpreter(script, data, params)
+    rt.run()
+    result = None
+    if rt.strategy is not None:
+        result = rt.backtest(data)
+        passes = 1
+        # 脚本读取了回测状态：用本次回测的状态重新运行，直到持仓不再变化（不动点）
+        while rt.uses_state:
+            if passes >= MAX_STRATEGY_PASSES:
+                raise PineRuntimeError(f"strategy.position_* 等回测状态在 {MAX_STRATEGY_PASSES} 次迭代内未收敛")
+            used = rt.strategy_state.get("strategy.position_size")
+            if used is not None and np.array_equal(used, result.position):
+                break
+            rt = Interpreter(script, data, params, strategy_state=strategy_state(result))
+            rt.run()
+            result = rt.backtest(data)
+            passes += 1
+    return RunResult(
+        backtest=result,
+        title=rt.title,
+        overlay=rt.overlay,
+        bars=rt.n,
+        plots=rt.plots,
+        shapes=rt.shapes,
+        hlines=rt.hlines,
+        inputs=rt.inputs,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 3),
+    )
+
+
+def run(code: str, dataset: Optional[dict] = None, params: Optional[dict] = None) -> RunResult:
+    """中文说明：在合成 K 线上运行脚本；dataset 为 synthetic_ohlcv 的参数"""
+    return execute(parse(code), synthetic_ohlcv(**(dataset or {"bars": 5000})), params)
+
+
+def cache_key(code: str, dataset: dict, params: dict) -> Tuple[str, str, str]:
+    return (
+        hashlib.sha256(code.encode("utf-8")).hexdigest(),
+        json.dumps(dataset, sort_keys=True),
+        json.dumps(params, sort_keys=True, default=str),
+    )
+
+
+class RunCache:
+    """中文说明：运行结果的 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Tuple[str, str, str], RunResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[RunResult]:
+        with self._lock:
+            result = self._items.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result: RunResult) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def run(self, code: str, dataset: dict, params: dict) -> Tuple[RunResult, bool]:
+        """中文说明：命中缓存直接返回，否则运行并写入缓存；返回 (结果, 是否命中)"""
+        key = cache_key(code, dataset, params)
+        result = self.get(key)
+        if result is not None:
+            return result, True
+        result = run(code, dataset, params)
+        self.put(key, result)
+        return result, False
+
+    def stats(self) -> dict:
+        return {"entries": len(self._items), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,364 @@
+# 中文说明：Pine ta.* 内置函数的向量化实现（NumPy）
+"""
+功能概述：
+- 每个函数一次处理整条序列（float64 数组），不逐根 K 线循环；结果与 TradingView 的定义对齐：
+  前 length-1 根为 na（NaN），ta.ema / ta.rma 以前 length 个值的简单平均作为初值
+- 递推型指标（ema / rma 及依赖它们的 rsi、atr、macd、dmi 等）用分块闭式解计算线性递推
+  y[t] = d * y[t-1] + x[t]：块内用累积和，块间进位用截断级数，全部是数组运算
+- 滑动窗口最大/最小值（highest/lowest）用分块前缀/后缀极值，O(n) 且与窗口长度无关；
+  累加型（sma/sum/stdev）使用累积和，其余窗口统计使用 sliding_window_view
+
+输入/输出：
+- 所有函数接收 NumPy 数组（及标量参数），返回同长度的 float64 / bool 数组（或数组元组）
+
+边界与安全：
+- 序列开头的 NaN（例如对 ta.macd 的结果再求 ema）会被跳过，从第一个有效值开始计算；
+  序列中间出现的 NaN 按 NumPy 规则传播
+- ta.supertrend 的上下轨带有依赖自身前值的“棘轮”逻辑，无法写成闭式递推，使用逐根循环的内核
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 分块递推时块内允许的最大放大倍数（决定块长；1e3 对应约 1e-13 的相对误差）
+_CHUNK_GAIN = 1e3
+
+
+def shift(x: np.ndarray, k: int = 1) -> np.ndarray:
+    """中文说明：历史引用 x[k]：整体后移 k 根，前 k 根为 na（布尔序列为 False）"""
+    if k == 0:
+        return x
+    fill = False if x.dtype == bool else (None if x.dtype == object else np.nan)
+    out = np.empty_like(x, dtype=x.dtype if fill is not np.nan else np.result_type(x.dtype, np.float64))
+    out[:k] = fill
+    out[k:] = x[:-k] if k < len(x) else x[:0]
+    return out
+
+
+def _first_valid(x: np.ndarray) -> int:
+    valid = np.flatnonzero(~np.isnan(x))
+    return int(valid[0]) if len(valid) else len(x)
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(len(x), np.nan)
+
+
+def linear_recurrence(z: np.ndarray, d: float, y0: float = 0.0) -> np.ndarray:
+    """中文说明：计算 y[t] = d * y[t-1] + z[t]（y[-1] = y0），分块闭式解，无逐元素循环"""
+    n = len(z)
+    if n == 0:
+        return z.astype(np.float64)
+    if d == 0.0:
+        return z.astype(np.float64)
+    if not 0.0 < d < 1.0:
+        raise ValueError("递推系数必须在 (0, 1) 之间")
+    size = max(1, min(n, int(math.log(_CHUNK_GAIN) / -math.log(d))))
+    chunks = -(-n // size)
+    padded = np.zeros(chunks * size)
+    padded[:n] = z
+    block = padded.reshape(chunks, size)
+    powers = d ** np.arange(size)  # d^j
+    # 块内零初值解：y[c, j] = d^j * sum_{k<=j} z[c, k] / d^k
+    local = np.cumsum(block / powers, axis=1) * powers
+    # 块末真实值 T[c] = D * T[c-1] + local[c, -1]，D = d^size；用截断级数一次算出
+    big = d ** size
+    ends = local[:, -1]
+    terms = max(1, math.ceil(-17 / math.log10(big))) if big > 0 else 1
+    carry = ends.copy()
+    factor = 1.0
+    for k in range(1, min(terms, chunks)):
+        factor *= big
+        carry[k:] += factor * ends[:-k]
+    carry += y0 * big ** np.arange(1, chunks + 1)
+    # 每块的初值是上一块的块末值
+    start = np.empty(chunks)
+    start[0] = y0
+    start[1:] = carry[:-1]
+    out = local + np.outer(start, powers * d)
+    return out.reshape(-1)[:n]
+
+
+def _ewm(x: np.ndarray, alpha: float, length: int) -> np.ndarray:
+    """中文说明：以前 length 个有效值的平均为初值的指数平滑（ta.ema / ta.rma 共用）"""
+    out = _nan_like(x)
+    s = _first_valid(x)
+    seed_at = s + length - 1
+    if seed_at >= len(x):
+        return out
+    seed = float(np.mean(x[s:seed_at + 1]))
+    out[seed_at] = seed
+    out[seed_at + 1:] = linear_recurrence(alpha * x[seed_at + 1:], 1.0 - alpha, seed)
+    return out
+
+
+def sma(x: np.ndarray, length: int) -> np.ndarray:
+    out = _nan_like(x)
+    s = _first_valid(x)
+    if len(x) - s < length:
+        return out
+    c = np.cumsum(np.concatenate(([0.0], x[s:])))
+    out[s + length - 1:] = (c[length:] - c[:-length]) / length
+    return out
+
+
+def rolling_sum(x: np.ndarray, length: int) -> np.ndarray:
+    return sma(x, length) * length
+
+
+def ema(x: np.ndarray, length: int) -> np.ndarray:
+    return _ewm(x, 2.0 / (length + 1), length)
+
+
+def rma(x: np.ndarray, length: int) -> np.ndarray:
+    return _ewm(x, 1.0 / length, length)
+
+
+def wma(x: np.ndarray, length: int) -> np.ndarray:
+    out = _nan_like(x)
+    if len(x) < length:
+        return out
+    weights = np.arange(1, length + 1, dtype=np.float64)
+    out[length - 1:] = sliding_window_view(x, length) @ weights / weights.sum()
+    return out
+
+
+def _running_extreme(x: np.ndarray, length: int, ufunc: np.ufunc, pad: float) -> np.ndarray:
+    """中文说明：滑动窗口最大/最小值（van Herk / Gil-Werman：块内前缀与后缀极值，O(n)，与窗口长度无关）"""
+    out = _nan_like(x)
+    n = len(x)
+    if n < length:
+        return out
+    chunks = -(-n // length)
+    padded = np.full(chunks * length, pad)
+    padded[:n] = x
+    block = padded.reshape(chunks, length)
+    prefix = ufunc.accumulate(block, axis=1).reshape(-1)
+    suffix = ufunc.accumulate(block[:, ::-1], axis=1)[:, ::-1].reshape(-1)
+    # 窗口 [i, i+length-1] 跨越至多两个块：i 所在块的后缀 + 末尾所在块的前缀
+    i = np.arange(n - length + 1)
+    out[length - 1:] = ufunc(suffix[i], prefix[i + length - 1])
+    return out
+
+
+def highest(x: np.ndarray, length: int) -> np.ndarray:
+    return _running_extreme(x, length, np.maximum, -np.inf)
+
+
+def lowest(x: np.ndarray, length: int) -> np.ndarray:
+    return _running_extreme(x, length, np.minimum, np.inf)
+
+
+def stdev(x: np.ndarray, length: int) -> np.ndarray:
+    """中文说明：总体标准差（ta.stdev 默认 biased=true）"""
+    mean = sma(x, length)
+    sq = sma(x * x, length)
+    return np.sqrt(np.maximum(sq - mean * mean, 0.0))
+
+
+def change(x: np.ndarray, length: int = 1) -> np.ndarray:
+    return x - shift(x, length)
+
+
+def cum(x: np.ndarray) -> np.ndarray:
+    return np.cumsum(np.nan_to_num(x))
+
+
+def fixnan(x: np.ndarray) -> np.ndarray:
+    """中文说明：用前一个有效值填充 na"""
+    idx = np.where(np.isnan(x), 0, np.arange(len(x)))
+    np.maximum.accumulate(idx, out=idx)
+    out = x[idx]
+    out[np.isnan(x) & (idx == 0) & np.isnan(x[0])] = np.nan
+    return out
+
+
+def rsi(x: np.ndarray, length: int) -> np.ndarray:
+    diff = change(x)
+    up = rma(np.maximum(diff, 0.0), length)
+    down = rma(-np.minimum(diff, 0.0), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + up / down)
+    out = np.where(down == 0, 100.0, np.where(up == 0, 0.0, out))
+    out[np.isnan(up) | np.isnan(down)] = np.nan
+    return out
+
+
+def tr(high: np.ndarray, low: np.ndarray, close: np.ndarray, handle_na: bool = True) -> np.ndarray:
+    prev = shift(close)
+    out = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+    if len(out):
+        out[0] = high[0] - low[0] if handle_na else np.nan
+    return out
+
+
+def atr(high, low, close, length: int) -> np.ndarray:
+    return rma(tr(high, low, close), length)
+
+
+def macd(x: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    line = ema(x, fast) - ema(x, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+
+def bb(x: np.ndarray, length: int, mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    basis = sma(x, length)
+    dev = mult * stdev(x, length)
+    return basis, basis + dev, basis - dev
+
+
+def kc(x, high, low, close, length: int, mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    basis = ema(x, length)
+    span = ema(tr(high, low, close), length) * mult
+    return basis, basis + span, basis - span
+
+
+def crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a > b) & (shift(a) <= shift(b))
+
+
+def crossunder(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a < b) & (shift(a) >= shift(b))
+
+
+def cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return crossover(a, b) | crossunder(a, b)
+
+
+def barssince(cond: np.ndarray) -> np.ndarray:
+    idx = np.where(cond, np.arange(len(cond)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    out = (np.arange(len(cond)) - idx).astype(np.float64)
+    out[idx < 0] = np.nan
+    return out
+
+
+def stoch(x, high, low, length: int) -> np.ndarray:
+    hh = highest(high, length)
+    ll = lowest(low, length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (x - ll) / (hh - ll)
+
+
+def willr(high, low, close, length: int) -> np.ndarray:
+    hh = highest(high, length)
+    ll = lowest(low, length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (close - hh) / (hh - ll)
+
+
+def cci(x: np.ndarray, length: int) -> np.ndarray:
+    out = _nan_like(x)
+    if len(x) < length:
+        return out
+    win = sliding_window_view(x, length)
+    mean = win.mean(axis=1)
+    dev = np.abs(win - mean[:, None]).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[length - 1:] = (x[length - 1:] - mean) / (0.015 * dev)
+    return out
+
+
+def cmo(x: np.ndarray, length: int) -> np.ndarray:
+    diff = change(x)
+    up = rolling_sum(np.where(diff > 0, diff, 0.0), length)
+    down = rolling_sum(np.where(diff < 0, -diff, 0.0), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (up - down) / (up + down)
+
+
+def dmi(high, low, close, di_length: int, adx_smoothing: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    up = change(high)
+    down = -change(low)
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    plus_dm[0] = minus_dm[0] = np.nan
+    trur = rma(tr(high, low, close), di_length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus = 100.0 * rma(plus_dm, di_length) / trur
+        minus = 100.0 * rma(minus_dm, di_length) / trur
+        total = plus + minus
+        adx = 100.0 * rma(np.abs(plus - minus) / np.where(total == 0, 1.0, total), adx_smoothing)
+    return plus, minus, adx
+
+
+def vwap(x: np.ndarray, volume: np.ndarray, session_start: Optional[np.ndarray] = None) -> np.ndarray:
+    """中文说明：按交易日重新累计的成交量加权均价；session_start 为每个新交易日第一根 K 线的布尔标记"""
+    pv = np.cumsum(x * volume)
+    vol = np.cumsum(volume)
+    if session_start is not None and session_start.any():
+        # 每段减去该段开始之前的累计值
+        starts = np.where(session_start, np.arange(len(x)), 0)
+        np.maximum.accumulate(starts, out=starts)
+        base_pv = np.concatenate(([0.0], pv))[starts]
+        base_vol = np.concatenate(([0.0], vol))[starts]
+        pv = pv - base_pv
+        vol = vol - base_vol
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pv / vol
+
+
+def pivothigh(x: np.ndarray, left: int, right: int) -> np.ndarray:
+    """中文说明：在确认的那根 K 线（枢轴之后 right 根）返回枢轴高点，其余为 na"""
+    return _pivot(x, left, right, np.max)
+
+
+def pivotlow(x: np.ndarray, left: int, right: int) -> np.ndarray:
+    return _pivot(x, left, right, np.min)
+
+
+def _pivot(x: np.ndarray, left: int, right: int, reducer) -> np.ndarray:
+    out = _nan_like(x)
+    span = left + right + 1
+    if len(x) < span:
+        return out
+    win = sliding_window_view(x, span)
+    center = win[:, left]
+    extreme = reducer(win, axis=1)
+    # 与 TradingView 一致：中心必须严格优于右侧、且不劣于左侧
+    others_right = win[:, left + 1:]
+    pivot = center[:, None]
+    strict = (pivot > others_right).all(axis=1) if reducer is np.max else (pivot < others_right).all(axis=1)
+    hit = (center == extreme) & strict
+    out[span - 1:] = np.where(hit, center, np.nan)
+    return out
+
+
+def supertrend(high, low, close, factor: float, atr_period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """中文说明：返回 (supertrend, direction)；direction 为 -1 表示上升趋势、1 表示下降趋势"""
+    src = (high + low) / 2.0
+    rng = factor * atr(high, low, close, atr_period)
+    basic_up = (src + rng).tolist()
+    basic_dn = (src - rng).tolist()
+    closes = close.tolist()
+    n = len(closes)
+    trend = [math.nan] * n
+    direction = [math.nan] * n
+    upper = lower = 0.0
+    prev_trend = math.nan
+    started = False
+    for i in range(n):
+        bu, bd = basic_up[i], basic_dn[i]
+        if bu != bu:  # ATR 尚未就绪
+            continue
+        prev_close = closes[i - 1] if i else math.nan
+        prev_upper, prev_lower = upper, lower
+        lower = bd if (bd > prev_lower or prev_close < prev_lower) else prev_lower
+        upper = bu if (bu < prev_upper or prev_close > prev_upper) else prev_upper
+        if not started:
+            d = 1
+            started = True
+        elif prev_trend == prev_upper:
+            d = -1 if closes[i] > upper else 1
+        else:
+            d = 1 if closes[i] < lower else -1
+        prev_trend = lower if d == -1 else upper
+        trend[i] = prev_trend
+        direction[i] = d
+    return np.array(trend), np.array(direction)
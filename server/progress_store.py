@@ -0,0 +1,477 @@
+# 中文说明：用户学习进度存储（可插拔后端）
+"""
+功能概述：
+- ProgressStore：进度存储接口（读取 / 保存 / 批量保存 / 持久化刷盘）
+- SqliteProgressStore：嵌入式 SQLite（WAL 模式），每个用户每节课一行，按行 upsert
+- JsonProgressStore：单 JSON 文件存储，仅用于本地开发与调试（写入时持有文件锁，多进程可安全使用）
+- migrate_json_to_sqlite：把旧版 progress.json 一次性导入 SQLite
+
+输入/输出：
+- store.get(user) -> dict（与前端 progress 结构一致：{"lessons": {...}, ...}）
+- store.save(user, progress) / store.save_many({user: progress}, versions=None)
+- store.get_with_version(user) -> (progress, version)；每次保存版本号递增（或由调用方指定）
+- store.update(user, mutate, base_version=None) -> (progress, version)：在一个事务/文件锁内完成
+  读取-校验版本-修改-写入，多个进程同时更新同一用户也不会丢失写入；版本不符抛出 VersionConflict
+- store.counts() -> 课程阶段计数器（见 server/stats.py），随每次保存增量更新
+- python -m server.progress_store migrate [--json PATH] [--db PATH]
+- python -m server.progress_store rebuild-stats [--backend sqlite|json]：从全部进度重建计数器
+
+边界与安全：
+- SQLite 连接按线程复用（每个工作线程一条连接），避免每次请求重新打开数据库
+- progress.lessons 之外的顶层字段（如 totalCompleted）存放在 lesson_id 为空串的一行，因此课程 id 不能为空串；
+  JSON 后端的版本号与计数器存放在保留键 __meta__ 下，该用户名不能用于保存进度（两者均抛出 ValueError，接口层返回 422）
+- JSON 后端每次保存都会重写整个文件，用户量大时请使用 SQLite 后端
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 下只支持单进程
+    fcntl = None
+
+from .sqlite_pool import SqlitePool
+from .stats import USERS_KEY, Counts, add_counts, diff_counts, lesson_counts, progress_counts, rebuild_counts
+
+# 顶层字段所在行的 lesson_id
+META_ROW = ""
+# JSON 后端保存版本号的保留键（不会作为用户名返回）
+JSON_META_KEY = "__meta__"
+# 不能用于保存进度的用户名
+RESERVED_USERS = frozenset({JSON_META_KEY})
+
+
+class VersionConflict(Exception):
+    """中文说明：客户端提交的版本号与服务端当前版本不一致"""
+
+    def __init__(self, current: int):
+        super().__init__(f"版本冲突，当前版本 {current}")
+        self.current = current
+
+
+class ProgressStore:
+    """中文说明：进度存储接口"""
+
+    def get(self, user: str) -> dict:
+        return self.get_with_version(user)[0]
+
+    def get_with_version(self, user: str) -> Tuple[dict, int]:
+        """中文说明：读取进度与版本号（从未保存过的用户版本为 0）"""
+        raise NotImplementedError
+
+    def save(self, user: str, progress: dict) -> None:
+        self.save_many({user: progress})
+
+    def save_many(self, items: Dict[str, dict], versions: Optional[Dict[str, int]] = None) -> None:
+        """中文说明：批量整体替换；versions 未给出的用户版本号 +1"""
+        raise NotImplementedError
+
+    def update(
+        self, user: str, mutate: Callable[[dict], dict], base_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        """中文说明：原子地读改写单个用户的进度，返回 (新进度, 新版本号)"""
+        raise NotImplementedError
+
+    def iter_all(self) -> Iterator[Tuple[str, dict]]:
+        """中文说明：遍历全部用户进度（仅供迁移与离线任务使用）"""
+        raise NotImplementedError
+
+    def counts(self) -> Counts:
+        """中文说明：读取统计计数器 {(lesson_id, stage): n}"""
+        raise NotImplementedError
+
+    def replace_counts(self, counts: Counts) -> None:
+        raise NotImplementedError
+
+    def rebuild_counts(self) -> Counts:
+        """中文说明：扫描全部用户进度重建计数器（离线任务，O(用户数)）"""
+        counts = rebuild_counts(self.iter_all())
+        self.replace_counts(counts)
+        return counts
+
+    def sync(self) -> None:
+        """中文说明：确保已保存的数据落盘"""
+
+    def close(self) -> None:
+        self.sync()
+
+
+class JsonProgressStore(ProgressStore):
+    """中文说明：单文件 JSON 存储（开发模式）"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """中文说明：线程锁 + 跨进程文件锁（锁文件与数据文件同目录）"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_suffix(".json.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_all(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def get_with_version(self, user: str) -> Tuple[dict, int]:
+        all_data = self._read_all()
+        if user == JSON_META_KEY:
+            return {}, 0
+        version = all_data.get(JSON_META_KEY, {}).get("versions", {}).get(user, 0)
+        return all_data.get(user, {}), version
+
+    def save_many(self, items: Dict[str, dict], versions: Optional[Dict[str, int]] = None) -> None:
+        versions = versions or {}
+        with self._locked():
+            all_data = self._read_all()
+            for user, progress in items.items():
+                self._put(all_data, user, progress, versions.get(user))
+            self._write_all(all_data)
+
+    def update(
+        self, user: str, mutate: Callable[[dict], dict], base_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        with self._locked():
+            all_data = self._read_all()
+            current = all_data.get(user, {}) if user != JSON_META_KEY else {}
+            version = all_data.get(JSON_META_KEY, {}).get("versions", {}).get(user, 0)
+            if base_version is not None and base_version != version:
+                raise VersionConflict(version)
+            # 传入副本：mutate 可能原地修改，计数器需要与修改前的数据比较
+            progress = mutate(copy.deepcopy(current))
+            self._put(all_data, user, progress, version + 1)
+            self._write_all(all_data)
+            return progress, version + 1
+
+    def _put(self, all_data: dict, user: str, progress: dict, version: Optional[int]) -> None:
+        """中文说明：在内存中替换一个用户的进度，同时更新版本号与统计计数器"""
+        if user in RESERVED_USERS:
+            raise ValueError(f"保留的用户名: {user}")
+        meta = all_data.setdefault(JSON_META_KEY, {})
+        known = meta.setdefault("versions", {})
+        if "stats" in meta:
+            counts = _unpack_counts(meta["stats"])
+        else:
+            # 旧文件没有计数器：先按现有数据补建一次
+            counts = rebuild_counts((u, p) for u, p in all_data.items() if u != JSON_META_KEY)
+        old = progress_counts(all_data[user]) if user in all_data else {}
+        add_counts(counts, diff_counts(old, progress_counts(progress)))
+        all_data[user] = progress
+        known[user] = version if version is not None else known.get(user, 0) + 1
+        meta["stats"] = _pack_counts(counts)
+
+    def _write_all(self, all_data: dict) -> None:
+        # 先写临时文件再原子替换，避免进程中断留下半个文件
+        tmp = self.path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(all_data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def iter_all(self) -> Iterator[Tuple[str, dict]]:
+        for user, progress in self._read_all().items():
+            if user != JSON_META_KEY:
+                yield user, progress
+
+    def counts(self) -> Counts:
+        return _unpack_counts(self._read_all().get(JSON_META_KEY, {}).get("stats", {}))
+
+    def replace_counts(self, counts: Counts) -> None:
+        with self._locked():
+            all_data = self._read_all()
+            all_data.setdefault(JSON_META_KEY, {})["stats"] = _pack_counts(counts)
+            self._write_all(all_data)
+
+
+def _pack_counts(counts: Counts) -> dict:
+    """中文说明：{(lesson_id, stage): n} -> {lesson_id: {stage: n}}（JSON 后端存储格式）"""
+    packed: dict = {}
+    for (lesson_id, stage), n in counts.items():
+        if n:
+            packed.setdefault(lesson_id, {})[stage] = n
+    return packed
+
+
+def _unpack_counts(packed: dict) -> Counts:
+    return {(lesson_id, stage): n for lesson_id, stages in packed.items() for stage, n in stages.items()}
+
+
+def split_progress(progress: dict) -> Dict[str, str]:
+    """中文说明：把用户进度拆成 {lesson_id: JSON 文本}，顶层字段放在 META_ROW"""
+    rows = {}
+    lessons = progress.get("lessons")
+    if isinstance(lessons, dict):
+        for lesson_id, value in lessons.items():
+            if str(lesson_id) == META_ROW:
+                raise ValueError("课程 id 不能为空")
+            rows[str(lesson_id)] = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        meta = {**progress, "lessons": {}}
+    else:
+        meta = progress
+    rows[META_ROW] = json.dumps(meta, ensure_ascii=False, separators=(",", ":"))
+    return rows
+
+
+def join_progress(rows) -> dict:
+    """中文说明：split_progress 的逆操作"""
+    meta: dict = {}
+    lessons = {}
+    for lesson_id, data in rows:
+        if lesson_id == META_ROW:
+            meta = json.loads(data)
+        else:
+            lessons[lesson_id] = json.loads(data)
+    if "lessons" in meta:
+        meta["lessons"] = lessons
+    return meta
+
+
+class SqliteProgressStore(ProgressStore):
+    """中文说明：SQLite（WAL）进度存储，每个用户每节课一行"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS progress (
+        user TEXT NOT NULL,
+        lesson_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (user, lesson_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS progress_version (
+        user TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS progress_stats (
+        lesson_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (lesson_id, stage)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._pool = SqlitePool(self.path)
+        conn = self._conn()
+        had_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'progress_stats'"
+        ).fetchone()
+        conn.executescript(self.SCHEMA)
+        if not had_stats and conn.execute("SELECT 1 FROM progress LIMIT 1").fetchone():
+            # 升级前创建的数据库：计数器表为新建，先按现有进度补建
+            self.rebuild_counts()
+
+    def _conn(self) -> sqlite3.Connection:
+        return self._pool.conn()
+
+    def get_with_version(self, user: str) -> Tuple[dict, int]:
+        conn = self._conn()
+        # 同一个读事务内读取，保证进度与版本号一致
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute("SELECT lesson_id, data FROM progress WHERE user = ?", (user,)).fetchall()
+            row = conn.execute("SELECT version FROM progress_version WHERE user = ?", (user,)).fetchone()
+        finally:
+            conn.execute("COMMIT")
+        return join_progress(rows), row[0] if row else 0
+
+    def save_many(self, items: Dict[str, dict], versions: Optional[Dict[str, int]] = None) -> None:
+        versions = versions or {}
+        conn = self._conn()
+        delta: Counts = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user, progress in items.items():
+                existing = dict(conn.execute("SELECT lesson_id, data FROM progress WHERE user = ?", (user,)))
+                add_counts(delta, self._write_user(conn, user, progress, existing, versions.get(user)))
+            _add_stats(conn, delta)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update(
+        self, user: str, mutate: Callable[[dict], dict], base_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        conn = self._conn()
+        # BEGIN IMMEDIATE 先取得写锁，其他进程的读改写在此排队，不会交错
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = dict(conn.execute("SELECT lesson_id, data FROM progress WHERE user = ?", (user,)))
+            row = conn.execute("SELECT version FROM progress_version WHERE user = ?", (user,)).fetchone()
+            version = row[0] if row else 0
+            if base_version is not None and base_version != version:
+                raise VersionConflict(version)
+            progress = mutate(join_progress(existing.items()))
+            _add_stats(conn, self._write_user(conn, user, progress, existing, version + 1))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return progress, version + 1
+
+    @staticmethod
+    def _write_user(
+        conn: sqlite3.Connection, user: str, progress: dict, existing: Dict[str, str], version: Optional[int]
+    ) -> Counts:
+        """中文说明：在当前事务内替换一个用户的全部行并写入版本号，返回计数器增量"""
+        rows = split_progress(progress)
+        stale = existing.keys() - rows.keys()
+        if stale:
+            conn.executemany(
+                "DELETE FROM progress WHERE user = ? AND lesson_id = ?",
+                [(user, lesson_id) for lesson_id in stale],
+            )
+        conn.executemany(
+            "INSERT INTO progress (user, lesson_id, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (user, lesson_id) DO UPDATE SET data = excluded.data "
+            "WHERE data != excluded.data",
+            [(user, lesson_id, data) for lesson_id, data in rows.items()],
+        )
+        if version is not None:
+            conn.execute(
+                "INSERT INTO progress_version (user, version) VALUES (?, ?) "
+                "ON CONFLICT (user) DO UPDATE SET version = excluded.version",
+                (user, version),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO progress_version (user, version) VALUES (?, 1) "
+                "ON CONFLICT (user) DO UPDATE SET version = version + 1",
+                (user,),
+            )
+        return _row_delta(existing, rows, progress)
+
+    def iter_all(self) -> Iterator[Tuple[str, dict]]:
+        cur = self._conn().execute("SELECT user, lesson_id, data FROM progress ORDER BY user")
+        user, rows = None, []
+        for row_user, lesson_id, data in cur:
+            if row_user != user and rows:
+                yield user, join_progress(rows)
+                rows = []
+            user = row_user
+            rows.append((lesson_id, data))
+        if rows:
+            yield user, join_progress(rows)
+
+    def counts(self) -> Counts:
+        rows = self._conn().execute("SELECT lesson_id, stage, n FROM progress_stats WHERE n != 0")
+        return {(lesson_id, stage): n for lesson_id, stage, n in rows}
+
+    def replace_counts(self, counts: Counts) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM progress_stats")
+            _add_stats(conn, counts)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sync(self) -> None:
+        # WAL 检查点：把日志内容写回主库文件
+        self._conn().execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self) -> None:
+        self.sync()
+        self._pool.close_all()
+
+
+def _row_delta(existing: Dict[str, str], rows: Dict[str, str], progress: dict) -> Counts:
+    """中文说明：只比较内容变化的课程行，得到本次保存对计数器的增量"""
+    lessons = progress.get("lessons")
+    lessons = lessons if isinstance(lessons, dict) else {}
+    old = {k: json.loads(v) for k, v in existing.items() if k != META_ROW and rows.get(k) != v}
+    new = {k: lessons[k] for k, v in rows.items() if k != META_ROW and existing.get(k) != v}
+    delta = diff_counts(lesson_counts(old), lesson_counts(new))
+    if META_ROW not in existing:
+        add_counts(delta, {USERS_KEY: 1})
+    return delta
+
+
+def _add_stats(conn: sqlite3.Connection, delta: Counts) -> None:
+    if delta:
+        conn.executemany(
+            "INSERT INTO progress_stats (lesson_id, stage, n) VALUES (?, ?, ?) "
+            "ON CONFLICT (lesson_id, stage) DO UPDATE SET n = n + excluded.n",
+            [(lesson_id, stage, n) for (lesson_id, stage), n in delta.items() if n],
+        )
+
+
+def migrate_json_to_sqlite(json_path: Path, db_path: Path) -> int:
+    """中文说明：把 progress.json 导入 SQLite，返回导入的用户数"""
+    source = JsonProgressStore(json_path)
+    target = SqliteProgressStore(db_path)
+    try:
+        items = dict(source.iter_all())
+        if items:
+            target.save_many(items)
+        return len(items)
+    finally:
+        target.close()
+
+
+def open_progress_store(data_dir: Path, backend: str = "") -> ProgressStore:
+    """中文说明：按配置打开进度存储（PS_PROGRESS_BACKEND=sqlite|json，默认 sqlite）"""
+    backend = (backend or os.environ.get("PS_PROGRESS_BACKEND", "sqlite")).lower()
+    json_path = Path(data_dir) / "progress.json"
+    if backend == "json":
+        return JsonProgressStore(json_path)
+    if backend != "sqlite":
+        raise ValueError(f"未知的进度存储后端: {backend}")
+    db_path = Path(data_dir) / "progress.db"
+    if not db_path.exists() and json_path.exists():
+        # 首次切换到 SQLite 时自动导入旧数据
+        migrate_json_to_sqlite(json_path, db_path)
+    return SqliteProgressStore(db_path)
+
+
+def main():
+    default_dir = Path(__file__).resolve().parent / "data"
+    parser = argparse.ArgumentParser(description="进度存储工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="把 progress.json 导入 SQLite")
+    mig.add_argument("--json", type=Path, default=default_dir / "progress.json")
+    mig.add_argument("--db", type=Path, default=default_dir / "progress.db")
+    reb = sub.add_parser("rebuild-stats", help="扫描全部进度，重建统计计数器")
+    reb.add_argument("--data-dir", type=Path, default=default_dir)
+    reb.add_argument("--backend", default="")
+    args = parser.parse_args()
+    if args.cmd == "migrate":
+        count = migrate_json_to_sqlite(args.json, args.db)
+        print(f"已导入 {count} 个用户的进度到 {args.db}")
+    elif args.cmd == "rebuild-stats":
+        store = open_progress_store(args.data_dir, args.backend)
+        try:
+            counts = store.rebuild_counts()
+        finally:
+            store.close()
+        print(f"已重建统计：{counts.get(USERS_KEY, 0)} 个用户，{len(counts)} 个计数器")
+
+
+if __name__ == "__main__":
+    main()
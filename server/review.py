@@ -0,0 +1,287 @@
+# 中文说明：SM-2 间隔重复复习引擎
+"""
+功能概述：
+- 为每个用户的每道测验题（lessonId:questionIdx）维护 SM-2 状态：难度系数 ease、间隔天数、连续答对次数
+- 每个用户一个按到期时间排序的最小堆，取到期卡片为 O(k log n)，不扫描全部答题记录
+- 状态持久化到 SQLite（review.db），用户首次访问时按需加载；内存中的用户卡组按 LRU 淘汰
+- 不缓存卡组时（max_users=0，多进程部署）每次答题的“读取-调度-写回”在一个写事务（BEGIN IMMEDIATE）内完成，
+  多个进程同时更新同一张卡片不会丢失更新
+
+输入/输出：
+- await engine.answer(user, lesson_id, question_idx, quality) -> 更新后的卡片状态
+- await engine.answer_many(user, [(lesson_id, question_idx, quality)]) -> 卡片列表；一次 I/O 调用、一个事务写完整套题
+- await engine.due(user, limit, now=None) -> 到期卡片列表（最早到期的在前）
+- quality_from_correct(correct) -> SM-2 评分（答对 4，答错 1）
+
+边界与安全：
+- 同一卡片更新时堆中旧条目不立即删除（惰性删除），旧条目比例过高时重建堆
+- 持久化带更新时间戳，只有更新的状态才会覆盖数据库中的旧状态
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .aio import run_io
+from .sqlite_pool import SqlitePool
+
+DAY = 86400
+MIN_EASE = 1.3
+DEFAULT_EASE = 2.5
+
+
+@dataclass
+class Card:
+    """中文说明：单道题的复习状态"""
+
+    card_id: str
+    ease: float = DEFAULT_EASE
+    interval: float = 0.0
+    reps: int = 0
+    lapses: int = 0
+    due: float = 0.0
+    updated: int = 0
+
+    @property
+    def lesson_id(self) -> str:
+        return self.card_id.rsplit(":", 1)[0]
+
+    @property
+    def question_idx(self) -> int:
+        return int(self.card_id.rsplit(":", 1)[1])
+
+    def to_public(self) -> dict:
+        return {
+            "lessonId": self.lesson_id,
+            "questionIdx": self.question_idx,
+            "ease": round(self.ease, 3),
+            "interval": self.interval,
+            "reps": self.reps,
+            "lapses": self.lapses,
+            "due": self.due,
+        }
+
+
+def card_key(lesson_id: str, question_idx: int) -> str:
+    """中文说明：与前端 state.answers 的键一致：lessonId:idx"""
+    return f"{lesson_id}:{question_idx}"
+
+
+def quality_from_correct(correct: bool) -> int:
+    return 4 if correct else 1
+
+
+def schedule(card: Card, quality: int, now: float) -> Card:
+    """中文说明：SM-2 调度，quality 取值 0..5（<3 视为遗忘）"""
+    quality = max(0, min(5, int(quality)))
+    if quality < 3:
+        card.reps = 0
+        card.lapses += 1
+        card.interval = 1.0
+    else:
+        card.reps += 1
+        if card.reps == 1:
+            card.interval = 1.0
+        elif card.reps == 2:
+            card.interval = 6.0
+        else:
+            card.interval = round(card.interval * card.ease, 2)
+    card.ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    card.due = now + card.interval * DAY
+    card.updated = time.time_ns()
+    return card
+
+
+class Deck:
+    """中文说明：单个用户的卡组：卡片表 + 按到期时间的最小堆（惰性删除）"""
+
+    def __init__(self, cards: Optional[List[Card]] = None):
+        self.cards: Dict[str, Card] = {}
+        self.heap: List[Tuple[float, str]] = []
+        for card in cards or []:
+            self.cards[card.card_id] = card
+            self.heap.append((card.due, card.card_id))
+        heapq.heapify(self.heap)
+
+    def upsert(self, card: Card) -> None:
+        self.cards[card.card_id] = card
+        heapq.heappush(self.heap, (card.due, card.card_id))
+        if len(self.heap) > 2 * len(self.cards) + 16:
+            self.heap = [(c.due, c.card_id) for c in self.cards.values()]
+            heapq.heapify(self.heap)
+
+    def due(self, now: float, limit: int) -> List[Card]:
+        """中文说明：弹出最多 limit 张到期卡片，再放回堆中（O(k log n)）"""
+        taken: List[Tuple[float, str]] = []
+        result: List[Card] = []
+        seen = set()
+        heap = self.heap
+        while heap and heap[0][0] <= now and len(result) < limit:
+            due, card_id = heapq.heappop(heap)
+            card = self.cards.get(card_id)
+            if card is None or card.due != due or card_id in seen:
+                continue  # 旧条目，直接丢弃
+            seen.add(card_id)
+            taken.append((due, card_id))
+            result.append(card)
+        for item in taken:
+            heapq.heappush(heap, item)
+        return result
+
+
+class ReviewStore:
+    """中文说明：复习状态的 SQLite 持久化"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS review_cards (
+        user TEXT NOT NULL,
+        card_id TEXT NOT NULL,
+        ease REAL NOT NULL,
+        interval REAL NOT NULL,
+        reps INTEGER NOT NULL,
+        lapses INTEGER NOT NULL,
+        due REAL NOT NULL,
+        updated INTEGER NOT NULL,
+        PRIMARY KEY (user, card_id)
+    ) WITHOUT ROWID
+    """
+
+    def __init__(self, path: Path):
+        self._pool = SqlitePool(path)
+        self._pool.conn().execute(self.SCHEMA)
+
+    def load(self, user: str) -> List[Card]:
+        rows = self._pool.conn().execute(
+            "SELECT card_id, ease, interval, reps, lapses, due, updated FROM review_cards WHERE user = ?",
+            (user,),
+        ).fetchall()
+        return [Card(*row) for row in rows]
+
+    def update(self, user: str, grades: List[Tuple[str, int]], now: float) -> List[Card]:
+        """中文说明：在一个写事务内读取、调度并写回卡片；grades 为 [(card_id, quality)]，同一张卡片可出现多次"""
+        conn = self._pool.conn()
+        # BEGIN IMMEDIATE 先取得写锁，其他进程的读改写在此排队，不会交错
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cards = {card.card_id: card for card in self.load(user)}
+            result = []
+            for card_id, quality in grades:
+                old = cards.get(card_id)
+                card = Card(**asdict(old)) if old else Card(card_id=card_id)
+                schedule(card, quality, now)
+                cards[card_id] = card
+                result.append(card)
+            self._write(conn, user, result)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def save(self, user: str, card: Card) -> None:
+        self.save_many(user, [card])
+
+    def save_many(self, user: str, cards: List[Card]) -> None:
+        """中文说明：在一个事务内写入多张卡片"""
+        conn = self._pool.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(conn, user, cards)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _write(conn, user: str, cards: List[Card]) -> None:
+        # 同一张卡片出现多次时只写最后的状态
+        latest = {card.card_id: card for card in cards}
+        conn.executemany(
+            "INSERT INTO review_cards (user, card_id, ease, interval, reps, lapses, due, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (user, card_id) DO UPDATE SET ease = excluded.ease, interval = excluded.interval, "
+            "reps = excluded.reps, lapses = excluded.lapses, due = excluded.due, updated = excluded.updated "
+            "WHERE excluded.updated >= review_cards.updated",
+            [(user, c.card_id, c.ease, c.interval, c.reps, c.lapses, c.due, c.updated) for c in latest.values()],
+        )
+
+    def close(self) -> None:
+        self._pool.close_all()
+
+
+class ReviewEngine:
+    """中文说明：复习调度入口；内存保留最近活跃用户的卡组"""
+
+    def __init__(self, store: ReviewStore, max_users: int = 20000):
+        self.store = store
+        self.max_users = max_users
+        self._decks: "OrderedDict[str, Deck]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    async def _deck(self, user: str) -> Deck:
+        deck = self._decks.get(user)
+        if deck is not None:
+            self._decks.move_to_end(user)
+            return deck
+        # 同一用户的并发请求只加载一次
+        pending = self._loading.get(user)
+        if pending is not None:
+            return await pending
+        fut = asyncio.get_running_loop().create_future()
+        self._loading[user] = fut
+        try:
+            deck = Deck(await run_io(self.store.load, user))
+            self.loads += 1
+            self._decks[user] = deck
+            while len(self._decks) > self.max_users:
+                self._decks.popitem(last=False)
+                self.evictions += 1
+            fut.set_result(deck)
+            return deck
+        except BaseException as e:
+            fut.set_exception(e)
+            # 没有其他等待者时避免 “exception was never retrieved” 警告
+            fut.exception()
+            raise
+        finally:
+            del self._loading[user]
+
+    async def answer(self, user: str, lesson_id: str, question_idx: int, quality: int,
+                     now: Optional[float] = None) -> Card:
+        return (await self.answer_many(user, [(lesson_id, question_idx, quality)], now))[0]
+
+    async def answer_many(self, user: str, grades: List[Tuple[str, int, int]],
+                          now: Optional[float] = None) -> List[Card]:
+        """中文说明：按顺序记录多道题的答题结果，只调用一次 run_io、写一个事务"""
+        now = time.time() if now is None else now
+        keyed = [(card_key(lesson_id, question_idx), quality) for lesson_id, question_idx, quality in grades]
+        if self.max_users <= 0:
+            # 不缓存卡组：内存中没有可信的当前状态，读改写交给存储的写事务
+            return await run_io(self.store.update, user, keyed, now)
+        deck = await self._deck(user)
+        cards = []
+        for key, quality in keyed:
+            old = deck.cards.get(key)
+            card = Card(**asdict(old)) if old else Card(card_id=key)
+            schedule(card, quality, now)
+            deck.upsert(card)
+            cards.append(card)
+        await run_io(self.store.save_many, user, cards)
+        return cards
+
+    async def due(self, user: str, limit: int = 20, now: Optional[float] = None) -> Tuple[List[Card], int]:
+        """中文说明：返回 (到期卡片, 卡组总数)"""
+        now = time.time() if now is None else now
+        deck = await self._deck(user)
+        return deck.due(now, limit), len(deck.cards)
+
+    def stats(self) -> dict:
+        return {"users_cached": len(self._decks), "loads": self.loads, "evictions": self.evictions}
@@ -0,0 +1,205 @@
+# 中文说明：课程全文检索（倒排索引 + BM25）
+"""
+功能概述：
+- 索引课程标题、副标题、概念讲解（去掉 HTML 标签）、总结（要点列表，逐条去标签）以及 Pine / Python 代码
+- 分词：英文与代码标识符整体保留（如 ta.crossover），同时按 "." 与 "_" 拆分（ta / crossover）；
+  中文按单字 + 相邻二元组（n-gram）切分，无需分词词典
+- 排序：BM25（标题中的词按更高权重计入词频）
+- 课程热加载时增量更新：按课程内容哈希复用上一版索引中未变化课程的分词结果，只重新分词改动的课程
+
+输入/输出：
+- SearchIndex.build(lessons, previous=None) -> SearchIndex
+- index.search(query, limit=10) -> [{"id", "title", "category", "isLocked", "score", "fields"}]
+
+边界与安全：
+- 锁定课程（isLocked）只索引标题，不暴露加密正文
+- 索引随课程快照一起替换，查询期间不会看到构建到一半的索引
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# 字段 -> 词频权重
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "subtitle": 2.0,
+    "concept": 1.0,
+    "concept_extra": 1.0,
+    "summary": 1.0,
+    "pine_code": 1.0,
+    "python_code": 1.0,
+}
+HTML_FIELDS = ("concept", "concept_extra", "summary")
+LOCKED_FIELDS = ("title",)
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*|[0-9]+(?:\.[0-9]+)?|[㐀-鿿豈-﫿]+")
+_SPLIT_RE = re.compile(r"[._]+")
+
+
+def strip_html(text: str) -> str:
+    return html.unescape(_TAG_RE.sub(" ", text))
+
+
+def tokenize(text: str) -> List[str]:
+    """中文说明：把文本切成检索词（小写）；查询与索引使用同一规则"""
+    tokens: List[str] = []
+    for m in _TOKEN_RE.finditer(text):
+        word = m.group(0)
+        if word[0] >= "㐀":
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            continue
+        word = word.strip("._").lower()
+        if not word:
+            continue
+        tokens.append(word)
+        parts = [p for p in _SPLIT_RE.split(word) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+@dataclass(frozen=True)
+class _Doc:
+    """中文说明：单节课的分词结果（词 -> 加权词频，词 -> 命中字段）"""
+
+    digest: str
+    tf: Dict[str, float]
+    fields: Dict[str, Tuple[str, ...]]
+    length: float
+
+
+def _lesson_texts(lesson: dict) -> Dict[str, str]:
+    names = LOCKED_FIELDS if lesson.get("isLocked") else FIELD_WEIGHTS
+    texts = {}
+    for name in names:
+        value = lesson.get(name)
+        if isinstance(value, list):
+            # 总结是要点列表：逐条去标签后按行拼接
+            items = [v for v in value if isinstance(v, str) and v and not v.startswith("ENC:")]
+            value = "\n".join(strip_html(v) if name in HTML_FIELDS else v for v in items)
+            if value:
+                texts[name] = value
+            continue
+        if not isinstance(value, str) or not value or value.startswith("ENC:"):
+            continue
+        texts[name] = strip_html(value) if name in HTML_FIELDS else value
+    return texts
+
+
+def _digest(texts: Dict[str, str]) -> str:
+    h = hashlib.sha256()
+    for name in sorted(texts):
+        h.update(name.encode())
+        h.update(b"\0")
+        h.update(texts[name].encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _analyze(texts: Dict[str, str], digest: str) -> _Doc:
+    tf: Dict[str, float] = {}
+    fields: Dict[str, List[str]] = {}
+    length = 0.0
+    for name, text in texts.items():
+        weight = FIELD_WEIGHTS[name]
+        for token in tokenize(text):
+            tf[token] = tf.get(token, 0.0) + weight
+            length += weight
+            hit = fields.setdefault(token, [])
+            if not hit or hit[-1] != name:
+                hit.append(name)
+    return _Doc(digest, tf, {t: tuple(v) for t, v in fields.items()}, length)
+
+
+@dataclass
+class SearchIndex:
+    """中文说明：不可变使用的倒排索引：词 -> [(文档序号, 加权词频)]"""
+
+    meta: List[dict] = field(default_factory=list)
+    docs: Dict[str, _Doc] = field(default_factory=dict)
+    postings: Dict[str, List[Tuple[int, float]]] = field(default_factory=dict)
+    lengths: List[float] = field(default_factory=list)
+    avg_length: float = 0.0
+    reused: int = 0
+    analyzed: int = 0
+
+    @classmethod
+    def build(cls, lessons: List[dict], previous: Optional["SearchIndex"] = None) -> "SearchIndex":
+        old = previous.docs if previous is not None else {}
+        index = cls()
+        for lesson in lessons:
+            lesson_id = lesson.get("id")
+            if not lesson_id or lesson_id in index.docs:
+                continue
+            texts = _lesson_texts(lesson)
+            digest = _digest(texts)
+            doc = old.get(lesson_id)
+            if doc is not None and doc.digest == digest:
+                index.reused += 1
+            else:
+                doc = _analyze(texts, digest)
+                index.analyzed += 1
+            n = len(index.meta)
+            index.docs[lesson_id] = doc
+            index.meta.append({
+                "id": lesson_id,
+                "title": lesson.get("title"),
+                "category": lesson.get("category"),
+                "isLocked": bool(lesson.get("isLocked")),
+            })
+            index.lengths.append(doc.length)
+            for token, weight in doc.tf.items():
+                index.postings.setdefault(token, []).append((n, weight))
+        if index.lengths:
+            index.avg_length = sum(index.lengths) / len(index.lengths)
+        return index
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        n_docs = len(self.meta)
+        if not terms or not n_docs:
+            return []
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+        avg = self.avg_length or 1.0
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_idx, tf in posting:
+                norm = K1 * (1 - B + B * self.lengths[doc_idx] / avg)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+                matched.setdefault(doc_idx, []).append(term)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        results = []
+        for doc_idx, score in ranked:
+            meta = self.meta[doc_idx]
+            doc = self.docs[meta["id"]]
+            hit_fields = []
+            for term in matched[doc_idx]:
+                for name in doc.fields.get(term, ()):
+                    if name not in hit_fields:
+                        hit_fields.append(name)
+            results.append({**meta, "score": round(score, 4), "fields": hit_fields})
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "docs": len(self.meta),
+            "terms": len(self.postings),
+            "reused": self.reused,
+            "analyzed": self.analyzed,
+        }
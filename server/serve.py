@@ -0,0 +1,35 @@
+# 中文说明：服务启动入口（单进程 / 多进程）
+"""
+功能概述：
+- python -m server.serve --workers 8：用 uvicorn 启动多个工作进程，共享同一个监听端口
+- 启动前设置 PS_WORKERS，server/main.py 据此切换到多进程安全模式（见 main.py 说明）
+
+输入/输出：
+- python -m server.serve [--host 0.0.0.0] [--port 8001] [--workers N]
+- 也可用 gunicorn：gunicorn -c server/gunicorn_conf.py server.main:app
+
+边界与安全：
+- 多进程时进度默认后端 SQLite 最合适；JSON 后端依赖文件锁（仅类 Unix 系统）且每次写入重写整个文件
+"""
+
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动后端服务")
+    parser.add_argument("--host", default=os.environ.get("PS_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PS_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PS_WORKERS", "1")))
+    args = parser.parse_args()
+
+    # 工作进程继承环境变量，导入 server.main 前即可得知部署模式
+    os.environ["PS_WORKERS"] = str(max(1, args.workers))
+
+    import uvicorn
+
+    uvicorn.run("server.main:app", host=args.host, port=args.port, workers=max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# 中文说明：SQLite 连接池（每线程一条连接）
+"""
+功能概述：
+- 同一数据库文件在每个工作线程复用一条连接，避免每次请求重新打开数据库
+- 新连接统一开启 WAL、synchronous=NORMAL 与忙等待超时
+
+输入/输出：
+- pool = SqlitePool(path); pool.conn() -> 当前线程的 sqlite3.Connection
+- pool.close_all() 关闭所有线程创建的连接
+
+边界与安全：
+- 连接使用自动提交模式（isolation_level=None），事务需显式 BEGIN/COMMIT
+- 多个进程同时初始化新数据库时，切换 WAL 可能不经忙等待直接报 database is locked，此时在 timeout 内重试
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class SqlitePool:
+    """中文说明：按线程分配的 SQLite 连接"""
+
+    def __init__(self, path: Path, timeout: float = 10):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+
+    def conn(self) -> sqlite3.Connection:
+        """中文说明：当前线程的连接（首次使用时创建，之后复用）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            self._enable_wal(conn)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _enable_wal(self, conn: sqlite3.Connection) -> None:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() >= deadline:
+                    conn.close()
+                    raise
+                time.sleep(0.05)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
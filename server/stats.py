@@ -0,0 +1,118 @@
+# 中文说明：学习进度统计（增量计数器）
+"""
+功能概述：
+- 每节课按阶段计数：started（有任一步完成）/ readDone / codeDone / quizDone / completed（三步全部完成）
+- 进度存储在每次保存时只比较发生变化的课程行，把差值累加到计数器（与进度写入同一事务）
+- 统计接口只读取计数器，按课程目录汇总，耗时与课程数成正比，与用户数无关
+
+输入/输出：
+- lesson_counts(lessons) -> {(lesson_id, stage): n}
+- diff_counts(old, new) -> 非零差值
+- lessons_report(lessons, counts) / funnel_report(lessons, counts) -> 接口返回结构
+- 计数器离线重建：python -m server.progress_store rebuild-stats
+
+边界与安全：
+- 写后队列中尚未落库的进度不计入统计（最多延迟一个写入窗口）
+- 不在课程目录中的 lesson_id 也会计数，但不会出现在报表里
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+FIELDS = ("readDone", "codeDone", "quizDone")
+STAGES = ("started",) + FIELDS + ("completed",)
+# 有进度记录的用户数，与进度表中顶层字段行使用相同的空 lesson_id
+USERS_KEY = ("", "users")
+
+Counts = Dict[Tuple[str, str], int]
+
+
+def entry_stages(entry) -> List[str]:
+    """中文说明：单节课进度所处的阶段"""
+    if not isinstance(entry, dict):
+        return []
+    done = [f for f in FIELDS if entry.get(f)]
+    if not done:
+        return []
+    stages = ["started"] + done
+    if len(done) == len(FIELDS):
+        stages.append("completed")
+    return stages
+
+
+def lesson_counts(lessons: Dict[str, object]) -> Counts:
+    counts: Counts = {}
+    for lesson_id, entry in lessons.items():
+        for stage in entry_stages(entry):
+            key = (str(lesson_id), stage)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def progress_counts(progress: dict) -> Counts:
+    """中文说明：单个用户进度对计数器的贡献"""
+    lessons = progress.get("lessons") if isinstance(progress, dict) else None
+    counts = lesson_counts(lessons) if isinstance(lessons, dict) else {}
+    counts[USERS_KEY] = 1
+    return counts
+
+
+def diff_counts(old: Counts, new: Counts) -> Counts:
+    delta = dict(new)
+    for key, n in old.items():
+        delta[key] = delta.get(key, 0) - n
+    return {k: n for k, n in delta.items() if n}
+
+
+def add_counts(total: Counts, delta: Counts) -> Counts:
+    for key, n in delta.items():
+        total[key] = total.get(key, 0) + n
+    return total
+
+
+def rebuild_counts(items: Iterable[Tuple[str, dict]]) -> Counts:
+    """中文说明：从全部用户进度重新计算计数器（离线任务）"""
+    total: Counts = {}
+    for _user, progress in items:
+        add_counts(total, progress_counts(progress))
+    return total
+
+
+def lessons_report(lessons: List[dict], counts: Counts) -> dict:
+    """中文说明：按课程目录顺序输出每节课各阶段人数"""
+    rows = []
+    for lesson in lessons:
+        lesson_id = lesson.get("id")
+        row = {"id": lesson_id, "title": lesson.get("title"), "category": lesson.get("category")}
+        for stage in STAGES:
+            row[stage] = counts.get((lesson_id, stage), 0)
+        rows.append(row)
+    return {"users": counts.get(USERS_KEY, 0), "lessons": rows}
+
+
+def funnel_report(lessons: List[dict], counts: Counts) -> dict:
+    """中文说明：全部课程与各分类的阶段漏斗；completionRate = 完成人次 / (课程数 × 用户数)"""
+    users = counts.get(USERS_KEY, 0)
+    total = {stage: 0 for stage in STAGES}
+    categories: Dict[str, dict] = {}
+    for lesson in lessons:
+        name = lesson.get("category") or ""
+        cat = categories.get(name)
+        if cat is None:
+            cat = categories[name] = {"category": name, "lessons": 0, **{stage: 0 for stage in STAGES}}
+        cat["lessons"] += 1
+        for stage in STAGES:
+            n = counts.get((lesson.get("id"), stage), 0)
+            cat[stage] += n
+            total[stage] += n
+
+    def rate(done, n_lessons):
+        return round(done / (n_lessons * users), 4) if users and n_lessons else 0.0
+
+    for cat in categories.values():
+        cat["completionRate"] = rate(cat["completed"], cat["lessons"])
+    return {
+        "users": users,
+        "stages": list(STAGES),
+        "total": {**total, "lessons": len(lessons), "completionRate": rate(total["completed"], len(lessons))},
+        "categories": list(categories.values()),
+    }
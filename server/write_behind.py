@@ -0,0 +1,233 @@
+# 中文说明：进度写入的异步写后（write-behind）队列
+"""
+功能概述：
+- POST /progress 只把最新进度放入内存队列，立即返回；后台任务按时间窗口批量落库
+- 同一用户在窗口内的多次更新会合并（只保留最后一次），减少磁盘写入
+- 关闭服务时（FastAPI lifespan）把剩余数据全部写入并执行持久化刷盘
+- 每个用户维护版本号，update 在用户级锁内完成“读取-校验版本-修改-入队”，支持乐观并发
+- 可选的 gate（server/admission.py 的 WriteGate）限制同时进行的存储写入：同步读改写、写入前读取与批量落库都先占用名额，
+  名额已满时同步写入排队或被拒绝（抛出 Overloaded），批量落库只排队不丢弃
+
+输入/输出：
+- await queue.submit(user, progress) -> 新版本号（整体替换）
+- await queue.update(user, mutate, base_version=None) -> 新版本号；版本不符抛出 VersionConflict
+- queue.peek(user) -> 尚未落库的 (进度, 版本号)（读自己写的一致性）
+- queue.stats() -> 队列深度、合并次数、批量刷盘耗时等指标
+
+边界与安全：
+- window <= 0 或后台任务未启动时退化为同步写入：读改写交给 store.update 在存储事务内完成，
+  多进程部署（每个进程各自的内存队列互不可见）必须使用这种模式
+- 批量写入失败时把数据放回队列（不覆盖更新的数据），下个窗口重试
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+import copy
+from typing import Callable, Dict, Optional, Tuple
+
+from .admission import WriteGate
+from .aio import run_io
+from .progress_store import ProgressStore, VersionConflict
+
+
+class WriteBehindQueue:
+    """中文说明：按用户合并的写后队列"""
+
+    def __init__(
+        self,
+        store: ProgressStore,
+        window: float = 0.5,
+        max_batch: int = 500,
+        gate: Optional[WriteGate] = None,
+    ):
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self.gate = gate
+        self._pending: Dict[str, Tuple[dict, int]] = {}
+        self._inflight: Dict[str, Tuple[dict, int]] = {}
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+        self._lock_refs: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        # 指标
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_items = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=512)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.window <= 0 or self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """中文说明：停止后台任务，写入剩余数据并刷盘"""
+        if self._task is not None:
+            # 不直接 cancel，避免打断正在进行的批量写入
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        await run_io(self.store.sync)
+
+    async def submit(self, user: str, progress: dict) -> int:
+        """中文说明：整体替换用户进度，返回新版本号"""
+        return await self.update(user, lambda _current: progress)
+
+    async def update(
+        self,
+        user: str,
+        mutate: Callable[[dict], dict],
+        base_version: Optional[int] = None,
+    ) -> int:
+        """中文说明：在用户级锁内读取当前进度，调用 mutate 得到新进度并入队"""
+        async with self._user_lock(user):
+            if not self.running:
+                self.submitted += 1
+                _progress, version = await self._store_io(self.store.update, user, mutate, base_version)
+                return version
+            pending = self.peek(user)
+            current, version = pending if pending is not None else await self._store_io(
+                self.store.get_with_version, user
+            )
+            if base_version is not None and base_version != version:
+                raise VersionConflict(version)
+            progress = mutate(copy.deepcopy(current))
+            version += 1
+            self.submitted += 1
+            if user in self._pending:
+                self.coalesced += 1
+            self._pending[user] = (progress, version)
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+            return version
+
+    async def read(self, user: str) -> Tuple[dict, int]:
+        """中文说明：读取最新进度与版本号（优先返回尚未落库的数据）"""
+        pending = self.peek(user)
+        if pending is not None:
+            return pending
+        return await run_io(self.store.get_with_version, user)
+
+    def peek(self, user: str) -> Optional[Tuple[dict, int]]:
+        """中文说明：返回尚未落库的 (进度, 版本号)（排队中或正在写入）"""
+        if user in self._pending:
+            return self._pending[user]
+        return self._inflight.get(user)
+
+    async def _store_io(self, fn, *args, shed: bool = True):
+        """中文说明：占用一个存储写入名额后在 I/O 线程池执行（未配置 gate 时直接执行）"""
+        if self.gate is None:
+            return await run_io(fn, *args)
+        async with self.gate.slot(shed):
+            return await run_io(fn, *args)
+
+    def _user_lock(self, user: str) -> "_UserLock":
+        return _UserLock(self, user)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """中文说明：把当前队列按批写入存储"""
+        if not self._pending:
+            return
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            while self._pending:
+                batch = dict(list(self._pending.items())[: self.max_batch])
+                for user in batch:
+                    del self._pending[user]
+                self._inflight = batch
+                started = time.perf_counter()
+                try:
+                    await self._store_io(
+                        self.store.save_many,
+                        {user: item[0] for user, item in batch.items()},
+                        {user: item[1] for user, item in batch.items()},
+                        shed=False,
+                    )
+                except Exception:
+                    self.errors += 1
+                    # 放回队列，但不覆盖期间到达的更新
+                    for user, item in batch.items():
+                        self._pending.setdefault(user, item)
+                    self._inflight = {}
+                    return
+                self._inflight = {}
+                self._latencies.append((time.perf_counter() - started) * 1000)
+                self.flushes += 1
+                self.flushed_items += len(batch)
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))], 3) if lat else None
+
+        return {
+            "running": self.running,
+            "window_s": self.window,
+            "depth": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "errors": self.errors,
+            "flush_ms_p50": pct(0.50),
+            "flush_ms_p95": pct(0.95),
+            "flush_ms_max": round(lat[-1], 3) if lat else None,
+        }
+
+
+class _UserLock:
+    """中文说明：按用户分配的 asyncio 锁，无人等待时自动回收，避免锁表无限增长"""
+
+    def __init__(self, queue: WriteBehindQueue, user: str):
+        self.queue = queue
+        self.user = user
+
+    async def __aenter__(self):
+        q = self.queue
+        lock = q._user_locks.get(self.user)
+        if lock is None:
+            lock = q._user_locks[self.user] = asyncio.Lock()
+        q._lock_refs[self.user] = q._lock_refs.get(self.user, 0) + 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._unref()
+            raise
+
+    async def __aexit__(self, *exc):
+        self.queue._user_locks[self.user].release()
+        self._unref()
+
+    def _unref(self):
+        q = self.queue
+        q._lock_refs[self.user] -= 1
+        if q._lock_refs[self.user] == 0:
+            del q._lock_refs[self.user]
+            del q._user_locks[self.user]
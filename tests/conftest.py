@@ -0,0 +1,81 @@
+# 中文说明：后端测试共享夹具
+# 目的：提供示例课程数据与隔离到临时目录的存储/限流/客户端夹具，供各接口测试复用
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server import main  # noqa: E402
+from server.admission import AdmissionControl, RateLimiter, WriteGate  # noqa: E402
+from server.lessons_store import LessonsStore  # noqa: E402
+from server.progress_store import SqliteProgressStore  # noqa: E402
+from server.review import ReviewEngine, ReviewStore  # noqa: E402
+from server.write_behind import WriteBehindQueue  # noqa: E402
+
+SAMPLE = {
+  "version": "test",
+  "lessons": [
+    {"id": "a", "title": "A", "category": "基础语法 (Basics)", "concept": "<p>甲</p>",
+     "pine_code": "plot(close)", "python_code": "print(1)",
+     "quiz": [{"q": "?", "choices": [{"text": "x", "isCorrect": False}, {"text": "y", "isCorrect": True}]}]},
+    {"id": "b", "title": "B", "category": "量化策略 (Strategies)", "concept": "ENC:xx", "isLocked": True,
+     "isEncrypted": True, "pine_code": "ENC:yy", "python_code": "ENC:zz", "quiz": []},
+  ],
+}
+
+
+def public(data):
+  """中文说明：接口返回的公开版本（去掉 isCorrect）"""
+  data = json.loads(json.dumps(data))
+  for l in data["lessons"]:
+    for q in l.get("quiz", []):
+      for c in q["choices"]:
+        c.pop("isCorrect", None)
+  return data
+
+
+def write_lessons(path, data):
+  path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def lessons_file(tmp_path, monkeypatch):
+  path = tmp_path / "lessons.json"
+  write_lessons(path, SAMPLE)
+  monkeypatch.setattr(main, "lessons_store", LessonsStore(path, check_interval=0))
+  return path
+
+
+@pytest.fixture
+def admission(monkeypatch):
+  control = AdmissionControl(RateLimiter(rate=5, burst=20), RateLimiter(rate=50, burst=200), WriteGate())
+  monkeypatch.setattr(main, "admission", control)
+  return control
+
+
+@pytest.fixture
+def progress_store(tmp_path, monkeypatch, admission):
+  store = SqliteProgressStore(tmp_path / "progress.db")
+  monkeypatch.setattr(main, "progress_store", store)
+  monkeypatch.setattr(main, "write_queue", WriteBehindQueue(store, window=60, gate=admission.gate))
+  yield store
+  store.close()
+
+
+@pytest.fixture
+def review_engine(tmp_path, monkeypatch):
+  store = ReviewStore(tmp_path / "review.db")
+  engine = ReviewEngine(store)
+  monkeypatch.setattr(main, "review_engine", engine)
+  yield engine
+  store.close()
+
+
+@pytest.fixture
+def client(lessons_file, progress_store, review_engine, admission):
+  return TestClient(main.app)
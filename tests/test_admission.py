@@ -0,0 +1,118 @@
+# 中文说明：进度写入准入控制测试
+# 目的：验证令牌桶的突发与补充速率、LRU 淘汰空闲的桶、在途写入上限的排队/超时/削峰，
+# 热点用户被限流时不影响其他用户，以及写后队列的存储读写与批量落库都占用在途名额
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.admission import (  # noqa: E402
+  AdmissionControl, Overloaded, RateLimited, RateLimiter, WriteGate, retry_after_header,
+)
+from server.progress_store import SqliteProgressStore  # noqa: E402
+from server.write_behind import WriteBehindQueue  # noqa: E402
+
+
+def test_token_bucket_burst_and_refill():
+  limiter = RateLimiter(rate=2, burst=3)
+  assert [limiter.acquire("u", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+  assert limiter.acquire("u", now=0.0) == pytest.approx(0.5)
+  # 0.25 秒补充半个令牌，仍不足一个
+  assert limiter.acquire("u", now=0.25) == pytest.approx(0.25)
+  assert limiter.acquire("u", now=0.5) == 0.0
+  # 长时间空闲后最多补满到桶容量
+  assert [limiter.acquire("u", now=100.0) for _ in range(4)][-1] > 0
+  assert limiter.stats()["allowed"] == 7 and limiter.stats()["limited"] == 3
+  assert retry_after_header(0.25) == "1" and retry_after_header(2.1) == "3"
+  assert RateLimiter(rate=0, burst=0).acquire("u") == 0.0
+
+
+def test_lru_evicts_idle_buckets():
+  limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+  limiter.acquire("a", now=0.0)
+  limiter.acquire("b", now=0.0)
+  limiter.acquire("a", now=0.1)  # a 最近使用过，b 成为最久未使用
+  limiter.acquire("c", now=0.2)
+  assert limiter.stats()["keys"] == 2 and limiter.stats()["evictions"] == 1
+  # a 的桶保留（仍为空），b 被淘汰后按满桶重建
+  assert limiter.acquire("a", now=0.2) > 0
+  assert limiter.acquire("b", now=0.2) == 0.0
+
+
+def test_hot_user_does_not_starve_others():
+  control = AdmissionControl(RateLimiter(rate=1, burst=2), RateLimiter(rate=100, burst=100), WriteGate())
+  control.check("hot", "1.1.1.1", now=0.0)
+  control.check("hot", "1.1.1.1", now=0.0)
+  with pytest.raises(RateLimited) as err:
+    control.check("hot", "1.1.1.1", now=0.0)
+  assert err.value.scope == "user" and err.value.retry_after == pytest.approx(1.0)
+  control.check("other", "1.1.1.1", now=0.0)
+  # 用户桶拒绝的请求不消耗 IP 桶
+  assert control.ip.stats()["allowed"] == 3
+  # 同一 IP 下换用户名绕不过 IP 桶
+  shared = AdmissionControl(RateLimiter(rate=0, burst=0), RateLimiter(rate=1, burst=1), WriteGate())
+  shared.check("a", "2.2.2.2", now=0.0)
+  with pytest.raises(RateLimited) as err:
+    shared.check("b", "2.2.2.2", now=0.0)
+  assert err.value.scope == "ip"
+
+
+def test_write_gate_queues_times_out_and_sheds():
+  async def scenario():
+    gate = WriteGate(max_inflight=2, max_queue=1, queue_timeout=0.05)
+    await gate.acquire()
+    await gate.acquire()
+    waiter = asyncio.create_task(gate.acquire())
+    await asyncio.sleep(0)
+    assert gate.stats()["queued"] == 1
+    # 队列已满：直接拒绝
+    with pytest.raises(Overloaded):
+      await gate.acquire()
+    # 释放一个名额：直接转交给排队中的请求，在途数不变
+    gate.release()
+    await waiter
+    assert gate.inflight == 2 and gate.queued == 0
+    # 没有名额释放：排队超时
+    with pytest.raises(Overloaded):
+      await gate.acquire()
+    gate.release()
+    gate.release()
+    assert gate.inflight == 0
+    return gate.stats()
+
+  stats = asyncio.run(scenario())
+  assert stats["shed"] == 1 and stats["timeouts"] == 1 and stats["admitted"] == 3 and stats["max_queued"] == 1
+
+
+def test_store_writes_take_gate_slots(tmp_path):
+  async def scenario():
+    store = SqliteProgressStore(tmp_path / "progress.db")
+    gate = WriteGate(max_inflight=1, max_queue=0)
+    queue = WriteBehindQueue(store, window=0, gate=gate)
+    await gate.acquire()  # 模拟一个进行中的存储写入
+    # 同步读改写需要名额：名额已满且不能排队，直接拒绝
+    with pytest.raises(Overloaded):
+      await queue.submit("u", {"n": 1})
+    gate.release()
+    assert await queue.submit("u", {"n": 1}) == 1
+    # 批量落库同样占用名额，但只排队等待、不会被丢弃
+    queue = WriteBehindQueue(store, window=60, gate=gate)
+    await queue.start()
+    await queue.submit("u", {"n": 2})
+    await gate.acquire()
+    flush = asyncio.create_task(queue.flush())
+    await asyncio.sleep(0.05)
+    assert not flush.done() and store.get("u") == {"n": 1}
+    gate.release()
+    await flush
+    assert store.get("u") == {"n": 2}
+    await queue.stop()
+    store.close()
+    return gate.stats()
+
+  stats = asyncio.run(scenario())
+  assert stats["shed"] == 1 and stats["inflight"] == 0 and stats["queued"] == 0
@@ -0,0 +1,171 @@
+# 中文说明：策略回测引擎测试
+# 目的：用手工构造的 K 线验证成交价、手续费、止盈止损/移动止损、加仓与绩效统计，
+# 以及向量化快速路径与事件推进路径结果一致、参数扫描多进程与单进程结果一致
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.backtest import (  # noqa: E402
+  DEFAULT_CONFIG, CloseOrder, EntryOrder, ExitOrder, Orders, _vector_eligible, backtest, sweep,
+)
+from server.pine_runtime import run, synthetic_ohlcv  # noqa: E402
+
+
+def bars(open_, high=None, low=None, close=None):
+  open_ = np.asarray(open_, dtype=float)
+  close = open_ if close is None else np.asarray(close, dtype=float)
+  return {
+    "open": open_,
+    "high": np.maximum(open_, close) if high is None else np.asarray(high, dtype=float),
+    "low": np.minimum(open_, close) if low is None else np.asarray(low, dtype=float),
+    "close": close,
+    "volume": np.ones(len(open_)),
+    "time": np.arange(len(open_), dtype=np.int64) * 86_400_000,
+  }
+
+
+def at(n, *idx):
+  mask = np.zeros(n, dtype=bool)
+  mask[list(idx)] = True
+  return mask
+
+
+def test_market_orders_fill_next_open_with_costs():
+  data = bars([10, 11, 12, 13, 14, 15, 16])
+  orders = Orders(entries=[EntryOrder("L", 1, at(7, 1))], closes=[CloseOrder("L", at(7, 4))])
+  for vectorized in (True, False):
+    result = backtest(orders, data, {"commission_value": 0.1, "slippage": 1}, mintick=0.5, vectorized=vectorized)
+    # 第 1 根收盘下单 -> 第 2 根开盘 12 + 滑点 0.5 买入；第 4 根收盘平仓 -> 第 5 根开盘 15 - 0.5 卖出
+    assert result.fill_bar.tolist() == [2, 5]
+    assert result.fill_price.tolist() == [12.5, 14.5]
+    commission = (12.5 + 14.5) * 0.001
+    assert result.trades["pnl"][0] == pytest.approx(2.0 - commission)
+    assert result.position.tolist() == [0, 0, 1, 1, 1, 0, 0]
+    assert result.equity[-1] == pytest.approx(1_000_000 + 2.0 - commission)
+    assert result.avg_price[3] == 12.5 and np.isnan(result.avg_price[5])
+
+
+def test_vector_path_matches_event_engine():
+  rng = np.random.default_rng(3)
+  data = synthetic_ohlcv(2000, seed=3)
+  checked = 0
+  for trial in range(60):
+    mask = lambda p: rng.random(2000) < p  # noqa: E731
+    orders = Orders(
+      entries=[EntryOrder("L", 1, mask(0.01)), EntryOrder("S", -1, mask(0.01))],
+      closes=[CloseOrder("L", mask(0.01)), CloseOrder(None, mask(0.003))],
+    )
+    config = {"commission_value": 0.1, "slippage": 2, "default_qty_type": ("fixed", "cash")[trial % 2],
+              "default_qty_value": (2, 1000)[trial % 2]}
+    if not _vector_eligible(orders, {**DEFAULT_CONFIG, **config}):
+      continue
+    fast = backtest(orders, data, config, vectorized=True)
+    slow = backtest(orders, data, config, vectorized=False)
+    assert np.allclose(fast.equity, slow.equity)
+    assert fast.trades["exit_bar"].tolist() == slow.trades["exit_bar"].tolist()
+    assert np.allclose(fast.avg_price, slow.avg_price, equal_nan=True)
+    assert fast.stats() == pytest.approx(slow.stats())
+    checked += 1
+  assert checked >= 20
+
+
+def test_exit_stop_loss_take_profit_and_gap():
+  # 第 1 根收盘进场 -> 第 2 根开盘 100；止盈 +5（limit 105），止损 -3（stop 97）
+  data = bars([100, 100, 100, 101, 99, 100], high=[100, 100, 101, 102, 100, 106], low=[100, 100, 99, 98, 96, 99])
+  orders = Orders(entries=[EntryOrder("L", 1, at(6, 1))],
+                  exits=[ExitOrder("X", "L", at(6, 1), profit=5, loss=3)])
+  result = backtest(orders, data, mintick=1.0)
+  assert result.trades["exit_bar"].tolist() == [4] and result.trades["exit_price"].tolist() == [97.0]
+  # 跳空低开：开盘已低于止损价时按开盘价成交
+  gap = bars([100, 100, 100, 95, 99], high=[100, 100, 101, 96, 100], low=[100, 100, 99, 94, 98])
+  result = backtest(orders, gap, mintick=1.0)
+  assert result.trades["exit_price"].tolist() == [95.0]
+  # 止盈
+  up = bars([100, 100, 100, 103, 104], high=[100, 100, 101, 106, 105], low=[100, 100, 99, 102, 103])
+  result = backtest(orders, up, mintick=1.0)
+  assert result.trades["exit_bar"].tolist() == [3] and result.trades["exit_price"].tolist() == [105.0]
+
+
+def test_trailing_stop():
+  # 进场 100；上涨 4 点后激活，止损 = 激活后最高价 - 2（只用此前 K 线的最高价）
+  high = [100, 100, 101, 105, 108, 107, 107]
+  low = [100, 100, 99, 101, 104, 105.5, 104]
+  data = bars([100, 100, 100, 102, 106, 106, 106], high=high, low=low)
+  orders = Orders(entries=[EntryOrder("L", 1, at(7, 1))],
+                  exits=[ExitOrder("T", "L", np.ones(7, dtype=bool), trail_points=4, trail_offset=2)])
+  result = backtest(orders, data, mintick=1.0)
+  assert result.trades["exit_bar"].tolist() == [5]
+  assert result.trades["exit_price"].tolist() == [106.0]
+
+
+def test_pyramiding_and_limit_entries():
+  data = bars([10, 10, 9, 8, 7, 8, 9, 10])
+  orders = Orders(entries=[EntryOrder("B", 1, np.ones(8, dtype=bool))], closes=[CloseOrder(None, at(8, 5))])
+  result = backtest(orders, data, {"pyramiding": 3})
+  # 每根收盘都下单，最多持有 3 笔：第 1、2、3 根开盘成交；平仓后第 7 根重新进场
+  assert result.trades["entry_bar"].tolist() == [1, 2, 3]
+  assert result.trades["exit_bar"].tolist() == [6, 6, 6]
+  assert result.avg_price[3] == pytest.approx((10 + 9 + 8) / 3)
+  assert result.position.tolist() == [0, 1, 2, 3, 3, 3, 1, 2]
+  # 限价单：价格触及才成交，成交价为 min(开盘价, 限价)；第 2 根最低 9.6 未触及，第 3 根低开 9 按开盘价成交
+  data = bars([10, 10, 10, 9, 8], high=[10, 10, 10, 10, 9], low=[10, 10, 9.6, 8.5, 7.5])
+  orders = Orders(entries=[EntryOrder("L", 1, at(5, 1), limit=np.full(5, 9.5))])
+  result = backtest(orders, data)
+  assert result.fill_bar.tolist() == [3] and result.fill_price.tolist() == [9.0]
+  data = bars([10, 10, 10, 9.8, 8], high=[10, 10, 10, 10, 9], low=[10, 10, 9.6, 9.2, 7.5])
+  result = backtest(orders, data)
+  assert result.fill_bar.tolist() == [3] and result.fill_price.tolist() == [9.5]
+
+
+def test_stats():
+  data = bars([10, 10, 12, 12, 9, 9, 9])
+  orders = Orders(entries=[EntryOrder("L", 1, at(7, 0, 2))], closes=[CloseOrder("L", at(7, 1, 3))])
+  stats = backtest(orders, data, {"initial_capital": 100.0, "default_qty_value": 10}).stats()
+  # 第一笔 10 -> 12 盈利 20；第二笔 12 -> 9 亏损 30
+  assert stats["total_trades"] == 2 and stats["win_rate"] == 0.5
+  assert stats["gross_profit"] == 20 and stats["gross_loss"] == 30 and stats["profit_factor"] == pytest.approx(2 / 3)
+  assert stats["net_profit"] == -10
+  assert stats["max_drawdown"] == 30 and stats["max_drawdown_pct"] == pytest.approx(30 / 120)
+  assert stats["cagr"] < 0 and stats["sharpe"] is not None
+
+
+def test_strategy_script_with_position_state():
+  code = """strategy("DCA", pyramiding=3)
+if bar_index == 10
+    strategy.entry("Buy", strategy.long)
+if strategy.position_size > 0 and close < strategy.position_avg_price * 0.995
+    strategy.entry("Buy", strategy.long)
+plot(strategy.position_size, "size")
+"""
+  result = run(code, {"bars": 2000, "seed": 5})
+  size = {p["title"]: p["values"] for p in result.plots}["size"]
+  bt = result.backtest
+  # 第 10 根下单、第 11 根开盘成交；加仓只发生在已有持仓且低于均价之后，且不超过 3 笔
+  assert bt.fill_bar[0] == 11 and bt.position[10] == 0 and bt.position[11] == 1
+  assert bt.position.max() <= 3 and len(bt.fill_bar) > 1
+  assert np.array_equal(size, bt.position)
+  public = result.to_public(tail=100)
+  assert len(public["strategy"]["equity"]) == 100 and public["strategy"]["stats"]["open_trades"] >= 1
+
+
+def test_sweep_processes_match_serial():
+  code = """strategy("sweep")
+fast = input.int(5, "Fast")
+f = ta.ema(close, fast)
+s = ta.ema(close, 30)
+if ta.crossover(f, s)
+    strategy.entry("L", strategy.long)
+if ta.crossunder(f, s)
+    strategy.entry("S", strategy.short)
+"""
+  grid = {"Fast": [5, 10, 15]}
+  serial = sweep(code, grid, {"bars": 3000}, workers=1)
+  parallel = sweep(code, grid, {"bars": 3000}, workers=2)
+  assert serial == parallel
+  assert [r["params"] for r in serial] == [{"Fast": 5}, {"Fast": 10}, {"Fast": 15}]
+  assert serial[0]["stats"]["total_trades"] > serial[2]["stats"]["total_trades"]
@@ -0,0 +1,148 @@
+# 中文说明：课程构建流水线测试
+# 目的：验证阶段顺序、逐课缓存与“内容不变不写盘”
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+from encrypt_lessons import KEY, open_bundle, xor_decrypt  # noqa: E402
+
+
+def make_source(path):
+  data = {
+    "version": "t",
+    "lessons": [
+      {"id": "strat_dual_ma", "title": "双均线", "isLocked": True, "concept": "<p>付费</p>", "pine_code": "plot(close)", "python_code": "", "quiz": []},
+      {"id": "l1_intro", "title": "9. 简介", "concept": "<p>公开</p>", "pine_code": "plot(close)", "python_code": "", "quiz": []},
+    ],
+  }
+  path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+  return data
+
+
+def test_build_runs_stages_once_and_caches(tmp_path):
+  src, out, cache = tmp_path / "src.json", tmp_path / "out.json", tmp_path / "cache.json"
+  data = make_source(src)
+  stages = ["reorder", "renumber", "encrypt"]
+  written, report = build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  assert written and report["lessons"]["encrypt"] == {"cached": 0, "built": 2}
+  assert report["revision"] == (1, True)
+  built = json.loads(out.read_text(encoding="utf-8"))
+  assert [l["id"] for l in built["lessons"]] == ["l1_intro", "strat_dual_ma"]
+  assert built["lessons"][0]["title"] == "1. 简介"
+  assert built["lessons"][1]["title"] == "策略 1: 双均线"
+  assert xor_decrypt(built["lessons"][1]["concept"][4:], KEY) == "<p>付费</p>"
+
+  # 未改动：全部命中缓存，输出不变不写盘
+  written, report = build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  assert not written and report["lessons"]["encrypt"] == {"cached": 2, "built": 0}
+  assert report["revision"] == (1, False)
+
+  # 只改一节课：只重新处理这一节
+  data["lessons"][0]["concept"] = "<p>改过</p>"
+  src.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+  written, report = build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  assert written and report["lessons"]["encrypt"] == {"cached": 1, "built": 1}
+  # 修订日志只记下改动的课程
+  log = json.loads((tmp_path / "out.revisions.json").read_text(encoding="utf-8"))
+  assert report["revision"] == (2, True) and log["revisions"][-1]["changed"] == ["strat_dual_ma"]
+
+
+def test_build_is_noop_on_committed_catalogue(tmp_path):
+  lessons = ROOT / "web" / "data" / "lessons.json"
+  out = tmp_path / "lessons.json"
+  out.write_bytes(lessons.read_bytes())
+  written, _ = build_lessons.build(str(lessons), str(out), cache_path=str(tmp_path / "c.json"))
+  assert not written
+
+
+def test_bundle_stage_writes_content_addressed_files(tmp_path):
+  src, out, cache = tmp_path / "src.json", tmp_path / "out.json", tmp_path / "cache.json"
+  data = make_source(src)
+  stages = ["reorder", "encrypt", "bundle"]
+  build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  built = json.loads(out.read_text(encoding="utf-8"))
+  paid = built["lessons"][1]
+  assert paid["bundle"].startswith("locked/") and paid["concept"] == "" and paid["isEncrypted"]
+  assert "bundle" not in built["lessons"][0]
+  assert open_bundle((tmp_path / paid["bundle"]).read_bytes())["concept"] == "<p>付费</p>"
+  # 重新构建：不变；改动后旧包被删除
+  assert not build_lessons.build(str(out), str(out), stages, cache_path=str(cache))[0]
+  data["lessons"][0]["concept"] = "<p>新内容</p>"
+  src.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+  build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  rebuilt = json.loads(out.read_text(encoding="utf-8"))["lessons"][1]
+  assert rebuilt["bundle"] != paid["bundle"]
+  assert [p.name for p in (tmp_path / "locked").iterdir()] == [rebuilt["bundle"].split("/")[1]]
+
+
+def test_highlight_stage_bundles_locked_markup(tmp_path):
+  pytest.importorskip("pygments")
+  src, out, cache = tmp_path / "src.json", tmp_path / "out.json", tmp_path / "cache.json"
+  make_source(src)
+  stages = ["reorder", "highlight", "encrypt", "bundle"]
+  build_lessons.build(str(src), str(out), stages, cache_path=str(cache))
+  free, paid = json.loads(out.read_text(encoding="utf-8"))["lessons"]
+  assert 'class="hljs-built_in"' in free["pine_html"]
+  assert paid["pine_html"] == ""
+  assert 'class="hljs-built_in"' in open_bundle((tmp_path / paid["bundle"]).read_bytes())["pine_html"]
+  # 以输出为源重新构建：从课程包还原后结果不变
+  assert not build_lessons.build(str(out), str(out), stages, cache_path=str(tmp_path / "c2.json"))[0]
+
+
+def test_highlight_skipped_strips_stale_markup(tmp_path, monkeypatch):
+  src, out, cache = tmp_path / "src.json", tmp_path / "out.json", tmp_path / "cache.json"
+  data = make_source(src)
+  # 上次构建留下的标记对应旧代码
+  data["lessons"][1]["pine_code"] = "plot(open)"
+  data["lessons"][1]["pine_html"] = '<span class="hljs-built_in">plot</span>(close)'
+  src.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+  monkeypatch.setattr(build_lessons.highlight_lessons, "lex", None)
+  build_lessons.build(str(src), str(out), ["highlight"], cache_path=str(cache))
+  built = {l["id"]: l for l in json.loads(out.read_text(encoding="utf-8"))["lessons"]}
+  assert "pine_html" not in built["l1_intro"] and built["l1_intro"]["pine_code"] == "plot(open)"
+
+
+def test_precache_manifest(tmp_path):
+  web = tmp_path / "web"
+  (web / "data").mkdir(parents=True)
+  (web / "lib").mkdir()
+  for name in build_lessons.PRECACHE_FILES:
+    (web / name).write_text(name, encoding="utf-8")
+  (web / "lib" / "empty.js").write_text("", encoding="utf-8")
+  (web / "lib" / "x.js").write_text("x", encoding="utf-8")
+  path = tmp_path / "m.js"
+  assert build_lessons.write_manifest(str(path), str(web))
+  assert not build_lessons.write_manifest(str(path), str(web))
+  manifest = build_lessons.precache_manifest(str(web))
+  assert set(manifest["files"]) == set(build_lessons.PRECACHE_FILES) | {"lib/x.js"}
+  # 任一文件变化：该文件哈希与整体版本都变化，其余不变
+  (web / "app.js").write_text("changed", encoding="utf-8")
+  changed = build_lessons.precache_manifest(str(web))
+  assert changed["version"] != manifest["version"]
+  assert [k for k in manifest["files"] if manifest["files"][k] != changed["files"][k]] == ["app.js"]
+  assert manifest["bundles"] == {}
+
+
+def test_precache_manifest_lists_bundles(tmp_path):
+  # 课程包的哈希就是文件名：sw.js 激活时据此删除运行时缓存中 __rev 不一致的旧包
+  web = tmp_path / "web"
+  (web / "data" / "locked").mkdir(parents=True)
+  for name in build_lessons.PRECACHE_FILES:
+    (web / name).write_text(name, encoding="utf-8")
+  name, data = build_lessons.encrypt_lessons.make_bundle({"concept": "<p>付费</p>"})
+  (web / "data" / "locked" / name).write_bytes(data)
+  manifest = build_lessons.precache_manifest(str(web))
+  assert manifest["bundles"] == {f"data/locked/{name}": name[:-len(".bin")]}
+  assert "data/locked/" + name not in manifest["files"]
+
+
+def test_committed_precache_manifest_is_current():
+  text = (ROOT / "web" / "precache-manifest.js").read_text(encoding="utf-8")
+  committed = json.loads(text.split("=", 1)[1].rsplit(";", 1)[0])
+  assert committed == build_lessons.precache_manifest(), "请运行 python build_lessons.py --manifest-only"
@@ -0,0 +1,98 @@
+# 中文说明：课程加密脚本测试
+# 目的：验证整块 XOR 与前端 xorDecrypt 互为逆运算，流式输出与一次性输出一致
+import io
+import json
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import encrypt_lessons  # noqa: E402
+from encrypt_lessons import KEY, xor_bytes, xor_decrypt, xor_encrypt  # noqa: E402
+
+SAMPLES = ["", "a", "Pine Script 学习 📈", "//@version=5\nplot(close)\n" * 500]
+
+
+def naive_xor(data, key):
+  return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
+
+
+def test_xor_matches_bytewise_reference(monkeypatch):
+  # 缩小分块，覆盖跨块与尾块的情况
+  monkeypatch.setattr(encrypt_lessons, "CHUNK_SIZE", 64)
+  key = KEY.encode()
+  for text in SAMPLES:
+    data = text.encode()
+    assert xor_bytes(data, key) == naive_xor(data, key)
+    assert xor_decrypt(xor_encrypt(text, KEY), KEY) == text
+
+
+def test_roundtrip_with_frontend_xor_decrypt():
+  node = shutil.which("node")
+  if not node:
+    pytest.skip("需要 node 运行前端解密函数")
+  app_js = (ROOT / "web" / "app.js").read_text(encoding="utf-8")
+  fn = "".join(re.search(rf"function {name}\(.*?\n  }}\n", app_js, re.S).group(0) for name in ("xorBytes", "xorDecrypt"))
+  script = fn + "\nconst items = JSON.parse(require('fs').readFileSync(0, 'utf8'));\n" \
+    "process.stdout.write(JSON.stringify(items.map(([c, k]) => xorDecrypt(c, k))));"
+  items = [[xor_encrypt(t, KEY), KEY] for t in SAMPLES if t]
+  out = subprocess.run([node, "-e", script], input=json.dumps(items), capture_output=True, text=True, check=True)
+  assert json.loads(out.stdout) == [t for t in SAMPLES if t]
+
+
+def test_streaming_output_matches_json_dump():
+  data = {
+    "version": "1.2",
+    "lessons": [
+      {"id": "free", "concept": "<p>公开</p>", "quiz": []},
+      {"id": "paid", "isLocked": True, "concept": "<p>付费</p>", "pine_code": "plot(close)", "summary": ["x"]},
+    ],
+  }
+  expected = json.loads(json.dumps(data))
+  encrypt_lessons.encrypt_catalogue(expected)
+  buf = io.StringIO()
+  source = json.loads(json.dumps(data))
+  assert encrypt_lessons.write_streaming(source, buf) == 1
+  assert buf.getvalue() == json.dumps(expected, ensure_ascii=False, indent=2)
+  # 逐课加密的是副本，写出后即释放，源数据保持明文
+  assert source == data
+  paid = expected["lessons"][1]
+  assert paid["isEncrypted"] and paid["concept"].startswith("ENC:")
+  # 已加密字段不会被二次加密
+  again = json.loads(json.dumps(expected))
+  encrypt_lessons.encrypt_catalogue(again)
+  assert again == expected
+  assert xor_decrypt(paid["concept"][4:], KEY) == "<p>付费</p>"
+
+
+def test_bundle_roundtrip_with_frontend_xor_bytes():
+  lesson = {"id": "paid", "isLocked": True, "concept": "<p>付费</p>", "pine_code": "ENC:" + xor_encrypt("plot(close)", KEY)}
+  name, data = encrypt_lessons.make_bundle(lesson)
+  assert name == encrypt_lessons.make_bundle(lesson)[0] and name.endswith(".bin")
+  assert encrypt_lessons.open_bundle(data) == {"concept": "<p>付费</p>", "pine_code": "plot(close)"}
+  node = shutil.which("node")
+  if not node:
+    pytest.skip("需要 node 运行前端解密函数")
+  app_js = (ROOT / "web" / "app.js").read_text(encoding="utf-8")
+  fn = re.search(r"function xorBytes\(.*?\n  }\n", app_js, re.S).group(0)
+  script = fn + "\nconst buf = require('fs').readFileSync(0);\n" \
+    "process.stdout.write(new TextDecoder().decode(xorBytes(new Uint8Array(buf), 'pinegood888')));"
+  out = subprocess.run([node, "-e", script], input=data, capture_output=True, check=True)
+  assert json.loads(out.stdout.decode("utf-8"))["concept"] == "<p>付费</p>"
+
+
+def test_committed_bundles_decrypt():
+  data_dir = ROOT / "web" / "data"
+  lessons = json.loads((data_dir / "lessons.json").read_text(encoding="utf-8"))["lessons"]
+  locked = [l for l in lessons if l.get("isLocked")]
+  assert locked and all(l.get("bundle") for l in locked)
+  for l in locked:
+    assert not any(l.get(f) for f in encrypt_lessons.FIELDS), l["id"]
+    payload = encrypt_lessons.open_bundle((data_dir / l["bundle"]).read_bytes())
+    assert payload.get("pine_code"), l["id"]
@@ -0,0 +1,55 @@
+# 中文说明：构建期语法高亮测试
+# 目的：验证 Pine 词法分类、HTML 转义与“去掉标签后与源码一致”
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pygments")
+
+import highlight_lessons  # noqa: E402
+
+PINE = '''//@version=5
+indicator("MA <cross>", overlay=true)
+fast = ta.sma(close, 10) // 快线
+var float level = na
+f(x) => x * 2
+plot(fast, color=color.red, style=plot.style_line)
+'''
+
+
+def spans(markup):
+  return {text: cls for cls, text in re.findall(r'<span class="([^"]+)">([^<]*)</span>', markup)}
+
+
+def test_pine_tokens_use_hljs_classes():
+  got = spans(highlight_lessons.highlight(PINE, "pine"))
+  assert got["//@version=5"] == "hljs-meta"
+  assert got["// 快线"] == "hljs-comment"
+  assert got["ta"] == "hljs-built_in" and got["sma"] == "hljs-built_in"
+  assert got["var"] == "hljs-keyword"
+  assert got["float"] == "hljs-type"
+  assert got["na"] == "hljs-literal"
+  assert got["close"] == "hljs-variable"
+  assert got["f"] == "hljs-title function_"
+  assert got["10"] == "hljs-number"
+  # color.red 是命名空间成员，不是类型关键字
+  assert got["color"] == "hljs-built_in"
+
+
+def test_markup_is_escaped_and_round_trips():
+  for code, lang in ((PINE, "pine"), ("def f(a):\n    return a < 1 and '&'\n", "python")):
+    markup = highlight_lessons.highlight(code, lang)
+    assert re.sub(r"</?span[^>]*>", "", markup).count("<") == 0
+    assert highlight_lessons.strip_tags(markup) == code
+
+
+def test_highlight_lesson_skips_encrypted_fields():
+  lesson = {"pine_code": "plot(close)", "python_code": "ENC:abcd", "python_html": "stale"}
+  highlight_lessons.highlight_lesson(lesson)
+  assert highlight_lessons.strip_tags(lesson["pine_html"]) == "plot(close)"
+  assert "python_html" not in lesson
@@ -0,0 +1,63 @@
+# 中文说明：课程修订日志测试
+# 目的：验证只在内容变化时生成修订、超出保留范围的修订号要求全量重新加载，
+# 对真实课程做小改动时增量响应远小于完整课程数据，以及服务端日志写在数据目录、不修改构建发布的日志
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server import lesson_revisions  # noqa: E402
+from server.lesson_revisions import RevisionLog  # noqa: E402
+from server.lessons_store import LessonsStore, build_snapshot  # noqa: E402
+
+
+def test_record_and_trim(monkeypatch):
+  monkeypatch.setattr(lesson_revisions, "MAX_REVISIONS", 3)
+  log = RevisionLog()
+  lessons = [{"id": "a", "v": 0}, {"id": "b", "v": 0}]
+  assert log.record(lessons) and not log.record(json.loads(json.dumps(lessons)))
+  for v in range(1, 5):
+    lessons[0]["v"] = v
+    assert log.record(lessons)
+  assert log.revision == 5 and [r["rev"] for r in log.revisions] == [3, 4, 5]
+  # 修订 2 之后的改动都还在日志中；更早的修订号需要全量重新加载
+  assert log.changes_since(2).upsert == ["a"]
+  assert log.changes_since(1) is None and log.changes_since(6) is None
+  assert log.record(list(reversed(lessons))) and log.changes_since(5).reordered
+
+
+def test_small_edit_costs_bytes_not_catalogue():
+  data = json.loads((ROOT / "web" / "data" / "lessons.json").read_text(encoding="utf-8"))
+  log = RevisionLog()
+  log.record(data["lessons"])
+  full = build_snapshot(data, revisions=log.copy()).body.raw
+  # 相当于 renumber_titles.py 改了一节课的标题
+  data["lessons"][3]["title"] += "（修订）"
+  log.record(data["lessons"])
+  delta = build_snapshot(data, revisions=log.copy()).changes(1).raw
+  assert json.loads(delta)["upsert"][0]["id"] == data["lessons"][3]["id"]
+  assert len(delta) * 10 < len(full)
+
+
+def test_server_log_seeded_from_published_log(tmp_path):
+  web, data_dir = tmp_path / "web", tmp_path / "data"
+  web.mkdir()
+  data_dir.mkdir()
+  lessons = [{"id": "a", "title": "A"}, {"id": "b", "title": "B"}]
+  published = RevisionLog()
+  published.record(lessons)
+  published.record(lessons[:1])
+  published.save(web / "lessons.revisions.json")
+  before = (web / "lessons.revisions.json").read_bytes()
+  (web / "lessons.json").write_text(json.dumps({"lessons": [lessons[0], {"id": "c", "title": "C"}]}), encoding="utf-8")
+
+  store = LessonsStore(web / "lessons.json", check_interval=0, revisions_path=data_dir / "lessons.revisions.json")
+  snap = store.get()
+  # 修订号接着构建发布的日志继续递增，新修订只写入服务端数据目录
+  assert snap.revision == 3 and json.loads(snap.changes(2).raw)["upsert"][0]["id"] == "c"
+  assert (web / "lessons.revisions.json").read_bytes() == before
+  assert RevisionLog.load(data_dir / "lessons.revisions.json").revision == 3
+  # 临时文件名唯一且替换后不残留
+  assert sorted(p.name for p in data_dir.iterdir()) == ["lessons.revisions.json", "lessons.revisions.json.lock"]
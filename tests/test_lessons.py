@@ -1,9 +1,14 @@
 # 中文说明：课程数据最小单元测试
-# 目的：验证 lessons.json 的结构完整性，避免前端加载异常
+# 目的：验证 lessons.json 的结构完整性与内容正确性（代码可解析、测验答案唯一），避免前端加载异常
 import json
+import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import validate_lessons  # noqa: E402
+
 LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
 
 
@@ -21,3 +26,9 @@ def test_lessons_schema():
     assert "python_code" in l and isinstance(l["python_code"], str), "缺少 python_code"
     assert "quiz" in l and isinstance(l["quiz"], list), "缺少 quiz 列表"
 
+
+def test_lessons_content_valid():
+  # Pine 代码完整语法分析、Python 代码 ast.parse、测验恰好一个正确选项（锁定课程先还原明文）
+  report = validate_lessons.validate_file(str(LESSONS_FILE), workers=1, cache_path=None)
+  assert report.lessons == len(json.loads(LESSONS_FILE.read_text(encoding="utf-8"))["lessons"])
+  assert report.ok, report.errors
@@ -0,0 +1,60 @@
+# 中文说明：课程二进制格式测试
+# 目的：验证 MessagePack 编码与标准一致、整体/流式/单课解码与 JSON 一致，以及提交的 lessons.bin 与 lessons.json 同步
+import io
+import json
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server import lessons_pack  # noqa: E402
+from server.lessons_pack import PackedLessons, iter_lessons, pack, packb, unpack  # noqa: E402
+
+CATALOGUE = {
+  "version": "t",
+  "lessons": [
+    {"id": "a", "title": "甲", "category": "基础语法 (Basics)", "n": -3, "big": 2 ** 40, "neg": -70000,
+     "ratio": 0.5, "ok": True, "none": None, "quiz": [{"q": "x" * 300, "choices": list(range(20))}]},
+    {"id": "b", "title": "乙", "category": "量化策略 (Strategies)", "concept": "长" * 30000},
+    {"id": "c", "title": "丙", "category": "基础语法 (Basics)"},
+  ],
+}
+
+
+def test_packb_matches_msgpack_spec():
+  assert packb(None) == b"\xc0" and packb(True) == b"\xc3" and packb(5) == b"\x05"
+  assert packb(-1) == b"\xff" and packb(200) == b"\xcc\xc8" and packb(-100) == b"\xd0\x9c"
+  assert packb("ab") == b"\xa2ab" and packb([1, 2]) == b"\x92\x01\x02"
+  assert packb({"a": 1}) == b"\x81\xa1a\x01"
+  assert packb(1.5) == b"\xcb" + struct.pack(">d", 1.5)
+  with pytest.raises(TypeError):
+    packb(object())
+
+
+def test_roundtrip_full_stream_and_single(tmp_path, monkeypatch):
+  monkeypatch.setattr(lessons_pack, "msgpack", None)  # 始终覆盖纯 Python 解码路径
+  data = pack(CATALOGUE)
+  # 分类名只存一次
+  assert data.count("基础语法 (Basics)".encode()) == 1
+  assert unpack(data) == CATALOGUE
+  assert list(iter_lessons(io.BytesIO(data))) == CATALOGUE["lessons"]
+  path = tmp_path / "l.bin"
+  path.write_bytes(data)
+  with PackedLessons(path) as packed:
+    assert packed.ids() == ["a", "b", "c"] and packed.meta == {"version": "t"}
+    assert packed.lesson("c") == CATALOGUE["lessons"][2]
+    assert packed.lesson("nope") is None
+
+
+def test_rejects_other_files():
+  with pytest.raises(ValueError):
+    unpack(b"{}" * 20)
+
+
+def test_committed_binary_matches_json():
+  lessons = json.loads((ROOT / "web" / "data" / "lessons.json").read_text(encoding="utf-8"))
+  assert (ROOT / "web" / "data" / "lessons.bin").read_bytes() == pack(lessons), "请运行 python build_lessons.py"
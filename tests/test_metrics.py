@@ -0,0 +1,80 @@
+# 中文说明：指标与采样分析测试
+# 目的：验证 Prometheus 文本格式、按路由模板聚合的延迟直方图、I/O 与计算线程池分开计时，以及 ?profile=1 写出 folded 调用栈
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.aio import run_cpu, run_io  # noqa: E402
+from server.metrics import CPU_SECONDS, IO_SECONDS, REQUEST_SECONDS, Histogram, MetricsMiddleware  # noqa: E402
+
+
+def test_histogram_render():
+  h = Histogram("t_seconds", "测试", ("op",), buckets=(0.1, 1.0))
+  h.observe(0.05, op="a")
+  h.observe(0.5, op="a")
+  h.observe(5, op="a")
+  lines = h.render()
+  assert 't_seconds_bucket{op="a",le="0.1"} 1' in lines
+  assert 't_seconds_bucket{op="a",le="1.0"} 2' in lines
+  assert 't_seconds_bucket{op="a",le="+Inf"} 3' in lines
+  assert 't_seconds_count{op="a"} 3' in lines
+
+
+def test_metrics_endpoint(client):
+  before = REQUEST_SECONDS.count(method="GET", route="/lessons/{lesson_id}", status=200)
+  client.get("/lessons")
+  client.get("/lessons/a")
+  client.get("/lessons/missing")
+  assert REQUEST_SECONDS.count(method="GET", route="/lessons/{lesson_id}", status=200) == before + 1
+  r = client.get("/metrics")
+  assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+  text = r.text
+  assert 'ps_http_request_duration_seconds_count{method="GET",route="/lessons/{lesson_id}",status="404"}' in text
+  assert 'ps_http_response_bytes_total{route="/lessons"}' in text
+  assert 'ps_json_seconds_count{op="parse"}' in text
+  assert "ps_lessons_cache_hit_ratio " in text
+  assert "# TYPE ps_write_queue_depth gauge" in text
+
+
+
+def test_cpu_pool_timed_separately_from_io():
+  def crunch():
+    return sum(range(1000))
+
+  def read():
+    return b""
+
+  asyncio.run(run_cpu(crunch))
+  asyncio.run(run_io(read))
+  cpu_op = crunch.__qualname__
+  io_op = read.__qualname__
+  assert CPU_SECONDS.count(op=cpu_op) == 1 and IO_SECONDS.count(op=cpu_op) == 0
+  assert IO_SECONDS.count(op=io_op) == 1 and CPU_SECONDS.count(op=io_op) == 0
+
+
+def test_profile_writes_folded_stacks(tmp_path, monkeypatch):
+  monkeypatch.setenv("PS_PROFILE_DIR", str(tmp_path))
+  app = FastAPI()
+
+  @app.get("/slow")
+  def slow():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+      pass
+    return {"ok": True}
+
+  app.add_middleware(MetricsMiddleware, profile=True)
+  with TestClient(app) as c:
+    assert "x-profile-file" not in c.get("/slow").headers
+    r = c.get("/slow", params={"profile": 1})
+  path = Path(r.headers["x-profile-file"])
+  lines = path.read_text(encoding="utf-8").splitlines()
+  assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+  assert any("slow (test_metrics.py" in line for line in lines)
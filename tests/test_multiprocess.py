@@ -0,0 +1,75 @@
+# 中文说明：多进程部署测试
+# 目的：多个进程（各自导入 server.main，相当于多个工作进程）同时写同一用户的进度，确认没有写入丢失
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.progress_store import open_progress_store  # noqa: E402
+
+PROCESSES = 4
+WRITES = 25
+
+WORKER = textwrap.dedent("""
+  import sys, time
+  from fastapi.testclient import TestClient
+  from server import main
+
+  name, start_at, writes = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+  with TestClient(main.app) as client:
+    time.sleep(max(0.0, start_at - time.time()))
+    for i in range(writes):
+      # 同一用户：每个进程写不同的课程，任何一次读改写被覆盖都会丢课程
+      r = client.patch("/progress", json={"user": "shared", "changes": [{"lessonId": f"{name}-{i}", "field": "readDone", "val": True}]})
+      assert r.status_code == 200, r.text
+      r = client.post("/progress", json={"user": name, "progress": {"lessons": {}, "n": i}})
+      assert r.status_code == 200, r.text
+""")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_concurrent_processes_lose_no_writes(tmp_path, backend):
+  if backend == "json" and os.name == "nt":
+    pytest.skip("JSON 后端的文件锁仅支持类 Unix 系统")
+  env = {
+    **os.environ,
+    "PS_DATA_DIR": str(tmp_path),
+    "PS_PROGRESS_BACKEND": backend,
+    "PS_WORKERS": str(PROCESSES),
+    # 本测试关注写入不丢失，关闭限流（每个用户短时间内写入远超默认突发额度）
+    "PS_RATE_USER": "0",
+    "PS_RATE_IP": "0",
+    "PYTHONPATH": str(ROOT),
+  }
+  start_at = time.time() + 3
+  procs = [
+    subprocess.Popen([sys.executable, "-c", WORKER, f"p{n}", str(start_at), str(WRITES)], env=env, cwd=ROOT,
+                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    for n in range(PROCESSES)
+  ]
+  for p in procs:
+    out, _ = p.communicate(timeout=120)
+    assert p.returncode == 0, out.decode("utf-8", "replace")
+
+  store = open_progress_store(tmp_path, backend)
+  try:
+    progress, version = store.get_with_version("shared")
+    assert len(progress["lessons"]) == PROCESSES * WRITES
+    assert version == PROCESSES * WRITES
+    for n in range(PROCESSES):
+      assert store.get_with_version(f"p{n}") == ({"lessons": {}, "n": WRITES - 1}, WRITES)
+    counts = store.counts()
+    assert counts[("", "users")] == PROCESSES + 1
+    assert counts == store.rebuild_counts()
+  finally:
+    store.close()
+  if backend == "json":
+    json.loads((tmp_path / "progress.json").read_text(encoding="utf-8"))
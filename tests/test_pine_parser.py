@@ -0,0 +1,114 @@
+# 中文说明：Pine Script 解析器测试
+# 目的：验证缩进块、续行、if 表达式与函数定义的语法树，错误带行号，且全部课程示例代码都能解析
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+from server.pine_parser import (  # noqa: E402
+  Assign, Binary, Call, For, ForIn, FuncDef, If, Import, Index, Name, PineSyntaxError, Switch, Ternary, TypeDef,
+  While, parse,
+)
+
+LESSONS_FILE = ROOT / "web" / "data" / "lessons.json"
+
+
+def test_parse_statements():
+  script = parse("""//@version=5
+indicator("T", overlay=true)
+var float x = na
+[m, s, h] = ta.macd(close, 12, 26,
+     9)
+y = close > open ? high : low[2]
+f(a, b = 2) => a * b
+for i = 0 to 10 by 2
+    x := x + i
+""")
+  assert script.version == 5
+  call, var, macd, tern, fn, loop = script.body
+  assert isinstance(call.expr, Call) and call.expr.kwargs[0][0] == "overlay"
+  assert isinstance(var, Assign) and var.mode == "var" and var.type == "float"
+  assert macd.targets == ["m", "s", "h"] and len(macd.value.args) == 4
+  assert isinstance(tern.value, Ternary) and isinstance(tern.value.orelse, Index)
+  assert isinstance(fn, FuncDef) and [p for p, _ in fn.params] == ["a", "b"]
+  assert isinstance(loop, For) and loop.step.value == 2 and loop.body[0].op == ":="
+
+
+def test_parse_if_expression_and_precedence():
+  script = parse("""msg = if close > open
+    "up"
+else if close < open
+    "down"
+else
+    "flat"
+z = 1 + 2 * 3 > 4 and not na(close)
+""")
+  node = script.body[0].value
+  assert isinstance(node, If) and len(node.branches) == 2 and node.orelse is not None
+  cond = script.body[1].value
+  assert isinstance(cond, Binary) and cond.op == "and"
+  assert cond.left.op == ">" and cond.left.left.op == "+"
+
+
+def test_soft_keywords_as_names():
+  script = parse('type = input.string("SMA", "MA Type")\nplot(type == "SMA" ? close : open)')
+  assert script.body[0].targets == ["type"]
+  assert isinstance(script.body[1].expr.args[0].cond.left, Name)
+
+
+def test_parse_v5_declarations_and_loops():
+  script = parse("""import TradingView/ta/7 as tvta
+export type Pivot
+    float price = na
+    array<float> xs
+method shift(Pivot p, float d = 1.0) =>
+    p.price + d
+ma = switch input.string("SMA")
+    "SMA" => ta.sma(close, 14)
+    "EMA" =>
+        ta.ema(close, 14)
+    => close
+switch
+    close > open => plot(close)
+i = 0
+while i < 3
+    i += 1
+for [k, v] in levels
+    plot(v)
+""")
+  imp, typ, method, ma, cond, _, loop, each = script.body
+  assert isinstance(imp, Import) and imp.path == "TradingView/ta/7" and imp.alias == "tvta"
+  assert isinstance(typ, TypeDef) and typ.export and [f[:2] for f in typ.fields] == [("float", "price"), ("array<float>", "xs")]
+  assert isinstance(method, FuncDef) and method.method and [p for p, _ in method.params] == ["p", "d"]
+  assert isinstance(ma.value, Switch) and len(ma.value.cases) == 2 and ma.value.default is not None
+  assert isinstance(cond, Switch) and cond.subject is None and cond.default is None
+  assert isinstance(loop, While) and loop.body[0].op == "+="
+  assert isinstance(each, ForIn) and each.targets == ["k", "v"] and each.iterable.id == "levels"
+
+
+@pytest.mark.parametrize("code,line", [
+  ("x = (1 + 2", 1),
+  ("plot(close)\ny = = 3", 2),
+  ("if close > open\nplot(close)", 2),
+  ("a = 1\nwhile a < 3\na += 1", 3),
+  ("x = switch a\n    => 1\n    2 => 3", 3),
+  ("import foo/bar as b", 1),
+])
+def test_syntax_errors_have_line(code, line):
+  with pytest.raises(PineSyntaxError) as err:
+    parse(code)
+  assert err.value.line == line
+
+
+def test_all_lessons_parse():
+  data = json.loads(LESSONS_FILE.read_text(encoding="utf-8"))
+  build_lessons.restore_bundles(data, LESSONS_FILE)
+  for lesson in data["lessons"]:
+    if lesson.get("pine_code", "").startswith("ENC:"):
+      continue
+    assert parse(lesson["pine_code"]).body, lesson["id"]
@@ -0,0 +1,180 @@
+# 中文说明：Pine 向量化运行时测试
+# 目的：验证 ta.* 向量化实现与逐根 K 线的朴素循环一致，以及分支合并、var 累加、input 覆盖、绘图采集与结果缓存
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import build_lessons  # noqa: E402
+from server import pine_ta as ta  # noqa: E402
+from server.pine_runtime import PineRuntimeError, RunCache, run, synthetic_ohlcv  # noqa: E402
+
+DATA = synthetic_ohlcv(400, seed=7)
+CLOSE, HIGH, LOW = DATA["close"], DATA["high"], DATA["low"]
+
+
+def naive_ewm(x, alpha, length):
+  """中文说明：Pine 的 ema/rma：前 length 根用 SMA 作为种子，之后逐根递推"""
+  out = np.full(len(x), np.nan)
+  for i in range(length - 1, len(x)):
+    out[i] = x[i - length + 1:i + 1].mean() if i == length - 1 else alpha * x[i] + (1 - alpha) * out[i - 1]
+  return out
+
+
+def naive_window(x, length, fn):
+  out = np.full(len(x), np.nan)
+  for i in range(length - 1, len(x)):
+    out[i] = fn(x[i - length + 1:i + 1])
+  return out
+
+
+def plots(result):
+  return {p["title"]: p["values"] for p in result.plots}
+
+
+def test_kernels_match_naive_loops():
+  assert np.allclose(ta.sma(CLOSE, 14), naive_window(CLOSE, 14, np.mean), equal_nan=True)
+  assert np.allclose(ta.ema(CLOSE, 12), naive_ewm(CLOSE, 2 / 13, 12), equal_nan=True)
+  assert np.allclose(ta.rma(CLOSE, 14), naive_ewm(CLOSE, 1 / 14, 14), equal_nan=True)
+  assert np.allclose(ta.highest(HIGH, 20), naive_window(HIGH, 20, np.max), equal_nan=True)
+  assert np.allclose(ta.lowest(LOW, 20), naive_window(LOW, 20, np.min), equal_nan=True)
+  assert np.allclose(ta.stdev(CLOSE, 20), naive_window(CLOSE, 20, np.std), equal_nan=True)
+
+
+def test_linear_recurrence_long_series():
+  rng = np.random.default_rng(1)
+  z = rng.normal(size=5000)
+  out = ta.linear_recurrence(z, 0.999, 3.0)
+  prev, expected = 3.0, np.empty_like(z)
+  for i, v in enumerate(z):
+    prev = 0.999 * prev + v
+    expected[i] = prev
+  assert np.allclose(out, expected, rtol=1e-10)
+
+
+def test_rsi_and_crosses():
+  diff = np.diff(CLOSE, prepend=np.nan)
+  up = naive_ewm(np.maximum(diff[1:], 0), 1 / 14, 14)
+  down = naive_ewm(np.maximum(-diff[1:], 0), 1 / 14, 14)
+  expected = np.concatenate(([np.nan], 100 - 100 / (1 + up / down)))
+  assert np.allclose(ta.rsi(CLOSE, 14), expected, equal_nan=True)
+  fast, slow = ta.sma(CLOSE, 5), ta.sma(CLOSE, 20)
+  over = [i for i in range(1, len(CLOSE)) if fast[i] > slow[i] and fast[i - 1] <= slow[i - 1]]
+  assert np.flatnonzero(ta.crossover(fast, slow)).tolist() == over
+
+
+def test_run_macd_bb_and_inputs():
+  code = """//@version=5
+indicator("MACD + BB")
+fast = input.int(12, "Fast")
+src = input.source(close, "Source")
+[m, s, h] = ta.macd(src, fast, 26, 9)
+[mid, up, lo] = ta.bb(src, 20, 2.0)
+plot(m, "macd")
+plot(h, "hist", color=color.new(color.red, 50))
+plot(up - lo, "width")
+hline(0, "zero")
+"""
+  result = run(code, {"bars": 400, "seed": 7}, {"Fast": 8, "src": "hl2"})
+  out = plots(result)
+  src = (HIGH + LOW) / 2
+  m, _s, h = ta.macd(src, 8, 26, 9)
+  assert np.allclose(out["macd"], m, equal_nan=True)
+  assert np.allclose(out["hist"], h, equal_nan=True)
+  assert result.plots[1]["color"] == "#F2364580"
+  assert np.allclose(out["width"], 4 * ta.stdev(src, 20), equal_nan=True)
+  assert result.hlines == [{"price": 0.0, "title": "zero", "color": None}]
+  assert [(i["title"], i["default"], i["value"]) for i in result.inputs] == [("Fast", 12, 8), ("Source", "close", "hl2")]
+  with pytest.raises(PineRuntimeError):
+    run(code, {"bars": 400}, {"Fast": "abc"})
+
+
+def test_run_branches_var_and_functions():
+  code = """indicator("flow")
+var count = 0
+if close > open
+    count += 1
+var float last = na
+if ta.crossover(close, ta.sma(close, 10))
+    last := close
+state = 0
+if close > open
+    state := 1
+else if close < open
+    state := -1
+double(x, n) =>
+    s = ta.sma(x, n)
+    s * 2
+total = 0.0
+for i = 1 to 3
+    total := total + i
+plot(count, "count")
+plot(last, "last")
+plot(state, "state")
+plot(double(close, 10), "double")
+plot(total, "total")
+plotshape(ta.crossover(close, ta.sma(close, 10)), "cross")
+"""
+  result = run(code, {"bars": 400, "seed": 7})
+  out = plots(result)
+  assert np.array_equal(out["count"], np.cumsum(CLOSE > DATA["open"]))
+  cross = ta.crossover(CLOSE, ta.sma(CLOSE, 10))
+  held, cur = [], np.nan
+  for i in range(len(CLOSE)):
+    cur = CLOSE[i] if cross[i] else cur
+    held.append(cur)
+  assert np.allclose(out["last"], held, equal_nan=True)
+  assert np.array_equal(out["state"], np.sign(CLOSE - DATA["open"]))
+  assert np.allclose(out["double"], ta.sma(CLOSE, 10) * 2, equal_nan=True)
+  assert (out["total"] == 6).all()
+  assert result.shapes[0]["bars"].tolist() == np.flatnonzero(cross).tolist()
+
+
+@pytest.mark.parametrize("code,message", [
+  ("x = 0.0\nx := x[1] + 1", "历史值"),
+  ("plot(foo)", "未定义"),
+  ("a = array.new_float(3)", "不支持的函数"),
+  ("plot(ta.sma(close, close))", "常量"),
+  ("for i = 0 to 100000\n    a = 1", "上限"),
+  ("i = 0\nwhile i < 3\n    i += 1", "不支持的语句"),
+  ("method twice(float x) => x * 2", "method"),
+])
+def test_runtime_errors(code, message):
+  with pytest.raises(PineRuntimeError) as err:
+    run(code, {"bars": 50})
+  assert message in err.value.message and err.value.line >= 1
+
+
+def test_all_indicator_lessons_run():
+  data = json.loads((ROOT / "web" / "data" / "lessons.json").read_text(encoding="utf-8"))
+  build_lessons.restore_bundles(data, ROOT / "web" / "data" / "lessons.json")
+  ran = 0
+  for lesson in data["lessons"]:
+    code = lesson.get("pine_code", "")
+    if code.startswith("ENC:") or "strategy(" in code or "array." in code or "map." in code or "ta.sar" in code:
+      continue
+    result = run(code, {"bars": 300})
+    assert result.bars == 300, lesson["id"]
+    ran += 1
+  assert ran >= 15
+
+
+def test_run_cache_and_tail():
+  cache = RunCache(max_entries=2)
+  code = "plot(ta.ema(close, 5))\nplotshape(close > open)"
+  first, hit = cache.run(code, {"bars": 100}, {})
+  assert not hit
+  again, hit = cache.run(code, {"bars": 100}, {})
+  assert hit and again is first
+  cache.run(code, {"bars": 100, "seed": 1}, {})
+  cache.run(code, {"bars": 100, "seed": 2}, {})
+  assert cache.run(code, {"bars": 100}, {})[1] is False
+  assert cache.stats()["entries"] == 2
+  public = first.to_public(tail=10)
+  assert public["bars"] == 10 and len(public["plots"][0]["values"]) == 10
+  assert all(0 <= b < 10 for b in public["shapes"][0]["bars"])
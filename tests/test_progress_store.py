@@ -0,0 +1,122 @@
+# 中文说明：进度存储后端测试
+# 目的：验证 SQLite/JSON 两种后端行为一致，以及 JSON -> SQLite 迁移
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.progress_store import (  # noqa: E402
+  JsonProgressStore,
+  SqliteProgressStore,
+  migrate_json_to_sqlite,
+  open_progress_store,
+)
+
+PROGRESS = {
+  "lessons": {
+    "l1_intro": {"readDone": True, "codeDone": True, "quizDone": False},
+    "ind_macd": {"readDone": True, "codeDone": False, "quizDone": False},
+  },
+  "totalCompleted": 1,
+}
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+  s = open_progress_store(tmp_path, request.param)
+  yield s
+  s.close()
+
+
+def test_roundtrip_and_replace(store):
+  store.save("u1", PROGRESS)
+  store.save_many({"u2": {"lessons": {}}, "u3": {"custom": 1}})
+  assert store.get("u1") == PROGRESS
+  assert store.get("u2") == {"lessons": {}}
+  assert store.get("u3") == {"custom": 1}
+  # 保存是整体替换：不再出现的课程会被删除
+  smaller = {"lessons": {"l1_intro": {"readDone": True}}, "totalCompleted": 0}
+  store.save("u1", smaller)
+  assert store.get("u1") == smaller
+  assert dict(store.iter_all())["u1"] == smaller
+
+
+def test_sqlite_one_row_per_lesson(tmp_path):
+  store = SqliteProgressStore(tmp_path / "p.db")
+  store.save("u1", PROGRESS)
+  store.close()
+  conn = sqlite3.connect(str(tmp_path / "p.db"))
+  assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+  rows = conn.execute("SELECT lesson_id FROM progress WHERE user = 'u1' ORDER BY lesson_id").fetchall()
+  assert [r[0] for r in rows] == ["", "ind_macd", "l1_intro"]
+
+
+
+def test_sqlite_rejects_empty_lesson_id(tmp_path):
+  store = SqliteProgressStore(tmp_path / "p.db")
+  store.save("u1", PROGRESS)
+  # 空串是顶层字段所在的行：拒绝保存，而不是悄悄覆盖或丢失
+  with pytest.raises(ValueError):
+    store.save("u1", {"lessons": {"": {"readDone": True}}, "totalCompleted": 9})
+  assert store.get_with_version("u1") == (PROGRESS, 1)
+  store.close()
+
+
+def test_json_rejects_reserved_user(tmp_path):
+  store = JsonProgressStore(tmp_path / "progress.json")
+  store.save("alice", PROGRESS)
+  store.save("alice", PROGRESS)
+  counts = store.counts()
+  with pytest.raises(ValueError):
+    store.save("__meta__", {"lessons": {}})
+  with pytest.raises(ValueError):
+    store.update("__meta__", lambda p: {"lessons": {}})
+  assert store.get_with_version("alice") == (PROGRESS, 2)
+  assert store.counts() == counts and counts
+
+def test_migrate_json_to_sqlite(tmp_path):
+  legacy = {"default": PROGRESS, "bob": {"lessons": {"l1_intro": {"readDone": True}}}}
+  (tmp_path / "progress.json").write_text(json.dumps(legacy), encoding="utf-8")
+  assert migrate_json_to_sqlite(tmp_path / "progress.json", tmp_path / "m.db") == 2
+  store = SqliteProgressStore(tmp_path / "m.db")
+  assert dict(store.iter_all()) == legacy
+  store.close()
+  # open_progress_store 首次打开时自动迁移
+  auto = open_progress_store(tmp_path, "sqlite")
+  assert auto.get("bob") == legacy["bob"]
+  auto.close()
+  assert isinstance(open_progress_store(tmp_path, "json"), JsonProgressStore)
+
+
+def test_stats_counters_incremental(store):
+  store.save("u1", PROGRESS)
+  store.save("u2", {"lessons": {"l1_intro": {"readDone": True, "codeDone": True, "quizDone": True}}})
+  counts = store.counts()
+  assert counts[("", "users")] == 2
+  assert counts[("l1_intro", "started")] == 2 and counts[("l1_intro", "completed")] == 1
+  assert counts[("ind_macd", "readDone")] == 1 and ("ind_macd", "codeDone") not in counts
+  # 整体替换：u1 去掉 ind_macd，完成 l1_intro
+  store.save("u1", {"lessons": {"l1_intro": {"readDone": True, "codeDone": True, "quizDone": True}}})
+  counts = store.counts()
+  assert counts[("l1_intro", "completed")] == 2 and ("ind_macd", "started") not in counts
+  assert counts[("", "users")] == 2
+  # 离线重建结果与增量计数一致
+  assert store.rebuild_counts() == counts
+
+
+def test_stats_backfilled_for_existing_db(tmp_path):
+  store = SqliteProgressStore(tmp_path / "p.db")
+  store.save("u1", PROGRESS)
+  store.close()
+  conn = sqlite3.connect(str(tmp_path / "p.db"))
+  conn.execute("DROP TABLE progress_stats")
+  conn.commit()
+  conn.close()
+  store = SqliteProgressStore(tmp_path / "p.db")
+  assert store.counts()[("l1_intro", "codeDone")] == 1
+  store.close()
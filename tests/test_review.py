@@ -0,0 +1,98 @@
+# 中文说明：SM-2 复习引擎测试
+# 目的：验证间隔计算、到期队列顺序、持久化后的重新加载、批量答题，以及不缓存卡组时多进程并发更新不丢失
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.review import DAY, Card, Deck, ReviewEngine, ReviewStore, schedule  # noqa: E402
+
+
+def test_sm2_intervals():
+  card = Card(card_id="l1_intro:0")
+  intervals = [schedule(card, 4, 0).interval for _ in range(4)]
+  assert intervals == [1.0, 6.0, 15.0, 37.5]
+  assert card.ease == 2.5  # quality=4 不改变 ease
+  schedule(card, 1, 0)
+  assert card.reps == 0 and card.interval == 1.0 and card.lapses == 1
+  assert card.ease < 2.5
+  for _ in range(20):
+    schedule(card, 0, 0)
+  assert card.ease == 1.3
+
+
+def test_deck_due_order_and_lazy_delete():
+  deck = Deck()
+  for i, due in enumerate([30, 10, 20, 500]):
+    deck.upsert(Card(card_id=f"a:{i}", due=due))
+  # 更新卡片后旧的堆条目应被忽略
+  deck.upsert(Card(card_id="a:1", due=400))
+  got = [c.card_id for c in deck.due(now=100, limit=10)]
+  assert got == ["a:2", "a:0"]
+  assert [c.card_id for c in deck.due(now=100, limit=1)] == ["a:2"]
+  assert [c.card_id for c in deck.due(now=1000, limit=10)] == ["a:2", "a:0", "a:1", "a:3"]
+
+
+def test_engine_persists_and_reloads(tmp_path):
+  async def scenario():
+    store = ReviewStore(tmp_path / "review.db")
+    engine = ReviewEngine(store, max_users=1)
+    await engine.answer("u1", "l1_intro", 0, 1, now=0)
+    await engine.answer("u1", "l1_intro", 1, 5, now=0)
+    await engine.answer("u2", "l1_intro", 0, 5, now=0)  # 触发 u1 被淘汰
+    assert engine.evictions == 1
+    cards, total = await engine.due("u1", 10, now=DAY + 1)
+    assert total == 2 and {c.card_id for c in cards} == {"l1_intro:0", "l1_intro:1"}
+    cards, _ = await engine.due("u1", 10, now=1)
+    assert cards == []
+    store.close()
+
+  asyncio.run(scenario())
+
+
+def test_uncached_updates_are_atomic_across_connections(tmp_path):
+  # 两个存储实例（各自的连接，相当于两个工作进程）同时更新同一张卡片
+  stores = [ReviewStore(tmp_path / "review.db") for _ in range(2)]
+  rounds = 150
+
+  def worker(store):
+    for _ in range(rounds):
+      store.update("u1", [("l1_intro:0", 4)], now=0)
+
+  threads = [threading.Thread(target=worker, args=(s,)) for s in stores]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  # 每次答对 reps 加 1：任何一次读改写交错都会少算
+  assert stores[0].load("u1")[0].reps == 2 * rounds
+
+  async def scenario():
+    engine = ReviewEngine(stores[0], max_users=0)
+    card = await engine.answer("u1", "l1_intro", 0, 4, now=0)
+    assert card.reps == 2 * rounds + 1 and engine.stats()["users_cached"] == 0
+
+  asyncio.run(scenario())
+  for store in stores:
+    store.close()
+
+
+def test_answer_many_matches_sequential_answers(tmp_path):
+  grades = [("l1_intro", 0, 4), ("l1_intro", 1, 1), ("l1_intro", 0, 5)]
+
+  async def scenario(max_users, name):
+    store = ReviewStore(tmp_path / name)
+    batch = await ReviewEngine(store, max_users=max_users).answer_many("u1", grades, now=0)
+    for lesson_id, idx, quality in grades:
+      await ReviewEngine(store, max_users=max_users).answer("u2", lesson_id, idx, quality, now=0)
+    stored = {u: sorted((c.card_id, c.reps, c.interval, c.ease) for c in store.load(u)) for u in ("u1", "u2")}
+    store.close()
+    return [c.card_id for c in batch], stored
+
+  for max_users in (10, 0):
+    ids, stored = asyncio.run(scenario(max_users, f"r{max_users}.db"))
+    assert ids == ["l1_intro:0", "l1_intro:1", "l1_intro:0"]
+    assert stored["u1"] == stored["u2"] and stored["u1"][0][1] == 2
@@ -0,0 +1,51 @@
+# 中文说明：全文检索测试
+# 目的：验证分词规则、BM25 排序、锁定课程只按标题检索以及热加载时的增量复用
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from server.search import SearchIndex, strip_html, tokenize  # noqa: E402
+
+LESSONS = [
+  {"id": "cross", "title": "均线交叉", "concept": "<p>使用 <b>ta.crossover</b> 判断金叉</p>",
+   "pine_code": "if ta.crossover(fast, slow)\n    strategy.entry(\"L\", strategy.long)", "python_code": "df['fast'] > df['slow']"},
+  {"id": "inputs", "title": "输入参数", "concept": "<p>input.source 与 input.int</p>",
+   "pine_code": "src = input.source(close)", "python_code": "src_col = 'close'"},
+  {"id": "locked", "title": "海龟策略", "isLocked": True, "concept": "ENC:abc", "pine_code": "ta.crossover secret"},
+]
+
+
+def test_tokenize_identifiers_and_cjk():
+  assert tokenize("ta.crossover(fast_ma)") == ["ta.crossover", "ta", "crossover", "fast_ma", "fast", "ma"]
+  assert tokenize("金叉") == ["金", "叉", "金叉"]
+  assert strip_html("<p>a &amp; <b>b</b></p>").split() == ["a", "&", "b"]
+
+
+def test_search_ranking_and_locked_titles():
+  index = SearchIndex.build(LESSONS)
+  hits = index.search("ta.crossover")
+  assert [h["id"] for h in hits] == ["cross"]
+  assert set(hits[0]["fields"]) == {"concept", "pine_code"}
+  assert index.search("input.source")[0]["id"] == "inputs"
+  assert index.search("金叉")[0]["id"] == "cross"
+  # 锁定课程只能按标题命中
+  assert [h["id"] for h in index.search("海龟")] == ["locked"]
+  assert index.search("secret") == []
+  assert index.search("") == [] and index.search("不存在的词汇zzz") == []
+
+
+def test_incremental_rebuild_reuses_unchanged_lessons():
+  first = SearchIndex.build(LESSONS)
+  changed = [dict(LESSONS[0], concept="<p>ta.crossunder</p>")] + LESSONS[1:]
+  second = SearchIndex.build(changed, previous=first)
+  assert second.stats()["reused"] == 2 and second.stats()["analyzed"] == 1
+  assert second.search("crossunder")[0]["id"] == "cross"
+
+
+def test_summary_list_is_indexed():
+  lessons = [dict(LESSONS[1], summary=["<b>ta.pivothigh</b> 找摆动高点", "其余要点"]), LESSONS[0]]
+  hits = SearchIndex.build(lessons).search("pivothigh")
+  assert [h["id"] for h in hits] == ["inputs"]
+  assert hits[0]["fields"] == ["summary"]
@@ -0,0 +1,286 @@
+# 中文说明：后端接口单元测试
+# 目的：验证课程缓存与进度接口的行为，使用临时目录隔离真实数据
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from conftest import SAMPLE, public, write_lessons  # noqa: E402
+from server import main  # noqa: E402
+from server.admission import RateLimiter, WriteGate  # noqa: E402
+from server.lessons_store import LessonsStore  # noqa: E402
+
+
+def test_lessons_served_from_cache(client):
+  r1 = client.get("/lessons")
+  r2 = client.get("/lessons")
+  assert r1.status_code == 200
+  assert r1.json() == public(SAMPLE)
+  assert r2.content == r1.content
+  stats = client.get("/stats/cache").json()
+  assert stats["misses"] == 1 and stats["hits"] == 1 and stats["reloads"] == 0
+
+
+def test_lessons_hot_reload(client, lessons_file):
+  client.get("/lessons")
+  changed = dict(SAMPLE, version="v2")
+  write_lessons(lessons_file, changed)
+  st = lessons_file.stat()
+  os.utime(lessons_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+  assert client.get("/lessons").json()["version"] == "v2"
+  assert client.get("/stats/cache").json()["reloads"] == 1
+
+
+def test_lessons_missing(tmp_path, monkeypatch):
+  monkeypatch.setattr(main, "lessons_store", LessonsStore(tmp_path / "missing.json", check_interval=0))
+  assert TestClient(main.app).get("/lessons").status_code == 404
+
+
+def test_lessons_etag_and_304(client):
+  r = client.get("/lessons", headers={"Accept-Encoding": "identity"})
+  etag = r.headers["etag"]
+  assert r.headers["cache-control"] == "no-cache"
+  r304 = client.get("/lessons", headers={"If-None-Match": etag})
+  assert r304.status_code == 304 and r304.content == b""
+
+
+def test_lessons_gzip_variant(client, lessons_file):
+  big = dict(SAMPLE, lessons=SAMPLE["lessons"] * 20)
+  write_lessons(lessons_file, big)
+  r = client.get("/lessons", headers={"Accept-Encoding": "gzip"})
+  assert r.headers["content-encoding"] == "gzip"
+  assert r.headers["etag"].endswith('-gzip"')
+  assert r.json() == public(big)
+  # 压缩版本的 ETag 同样可用于条件请求
+  assert client.get("/lessons", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+
+def test_lessons_brotli_variant(client, lessons_file):
+  pytest.importorskip("brotli")
+  big = dict(SAMPLE, lessons=SAMPLE["lessons"] * 20)
+  write_lessons(lessons_file, big)
+  r = client.get("/lessons", headers={"Accept-Encoding": "gzip, br"})
+  assert r.headers["content-encoding"] == "br"
+  assert r.headers["etag"].endswith('-br"')
+  # 客户端已按 Content-Encoding 解压
+  assert r.json() == public(big)
+
+
+def test_lessons_index_and_single(client):
+  index = client.get("/lessons/index").json()
+  assert [l["id"] for l in index["lessons"]] == ["a", "b"]
+  first = index["lessons"][0]
+  assert "concept" not in first and "quiz" not in first
+  assert first["category"] == "基础语法 (Basics)" and first["bytes"] > 0
+  assert index["lessons"][1]["isLocked"] is True
+  assert client.get("/lessons/a").json() == public(SAMPLE)["lessons"][0]
+  assert client.get("/lessons/nope").status_code == 404
+
+
+def test_lessons_changes_since_revision(client, lessons_file):
+  index = client.get("/lessons/index").json()
+  rev = index["revision"]
+  assert rev == 1
+  same = client.get(f"/lessons/changes?since={rev}").json()
+  assert same == {"revision": 1, "since": 1, "full": False, "removed": [], "order": None, "upsert": []}
+  assert client.get("/lessons/changes?since=0").json()["full"] is True
+
+  # 改一节课的标题：只下发这一节
+  changed = json.loads(json.dumps(SAMPLE))
+  changed["lessons"][0]["title"] = "A2"
+  write_lessons(lessons_file, changed)
+  delta = client.get(f"/lessons/changes?since={rev}").json()
+  assert delta["revision"] == 2 and delta["order"] is None and delta["removed"] == []
+  assert delta["upsert"] == [public(changed)["lessons"][0]]
+
+  # 删除一节、新增一节：附带新的顺序；从最初的修订同步时合并两次改动
+  changed["lessons"] = [changed["lessons"][0], dict(changed["lessons"][0], id="c", title="C")]
+  write_lessons(lessons_file, changed)
+  delta = client.get(f"/lessons/changes?since={rev}").json()
+  assert delta["revision"] == 3 and delta["removed"] == ["b"] and delta["order"] == ["a", "c"]
+  assert [l["id"] for l in delta["upsert"]] == ["a", "c"]
+  assert client.get("/lessons/changes?since=2").json()["upsert"][0]["id"] == "c"
+  assert client.get("/lessons/changes?since=9").json()["full"] is True
+
+  # 修订日志写在 lessons.json 旁，服务重启后修订号保持不变
+  restarted = LessonsStore(lessons_file, check_interval=0).get()
+  assert restarted.revision == 3
+
+
+def test_lessons_changes_full_resync_shared(client):
+  # 超出范围的 since 共用一份缓存响应，正文不能带上第一个请求方的 since
+  full = {"revision": 1, "full": True}
+  assert client.get("/lessons/changes?since=0").json() == full
+  assert client.get("/lessons/changes?since=99999").json() == full
+  assert client.get("/lessons/changes?since=-5").json() == full
+
+
+def test_lessons_packed(client):
+  from server.lessons_pack import unpack
+  r = client.get("/lessons/packed")
+  assert r.headers["content-type"] == "application/octet-stream"
+  assert unpack(r.content) == public(SAMPLE)
+  assert client.get("/lessons/packed", headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+
+def test_progress_roundtrip(client):
+  progress = {"lessons": {"a": {"readDone": True, "codeDone": False, "quizDone": False}}, "totalCompleted": 0}
+  assert client.post("/progress", json={"user": "u1", "progress": progress}).json() == {"ok": True, "version": 1}
+  assert client.get("/progress", params={"user": "u1"}).json() == {"user": "u1", "progress": progress, "version": 1}
+  assert client.get("/progress", params={"user": "nobody"}).json()["progress"] == {}
+
+
+def test_progress_write_behind_coalesces(client, progress_store):
+  # 进入 lifespan 后写后队列才会启动；窗口为 60 秒，退出时统一刷盘
+  with client:
+    for i in range(5):
+      client.post("/progress", json={"user": "u1", "progress": {"n": i}})
+    client.post("/progress", json={"user": "u2", "progress": {"n": 0}})
+    stats = client.get("/stats/writes").json()
+    assert stats["depth"] == 2 and stats["coalesced"] == 4
+    # 读自己写：尚未落库的数据也能读到
+    assert client.get("/progress", params={"user": "u1"}).json()["progress"] == {"n": 4}
+    assert progress_store.get("u1") == {}
+  assert progress_store.get("u1") == {"n": 4}
+  assert progress_store.get("u2") == {"n": 0}
+
+
+def test_progress_rejects_reserved_keys(client):
+  client.post("/progress", json={"user": "alice", "progress": {"lessons": {"a": {"readDone": True}}}})
+  assert client.post("/progress", json={"user": "__meta__", "progress": {}}).status_code == 422
+  assert client.patch("/progress", json={"user": "__meta__", "changes": [{"lessonId": "a", "field": "x"}]}).status_code == 422
+  assert client.patch("/progress", json={"user": "alice", "changes": [{"lessonId": "", "field": "x"}]}).status_code == 422
+  r = client.post("/progress", json={"user": "alice", "progress": {"lessons": {"": {"readDone": True}}}})
+  assert r.status_code == 422
+  assert client.get("/progress", params={"user": "alice"}).json()["version"] == 1
+
+
+def test_progress_rate_limited_per_user(client, admission):
+  admission.user = RateLimiter(rate=0.5, burst=2)
+  for i in range(2):
+    assert client.post("/progress", json={"user": "hot", "progress": {"n": i}}).status_code == 200
+  r = client.patch("/progress", json={"user": "hot", "changes": [{"lessonId": "a", "field": "readDone", "val": True}]})
+  assert r.status_code == 429
+  assert r.headers["Retry-After"] == "2"
+  assert r.json()["detail"]["scope"] == "user" and r.json()["detail"]["retryAfter"] > 0
+  # 热点用户被限流不影响其他用户
+  assert client.post("/progress", json={"user": "calm", "progress": {"n": 0}}).status_code == 200
+  stats = client.get("/stats/admission").json()
+  assert stats["user"]["limited"] == 1 and stats["user"]["keys"] == 2
+  assert stats["writes"]["inflight"] == 0 and stats["writes"]["admitted"] == 3
+  assert 'ps_admission_limited_total{scope="user"} 1' in client.get("/metrics").text
+
+
+def test_progress_shed_when_writes_saturated(client, admission):
+  admission.gate = main.write_queue.gate = WriteGate(max_inflight=1, max_queue=0)
+  admission.gate.inflight = 1  # 模拟一个尚未完成的存储写入占满名额
+  r = client.post("/progress", json={"user": "u1", "progress": {"n": 1}})
+  assert r.status_code == 503 and r.headers["Retry-After"] == "2"
+  admission.gate.release()
+  assert client.post("/progress", json={"user": "u1", "progress": {"n": 1}}).status_code == 200
+  assert client.get("/stats/admission").json()["writes"]["shed"] == 1
+
+
+def test_progress_patch_merges_deltas(client):
+  r = client.patch("/progress", json={"user": "u1", "changes": [{"lessonId": "a", "field": "readDone", "val": True}]})
+  assert r.json() == {"ok": True, "version": 1}
+  r = client.patch("/progress", json={
+    "user": "u1", "baseVersion": 1,
+    "changes": [{"lessonId": "a", "field": "codeDone", "val": True}, {"lessonId": "b", "field": "quizDone", "val": True}],
+  })
+  assert r.json()["version"] == 2
+  got = client.get("/progress", params={"user": "u1"}).json()
+  assert got["version"] == 2
+  assert got["progress"]["lessons"] == {
+    "a": {"readDone": True, "codeDone": True, "quizDone": False},
+    "b": {"readDone": False, "codeDone": False, "quizDone": True},
+  }
+  # 过期版本号返回 409 并告知当前版本
+  stale = client.patch("/progress", json={"user": "u1", "baseVersion": 1, "changes": [{"lessonId": "a", "field": "x"}]})
+  assert stale.status_code == 409 and stale.json()["detail"]["version"] == 2
+  assert client.patch("/progress", json={"user": "u1", "changes": []}).status_code == 422
+
+
+def test_review_answer_and_due(client):
+  r = client.post("/review/answer", json={"user": "u1", "lessonId": "a", "questionIdx": 0, "correct": False})
+  card = r.json()["card"]
+  assert card["interval"] == 1.0 and card["lapses"] == 1
+  assert client.get("/review/due", params={"user": "u1"}).json()["cards"] == []  # 明天才到期
+  assert client.get("/review/due", params={"user": "u1"}).json()["total"] == 1
+  bad = client.post("/review/answer", json={"user": "u1", "lessonId": "a", "questionIdx": 5, "correct": True})
+  assert bad.status_code == 404
+
+
+def test_quiz_grade_batch(client, review_engine, monkeypatch):
+  assert "isCorrect" not in client.get("/lessons/a").text
+  saves = []
+  save_many = review_engine.store.save_many
+  monkeypatch.setattr(review_engine.store, "save_many", lambda user, cards: saves.append(len(cards)) or save_many(user, cards))
+  r = client.post("/quiz/grade", json={"user": "u1", "answers": [
+    {"lessonId": "a", "questionIdx": 0, "choice": 1},
+    {"lessonId": "a", "questionIdx": 0, "choice": 0},
+    {"lessonId": "a", "questionIdx": 9, "choice": 0},
+  ]}).json()
+  assert r["score"] == 1 and r["total"] == 3
+  assert [x["correct"] for x in r["results"]] == [True, False, False]
+  assert r["results"][0]["correctChoices"] == [1]
+  assert "error" in r["results"][2]
+  # 带 user 的判分同时记入复习计划：整套题一次写入，同一题按答题顺序调度（先对后错）
+  assert saves == [2]
+  assert client.get("/review/due", params={"user": "u1"}).json()["total"] == 1
+  assert review_engine.store.load("u1")[0].lapses == 1
+
+
+def test_stats_lessons_and_funnel(client):
+  done = {"readDone": True, "codeDone": True, "quizDone": True}
+  client.post("/progress", json={"user": "u1", "progress": {"lessons": {"a": done, "b": {"readDone": True}}}})
+  client.post("/progress", json={"user": "u2", "progress": {"lessons": {"a": {**done, "quizDone": False}}}})
+  client.patch("/progress", json={"user": "u2", "changes": [{"lessonId": "a", "field": "quizDone", "val": True}]})
+  lessons = client.get("/stats/lessons").json()
+  assert lessons["users"] == 2
+  a, b = lessons["lessons"]
+  assert (a["id"], a["started"], a["completed"]) == ("a", 2, 2)
+  assert (b["id"], b["started"], b["readDone"], b["completed"]) == ("b", 1, 1, 0)
+  funnel = client.get("/stats/funnel").json()
+  assert funnel["total"]["completed"] == 2 and funnel["total"]["completionRate"] == 0.5
+  assert [c["category"] for c in funnel["categories"]] == ["基础语法 (Basics)", "量化策略 (Strategies)"]
+  assert funnel["categories"][0]["completionRate"] == 1.0
+
+
+def test_search_endpoint(client):
+  r = client.get("/search", params={"q": "plot"})
+  assert [h["id"] for h in r.json()["results"]] == ["a"]
+  # 锁定课程不检索加密正文
+  assert client.get("/search", params={"q": "B"}).json()["results"][0]["id"] == "b"
+  assert client.get("/search", params={"q": "yy"}).json()["results"] == []
+
+
+def test_run_script(client, monkeypatch):
+  from server.pine_runtime import RunCache
+  monkeypatch.setattr(main, "run_cache", RunCache())
+  body = {"code": 'indicator("t")\nlen = input.int(3, "Len")\nplot(ta.sma(close, len), "ma")',
+          "dataset": {"bars": 50}, "params": {"Len": 5}, "tail": 10}
+  r = client.post("/run", json=body)
+  assert r.status_code == 200
+  data = r.json()
+  assert data["title"] == "t" and data["bars"] == 10 and not data["cached"]
+  assert len(data["plots"][0]["values"]) == 10 and data["inputs"][0]["value"] == 5
+  assert client.post("/run", json=body).json()["cached"] is True
+  # 前 4 根 K 线的均线为 na，序列化为 null
+  head = client.post("/run", json={**body, "tail": None}).json()["plots"][0]["values"]
+  assert head[:4] == [None] * 4 and head[4] is not None
+  assert client.get("/stats/run").json()["hits"] == 2
+  r = client.post("/run", json={"code": "plot(close)\nplot(undefined_var)"})
+  assert r.status_code == 400 and r.json()["detail"]["line"] == 2
+  assert client.post("/run", json={"code": "x = (", "dataset": {"bars": 10}}).status_code == 400
+  assert client.post("/run", json={"code": "plot(close)", "dataset": {"bars": 10 ** 7}}).status_code == 422
+  code = 'strategy("s")\nif ta.crossover(close, ta.sma(close, 5))\n    strategy.entry("L", strategy.long)\n' \
+         'if ta.crossunder(close, ta.sma(close, 5))\n    strategy.close("L")'
+  data = client.post("/run", json={"code": code, "dataset": {"bars": 500}, "tail": 50}).json()
+  assert data["strategy"]["stats"]["total_trades"] > 0 and len(data["strategy"]["equity"]) == 50
@@ -0,0 +1,77 @@
+# 中文说明：课程内容校验测试
+# 目的：验证 Pine/Python 语法错误与测验结构问题能带行号报告，缓存按内容哈希命中，
+# 以及进程池与串行校验结果一致
+import copy
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import validate_lessons  # noqa: E402
+
+GOOD = {
+  "id": "ok",
+  "pine_code": "//@version=5\nindicator(\"ok\")\nplot(ta.sma(close, 14))\n",
+  "python_code": "import pandas as pd\nprint(pd.__version__)\n",
+  "quiz": [{"q": "1 + 1 = ?", "choices": [{"text": "2", "isCorrect": True}, {"text": "3", "isCorrect": False}]}],
+}
+
+
+def lesson(**changes):
+  out = copy.deepcopy(GOOD)
+  out.update(changes)
+  return out
+
+
+def test_check_lesson_reports_field_and_line():
+  assert validate_lessons.check_lesson(GOOD) == []
+  errors = validate_lessons.check_lesson(lesson(pine_code="plot(close)\nx = (1 + 2", python_code="def f(:\n  pass"))
+  assert errors[0].startswith("pine_code: 第 2 行")
+  assert errors[1].startswith("python_code: 第 1 行")
+  two = [{"text": "a", "isCorrect": True}, {"text": "b", "isCorrect": True}]
+  errors = validate_lessons.check_lesson(lesson(quiz=[{"q": "", "choices": two}, {"q": "x", "choices": []}]))
+  assert errors == [
+    "quiz 第 1 题: 题干为空",
+    "quiz 第 1 题: 应恰好有一个正确选项（实际 2 个）",
+    "quiz 第 2 题: 至少需要两个选项",
+  ]
+  # 无法还原的加密字段与空代码不做语法检查
+  assert validate_lessons.check_lesson(lesson(pine_code="ENC:abc", python_code="")) == []
+
+
+def test_cache_by_content_hash(tmp_path):
+  catalogue = {"lessons": [lesson(id=f"l{i}", pine_code=f"plot(close * {i})") for i in range(5)]}
+  catalogue["lessons"].append(lesson(id="bad", python_code="x ="))
+  cache_path = tmp_path / "cache.json"
+  source = tmp_path / "lessons.json"
+  source.write_text(json.dumps(catalogue), encoding="utf-8")
+
+  first = validate_lessons.validate_file(str(source), workers=1, cache_path=str(cache_path))
+  assert (first.lessons, first.cached, first.checked) == (6, 0, 6)
+  assert list(first.errors) == ["bad"]
+  again = validate_lessons.validate_file(str(source), workers=1, cache_path=str(cache_path))
+  assert (again.cached, again.checked) == (6, 0) and again.errors == first.errors
+
+  # 只改动一节课的被检查字段才会重新校验；改标题不影响缓存
+  catalogue["lessons"][0]["pine_code"] = "plot(open)"
+  catalogue["lessons"][1]["title"] = "renamed"
+  source.write_text(json.dumps(catalogue), encoding="utf-8")
+  third = validate_lessons.validate_file(str(source), workers=1, cache_path=str(cache_path))
+  assert (third.cached, third.checked) == (5, 1)
+  # 写回的缓存只保留本次用到的条目
+  assert len(json.loads(cache_path.read_text(encoding="utf-8"))["results"]) == 6
+
+
+def test_pool_matches_serial(monkeypatch):
+  monkeypatch.setattr(validate_lessons, "PARALLEL_MIN", 1)
+  lessons = []
+  for i in range(40):
+    broken = {"pine_code": "if close\nplot(close)"} if i % 7 == 0 else {}
+    lessons.append(lesson(id=f"l{i}", python_code=f"x = {i}", **broken))
+  catalogue = {"lessons": lessons}
+  serial = validate_lessons.validate(catalogue, {}, workers=1)
+  parallel = validate_lessons.validate(catalogue, {}, workers=2)
+  assert serial.errors == parallel.errors and len(serial.errors) == 6
+  assert parallel.checked == 40
@@ -0,0 +1,208 @@
+# 中文说明：课程内容校验
+"""
+功能概述：
+- 逐课检查：pine_code 用 server/pine_parser.py 做完整的 v5 语法分析；python_code 用 ast.parse 检查语法；
+  quiz 检查题目结构（题干非空、至少两个选项、选项文本非空、恰好一个 isCorrect）
+- 结果按“校验器版本 + 被检查字段的内容哈希”缓存：未改动的课程不再解析，
+  重复校验一份未变化的课程目录只需计算哈希与读取缓存
+- 缓存未命中的课程较多时用进程池并行校验（解析是纯 CPU 计算），较少时在当前进程串行执行
+
+输入/输出：
+- python validate_lessons.py [--source PATH] [--workers N] [--force] [--cache PATH]
+- 输出有问题的课程与错误（带字段与行号）、课程数、缓存命中数与耗时；存在错误时退出码为 1
+- validate(catalogue) -> Report：errors 为 {课程 id: [错误描述]}，只包含有问题的课程
+- 缓存写在仓库根目录 .validate_cache.json（已加入 .gitignore）
+
+边界与安全：
+- 只读课程文件，不修改任何内容；已打包的锁定课程先从 locked/ 中的课程包还原明文再校验
+- 仍带 ENC: 前缀（无法还原）的字段跳过语法检查，quiz 照常检查
+- 代码字段允许为空字符串（参考资料类课程可以没有 Python 对照代码），空代码不报错
+- 缓存只按内容哈希命中，与课程 id 无关；写回时只保留本次用到的条目
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import build_lessons
+from server.pine_parser import PineSyntaxError, parse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "web", "data")
+CACHE_FILE = os.path.join(HERE, ".validate_cache.json")
+
+# 校验规则的版本：修改检查逻辑（含解析器语法范围）时递增，使旧缓存失效
+VALIDATOR_VERSION = 1
+# 参与校验的字段；哈希只覆盖这些字段，修改标题、摘要等不会使缓存失效
+CHECKED_FIELDS = ("pine_code", "python_code", "quiz")
+# 未命中数少于该值时串行执行，避免进程启动开销大于校验本身
+PARALLEL_MIN = 64
+
+
+@dataclass
+class Report:
+    """中文说明：一次校验的结果与统计"""
+
+    errors: dict = field(default_factory=dict)
+    lessons: int = 0
+    cached: int = 0
+    checked: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def content_hash(lesson):
+    """中文说明：被检查字段的内容哈希（键排序后的紧凑 JSON）"""
+    payload = {name: lesson.get(name) for name in CHECKED_FIELDS}
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def check_pine(code):
+    if not isinstance(code, str):
+        return ["pine_code: 应为字符串"]
+    try:
+        parse(code)
+    except PineSyntaxError as e:
+        return [f"pine_code: 第 {e.line} 行: {e.message}"]
+    return []
+
+
+def check_python(code):
+    if not isinstance(code, str):
+        return ["python_code: 应为字符串"]
+    try:
+        ast.parse(code)
+    except SyntaxError as e:
+        return [f"python_code: 第 {e.lineno} 行: {e.msg}"]
+    return []
+
+
+def check_quiz(quiz):
+    if not isinstance(quiz, list):
+        return ["quiz: 应为列表"]
+    errors = []
+    for i, item in enumerate(quiz, start=1):
+        where = f"quiz 第 {i} 题"
+        if not isinstance(item, dict):
+            errors.append(f"{where}: 应为对象")
+            continue
+        if not isinstance(item.get("q"), str) or not item["q"].strip():
+            errors.append(f"{where}: 题干为空")
+        choices = item.get("choices")
+        if not isinstance(choices, list) or len(choices) < 2:
+            errors.append(f"{where}: 至少需要两个选项")
+            continue
+        if any(not isinstance(c, dict) or not str(c.get("text", "")).strip() for c in choices):
+            errors.append(f"{where}: 选项文本为空")
+        correct = sum(1 for c in choices if isinstance(c, dict) and c.get("isCorrect") is True)
+        if correct != 1:
+            errors.append(f"{where}: 应恰好有一个正确选项（实际 {correct} 个）")
+    return errors
+
+
+def check_lesson(lesson):
+    """中文说明：校验单节课，返回错误描述列表（空列表表示通过）；ENC: 字段跳过语法检查"""
+    errors = []
+    for name, fn in (("pine_code", check_pine), ("python_code", check_python)):
+        value = lesson.get(name)
+        if isinstance(value, str) and value.startswith("ENC:"):
+            continue
+        errors.extend(fn(value))
+    errors.extend(check_quiz(lesson.get("quiz")))
+    return errors
+
+
+def validate(catalogue, cache=None, workers=None, force=False):
+    """中文说明：校验课程目录；cache 为 {内容哈希: 错误列表}，原地更新为本次用到的条目"""
+    started = time.perf_counter()
+    cache = {} if cache is None else cache
+    old = dict(cache)
+    cache.clear()
+    report = Report()
+    misses = {}
+    keys = []
+    for lesson in catalogue.get("lessons", []):
+        key = f"{VALIDATOR_VERSION}:{content_hash(lesson)}"
+        keys.append((lesson.get("id"), key))
+        if not force and key in old:
+            cache[key] = old[key]
+            report.cached += 1
+        elif key not in misses:
+            # 进程池任务只传递被检查的字段，减少序列化开销
+            misses[key] = {name: lesson.get(name) for name in CHECKED_FIELDS}
+
+    workers = workers or os.cpu_count() or 1
+    pending = list(misses.items())
+    if workers > 1 and len(pending) >= PARALLEL_MIN:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(check_lesson, [f for _, f in pending], chunksize=chunksize))
+    else:
+        results = [check_lesson(f) for _, f in pending]
+    for (key, _), errors in zip(pending, results):
+        cache[key] = errors
+    report.checked = len(pending)
+
+    for lesson_id, key in keys:
+        if cache[key]:
+            report.errors[lesson_id] = cache[key]
+    report.lessons = len(keys)
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+def load_cache(path):
+    """中文说明：读取缓存；文件缺失、损坏或校验器版本不同时返回空缓存"""
+    data = build_lessons.load_cache(path)
+    if data.get("version") != VALIDATOR_VERSION:
+        return {}
+    return data.get("results", {})
+
+
+def save_cache(path, cache):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": VALIDATOR_VERSION, "results": cache}, f, ensure_ascii=False)
+
+
+def validate_file(source, workers=None, force=False, cache_path=CACHE_FILE):
+    """中文说明：读取课程文件（还原锁定课程包）并校验；cache_path 为 None 时不读写缓存"""
+    with open(source, "r", encoding="utf-8") as f:
+        catalogue = json.load(f)
+    build_lessons.restore_bundles(catalogue, source)
+    cache = load_cache(cache_path) if cache_path else {}
+    report = validate(catalogue, cache, workers=workers, force=force)
+    if cache_path:
+        save_cache(cache_path, cache)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="课程内容校验")
+    parser.add_argument("--source", default=os.path.join(DATA_DIR, "lessons.json"))
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认本机核数；1 为串行）")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，重新校验所有课程")
+    parser.add_argument("--cache", default=CACHE_FILE, help="缓存文件路径（设为空串则不使用缓存）")
+    args = parser.parse_args()
+
+    report = validate_file(args.source, args.workers, args.force, args.cache or None)
+    for lesson_id, errors in report.errors.items():
+        print(f"✗ {lesson_id}")
+        for message in errors:
+            print(f"    {message}")
+    print(f"共 {report.lessons} 节课，复用缓存 {report.cached}，重新校验 {report.checked}，"
+          f"有问题 {len(report.errors)} 节，耗时 {report.elapsed_ms:.2f} ms")
+    if not report.ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,15 @@
   // -------------------------------
   // 基础状态与工具函数
   // -------------------------------
+  // 后端地址：为空时直接读取静态 lessons.json；设置 window.PS_API_BASE 后改为
+  // 先加载课程目录，再在选中课程时按需加载单课正文
+  const API_BASE = (window.PS_API_BASE || "").replace(/\/$/, "");
+  const API_USER = window.PS_USER || "default";
+
   const state = {
     lessons: [],
+    // 后端模式下本地课程副本对应的修订号（/lessons/index 与 /lessons/changes 返回）
+    revision: 0,
     currentLessonIndex: null,
     currentQuizIndex: 0,
     answers: {},
@@ -55,6 +62,7 @@
   // 初始化：加载数据与事件绑定
   // -------------------------------
   document.addEventListener("DOMContentLoaded", async () => {
+    registerServiceWorker();
     bindGlobalEvents();
     await loadLessonsJSON();
     renderLessonList();
@@ -65,11 +73,21 @@
     updateGlobalProgress();
   });
 
+  // 离线缓存：sw.js 按构建生成的清单预缓存静态文件，再次打开时直接从缓存读取
+  function registerServiceWorker() {
+    if (!("serviceWorker" in navigator) || !location.protocol.startsWith("http")) return;
+    // updateViaCache: none 让浏览器检查 sw.js 与清单更新时绕过 HTTP 缓存
+    navigator.serviceWorker
+      .register("./sw.js", { updateViaCache: "none" })
+      .catch((e) => console.warn("Service Worker 注册失败", e));
+  }
+
   async function loadLessonsJSON() {
     // 中文说明：优先从本地文件加载，后端可替换相同路径
+    if (API_BASE) return loadLessonsIndex();
     try {
-      // 添加时间戳防止缓存
-      const res = await fetch("./data/lessons.json?t=" + Date.now());
+      // 使用 no-cache 让浏览器携带 If-None-Match 重新验证，内容未变时服务端返回 304，无需重新下载
+      const res = await fetch("./data/lessons.json", { cache: "no-cache" });
       if (!res.ok) throw new Error("网络错误");
       const data = await res.json();
       state.lessons = data.lessons || [];
@@ -80,6 +98,107 @@
     }
   }
 
+  async function loadLessonsIndex() {
+    // 中文说明：后端模式只拉取目录（元数据），正文在 selectLesson 时按需加载；
+    // 本地已有按修订号缓存的副本时只拉取增量
+    if (await syncLessons()) return;
+    try {
+      const res = await fetch(`${API_BASE}/lessons/index`, { cache: "no-cache" });
+      if (!res.ok) throw new Error("网络错误");
+      const data = await res.json();
+      state.lessons = (data.lessons || []).map((l) => ({ ...l, _partial: true }));
+      state.revision = data.revision || 0;
+      saveLessonsCache();
+    } catch (e) {
+      console.warn("课程目录加载失败，使用空数据。", e);
+      state.lessons = [];
+    }
+  }
+
+  // -------------------------------
+  // 增量同步：目录与已加载的正文按修订号缓存在 localStorage，
+  // 再次打开时只请求 /lessons/changes?since=<修订号>，按返回的增量修补本地副本
+  // -------------------------------
+  const LESSONS_CACHE_KEY = "ps_lessons_cache";
+
+  function loadLessonsCache() {
+    try {
+      const cached = JSON.parse(localStorage.getItem(LESSONS_CACHE_KEY) || "null");
+      if (cached && cached.apiBase === API_BASE && cached.revision > 0 && Array.isArray(cached.lessons)) return cached;
+    } catch (e) {
+      // 缓存损坏时当作没有缓存
+    }
+    return null;
+  }
+
+  function saveLessonsCache() {
+    if (!state.revision) return;
+    // 只保存服务端返回的字段；_pending 等运行时状态不写入
+    const lessons = state.lessons.map(({ _pending, ...l }) => l);
+    try {
+      localStorage.setItem(LESSONS_CACHE_KEY, JSON.stringify({ apiBase: API_BASE, revision: state.revision, lessons }));
+    } catch (e) {
+      // 超出存储配额：放弃缓存，下次全量加载目录
+      localStorage.removeItem(LESSONS_CACHE_KEY);
+    }
+  }
+
+  // 把增量应用到缓存的课程列表：删除 removed，替换或新增 upsert（完整正文），顺序变化时按 order 重排
+  function applyLessonChanges(lessons, delta) {
+    const byId = new Map(lessons.map((l) => [l.id, l]));
+    (delta.removed || []).forEach((id) => byId.delete(id));
+    (delta.upsert || []).forEach((l) => byId.set(l.id, l));
+    const order = delta.order || lessons.map((l) => l.id);
+    return order.filter((id) => byId.has(id)).map((id) => byId.get(id));
+  }
+
+  async function syncLessons() {
+    const cached = loadLessonsCache();
+    if (!cached) return false;
+    let delta;
+    try {
+      const res = await fetch(`${API_BASE}/lessons/changes?since=${cached.revision}`, { cache: "no-cache" });
+      if (!res.ok) throw new Error("网络错误");
+      delta = await res.json();
+    } catch (e) {
+      // 离线或服务不可用：直接使用本地副本
+      console.warn("课程增量同步失败，使用本地缓存。", e);
+      state.lessons = cached.lessons;
+      state.revision = cached.revision;
+      return true;
+    }
+    // 修订号超出服务端日志的保留范围：重新加载目录
+    if (delta.full) return false;
+    state.lessons = applyLessonChanges(cached.lessons, delta);
+    state.revision = delta.revision;
+    if (delta.revision !== cached.revision) saveLessonsCache();
+    return true;
+  }
+
+  // 按需加载单课正文，已加载的课程直接返回
+  async function ensureLessonBody(index) {
+    const lsn = state.lessons[index];
+    if (!lsn || !lsn._partial) return lsn;
+    if (!lsn._pending) {
+      lsn._pending = fetch(`${API_BASE}/lessons/${encodeURIComponent(lsn.id)}`, { cache: "no-cache" })
+        .then((res) => {
+          if (!res.ok) throw new Error("网络错误");
+          return res.json();
+        })
+        .then((full) => {
+          state.lessons[index] = { ...full };
+          saveLessonsCache();
+          return state.lessons[index];
+        })
+        .catch((e) => {
+          console.warn("课程正文加载失败", e);
+          lsn._pending = null;
+          return lsn;
+        });
+    }
+    return lsn._pending;
+  }
+
   function bindGlobalEvents() {
     // 中文说明：主题切换
     const toggleThemeBtn = document.getElementById("toggleThemeBtn");
@@ -205,11 +324,11 @@
     return `${done}/3`;
   }
 
-  function selectLesson(index) {
+  async function selectLesson(index) {
     state.currentLessonIndex = index;
     state.currentQuizIndex = 0;
     renderLessonList();
-    const lsn = state.lessons[index];
+    let lsn = state.lessons[index];
     document.getElementById("lessonTitle").innerText = lsn.title;
     document.getElementById("lessonSubtitle").innerText = lsn.subtitle || "";
 
@@ -245,6 +364,15 @@
       return; // Stop rendering content
     }
 
+    // 后端模式：正文按需加载；加载期间用户可能已切换到其他课程
+    lsn = await ensureLessonBody(index);
+    if (state.currentLessonIndex !== index) return;
+    // 锁定课程：正文在独立的加密包中，VIP 打开时才拉取并解密
+    if (lsn.bundle) {
+      lsn = await openLockedBundle(lsn);
+      if (state.currentLessonIndex !== index) return;
+    }
+
     renderConcept(lsn);
     renderCode(lsn);
     renderQuiz();
@@ -345,23 +473,56 @@
   // -------------------------------
   // 简单解密工具 (XOR)
   // -------------------------------
+  function xorBytes(bytes, key) {
+    const keyBytes = new TextEncoder().encode(key);
+    const out = new Uint8Array(bytes.length);
+    for (let i = 0; i < bytes.length; i++) {
+      out[i] = bytes[i] ^ keyBytes[i % keyBytes.length];
+    }
+    return out;
+  }
+
   function xorDecrypt(encryptedBase64, key) {
     if (!encryptedBase64) return "";
     try {
       const encryptedBytes = Uint8Array.from(atob(encryptedBase64), c => c.charCodeAt(0));
-      const keyBytes = new TextEncoder().encode(key);
-      const decryptedBytes = new Uint8Array(encryptedBytes.length);
-      
-      for (let i = 0; i < encryptedBytes.length; i++) {
-        decryptedBytes[i] = encryptedBytes[i] ^ keyBytes[i % keyBytes.length];
-      }
-      return new TextDecoder().decode(decryptedBytes);
+      return new TextDecoder().decode(xorBytes(encryptedBytes, key));
     } catch (e) {
       console.error("Decryption failed:", e);
       return "[内容解析错误]";
     }
   }
 
+  // 解密密钥即激活码（存储为 'manual_code_PINEGOOD888'，验证时不区分大小写）
+  function vipKey() {
+    const stored = localStorage.getItem("ps_vip_user") || "";
+    return stored.replace("manual_code_", "").trim().toLowerCase();
+  }
+
+  // 已解密的锁定课程包：bundle 路径 -> Promise<{concept, pine_code, ...}>，同一课程只下载解密一次
+  const lockedBundles = new Map();
+
+  async function openLockedBundle(lsn) {
+    let pending = lockedBundles.get(lsn.bundle);
+    if (!pending) {
+      pending = fetch(`./data/${lsn.bundle}`)
+        .then((res) => {
+          if (!res.ok) throw new Error("网络错误");
+          return res.arrayBuffer();
+        })
+        .then((buf) => JSON.parse(new TextDecoder().decode(xorBytes(new Uint8Array(buf), vipKey()))));
+      lockedBundles.set(lsn.bundle, pending);
+    }
+    try {
+      return { ...lsn, ...(await pending), isEncrypted: false };
+    } catch (e) {
+      // 失败（网络或密钥错误）不缓存，下次打开时重试
+      lockedBundles.delete(lsn.bundle);
+      console.error("课程内容解密失败", e);
+      return { ...lsn, concept: "[内容解析错误]", isEncrypted: false };
+    }
+  }
+
   // -------------------------------
   // 概念讲解与总结
   // -------------------------------
@@ -396,41 +557,53 @@
   // -------------------------------
   // 代码对照（Pine Script vs Python）
   // -------------------------------
-  function renderCode(lsn) {
-    const pineEl = document.getElementById("pineCode");
-    const pyEl = document.getElementById("pythonCode");
-    
-    let pCode = lsn.pine_code || "";
-    let pyCode = lsn.python_code || "";
-    
-    if (lsn.isEncrypted) {
-        const stored = localStorage.getItem("ps_vip_user") || "";
-        const userKey = stored.replace("manual_code_", "").trim();
-        
-        if (pCode.startsWith("ENC:")) pCode = xorDecrypt(pCode.substring(4), userKey);
-        if (pyCode.startsWith("ENC:")) pyCode = xorDecrypt(pyCode.substring(4), userKey);
-    }
-    
-    // 调试：打印一下看看内容
-    // console.log("Rendering Pine Code:", pCode);
-    
-    // 尝试方案 A: 纯文本注入，依赖 CSS pre-wrap
-    pineEl.textContent = pCode;
-    pyEl.textContent = pyCode;
-    
-    // 重置 class
-    pineEl.className = "language-javascript";
-    pyEl.className = "language-python";
-    pineEl.removeAttribute("data-highlighted");
-    pyEl.removeAttribute("data-highlighted");
-
-    // 只有当 hljs 存在且加载成功时才高亮
-    if (window.hljs) {
-      hljs.highlightElement(pineEl);
-      hljs.highlightElement(pyEl);
-    } else {
-      console.warn("Highlight.js not loaded");
+  // highlight.js 只作为后备：课程数据由 build_lessons.py 预先生成了高亮标记（pine_html / python_html），
+  // 只有缺少预生成标记的课程（例如未安装 Pygments 时构建的数据）才会按需加载
+  const HLJS_URL = "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js";
+  let hljsLoading = null;
+
+  function loadHighlighter() {
+    if (window.hljs) return Promise.resolve(window.hljs);
+    if (!hljsLoading) {
+      hljsLoading = new Promise((resolve, reject) => {
+        const script = document.createElement("script");
+        script.src = HLJS_URL;
+        script.onload = () => resolve(window.hljs);
+        script.onerror = () => {
+          hljsLoading = null;
+          reject(new Error("Highlight.js not loaded"));
+        };
+        document.head.appendChild(script);
+      });
     }
+    return hljsLoading;
+  }
+
+  function renderCode(lsn) {
+    const userKey = (localStorage.getItem("ps_vip_user") || "").replace("manual_code_", "").trim();
+    const reveal = (value) =>
+      lsn.isEncrypted && value.startsWith("ENC:") ? xorDecrypt(value.substring(4), userKey) : value;
+
+    [
+      [document.getElementById("pineCode"), "pine_code", "pine_html", "pine", "javascript"],
+      [document.getElementById("pythonCode"), "python_code", "python_html", "python", "python"],
+    ].forEach(([el, codeField, htmlField, lang, hljsLang]) => {
+      const markup = lsn[htmlField] ? reveal(lsn[htmlField]) : "";
+      el.removeAttribute("data-highlighted");
+      if (markup) {
+        el.innerHTML = markup;
+        el.className = `hljs language-${lang}`;
+        return;
+      }
+      // 后备：纯文本注入（依赖 CSS pre-wrap），再用 highlight.js 高亮
+      el.textContent = reveal(lsn[codeField] || "");
+      el.className = `language-${hljsLang}`;
+      loadHighlighter()
+        .then((hljs) => {
+          if (el.textContent === reveal(lsn[codeField] || "")) hljs.highlightElement(el);
+        })
+        .catch((e) => console.warn(e.message));
+    });
 
     markLessonProgress(lsn.id, "codeDone", true);
   }
@@ -488,7 +661,24 @@
       .join("");
   }
 
-  function handleSubmitQuiz() {
+  // 判分：静态模式直接读取选项上的 isCorrect；后端模式下课程数据不含答案，
+  // 由服务端 /quiz/grade 判分（同时记入 SM-2 复习计划）
+  async function gradeAnswer(lsn, idx, choiceIdx) {
+    const q = lsn.quiz[idx];
+    if (!API_BASE) {
+      const correctChoices = q.choices.map((c, i) => (c.isCorrect ? i : -1)).filter((i) => i >= 0);
+      return { correct: !!q.choices[choiceIdx]?.isCorrect, correctChoices };
+    }
+    const res = await fetch(`${API_BASE}/quiz/grade`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ user: API_USER, answers: [{ lessonId: lsn.id, questionIdx: idx, choice: choiceIdx }] }),
+    });
+    if (!res.ok) throw new Error("判分失败");
+    return (await res.json()).results[0];
+  }
+
+  async function handleSubmitQuiz() {
     const lsn = state.lessons[state.currentLessonIndex];
     const quiz = lsn.quiz || [];
     const idx = state.currentQuizIndex;
@@ -505,12 +695,24 @@
       return;
     }
     const choiceIdx = Number(selected.value);
-    const correct = !!q.choices[choiceIdx]?.isCorrect;
+    submitBtn.disabled = true;
+    let result;
+    try {
+      result = await gradeAnswer(lsn, idx, choiceIdx);
+    } catch (e) {
+      feedback.innerHTML = `<span class="bad">判分失败，请稍后重试</span>`;
+      submitBtn.disabled = false;
+      return;
+    }
+    // 等待判分期间用户可能已切换课程或题目
+    if (state.lessons[state.currentLessonIndex]?.id !== lsn.id || state.currentQuizIndex !== idx) return;
+    const correct = !!result.correct;
+    const correctSet = new Set(result.correctChoices || []);
 
     // 展示对错并给予讲解
     body.querySelectorAll(".choice").forEach((el, i) => {
-      el.classList.toggle("correct", !!q.choices[i]?.isCorrect);
-      if (i === choiceIdx && !q.choices[i]?.isCorrect) el.classList.add("wrong");
+      el.classList.toggle("correct", correctSet.has(i));
+      if (i === choiceIdx && !correctSet.has(i)) el.classList.add("wrong");
     });
     feedback.innerHTML = correct
       ? `<span class="ok">回答正确！</span> ${q.explain || ""}`
@@ -531,9 +733,109 @@
     if (!state.progress.lessons[lessonId]) {
       state.progress.lessons[lessonId] = { readDone: false, codeDone: false, quizDone: false };
     }
+    if (state.progress.lessons[lessonId][field] === val) return;
     state.progress.lessons[lessonId][field] = val;
     saveProgress();
     updateGlobalProgress();
+    queueProgressSync(lessonId, field, val);
+  }
+
+  // 后端同步：只提交变化的字段（PATCH），短时间内的多次变化合并为一次请求
+  const pendingChanges = new Map();
+  let syncTimer = null;
+  function queueProgressSync(lessonId, field, val) {
+    if (!API_BASE) return;
+    pendingChanges.set(`${lessonId}\u0000${field}`, { lessonId, field, val });
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(flushProgressSync, 300);
+  }
+
+  // 放回队列（不覆盖期间产生的更新的值）
+  function requeueChanges(changes) {
+    changes.forEach((c) => {
+      const key = `${c.lessonId}\u0000${c.field}`;
+      if (!pendingChanges.has(key)) pendingChanges.set(key, c);
+    });
+  }
+
+  // 单次 PATCH 的变化数上限（与服务端 ProgressPatch.changes 的 max_length 一致）
+  const SYNC_BATCH = 100;
+
+  async function flushProgressSync() {
+    if (pendingChanges.size === 0) return;
+    const changes = Array.from(pendingChanges.values());
+    pendingChanges.clear();
+    for (let i = 0; i < changes.length; i += SYNC_BATCH) {
+      const batch = changes.slice(i, i + SYNC_BATCH);
+      let res;
+      try {
+        res = await fetch(`${API_BASE}/progress`, {
+          method: "PATCH",
+          headers: { "Content-Type": "application/json" },
+          // baseVersion 为上次同步后的版本号；其他设备期间写入过时服务端返回 409
+          body: JSON.stringify({ user: API_USER, changes: batch, baseVersion: state.progressVersion ?? null }),
+        });
+      } catch (e) {
+        // 网络错误：本批及之后的变化放回队列，下次变化时一并重试
+        requeueChanges(changes.slice(i));
+        console.warn("进度同步失败，稍后重试", e);
+        return;
+      }
+      if (res.status === 429 || res.status === 503) {
+        // 服务端限流或繁忙：按 Retry-After 延后重试，期间的新变化合并进同一次请求
+        requeueChanges(changes.slice(i));
+        const wait = Math.max(1, Number(res.headers.get("Retry-After")) || 1);
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(flushProgressSync, wait * 1000);
+        return;
+      }
+      if (res.status === 409) {
+        // 版本冲突：取服务端最新进度与版本号，再按新版本重新提交本批及之后的变化
+        requeueChanges(changes.slice(i));
+        if (await resyncProgress()) {
+          clearTimeout(syncTimer);
+          syncTimer = setTimeout(flushProgressSync, 0);
+        }
+        return;
+      }
+      if (res.status >= 400 && res.status < 500) {
+        // 其他 4xx（请求本身不被接受）：重试不会成功，丢弃本批
+        console.warn("进度同步被拒绝，已丢弃本批变化", res.status);
+        continue;
+      }
+      if (!res.ok) {
+        requeueChanges(changes.slice(i));
+        console.warn("进度同步失败，稍后重试", res.status);
+        return;
+      }
+      state.progressVersion = (await res.json()).version;
+    }
+  }
+
+  // 合并服务端进度（只取其他设备已完成的字段，本地已完成的不会被撤销）并更新版本号；尚未提交的本地变化以本地为准
+  async function resyncProgress() {
+    try {
+      const res = await fetch(`${API_BASE}/progress?user=${encodeURIComponent(API_USER)}`);
+      if (!res.ok) return false;
+      const data = await res.json();
+      const lessons = (data.progress && data.progress.lessons) || {};
+      Object.entries(lessons).forEach(([lessonId, fields]) => {
+        if (!state.progress.lessons[lessonId]) {
+          state.progress.lessons[lessonId] = { readDone: false, codeDone: false, quizDone: false };
+        }
+        const local = state.progress.lessons[lessonId];
+        Object.entries(fields || {}).forEach(([field, val]) => {
+          if (val && !local[field] && !pendingChanges.has(`${lessonId}\u0000${field}`)) local[field] = val;
+        });
+      });
+      state.progressVersion = data.version;
+      saveProgress();
+      updateGlobalProgress();
+      return true;
+    } catch (e) {
+      console.warn("进度重新同步失败", e);
+      return false;
+    }
   }
 
   function updateGlobalProgress() {
@@ -0,0 +1,39 @@
+// 中文说明：离线缓存清单，由 build_lessons.py 生成，请勿手工修改
+self.PRECACHE_MANIFEST = {
+  "version": "577cf03fb2250e04",
+  "files": {
+    "index.html": "06aefcf4b0ea7513",
+    "app.js": "f1ac762d3fd9dacb",
+    "styles.css": "e8ce339bf6bec75a",
+    "data/lessons.json": "c86070dd1c2b7b40",
+    "assets/alipay.png": "6df7dad3f2d3d10e",
+    "assets/wechat_pay.png": "b60ebab3d717ea18"
+  },
+  "external": [
+    "https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css"
+  ],
+  "bundles": {
+    "data/locked/01b2121bf3b211cb.bin": "01b2121bf3b211cb",
+    "data/locked/3039918b3027da70.bin": "3039918b3027da70",
+    "data/locked/39293c7b18359c2c.bin": "39293c7b18359c2c",
+    "data/locked/43060f6803502216.bin": "43060f6803502216",
+    "data/locked/445d44efc876d324.bin": "445d44efc876d324",
+    "data/locked/44ec9e2415871a77.bin": "44ec9e2415871a77",
+    "data/locked/4ab15472bbee67d6.bin": "4ab15472bbee67d6",
+    "data/locked/5d9296017814cb7f.bin": "5d9296017814cb7f",
+    "data/locked/656609eca60b8f4a.bin": "656609eca60b8f4a",
+    "data/locked/69d5a1ce971a6ff9.bin": "69d5a1ce971a6ff9",
+    "data/locked/6d2cc9148e00aeee.bin": "6d2cc9148e00aeee",
+    "data/locked/6d2eec2c5aac9f15.bin": "6d2eec2c5aac9f15",
+    "data/locked/6df0d10fcbbadff0.bin": "6df0d10fcbbadff0",
+    "data/locked/821e0b7f0bdfef45.bin": "821e0b7f0bdfef45",
+    "data/locked/8d59fbf8b6660b3e.bin": "8d59fbf8b6660b3e",
+    "data/locked/9f94ddb874f257c6.bin": "9f94ddb874f257c6",
+    "data/locked/a5033ebbc906cb2a.bin": "a5033ebbc906cb2a",
+    "data/locked/a6da4de0b2f3f13d.bin": "a6da4de0b2f3f13d",
+    "data/locked/bbbc178dff5d9481.bin": "bbbc178dff5d9481",
+    "data/locked/d6d81960954c6af0.bin": "d6d81960954c6af0",
+    "data/locked/d9dc421f4f855ae2.bin": "d9dc421f4f855ae2",
+    "data/locked/fc3e872a131bf897.bin": "fc3e872a131bf897"
+  }
+};
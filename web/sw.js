@@ -0,0 +1,117 @@
+// 中文说明：离线缓存 Service Worker
+// 功能概述：
+// - 安装时按 precache-manifest.js（build_lessons.py 生成的内容哈希清单）预缓存页面、脚本、样式、课程数据与固定版本的外部库
+// - 所有清单内的请求一律缓存优先：再次打开页面时不需要任何网络请求，离线也能使用
+// - 清单内容变化（任一文件哈希变化）时浏览器会安装新版本；只下载哈希变化的文件，其余沿用旧缓存
+// - 锁定课程包（data/locked/<hash>.bin）文件名即内容哈希，首次打开后缓存（键同样带 __rev=<哈希>），之后直接读取；
+//   激活时删除 __rev 与清单 bundles 不一致的课程包，每次重新构建课程后不会在客户端累积旧包
+// 边界与安全：
+// - 只处理本站作用域内的 GET 请求与清单中的外部资源；后端 API 请求直接走网络
+// - 缓存键为 "路径?__rev=<哈希>"，不同版本的同名文件不会互相覆盖
+
+importScripts("./precache-manifest.js");
+
+const MANIFEST = self.PRECACHE_MANIFEST || { version: "dev", files: {}, external: [], bundles: {} };
+const PRECACHE = "ps-precache-v1";
+const RUNTIME = "ps-runtime-v1";
+const SCOPE = new URL("./", self.location).href;
+
+function revKey(path, rev) {
+  return new URL(`${path}?__rev=${rev}`, SCOPE).href;
+}
+
+// 课程包文件名即内容哈希（与清单 bundles 中的哈希一致）
+function bundleKey(path) {
+  return revKey(path, path.slice(path.lastIndexOf("/") + 1).replace(/\.bin$/, ""));
+}
+
+function currentKeys() {
+  const keys = new Set(Object.entries(MANIFEST.files).map(([path, rev]) => revKey(path, rev)));
+  (MANIFEST.external || []).forEach((url) => keys.add(url));
+  return keys;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    (async () => {
+      const cache = await caches.open(PRECACHE);
+      const cached = new Set((await cache.keys()).map((r) => r.url));
+      const jobs = Object.entries(MANIFEST.files).map(async ([path, rev]) => {
+        const key = revKey(path, rev);
+        if (cached.has(key)) return; // 内容未变化，沿用旧缓存
+        const res = await fetch(new URL(path, SCOPE), { cache: "reload" });
+        if (!res.ok) throw new Error(`预缓存失败: ${path}`);
+        await cache.put(key, res);
+      });
+      (MANIFEST.external || []).forEach((url) => {
+        if (cached.has(url)) return;
+        // 外部库下载失败不阻止安装，首次在线使用时再缓存
+        jobs.push(
+          fetch(url, { mode: "cors" })
+            .then((res) => (res.ok ? cache.put(url, res) : null))
+            .catch((e) => console.warn("外部资源预缓存失败", url, e))
+        );
+      });
+      await Promise.all(jobs);
+      await self.skipWaiting();
+    })()
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    (async () => {
+      // 删除不在当前清单中的旧版本条目与旧缓存
+      const keep = currentKeys();
+      const cache = await caches.open(PRECACHE);
+      for (const req of await cache.keys()) {
+        if (!keep.has(req.url)) await cache.delete(req);
+      }
+      // 运行时缓存：只保留当前清单引用的课程包（旧版本的无 __rev 键也一并删除）
+      const bundles = MANIFEST.bundles || {};
+      const runtime = await caches.open(RUNTIME);
+      for (const req of await runtime.keys()) {
+        if (!req.url.startsWith(SCOPE)) continue;
+        const path = req.url.slice(SCOPE.length).split("?")[0];
+        if (!path.startsWith("data/locked/")) continue;
+        if (bundles[path] !== new URL(req.url).searchParams.get("__rev")) await runtime.delete(req);
+      }
+      for (const name of await caches.keys()) {
+        if (name !== PRECACHE && name !== RUNTIME) await caches.delete(name);
+      }
+      await self.clients.claim();
+    })()
+  );
+});
+
+async function cacheFirst(cacheName, key, request) {
+  const cache = await caches.open(cacheName);
+  const hit = await cache.match(key);
+  if (hit) return hit;
+  const res = await fetch(request);
+  if (res.ok) cache.put(key, res.clone());
+  return res;
+}
+
+self.addEventListener("fetch", (event) => {
+  const req = event.request;
+  if (req.method !== "GET") return;
+
+  if ((MANIFEST.external || []).includes(req.url)) {
+    event.respondWith(cacheFirst(PRECACHE, req.url, req));
+    return;
+  }
+  if (!req.url.startsWith(SCOPE)) return;
+
+  let path = req.url.slice(SCOPE.length).split("#")[0].split("?")[0];
+  if (path === "" || (req.mode === "navigate" && !(path in MANIFEST.files))) path = "index.html";
+
+  const rev = MANIFEST.files[path];
+  if (rev) {
+    event.respondWith(cacheFirst(PRECACHE, revKey(path, rev), new URL(path, SCOPE)));
+    return;
+  }
+  if (path.startsWith("data/locked/")) {
+    event.respondWith(cacheFirst(RUNTIME, bundleKey(path), req));
+  }
+});